@@ -0,0 +1,18 @@
+from __future__ import unicode_literals
+
+from django.dispatch import receiver
+
+from reviewboard.signals import initializing
+
+
+@receiver(initializing)
+def _on_initializing(*args, **kwargs):
+    """Handler for when Review Board is initializing.
+
+    This will begin listening for changes to group memberships and to the
+    access settings of groups and repositories, invalidating the cached IDs
+    of accessible groups and repositories when they change.
+    """
+    from reviewboard.accounts.access_cache import connect_signals
+
+    connect_signals()
@@ -0,0 +1,222 @@
+"""Caching for the IDs of repositories and groups accessible by users.
+
+Access checks for review requests need the IDs of the repositories and
+review groups a user can access. A single page (such as the Dashboard) can
+ask for these many times with the same arguments, from the review request
+queries, the search form, the datagrids and the API.
+
+:py:func:`get_accessible_ids` remembers the results on the user object, so
+they're computed at most once per request. When
+``ACCESSIBLE_IDS_CACHE_EXPIRATION`` is set to a number of seconds, results
+are also shared between requests through the cache.
+
+Only up to :py:data:`MAX_REMEMBERED_IDS` IDs are remembered. If a user can
+access more objects than that, a subquery for the IDs is returned instead,
+so that callers don't build huge ``IN (...)`` lists.
+
+Any change to group memberships, repository access lists, or the access
+settings of a group or repository invalidates all remembered results. Within
+a process, this takes effect immediately. Results shared through the cache
+are stored under a versioned key, and the version is replaced on each change.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+
+
+#: The maximum number of IDs remembered for a user.
+#:
+#: Beyond this, the IDs are looked up through a subquery instead.
+MAX_REMEMBERED_IDS = 1000
+
+
+_VERSION_KEY = 'accessible-ids-version'
+
+# Stored in the cache in place of the IDs when there are too many.
+_TOO_MANY_IDS = 'too-many'
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _get_shared_version():
+    """Return the current version for results shared between requests.
+
+    Returns:
+        unicode:
+        The version. A new one will be created if it's not in the cache.
+    """
+    key = make_cache_key(_VERSION_KEY)
+    version = cache.get(key)
+
+    if version is None:
+        version = uuid.uuid4().hex
+
+        # Another process may have just created this version, in which case
+        # we want to use that one.
+        if not cache.add(key, version):
+            version = cache.get(key) or version
+
+    return version
+
+
+def _get_ids(get_queryset):
+    """Return the IDs from a queryset, if there aren't too many.
+
+    Args:
+        get_queryset (callable):
+            A function returning a queryset of the IDs.
+
+    Returns:
+        list of int:
+        The IDs, or ``None`` if there are more than
+        :py:data:`MAX_REMEMBERED_IDS`.
+    """
+    ids = list(get_queryset()[:MAX_REMEMBERED_IDS + 1])
+
+    if len(ids) > MAX_REMEMBERED_IDS:
+        return None
+
+    return ids
+
+
+def get_accessible_ids(name, user, visible_only, local_site, get_queryset):
+    """Return the IDs of objects accessible by a user.
+
+    Args:
+        name (unicode):
+            The name of the type of object (such as ``repository`` or
+            ``group``).
+
+        user (django.contrib.auth.models.User):
+            The user the objects must be accessible by.
+
+        visible_only (bool):
+            Whether only visible objects are included.
+
+        local_site (reviewboard.site.models.LocalSite):
+            The Local Site the objects belong to, if any.
+
+        get_queryset (callable):
+            A function returning a queryset of the IDs (such as one from
+            ``values_list('pk', flat=True)``).
+
+    Returns:
+        list of int or django.db.models.query.QuerySet:
+        The IDs of the accessible objects. If there are more than
+        :py:data:`MAX_REMEMBERED_IDS`, this will be the queryset from
+        ``get_queryset`` instead, for use as a subquery.
+    """
+    memo = getattr(user, '_accessible_ids_cache', None)
+
+    if memo is None or memo['generation'] != _generation:
+        memo = {
+            'generation': _generation,
+            'ids': {},
+        }
+        user._accessible_ids_cache = memo
+
+    if local_site is None:
+        local_site_id = None
+    else:
+        local_site_id = local_site.pk
+
+    key = (name, user.is_superuser, visible_only, local_site_id)
+
+    try:
+        return memo['ids'][key]
+    except KeyError:
+        pass
+
+    expiration = getattr(settings, 'ACCESSIBLE_IDS_CACHE_EXPIRATION', 0)
+
+    if expiration:
+        if user.is_authenticated():
+            user_id = user.pk
+        else:
+            user_id = 'anonymous'
+
+        cache_key = make_cache_key('accessible-ids:%s:%s:%s:%d:%d:%s' % (
+            _get_shared_version(), name, user_id, user.is_superuser,
+            visible_only, local_site_id or 'global'))
+        ids = cache.get(cache_key)
+
+        if ids is None:
+            ids = _get_ids(get_queryset)
+
+            if ids is None:
+                cache.set(cache_key, _TOO_MANY_IDS, expiration)
+            else:
+                cache.set(cache_key, ids, expiration)
+        elif ids == _TOO_MANY_IDS:
+            ids = None
+    else:
+        ids = _get_ids(get_queryset)
+
+    if ids is None:
+        ids = get_queryset()
+
+    memo['ids'][key] = ids
+
+    return ids
+
+
+def invalidate_accessible_ids():
+    """Invalidate all remembered accessible IDs.
+
+    This must be called whenever group memberships, repository access lists,
+    or the access settings for groups or repositories change.
+    """
+    global _generation
+
+    with _generation_lock:
+        _generation += 1
+
+    cache.set(make_cache_key(_VERSION_KEY), uuid.uuid4().hex)
+
+
+def _on_access_changed(**kwargs):
+    """Handle a change affecting which objects users can access.
+
+    Args:
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    invalidate_accessible_ids()
+
+
+def _on_access_m2m_changed(action, **kwargs):
+    """Handle a change to a membership or access list.
+
+    Args:
+        action (unicode):
+            The change action.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_accessible_ids()
+
+
+def connect_signals():
+    """Connect the signal handlers that invalidate accessible IDs."""
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    from reviewboard.reviews.models import Group
+    from reviewboard.scmtools.models import Repository
+
+    for sender in (Group.users.through,
+                   Repository.users.through,
+                   Repository.review_groups.through):
+        m2m_changed.connect(_on_access_m2m_changed, sender=sender)
+
+    for sender in (Group, Repository):
+        post_save.connect(_on_access_changed, sender=sender)
+        post_delete.connect(_on_access_changed, sender=sender)
@@ -9,6 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.accounts.models import (ReviewRequestVisit, Profile,
                                          LocalSiteProfile)
+from reviewboard.datagrids.sidebar_cache import invalidate_all_sidebar_counts
 from reviewboard.reviews.models import Group
 
 
@@ -146,6 +147,7 @@ def fix_review_counts():
         total_outgoing_request_count=None,
         starred_public_request_count=None)
     Group.objects.update(incoming_request_count=None)
+    invalidate_all_sidebar_counts()
 
 
 # Get rid of the old User admin model, and replace it with our own.
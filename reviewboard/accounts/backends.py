@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
 import hashlib
+import itertools
 import logging
 import re
 import sre_constants
@@ -11,8 +12,10 @@ from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.contrib.auth import get_backends
 from django.contrib.auth import hashers
+from django.core.cache import cache
 from django.utils import six
 from django.utils.translation import ugettext_lazy as _
+from djblets.cache.backend import make_cache_key
 from djblets.db.query import get_object_or_none
 from djblets.siteconfig.models import SiteConfiguration
 try:
@@ -30,6 +33,7 @@ from reviewboard.accounts.forms.auth import (ActiveDirectorySettingsForm,
                                              StandardAuthSettingsForm,
                                              X509SettingsForm,
                                              HTTPBasicSettingsForm)
+from reviewboard.accounts.ldap_pool import connection_pool
 from reviewboard.accounts.models import LocalSiteProfile
 from reviewboard.site.models import LocalSite
 from reviewboard.registries.registry import EntryPointRegistry
@@ -539,9 +543,9 @@ class LDAPBackend(AuthBackend):
         if isinstance(password, six.text_type):
             password = password.encode('utf-8')
 
-        userdn = self._get_user_dn(ldapo, username)
-
         try:
+            userdn = self._get_user_dn(ldapo, username)
+
             # Now that we have the user, attempt to bind to verify
             # authentication.
             logging.debug('Attempting to authenticate user DN "%s" '
@@ -563,6 +567,8 @@ class LDAPBackend(AuthBackend):
             logging.exception('Unexpected error authenticating user "%s" '
                               'in LDAP: %s',
                               username, e)
+        finally:
+            self._release_connection(ldapo)
 
         return None
 
@@ -609,6 +615,8 @@ class LDAPBackend(AuthBackend):
                           username)
             return None
 
+        owns_connection = (ldapo is None)
+
         try:
             if ldapo is None:
                 ldapo = self._connect(request=request)
@@ -682,6 +690,9 @@ class LDAPBackend(AuthBackend):
                             exc_info=1)
         except ldap.LDAPError as e:
             logging.warning("LDAP error: %s", e, exc_info=1)
+        finally:
+            if owns_connection and ldapo is not None:
+                self._release_connection(ldapo)
 
         return None
 
@@ -689,7 +700,11 @@ class LDAPBackend(AuthBackend):
         """Connect to LDAP.
 
         This will attempt to connect and authenticate (if needed) to the
-        configured LDAP server.
+        configured LDAP server. An idle connection from a previous
+        operation will be reused if available.
+
+        The connection must be passed to :py:meth:`_release_connection`
+        once the caller is done with it.
 
         Args:
             request (django.http.HttpRequest, optional):
@@ -704,7 +719,19 @@ class LDAPBackend(AuthBackend):
         if ldap is None:
             return None
 
+        ldapo = connection_pool.acquire(self._get_pool_key())
+
         try:
+            if ldapo is not None:
+                try:
+                    self._bind_service_account(ldapo)
+
+                    return ldapo
+                except ldap.SERVER_DOWN:
+                    # The server closed the idle connection. Start over with
+                    # a new one.
+                    connection_pool.discard(ldapo)
+
             ldapo = ldap.initialize(settings.LDAP_URI)
             ldapo.set_option(ldap.OPT_REFERRALS, 0)
             ldapo.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
@@ -712,13 +739,7 @@ class LDAPBackend(AuthBackend):
             if settings.LDAP_TLS:
                 ldapo.start_tls_s()
 
-            if settings.LDAP_ANON_BIND_UID:
-                # Log in as the service account before searching.
-                ldapo.simple_bind_s(settings.LDAP_ANON_BIND_UID,
-                                    settings.LDAP_ANON_BIND_PASSWD)
-            else:
-                # Bind anonymously to the server.
-                ldapo.simple_bind_s()
+            self._bind_service_account(ldapo)
 
             return ldapo
         except ldap.INVALID_CREDENTIALS:
@@ -741,8 +762,50 @@ class LDAPBackend(AuthBackend):
                               e,
                               request=request)
 
+        if ldapo is not None:
+            connection_pool.discard(ldapo)
+
         return None
 
+    def _bind_service_account(self, ldapo):
+        """Bind a connection as the configured service account.
+
+        If no service account is configured, this will bind anonymously.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The LDAP connection.
+
+        Raises:
+            ldap.LDAPError:
+                There was an error binding to the server.
+        """
+        if settings.LDAP_ANON_BIND_UID:
+            # Log in as the service account before searching.
+            ldapo.simple_bind_s(settings.LDAP_ANON_BIND_UID,
+                                settings.LDAP_ANON_BIND_PASSWD)
+        else:
+            # Bind anonymously to the server.
+            ldapo.simple_bind_s()
+
+    def _get_pool_key(self):
+        """Return the key for this server's connections in the pool.
+
+        Returns:
+            tuple:
+            The key for the connection pool.
+        """
+        return ('ldap', settings.LDAP_URI, settings.LDAP_TLS)
+
+    def _release_connection(self, ldapo):
+        """Return a connection to the pool for later reuse.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The LDAP connection returned by :py:meth:`_connect`.
+        """
+        connection_pool.release(self._get_pool_key(), ldapo)
+
     def _get_user_dn(self, ldapo, username, request=None):
         """Return the DN for a given username.
 
@@ -856,87 +919,134 @@ class ActiveDirectoryBackend(AuthBackend):
         """Get the LDAP groups for the given users.
 
         This iterates over the users specified in ``search_results`` and
-        returns a set of groups of which those users are members.
+        returns a set of groups of which those users are members, along with
+        the groups those groups are members of (up to
+        ``AD_RECURSION_DEPTH`` levels deep).
+
+        Each level of nested groups is looked up using
+        :py:meth:`get_parent_groups`, which serves them from the cache when
+        possible and otherwise looks them all up in a single query.
         """
-        depth += 1
         if seen is None:
             seen = set()
 
+        groups = set()
+
         for name, data in search_results:
             if name is None:
                 continue
 
-            member_of = data.get('memberOf', [])
-            new_groups = [x.split(b',')[0].split(b'=')[1] for x in member_of]
+            groups.update(self._get_group_names(data.get('memberOf', [])))
 
-            old_seen = seen.copy()
-            seen.update(new_groups)
+        while True:
+            depth += 1
+            new_groups = groups - seen
+            seen.update(groups)
 
-            # collect groups recursively
-            if self.can_recurse(depth):
-                for group in new_groups:
-                    if group in old_seen:
-                        continue
+            if not new_groups:
+                break
 
-                    # Search for groups with the specified CN. Use the CN
-                    # rather than The sAMAccountName so that behavior is
-                    # correct when the values differ (e.g. if a
-                    # "pre-Windows 2000" group name is set in AD)
-                    group_data = self.search_ad(
-                        con,
-                        filter_format('(&(objectClass=group)(cn=%s))',
-                                      (group,)))
-                    seen.update(self.get_member_of(con, group_data,
-                                                   seen=seen, depth=depth))
-            else:
+            if not self.can_recurse(depth):
                 logging.warning('ActiveDirectory recursive group check '
                                 'reached maximum recursion depth.')
+                break
+
+            parent_groups = self.get_parent_groups(con, new_groups)
+            groups = set(itertools.chain.from_iterable(
+                six.itervalues(parent_groups)))
 
         return seen
 
-    def get_ldap_connections(self, userdomain=None):
-        """Get a set of connections to LDAP servers.
+    def get_parent_groups(self, con, group_names):
+        """Return the groups that the given groups are members of.
 
-        This returns an iterable of connections to the LDAP servers specified
-        in AD_DOMAIN_CONTROLLER.
+        The result for each group is cached for ``AD_GROUP_CACHE_EXPIRATION``
+        seconds (one hour by default, or disabled if set to 0). Any groups
+        not in the cache are looked up together in a single query.
+
+        Args:
+            con (ldap.LDAPObject):
+                The LDAP connection.
+
+            group_names (set of bytes):
+                The common names (CNs) of the groups.
+
+        Returns:
+            dict:
+            A dictionary mapping each group name to a list of the names of
+            groups it's a member of.
         """
-        if settings.AD_FIND_DC_FROM_DNS:
-            dcs = self.find_domain_controllers_from_dns(userdomain)
-        else:
-            dcs = []
+        expiration = getattr(settings, 'AD_GROUP_CACHE_EXPIRATION', 60 * 60)
+        search_root = self.get_ldap_search_root()
+        cache_keys = dict(
+            (make_cache_key(self._make_group_cache_key(search_root, name)),
+             name)
+            for name in group_names
+        )
+        parent_groups = {}
+
+        if expiration:
+            for key, parents in six.iteritems(cache.get_many(cache_keys)):
+                parent_groups[cache_keys[key]] = parents
+
+        missing = [
+            name
+            for name in group_names
+            if name not in parent_groups
+        ]
+
+        if missing:
+            # Search for groups with the specified CNs. Use the CN rather
+            # than the sAMAccountName so that behavior is correct when the
+            # values differ (e.g. if a "pre-Windows 2000" group name is set
+            # in AD).
+            group_data = self.search_ad(
+                con,
+                '(&(objectClass=group)(|%s))' % ''.join(
+                    filter_format('(cn=%s)', (name,))
+                    for name in missing
+                ))
+
+            found = dict(
+                (name, [])
+                for name in missing
+            )
+
+            for dn, data in group_data:
+                if dn is None:
+                    continue
 
-            for dc_entry in settings.AD_DOMAIN_CONTROLLER.split():
-                if ':' in dc_entry:
-                    host, port = dc_entry.split(':')
-                else:
-                    host = dc_entry
-                    port = '389'
+                name = self._get_group_names([dn])[0]
 
-                dcs.append([port, host])
+                if name in found:
+                    found[name] += self._get_group_names(
+                        data.get('memberOf', []))
 
-        for dc in dcs:
-            port, host = dc
-            ldap_uri = 'ldap://%s:%s' % (host, port)
-            con = ldap.initialize(ldap_uri)
+            parent_groups.update(found)
 
-            if settings.AD_USE_TLS:
-                try:
-                    con.start_tls_s()
-                except ldap.UNAVAILABLE:
-                    logging.warning('Active Directory: Domain controller '
-                                    '%s:%d for domain %s unavailable',
-                                    host, int(port), userdomain)
-                    continue
-                except ldap.CONNECT_ERROR:
-                    logging.warning("Active Directory: Could not connect "
-                                    "to domain controller %s:%d for domain "
-                                    "%s, possibly the certificate wasn't "
-                                    "verifiable",
-                                    host, int(port), userdomain)
-                    continue
+            if expiration:
+                cache.set_many(
+                    dict(
+                        (key, found[name])
+                        for key, name in six.iteritems(cache_keys)
+                        if name in found
+                    ),
+                    expiration)
+
+        return parent_groups
+
+    def get_ldap_connections(self, userdomain=None):
+        """Get a set of connections to LDAP servers.
+
+        This returns an iterable of connections to the LDAP servers specified
+        in AD_DOMAIN_CONTROLLER.
+        """
+        for host, port in self._get_domain_controllers(userdomain):
+            con, reused = self._get_ldap_connection(host, port, userdomain,
+                                                    reuse=False)
 
-            con.set_option(ldap.OPT_REFERRALS, 0)
-            yield con
+            if con is not None:
+                yield con
 
     def authenticate(self, username, password, **kwargs):
         """Authenticate the user.
@@ -958,8 +1068,6 @@ class ActiveDirectoryBackend(AuthBackend):
         if user_subdomain:
             userdomain = "%s.%s" % (user_subdomain, userdomain)
 
-        connections = self.get_ldap_connections(userdomain)
-
         required_group = settings.AD_GROUP_NAME
         if isinstance(required_group, six.text_type):
             required_group = required_group.encode('utf-8')
@@ -969,55 +1077,268 @@ class ActiveDirectoryBackend(AuthBackend):
         else:
             username_bytes = username
 
-        if isinstance(user_subdomain, six.text_type):
-            user_subdomain = user_subdomain.encode('utf-8')
-
         if isinstance(password, six.text_type):
             password = password.encode('utf-8')
 
-        for con in connections:
-            try:
-                bind_username = b'%s@%s' % (username_bytes, userdomain)
-                logging.debug("User %s is trying to log in via AD",
-                              bind_username.decode('utf-8'))
-                con.simple_bind_s(bind_username, password)
-                user_data = self.search_ad(
-                    con,
-                    filter_format('(&(objectClass=user)(sAMAccountName=%s))',
-                                  (username_bytes,)),
-                    userdomain)
-
-                if not user_data:
+        for host, port in self._get_domain_controllers(userdomain):
+            # If an idle connection from the pool turns out to have been
+            # closed by the server, try again with a new one.
+            for reuse in (True, False):
+                con, reused = self._get_ldap_connection(host, port,
+                                                        userdomain,
+                                                        reuse=reuse)
+
+                if con is None:
+                    break
+
+                try:
+                    user = self._authenticate_with_connection(
+                        con, username, username_bytes, password, userdomain,
+                        required_group)
+                except ldap.SERVER_DOWN:
+                    connection_pool.discard(con)
+
+                    if reused:
+                        continue
+
+                    logging.warning('Active Directory: Domain controller '
+                                    'is down')
+                    break
+                except ldap.INVALID_CREDENTIALS:
+                    self._release_ldap_connection(host, port, con)
+                    logging.warning('Active Directory: Failed login for '
+                                    'user %s',
+                                    username)
                     return None
+                except Exception:
+                    connection_pool.discard(con)
+                    raise
 
-                if required_group:
-                    try:
-                        group_names = self.get_member_of(con, user_data)
-                    except Exception as e:
-                        logging.error("Active Directory error: failed getting"
-                                      "groups for user '%s': %s",
-                                      username, e, exc_info=1)
-                        return None
-
-                    if required_group not in group_names:
-                        logging.warning("Active Directory: User %s is not in "
-                                        "required group %s",
-                                        username, required_group)
-                        return None
-
-                return self.get_or_create_user(username, None, user_data)
-            except ldap.SERVER_DOWN:
-                logging.warning('Active Directory: Domain controller is down')
-                continue
-            except ldap.INVALID_CREDENTIALS:
-                logging.warning('Active Directory: Failed login for user %s',
-                                username)
-                return None
+                self._release_ldap_connection(host, port, con)
+
+                return user
 
         logging.error('Active Directory error: Could not contact any domain '
                       'controller servers')
         return None
 
+    def _authenticate_with_connection(self, con, username, username_bytes,
+                                      password, userdomain, required_group):
+        """Authenticate the user using a connection to a domain controller.
+
+        Args:
+            con (ldap.LDAPObject):
+                The connection to the domain controller.
+
+            username (unicode):
+                The username, without the domain.
+
+            username_bytes (bytes):
+                The username, encoded as UTF-8.
+
+            password (bytes):
+                The password, encoded as UTF-8.
+
+            userdomain (unicode):
+                The user's domain.
+
+            required_group (bytes):
+                The group the user must be a member of, if any.
+
+        Returns:
+            django.contrib.auth.models.User:
+            The user, or ``None`` if the user couldn't be found or isn't in
+            the required group.
+
+        Raises:
+            ldap.LDAPError:
+                There was an error communicating with the domain controller,
+                or the credentials were invalid.
+        """
+        bind_username = b'%s@%s' % (username_bytes, userdomain)
+        logging.debug("User %s is trying to log in via AD",
+                      bind_username.decode('utf-8'))
+        con.simple_bind_s(bind_username, password)
+        user_data = self.search_ad(
+            con,
+            filter_format('(&(objectClass=user)(sAMAccountName=%s))',
+                          (username_bytes,)),
+            userdomain)
+
+        if not user_data:
+            return None
+
+        if required_group:
+            try:
+                group_names = self.get_member_of(con, user_data)
+            except ldap.SERVER_DOWN:
+                # The caller needs to discard the connection, rather than
+                # returning it to the pool.
+                raise
+            except Exception as e:
+                logging.error("Active Directory error: failed getting"
+                              "groups for user '%s': %s",
+                              username, e, exc_info=1)
+                return None
+
+            if required_group not in group_names:
+                logging.warning("Active Directory: User %s is not in "
+                                "required group %s",
+                                username, required_group)
+                return None
+
+        return self.get_or_create_user(username, None, user_data)
+
+    def _get_domain_controllers(self, userdomain=None):
+        """Return the domain controllers to connect to.
+
+        Args:
+            userdomain (unicode, optional):
+                The user's domain, used when finding domain controllers
+                through DNS.
+
+        Returns:
+            list of tuple:
+            A list of ``(host, port)`` tuples for each domain controller.
+        """
+        if settings.AD_FIND_DC_FROM_DNS:
+            dcs = self.find_domain_controllers_from_dns(userdomain)
+        else:
+            dcs = []
+
+            for dc_entry in settings.AD_DOMAIN_CONTROLLER.split():
+                if ':' in dc_entry:
+                    host, port = dc_entry.split(':')
+                else:
+                    host = dc_entry
+                    port = '389'
+
+                dcs.append([port, host])
+
+        return [
+            (host, port)
+            for port, host in dcs
+        ]
+
+    def _get_ldap_connection(self, host, port, userdomain=None, reuse=True):
+        """Return a connection to a domain controller.
+
+        An idle connection from a previous login will be returned if
+        available. The connection should be passed to
+        :py:meth:`_release_ldap_connection` once the caller is done with it.
+
+        Args:
+            host (unicode):
+                The hostname of the domain controller.
+
+            port (unicode):
+                The port of the domain controller.
+
+            userdomain (unicode, optional):
+                The user's domain, used for logging.
+
+            reuse (bool, optional):
+                Whether an idle connection can be returned.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the connection (or ``None`` if the domain
+            controller couldn't be reached) and whether it was an idle
+            connection from the pool.
+        """
+        if reuse:
+            con = connection_pool.acquire(self._get_pool_key(host, port))
+
+            if con is not None:
+                return con, True
+
+        ldap_uri = 'ldap://%s:%s' % (host, port)
+        con = ldap.initialize(ldap_uri)
+
+        if settings.AD_USE_TLS:
+            try:
+                con.start_tls_s()
+            except ldap.UNAVAILABLE:
+                logging.warning('Active Directory: Domain controller '
+                                '%s:%d for domain %s unavailable',
+                                host, int(port), userdomain)
+                return None, False
+            except ldap.CONNECT_ERROR:
+                logging.warning("Active Directory: Could not connect "
+                                "to domain controller %s:%d for domain "
+                                "%s, possibly the certificate wasn't "
+                                "verifiable",
+                                host, int(port), userdomain)
+                return None, False
+
+        con.set_option(ldap.OPT_REFERRALS, 0)
+
+        return con, False
+
+    def _release_ldap_connection(self, host, port, con):
+        """Return a connection to the pool for later reuse.
+
+        Args:
+            host (unicode):
+                The hostname of the domain controller.
+
+            port (unicode):
+                The port of the domain controller.
+
+            con (ldap.LDAPObject):
+                The connection to return.
+        """
+        connection_pool.release(self._get_pool_key(host, port), con)
+
+    def _get_pool_key(self, host, port):
+        """Return the key for a domain controller's connections in the pool.
+
+        Args:
+            host (unicode):
+                The hostname of the domain controller.
+
+            port (unicode):
+                The port of the domain controller.
+
+        Returns:
+            tuple:
+            The key for the connection pool.
+        """
+        return ('ad', host, six.text_type(port), settings.AD_USE_TLS)
+
+    def _get_group_names(self, dns):
+        """Return the common names of groups from their DNs.
+
+        Args:
+            dns (list of bytes):
+                The distinguished names of the groups.
+
+        Returns:
+            list of bytes:
+            The common names of the groups.
+        """
+        return [
+            dn.split(b',')[0].split(b'=')[1]
+            for dn in dns
+        ]
+
+    def _make_group_cache_key(self, search_root, name):
+        """Return the cache key for a group's parent groups.
+
+        Args:
+            search_root (unicode):
+                The LDAP search root used to look up the group.
+
+            name (bytes):
+                The common name of the group.
+
+        Returns:
+            unicode:
+            The cache key.
+        """
+        return 'ad-group-parents:%s' % hashlib.sha1(
+            b'%s:%s' % (search_root.encode('utf-8'), name)).hexdigest()
+
     def get_or_create_user(self, username, request, ad_user_data):
         """Get an existing user, or create one if it does not exist."""
         username = re.sub(INVALID_USERNAME_CHAR_REGEX, '', username).lower()
@@ -0,0 +1,139 @@
+"""Pooled connections to LDAP servers.
+
+Setting up a new LDAP connection (and starting TLS on it) for every login can
+take longer than the login itself. The LDAP and Active Directory
+authentication backends instead return their connections to the
+per-process :py:data:`connection_pool` when they're done, and reuse them for
+the next login.
+
+Connections are always bound again by the backends after being acquired, so
+a connection left bound as one user is never used with that user's
+credentials by another login.
+"""
+
+from __future__ import unicode_literals
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.utils import six
+
+
+class LDAPConnectionPool(object):
+    """A per-process pool of open LDAP connections.
+
+    Idle connections are kept for up to :py:attr:`idle_timeout` seconds, and
+    up to :py:attr:`max_idle` connections are kept for each server. Servers
+    may close idle connections sooner than that, so callers must be prepared
+    to retry on a new connection if a reused one turns out to be closed.
+    """
+
+    #: The maximum number of idle connections to keep for each key.
+    max_idle = 4
+
+    #: The number of seconds an idle connection is kept open.
+    idle_timeout = 5 * 60
+
+    def __init__(self):
+        """Initialize the pool."""
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self, key):
+        """Return an idle connection from the pool.
+
+        Args:
+            key (tuple):
+                The key for the server the connection is for.
+
+        Returns:
+            ldap.ldapobject.LDAPObject:
+            The idle connection, or ``None`` if there isn't a usable one.
+        """
+        expired = []
+        expire_time = time.time() - self.idle_timeout
+        result = None
+
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.get(key, [])
+
+            while idle:
+                con, last_used = idle.pop()
+
+                if last_used >= expire_time:
+                    result = con
+                    break
+
+                expired.append(con)
+
+        for con in expired:
+            self.discard(con)
+
+        return result
+
+    def release(self, key, con):
+        """Return a connection to the pool.
+
+        If the pool is full, the connection will be closed instead.
+
+        Args:
+            key (tuple):
+                The key for the server the connection is for.
+
+            con (ldap.ldapobject.LDAPObject):
+                The connection to return.
+        """
+        with self._lock:
+            self._check_pid()
+            idle = self._idle.setdefault(key, [])
+
+            if len(idle) < self.max_idle:
+                idle.append((con, time.time()))
+                return
+
+        self.discard(con)
+
+    def discard(self, con):
+        """Close a connection that won't be returned to the pool.
+
+        Args:
+            con (ldap.ldapobject.LDAPObject):
+                The connection to close.
+        """
+        try:
+            con.unbind_s()
+        except Exception as e:
+            logging.debug('Error closing LDAP connection: %s', e)
+
+    def close_all(self):
+        """Close all idle connections in the pool."""
+        with self._lock:
+            self._check_pid()
+            idle = self._idle
+            self._idle = {}
+
+        for connections in six.itervalues(idle):
+            for con, last_used in connections:
+                self.discard(con)
+
+    def _check_pid(self):
+        """Discard connections inherited from a parent process.
+
+        The connections belong to the parent process, so they're left for
+        it to close. This must be called with the lock held.
+        """
+        pid = os.getpid()
+
+        if pid != self._pid:
+            self._idle = {}
+            self._pid = pid
+
+
+#: The pool of LDAP connections for this process.
+connection_pool = LDAPConnectionPool()
+atexit.register(connection_pool.close_all)
@@ -17,6 +17,7 @@ from reviewboard.accounts.managers import (ProfileManager,
                                            TrophyManager)
 from reviewboard.accounts.trophies import trophies_registry
 from reviewboard.avatars import avatar_services
+from reviewboard.datagrids.sidebar_cache import invalidate_user_sidebar_counts
 from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.reviews.signals import (reply_published,
                                          review_published,
@@ -216,6 +217,7 @@ class Profile(models.Model):
                 site_profile.save()
 
             site_profile.increment_starred_public_request_count()
+            invalidate_user_sidebar_counts([self.user_id])
 
         self.save()
 
@@ -242,6 +244,7 @@ class Profile(models.Model):
                 site_profile.save()
 
             site_profile.decrement_starred_public_request_count()
+            invalidate_user_sidebar_counts([self.user_id])
 
         self.save()
 
@@ -446,6 +449,16 @@ def _get_profile(self):
     # would use, ensuring that we benefit from Django's caching when possible.
     profile = getattr(self, '_profile_set_cache', None)
 
+    if (profile is None and
+        'profile' in getattr(self, '_prefetched_objects_cache', {})):
+        # The profile was fetched through prefetch_related('profile_set').
+        profiles = list(self.profile_set.all())
+
+        if profiles:
+            profile = profiles[0]
+            profile.user = self
+            self._profile_set_cache = profile
+
     if profile is None:
         profile = Profile.objects.get_or_create(user=self)[0]
         profile.user = self
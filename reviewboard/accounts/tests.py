@@ -6,9 +6,12 @@ import nose
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db.models.query import QuerySet
 from django.http import HttpResponse, HttpResponseRedirect
 from django.test.client import RequestFactory
+from django.utils import six
 from django.views.generic.base import View
 from djblets.registries.errors import ItemLookupError, RegistrationError
 from djblets.siteconfig.models import SiteConfiguration
@@ -20,7 +23,9 @@ try:
 except ImportError:
     ldap = None
 
-from reviewboard.accounts.backends import (AuthBackend, auth_backends,
+from reviewboard.accounts import access_cache
+from reviewboard.accounts.backends import (ActiveDirectoryBackend,
+                                           AuthBackend, auth_backends,
                                            get_enabled_auth_backends,
                                            INVALID_USERNAME_CHAR_REGEX,
                                            register_auth_backend,
@@ -30,6 +35,7 @@ from reviewboard.accounts.backends import (AuthBackend, auth_backends,
 from reviewboard.accounts.forms.pages import (AccountPageForm,
                                               ChangePasswordForm,
                                               ProfileForm)
+from reviewboard.accounts.ldap_pool import connection_pool
 from reviewboard.accounts.mixins import (CheckLoginRequiredViewMixin,
                                          LoginRequiredViewMixin,
                                          UserProfileRequiredViewMixin)
@@ -40,6 +46,8 @@ from reviewboard.accounts.models import (LocalSiteProfile,
 from reviewboard.accounts.pages import (AccountPage, get_page_classes,
                                         register_account_page_class,
                                         unregister_account_page_class)
+from reviewboard.reviews.models import Group
+from reviewboard.scmtools.models import Repository
 from reviewboard.testing import TestCase
 
 
@@ -127,6 +135,9 @@ class BaseTestLDAPObject(object):
     def search_s(self, *args, **kwargs):
         pass
 
+    def unbind_s(self):
+        pass
+
 
 class LDAPAuthBackendTests(SpyAgency, TestCase):
     """Unit tests for the LDAP authentication backend."""
@@ -151,6 +162,11 @@ class LDAPAuthBackendTests(SpyAgency, TestCase):
 
         self.backend = LDAPBackend()
 
+    def tearDown(self):
+        super(LDAPAuthBackendTests, self).tearDown()
+
+        connection_pool.close_all()
+
     @add_fixtures(['test_users'])
     def test_authenticate_with_valid_credentials(self):
         """Testing LDAPBackend.authenticate with valid credentials"""
@@ -331,10 +347,172 @@ class LDAPAuthBackendTests(SpyAgency, TestCase):
         self.assertIsNone(user)
         self.assertEqual(User.objects.count(), 0)
 
+    @add_fixtures(['test_users'])
+    def test_authenticate_reuses_connection(self):
+        """Testing LDAPBackend.authenticate reuses connections between logins
+        """
+        class TestLDAPObject(BaseTestLDAPObject):
+            def search_s(ldapo, base, scope,
+                         filter_str=self.DEFAULT_FILTER_STR,
+                         *args, **kwargs):
+                return [['CN=Doc Dwarf,OU=MyOrg,DC=example,DC=COM']]
+
+        self._patch_ldap(TestLDAPObject)
+        self.spy_on(TestLDAPObject.simple_bind_s)
+
+        self.assertIsNotNone(
+            self.backend.authenticate(username='doc', password='mypass'))
+        self.assertIsNotNone(
+            self.backend.authenticate(username='doc', password='mypass'))
+
+        self.assertEqual(len(ldap.initialize.spy.calls), 1)
+
+        # The connection must be bound again for each login.
+        self.assertEqual(len(TestLDAPObject.simple_bind_s.spy.calls), 2)
+
+    @add_fixtures(['test_users'])
+    def test_authenticate_with_closed_connection(self):
+        """Testing LDAPBackend.authenticate with a pooled connection closed by
+        the server
+        """
+        class TestLDAPObject(BaseTestLDAPObject):
+            closed = False
+
+            def simple_bind_s(ldapo, *args, **kwargs):
+                if ldapo.closed:
+                    raise ldap.SERVER_DOWN()
+
+            def search_s(ldapo, base, scope,
+                         filter_str=self.DEFAULT_FILTER_STR,
+                         *args, **kwargs):
+                return [['CN=Doc Dwarf,OU=MyOrg,DC=example,DC=COM']]
+
+        self._patch_ldap(TestLDAPObject)
+
+        self.backend.authenticate(username='doc', password='mypass')
+        ldap.initialize.spy.calls[0].return_value.closed = True
+
+        self.assertIsNotNone(
+            self.backend.authenticate(username='doc', password='mypass'))
+        self.assertEqual(len(ldap.initialize.spy.calls), 2)
+
     def _patch_ldap(self, cls):
         self.spy_on(ldap.initialize, call_fake=lambda uri, *args: cls(uri))
 
 
+class ActiveDirectoryAuthBackendTests(SpyAgency, TestCase):
+    """Unit tests for the Active Directory authentication backend."""
+
+    def setUp(self):
+        if ldap is None:
+            raise nose.SkipTest()
+
+        super(ActiveDirectoryAuthBackendTests, self).setUp()
+
+        settings.AD_DOMAIN_NAME = 'example.com'
+        settings.AD_SEARCH_ROOT = None
+        settings.AD_OU_NAME = None
+        settings.AD_RECURSION_DEPTH = -1
+
+        self.backend = ActiveDirectoryBackend()
+
+        # Group A is a member of group B, which is a member of group C.
+        self.group_parents = {
+            b'A': [b'CN=B,DC=example,DC=com'],
+            b'B': [b'CN=C,DC=example,DC=com'],
+            b'C': [],
+        }
+        self.searches = []
+
+        def search_ad(backend, con, filterstr, userdomain=None):
+            self.searches.append(filterstr)
+
+            return [
+                ('CN=%s,DC=example,DC=com' % name.decode('utf-8'),
+                 {'memberOf': parents})
+                for name, parents in six.iteritems(self.group_parents)
+                if '(cn=%s)' % name.decode('utf-8') in filterstr
+            ]
+
+        self.spy_on(ActiveDirectoryBackend.search_ad, call_fake=search_ad)
+
+        self.user_data = [
+            ('CN=Doc Dwarf,DC=example,DC=com', {
+                'memberOf': [b'CN=A,DC=example,DC=com'],
+            }),
+        ]
+
+    def tearDown(self):
+        super(ActiveDirectoryAuthBackendTests, self).tearDown()
+
+        cache.clear()
+
+    def test_get_member_of(self):
+        """Testing ActiveDirectoryBackend.get_member_of with nested groups"""
+        self.assertEqual(self.backend.get_member_of(None, self.user_data),
+                         set([b'A', b'B', b'C']))
+
+        # There should be one query for each level of nesting.
+        self.assertEqual(len(self.searches), 2)
+
+    def test_get_member_of_cached(self):
+        """Testing ActiveDirectoryBackend.get_member_of caches nested groups
+        """
+        self.backend.get_member_of(None, self.user_data)
+        self.searches = []
+
+        self.assertEqual(self.backend.get_member_of(None, self.user_data),
+                         set([b'A', b'B', b'C']))
+        self.assertEqual(self.searches, [])
+
+    def test_get_member_of_with_recursion_depth(self):
+        """Testing ActiveDirectoryBackend.get_member_of with
+        AD_RECURSION_DEPTH
+        """
+        settings.AD_RECURSION_DEPTH = 1
+
+        self.assertEqual(self.backend.get_member_of(None, self.user_data),
+                         set([b'A', b'B']))
+        self.assertEqual(len(self.searches), 1)
+
+    def test_get_parent_groups_batches_lookups(self):
+        """Testing ActiveDirectoryBackend.get_parent_groups looks up uncached
+        groups in one query
+        """
+        self.assertEqual(
+            self.backend.get_parent_groups(None, set([b'A', b'B', b'Z'])),
+            {
+                b'A': [b'B'],
+                b'B': [b'C'],
+                b'Z': [],
+            })
+        self.assertEqual(len(self.searches), 1)
+        self.assertTrue(self.searches[0].startswith(
+            '(&(objectClass=group)(|'))
+
+    def test_authenticate_with_connection_server_down(self):
+        """Testing ActiveDirectoryBackend._authenticate_with_connection
+        raises SERVER_DOWN from group lookups
+        """
+        class FakeConnection(object):
+            def simple_bind_s(self, *args):
+                pass
+
+        def get_member_of(*args, **kwargs):
+            raise ldap.SERVER_DOWN()
+
+        ActiveDirectoryBackend.search_ad.unspy()
+        self.spy_on(ActiveDirectoryBackend.search_ad,
+                    call_fake=lambda *args, **kwargs: self.user_data)
+        self.spy_on(ActiveDirectoryBackend.get_member_of,
+                    call_fake=get_member_of)
+
+        with self.assertRaises(ldap.SERVER_DOWN):
+            self.backend._authenticate_with_connection(
+                FakeConnection(), 'doc', b'doc', b'password', 'example.com',
+                b'A')
+
+
 class AuthBackendRegistryTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -363,6 +541,110 @@ class AuthBackendRegistryTests(TestCase):
         self.assertSetEqual(set(auth_backends), starting_set)
 
 
+class AccessibleIDsCacheTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.accounts.access_cache."""
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def setUp(self):
+        super(AccessibleIDsCacheTests, self).setUp()
+
+        self.user = User.objects.get(username='doc')
+
+    def tearDown(self):
+        super(AccessibleIDsCacheTests, self).tearDown()
+
+        cache.clear()
+
+    def test_group_accessible_ids_remembered(self):
+        """Testing Group.objects.accessible_ids remembers results for the
+        user
+        """
+        group = self.create_review_group(invite_only=True)
+        group.users.add(self.user)
+
+        self.assertEqual(
+            Group.objects.accessible_ids(self.user, visible_only=False),
+            [group.pk])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                Group.objects.accessible_ids(self.user, visible_only=False),
+                [group.pk])
+
+    def test_group_accessible_ids_after_membership_change(self):
+        """Testing Group.objects.accessible_ids after group membership
+        changes
+        """
+        group = self.create_review_group(invite_only=True)
+
+        self.assertEqual(
+            Group.objects.accessible_ids(self.user, visible_only=False),
+            [])
+
+        group.users.add(self.user)
+
+        self.assertEqual(
+            Group.objects.accessible_ids(self.user, visible_only=False),
+            [group.pk])
+
+    def test_repository_accessible_ids_after_acl_change(self):
+        """Testing Repository.objects.accessible_ids after repository access
+        list changes
+        """
+        repository = self.create_repository(public=False)
+
+        self.assertEqual(Repository.objects.accessible_ids(self.user), [])
+
+        repository.users.add(self.user)
+
+        self.assertEqual(Repository.objects.accessible_ids(self.user),
+                         [repository.pk])
+
+    def test_repository_accessible_ids_after_save(self):
+        """Testing Repository.objects.accessible_ids after a repository is
+        made public
+        """
+        repository = self.create_repository(public=False)
+
+        self.assertEqual(Repository.objects.accessible_ids(self.user), [])
+
+        repository.public = True
+        repository.save()
+
+        self.assertEqual(Repository.objects.accessible_ids(self.user),
+                         [repository.pk])
+
+    def test_accessible_ids_shared_between_requests(self):
+        """Testing Repository.objects.accessible_ids with
+        ACCESSIBLE_IDS_CACHE_EXPIRATION shares results between requests
+        """
+        repository = self.create_repository()
+        user2 = User.objects.get(pk=self.user.pk)
+
+        with self.settings(ACCESSIBLE_IDS_CACHE_EXPIRATION=60):
+            Repository.objects.accessible_ids(self.user)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(Repository.objects.accessible_ids(user2),
+                                 [repository.pk])
+
+    def test_accessible_ids_with_too_many(self):
+        """Testing Repository.objects.accessible_ids returns a subquery when
+        there are more than MAX_REMEMBERED_IDS results
+        """
+        repository1 = self.create_repository(name='repo1')
+        repository2 = self.create_repository(name='repo2')
+
+        self.spy_on(access_cache._get_ids,
+                    call_fake=lambda get_queryset: None)
+
+        ids = Repository.objects.accessible_ids(self.user)
+
+        self.assertIsInstance(ids, QuerySet)
+        self.assertEqual(set(ids), set([repository1.pk, repository2.pk]))
+
+
 class ReviewRequestVisitTests(TestCase):
     """Testing the ReviewRequestVisit model"""
 
@@ -0,0 +1,411 @@
+"""Daily activity statistics for the Administration Dashboard.
+
+The activity graph and database statistics widgets used to count comments,
+reviews, review requests and other objects directly, grouping them by day.
+On large databases, this could take a very long time.
+
+Instead, the number of objects of each type created on each day is stored in
+:py:class:`~reviewboard.reviews.models.DailyActivityCount`. The counts are
+updated as objects are created and deleted, and the widgets only need to read
+a row per day.
+
+Existing objects are counted by the ``backfill-activity-stats`` management
+command. Until that's been run, the widgets count the objects directly.
+
+Objects are counted on the day of their timestamp. Timestamps can change
+after an object is created (for instance, when a review is published), so
+the count is moved to the new day whenever an object's timestamp changes.
+Code updating timestamps in bulk must call
+:py:func:`record_timestamp_update` to do the same.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.aggregates import Count
+from django.utils import six, timezone
+from djblets.siteconfig.models import SiteConfiguration
+
+
+#: The site configuration key noting that existing objects were counted.
+BACKFILLED_SITECONFIG_KEY = 'activity_stats_backfilled'
+
+
+_timestamp_fields = {}
+
+
+def get_activity_types():
+    """Return the types of objects whose activity is counted.
+
+    Returns:
+        list of tuple:
+        A list of 3-tuples, each containing the name of the type, the model
+        class, and the name of the model's creation timestamp field (or
+        ``None``, if it doesn't have one).
+    """
+    from reviewboard.attachments.models import FileAttachment
+    from reviewboard.changedescs.models import ChangeDescription
+    from reviewboard.diffviewer.models import DiffSet
+    from reviewboard.reviews.models import (Comment, Review, ReviewRequest,
+                                            ReviewRequestDraft, Screenshot)
+
+    return [
+        ('change_descriptions', ChangeDescription, 'timestamp'),
+        ('comments', Comment, 'timestamp'),
+        ('diffsets', DiffSet, 'timestamp'),
+        ('file_attachments', FileAttachment, None),
+        ('review_request_drafts', ReviewRequestDraft, None),
+        ('review_requests', ReviewRequest, 'time_added'),
+        ('reviews', Review, 'timestamp'),
+        ('screenshots', Screenshot, None),
+    ]
+
+
+def is_backfilled():
+    """Return whether existing objects have been counted.
+
+    Returns:
+        bool:
+        ``True`` if the stored counts can be used.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    return bool(siteconfig.get(BACKFILLED_SITECONFIG_KEY, False))
+
+
+def _get_utc_date(timestamp):
+    """Return the day, in UTC, for a timestamp.
+
+    Args:
+        timestamp (datetime.datetime):
+            The timestamp. If ``None``, the current time is used.
+
+    Returns:
+        datetime.date:
+        The day in UTC.
+    """
+    if timestamp is None:
+        timestamp = timezone.now()
+
+    if timezone.is_aware(timestamp):
+        timestamp = timestamp.astimezone(timezone.utc)
+
+    return timestamp.date()
+
+
+def record_activity(name, date, delta):
+    """Add to the count of objects created on a day.
+
+    Args:
+        name (unicode):
+            The name of the type of object.
+
+        date (datetime.date):
+            The day the objects were created on.
+
+        delta (int):
+            The number of objects to add. This is negative for deleted
+            objects.
+    """
+    from reviewboard.reviews.models import DailyActivityCount
+
+    counts = DailyActivityCount.objects.filter(name=name, date=date)
+
+    if counts.update(count=F('count') + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            DailyActivityCount.objects.create(name=name, date=date,
+                                              count=delta)
+    except IntegrityError:
+        # Another process created the count first.
+        counts.update(count=F('count') + delta)
+
+
+def get_daily_counts(name, start_date, end_date):
+    """Return the number of objects created on each day in a range.
+
+    Args:
+        name (unicode):
+            The name of the type of object.
+
+        start_date (datetime.date):
+            The first day in the range.
+
+        end_date (datetime.date):
+            The last day in the range.
+
+    Returns:
+        list of tuple:
+        A list of ``(date, count)`` tuples, ordered by date. Days with a
+        count of 0 are left out. A negative count means the stored counts
+        are off, and need to be corrected by backfilling them again.
+    """
+    from reviewboard.reviews.models import DailyActivityCount
+
+    return list(
+        DailyActivityCount.objects
+        .filter(name=name,
+                date__range=(start_date, end_date))
+        .exclude(count=0)
+        .order_by('date')
+        .values_list('date', 'count'))
+
+
+def get_total_count(name):
+    """Return the number of objects of a type.
+
+    Args:
+        name (unicode):
+            The name of the type of object.
+
+    Returns:
+        int:
+        The number of objects.
+    """
+    from reviewboard.reviews.models import DailyActivityCount
+
+    total = (
+        DailyActivityCount.objects
+        .filter(name=name)
+        .aggregate(total=Sum('count'))['total'])
+
+    return total or 0
+
+
+def backfill_activity_stats():
+    """Count all existing objects, replacing any stored counts.
+
+    This only needs to be run once, after upgrading, but can be run again at
+    any time to correct the counts.
+
+    Returns:
+        dict:
+        The total number of objects counted for each type.
+    """
+    from reviewboard.reviews.models import DailyActivityCount
+
+    today = _get_utc_date(None)
+    new_counts = []
+    totals = {}
+
+    for name, model, date_field in get_activity_types():
+        if date_field:
+            # The dates are computed by the database, in UTC, since the
+            # tables can be very large.
+            day_counts = [
+                (day['day'], day['created_count'])
+                for day in (
+                    model.objects
+                    .extra({'day': 'date(%s)' % date_field})
+                    .values('day')
+                    .annotate(created_count=Count('pk'))
+                    .order_by('day'))
+            ]
+        else:
+            day_counts = [(today, model.objects.count())]
+
+        totals[name] = 0
+
+        for date, count in day_counts:
+            if isinstance(date, six.string_types):
+                date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+            elif isinstance(date, datetime.datetime):
+                date = date.date()
+
+            new_counts.append(DailyActivityCount(name=name, date=date,
+                                                 count=count))
+            totals[name] += count
+
+    with transaction.atomic():
+        DailyActivityCount.objects.all().delete()
+        DailyActivityCount.objects.bulk_create(new_counts, batch_size=500)
+
+    siteconfig = SiteConfiguration.objects.get_current()
+    siteconfig.set(BACKFILLED_SITECONFIG_KEY, True)
+    siteconfig.save()
+
+    return totals
+
+
+def _get_activity_type(sender):
+    """Return the activity type for a model.
+
+    Args:
+        sender (type):
+            The model class.
+
+    Returns:
+        tuple:
+        The entry from :py:func:`get_activity_types` for the model, or
+        ``None`` if its activity isn't counted.
+    """
+    for activity_type in get_activity_types():
+        if sender is activity_type[1]:
+            return activity_type
+
+    return None
+
+
+def record_timestamp_update(queryset, timestamp):
+    """Move counts for objects whose timestamps are updated in bulk.
+
+    This must be called before ``queryset.update()`` changes the timestamp
+    field of counted objects, since no signals are emitted for those
+    changes.
+
+    Args:
+        queryset (django.db.models.query.QuerySet):
+            The objects being updated.
+
+        timestamp (datetime.datetime):
+            The new timestamp.
+    """
+    activity_type = _get_activity_type(queryset.model)
+
+    if activity_type is None or activity_type[2] is None:
+        return
+
+    name, model, date_field = activity_type
+    new_date = _get_utc_date(timestamp)
+    moved_counts = {}
+
+    for old_timestamp in queryset.values_list(date_field, flat=True):
+        old_date = _get_utc_date(old_timestamp)
+
+        if old_date != new_date:
+            moved_counts[old_date] = moved_counts.get(old_date, 0) + 1
+
+    for old_date, count in six.iteritems(moved_counts):
+        record_activity(name, old_date, -count)
+        record_activity(name, new_date, count)
+
+
+def _get_counted_date(instance, date_field):
+    """Return the day an object is currently counted on.
+
+    This is the day of the timestamp the object had when it was loaded or
+    last saved.
+
+    Args:
+        instance (django.db.models.Model):
+            The object.
+
+        date_field (unicode):
+            The name of the object's creation timestamp field, or ``None``.
+
+    Returns:
+        datetime.date:
+        The day the object is counted on.
+    """
+    if not date_field:
+        return _get_utc_date(None)
+
+    return _get_utc_date(instance.__dict__.get('_activity_timestamp',
+                                               getattr(instance, date_field)))
+
+
+def _on_object_loaded(sender, instance, **kwargs):
+    """Handle an object being initialized.
+
+    This notes the object's timestamp, so that the count can be moved if the
+    timestamp changes.
+
+    Args:
+        sender (type):
+            The model class of the object.
+
+        instance (django.db.models.Model):
+            The object that was initialized.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    # This is called for every object loaded, so it avoids looking up the
+    # full activity type.
+    timestamp = instance.__dict__.get(_timestamp_fields.get(sender))
+
+    if timestamp is not None:
+        instance._activity_timestamp = timestamp
+
+
+def _on_object_saved(sender, instance, created=False, raw=False, **kwargs):
+    """Handle an object being saved.
+
+    Args:
+        sender (type):
+            The model class of the object.
+
+        instance (django.db.models.Model):
+            The object that was saved.
+
+        created (bool, optional):
+            Whether the object was created.
+
+        raw (bool, optional):
+            Whether the object was saved while loading a fixture.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    activity_type = _get_activity_type(sender)
+
+    if activity_type is None:
+        return
+
+    name, model, date_field = activity_type
+
+    if created:
+        if date_field:
+            date = _get_utc_date(getattr(instance, date_field))
+        else:
+            date = _get_utc_date(None)
+
+        record_activity(name, date, 1)
+    elif date_field and not raw:
+        old_date = _get_counted_date(instance, date_field)
+        date = _get_utc_date(getattr(instance, date_field))
+
+        if old_date != date:
+            record_activity(name, old_date, -1)
+            record_activity(name, date, 1)
+
+    if date_field:
+        instance._activity_timestamp = getattr(instance, date_field)
+
+
+def _on_object_deleted(sender, instance, **kwargs):
+    """Handle an object being deleted.
+
+    Args:
+        sender (type):
+            The model class of the object.
+
+        instance (django.db.models.Model):
+            The object that was deleted.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    activity_type = _get_activity_type(sender)
+
+    if activity_type is not None:
+        name, model, date_field = activity_type
+        record_activity(name, _get_counted_date(instance, date_field), -1)
+
+
+def connect_signals():
+    """Connect the signal handlers that keep the counts up-to-date."""
+    from django.db.models.signals import post_delete, post_init, post_save
+
+    for name, model, date_field in get_activity_types():
+        if date_field:
+            _timestamp_fields[model] = date_field
+            post_init.connect(_on_object_loaded, sender=model)
+
+        post_save.connect(_on_object_saved, sender=model)
+        post_delete.connect(_on_object_deleted, sender=model)
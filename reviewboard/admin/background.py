@@ -0,0 +1,92 @@
+"""Running functions on background threads.
+
+Some work started by a request (such as refreshing a stale cache entry, or
+generating a thumbnail) doesn't need to finish before the response is sent.
+:py:class:`BackgroundQueue` runs that work on a small pool of daemon threads,
+with a limit on how much work can be waiting, so a burst of requests can't
+start an unbounded number of threads.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from django.db import connection
+from django.utils.six.moves import queue, range
+
+
+class BackgroundQueue(object):
+    """A queue of functions run by a pool of background threads.
+
+    The threads are started the first time a function is queued, and run
+    until the process exits. Any database connection opened by a function
+    is closed when the function finishes.
+    """
+
+    def __init__(self, name, num_threads=1, max_pending=100):
+        """Initialize the queue.
+
+        Args:
+            name (unicode):
+                The name of the queue, used for the threads and in logs.
+
+            num_threads (int, optional):
+                The number of threads running functions.
+
+            max_pending (int, optional):
+                The maximum number of functions waiting to be run.
+        """
+        self.name = name
+        self.num_threads = num_threads
+        self.max_pending = max_pending
+
+        self._queue = None
+        self._lock = threading.Lock()
+
+    def run(self, func, *args):
+        """Queue a function to be run on a background thread.
+
+        Args:
+            func (callable):
+                The function to run.
+
+            *args (tuple):
+                The arguments to pass to the function.
+
+        Returns:
+            bool:
+            ``True`` if the function was queued, or ``False`` if there were
+            already :py:attr:`max_pending` functions waiting.
+        """
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(self.max_pending)
+
+                for i in range(self.num_threads):
+                    thread = threading.Thread(
+                        target=self._run_worker,
+                        name='%s-%d' % (self.name, i + 1))
+                    thread.daemon = True
+                    thread.start()
+
+        try:
+            self._queue.put_nowait((func, args))
+        except queue.Full:
+            return False
+
+        return True
+
+    def _run_worker(self):
+        """Run functions from the queue, until the process exits."""
+        while True:
+            func, args = self._queue.get()
+
+            try:
+                func(*args)
+            except Exception as e:
+                logging.exception('Unexpected error running a function on '
+                                  'the "%s" background queue: %s',
+                                  self.name, e)
+            finally:
+                connection.close()
@@ -1,7 +1,11 @@
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
 import logging
+import pickle
 import socket
+import threading
+import time
+from collections import defaultdict
 
 try:
     import cmemcache as memcache
@@ -12,8 +16,345 @@ except ImportError:
         memcache = None
 
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import six
+from djblets.cache.backend import (cache_memoize as djblets_cache_memoize,
+                                   make_cache_key)
 from djblets.cache.forwarding_backend import DEFAULT_FORWARD_CACHE_ALIAS
 
+from reviewboard.admin import profiling
+from reviewboard.admin.background import BackgroundQueue
+from reviewboard.admin.profiling import get_cache_key_family
+
+
+#: The statistics counted for each cache key family.
+#:
+#: ``fill_time_ms`` is the total number of milliseconds spent computing
+#: values that weren't in the cache. Only some computed values are measured
+#: (see :py:data:`STORED_BYTES_SAMPLE_INTERVAL`). ``sized_fills`` is the
+#: number measured, and ``stored_bytes`` is their total size when pickled,
+#: before any compression.
+FAMILY_STAT_NAMES = ('hits', 'misses', 'fills', 'fill_time_ms',
+                     'sized_fills', 'stored_bytes')
+
+#: How often the size of a computed value is measured.
+#:
+#: Measuring a value means pickling it again, which is expensive for large
+#: values, so only the first of every this many values computed for each
+#: key family is measured.
+STORED_BYTES_SAMPLE_INTERVAL = 10
+
+#: The number of seconds between writes of counted statistics to the cache.
+#:
+#: These writes happen on a background thread, so they don't slow down the
+#: request that triggers them.
+FAMILY_STATS_FLUSH_INTERVAL = 10
+
+#: The cache key storing the list of known key families.
+FAMILY_LIST_CACHE_KEY = 'cache-stats-families'
+
+#: The number of seconds family statistics are kept.
+FAMILY_STATS_EXPIRATION = 30 * 24 * 60 * 60
+
+_pending_lock = threading.Lock()
+_pending_family_stats = defaultdict(lambda: defaultdict(int))
+_fill_counts = defaultdict(int)
+_last_flush = [time.time()]
+_flush_queue = BackgroundQueue('cache-stats-flush', max_pending=1)
+
+
+def _make_family_stat_cache_key(family, stat_name):
+    """Return the cache key storing a statistic for a key family.
+
+    Args:
+        family (unicode):
+            The key family.
+
+        stat_name (unicode):
+            The name of the statistic.
+
+    Returns:
+        unicode:
+        The full cache key.
+    """
+    return make_cache_key('cache-stats:%s:%s' % (family, stat_name))
+
+
+def _add_family_stats(key, **deltas):
+    """Count statistics for the family of a cache key.
+
+    Statistics are counted in memory, and written to the cache on a
+    background thread every :py:data:`FAMILY_STATS_FLUSH_INTERVAL` seconds,
+    so counting doesn't add cache round trips to any request.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        **deltas (dict):
+            The amounts to add to each statistic.
+    """
+    family = get_cache_key_family(key)
+
+    with _pending_lock:
+        stats = _pending_family_stats[family]
+
+        for stat_name, delta in six.iteritems(deltas):
+            stats[stat_name] += delta
+
+        now = time.time()
+        should_flush = now - _last_flush[0] >= FAMILY_STATS_FLUSH_INTERVAL
+
+        if should_flush:
+            # Only one lookup should start the flush.
+            _last_flush[0] = now
+
+    if should_flush:
+        _flush_queue.run(flush_family_stats)
+
+
+def flush_family_stats():
+    """Write counted key family statistics to the cache.
+
+    Statistics from all processes are added together in the cache.
+    """
+    with _pending_lock:
+        pending = dict(_pending_family_stats)
+        _pending_family_stats.clear()
+        _last_flush[0] = time.time()
+
+    if not pending:
+        return
+
+    try:
+        families_key = make_cache_key(FAMILY_LIST_CACHE_KEY)
+        families = set(cache.get(families_key) or [])
+
+        if not families.issuperset(six.iterkeys(pending)):
+            families.update(six.iterkeys(pending))
+            cache.set(families_key, sorted(families),
+                      FAMILY_STATS_EXPIRATION)
+
+        for family, stats in six.iteritems(pending):
+            for stat_name, delta in six.iteritems(stats):
+                if not delta:
+                    continue
+
+                stat_key = _make_family_stat_cache_key(family, stat_name)
+
+                try:
+                    cache.incr(stat_key, delta)
+                except ValueError:
+                    # The counter doesn't exist yet. If another process
+                    # creates it first, add to that one instead.
+                    if not cache.add(stat_key, delta,
+                                     FAMILY_STATS_EXPIRATION):
+                        cache.incr(stat_key, delta)
+    except Exception as e:
+        logging.error('Unable to store cache key family statistics: %s', e)
+
+
+def get_cache_family_stats():
+    """Return statistics on Review Board's cache usage by key family.
+
+    Returns:
+        list of dict:
+        The statistics for each key family, sorted by family. Each contains
+        the ``family`` name and each of :py:data:`FAMILY_STAT_NAMES`, along
+        with ``hit_rate`` (a percentage), ``avg_fill_time_ms``,
+        ``avg_stored_bytes`` (across the measured values),
+        ``estimated_stored_bytes`` (the estimated size of all computed
+        values), and ``saved_time_ms`` (an estimate of the time
+        saved by cache hits).
+    """
+    flush_family_stats()
+
+    families = cache.get(make_cache_key(FAMILY_LIST_CACHE_KEY)) or []
+    stat_keys = dict(
+        ((family, stat_name),
+         _make_family_stat_cache_key(family, stat_name))
+        for family in families
+        for stat_name in FAMILY_STAT_NAMES
+    )
+    values = cache.get_many(list(stat_keys.values()))
+    results = []
+
+    for family in families:
+        stats = {
+            'family': family,
+        }
+
+        for stat_name in FAMILY_STAT_NAMES:
+            stats[stat_name] = values.get(stat_keys[(family, stat_name)], 0)
+
+        lookups = stats['hits'] + stats['misses']
+
+        if lookups:
+            stats['hit_rate'] = 100 * stats['hits'] / lookups
+        else:
+            stats['hit_rate'] = 0
+
+        if stats['fills']:
+            stats['avg_fill_time_ms'] = (stats['fill_time_ms'] /
+                                         stats['fills'])
+        else:
+            stats['avg_fill_time_ms'] = 0
+
+        if stats['sized_fills']:
+            stats['avg_stored_bytes'] = (stats['stored_bytes'] //
+                                         stats['sized_fills'])
+        else:
+            stats['avg_stored_bytes'] = 0
+
+        stats['estimated_stored_bytes'] = (stats['avg_stored_bytes'] *
+                                           stats['fills'])
+
+        stats['saved_time_ms'] = stats['hits'] * stats['avg_fill_time_ms']
+        results.append(stats)
+
+    return results
+
+
+def reset_cache_family_stats():
+    """Reset all statistics on cache usage by key family."""
+    with _pending_lock:
+        _pending_family_stats.clear()
+        _fill_counts.clear()
+
+    families_key = make_cache_key(FAMILY_LIST_CACHE_KEY)
+
+    cache.delete_many([
+        _make_family_stat_cache_key(family, stat_name)
+        for family in cache.get(families_key) or []
+        for stat_name in FAMILY_STAT_NAMES
+    ])
+    cache.delete(families_key)
+
+
+def record_cache_lookup(key, hit):
+    """Record a lookup of a cache key.
+
+    This is counted for the key's family, and in the current request's
+    profile.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        hit (bool):
+            Whether the value was found in the cache.
+    """
+    profiling.record_cache_lookup(key, hit)
+
+    if hit:
+        _add_family_stats(key, hits=1)
+    else:
+        _add_family_stats(key, misses=1)
+
+
+def _get_stored_size(value):
+    """Return the size of a value when stored in the cache.
+
+    Args:
+        value (object):
+            The value.
+
+    Returns:
+        int:
+        The size of the pickled value, in bytes, or ``None`` if it couldn't
+        be pickled.
+    """
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+def record_cache_fill(key, value, fill_time):
+    """Record that a value was computed and stored in the cache.
+
+    The size of the value is only measured for one of every
+    :py:data:`STORED_BYTES_SAMPLE_INTERVAL` values computed for the key's
+    family.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        value (object):
+            The value stored.
+
+        fill_time (float):
+            The number of seconds spent computing the value.
+    """
+    family = get_cache_key_family(key)
+
+    with _pending_lock:
+        should_measure = (
+            _fill_counts[family] % STORED_BYTES_SAMPLE_INTERVAL == 0)
+        _fill_counts[family] += 1
+
+    stats = {
+        'fills': 1,
+        'fill_time_ms': int(fill_time * 1000),
+    }
+
+    if should_measure:
+        stored_bytes = _get_stored_size(value)
+
+        if stored_bytes is not None:
+            stats['stored_bytes'] = stored_bytes
+            stats['sized_fills'] = 1
+
+    _add_family_stats(key, **stats)
+
+
+def cache_memoize(key, lookup_callable, *args, **kwargs):
+    """Return a cached value, looking it up and caching it if needed.
+
+    This wraps :py:func:`djblets.cache.backend.cache_memoize`, taking the
+    same arguments. Lookups, and the time taken and size of values computed
+    on a miss, are recorded for the key's family (see
+    :py:func:`get_cache_family_stats`) and in the current request's profile.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        lookup_callable (callable):
+            A function returning the value to cache.
+
+        *args (tuple):
+            Additional positional arguments for the cache.
+
+        **kwargs (dict):
+            Additional keyword arguments for the cache.
+
+    Returns:
+        object:
+        The cached or newly looked up value.
+    """
+    state = {
+        'fill_time': None,
+    }
+
+    def _lookup():
+        start_time = time.time()
+        value = lookup_callable()
+        state['fill_time'] = time.time() - start_time
+
+        return value
+
+    result = djblets_cache_memoize(key, _lookup, *args, **kwargs)
+
+    if state['fill_time'] is None:
+        record_cache_lookup(key, hit=True)
+    else:
+        record_cache_lookup(key, hit=False)
+        record_cache_fill(key, result, state['fill_time'])
+
+    return result
+
 
 def get_memcached_hosts():
     """Return the hosts currently configured for memcached."""
@@ -0,0 +1,343 @@
+"""Support for dumping and loading the database with dumpdb and loaddb.
+
+Version 2 of the dump format is line-based, so it can be written and read
+as a stream::
+
+    # dbdump v2
+    # model reviews.group ["id", "name", "display_name", ...]
+    [1, "dev", "Developers", ...]
+    [2, "qa", "QA", ...]
+    # model reviews.group_users ["id", "group_id", "user_id"]
+    [1, 1, 3]
+
+Each model starts with a header line listing the names of its database
+columns, followed by one JSON array of values per row. Many-to-many
+relations are dumped as rows of their intermediary tables.
+
+Rows are read from the database in batches ordered by primary key, using
+the last primary key of each batch to find the next one, so each batch is
+as fast to read as the first. When loading, rows are inserted in batches
+using ``bulk_create``, with constraint checks deferred until the end.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import decimal
+import json
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import get_apps, get_model, get_models
+from django.utils.encoding import is_protected_type
+
+
+#: The current version of the dump format.
+DUMP_FORMAT_VERSION = 2
+
+#: The default number of rows read or written at a time.
+DEFAULT_BATCH_SIZE = 1000
+
+#: The prefix for lines starting a model's rows.
+MODEL_HEADER_PREFIX = '# model '
+
+
+def get_dump_models():
+    """Return the models to dump.
+
+    Proxy and unmanaged models are left out, since they don't have tables
+    of their own.
+
+    Returns:
+        list of type:
+        The model classes to dump.
+    """
+    models = []
+
+    for app in get_apps():
+        for model in get_models(app, include_auto_created=True):
+            if not model._meta.proxy and model._meta.managed:
+                models.append(model)
+
+    return models
+
+
+def get_model_label(model):
+    """Return the label identifying a model in a dump.
+
+    Args:
+        model (type):
+            The model class.
+
+    Returns:
+        unicode:
+        The label, in ``app_label.model_name`` form.
+    """
+    return '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+
+
+def _encode_value(value):
+    """Encode a value that JSON can't represent directly.
+
+    Args:
+        value (object):
+            The value to encode.
+
+    Returns:
+        unicode:
+        The encoded value.
+
+    Raises:
+        TypeError:
+            The value can't be encoded.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    elif isinstance(value, decimal.Decimal):
+        return '%s' % value
+
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def _serialize_value(obj, field):
+    """Return the value of a field, for dumping.
+
+    This matches the behavior of Django's serializers.
+
+    Args:
+        obj (django.db.models.Model):
+            The object being dumped.
+
+        field (django.db.models.Field):
+            The field to dump.
+
+    Returns:
+        object:
+        The value to dump.
+    """
+    if field.rel:
+        return getattr(obj, field.attname)
+
+    value = field._get_val_from_obj(obj)
+
+    if is_protected_type(value):
+        return value
+    else:
+        return field.value_to_string(obj)
+
+
+def _deserialize_value(field, value):
+    """Return the value of a field from a dump.
+
+    This matches the behavior of Django's deserializers.
+
+    Args:
+        field (django.db.models.Field):
+            The field being loaded.
+
+        value (object):
+            The value from the dump.
+
+    Returns:
+        object:
+        The value to store on the object.
+    """
+    if field.rel:
+        if value is None:
+            return None
+
+        return (field.rel.to._meta.get_field(field.rel.field_name)
+                .to_python(value))
+
+    return field.to_python(value)
+
+
+def dump_model(model, write, batch_size=DEFAULT_BATCH_SIZE):
+    """Dump the rows for a model.
+
+    Args:
+        model (type):
+            The model class to dump.
+
+        write (callable):
+            A function called with each chunk of dumped data.
+
+        batch_size (int, optional):
+            The number of rows to read at a time.
+
+    Returns:
+        int:
+        The number of rows dumped.
+    """
+    fields = model._meta.local_fields
+    pk_name = model._meta.pk.attname
+    queryset = model._base_manager.order_by(pk_name)
+    count = 0
+    last_pk = None
+
+    write('%s%s %s\n' % (MODEL_HEADER_PREFIX, get_model_label(model),
+                         json.dumps([field.attname for field in fields])))
+
+    while True:
+        if last_pk is None:
+            batch = queryset
+        else:
+            batch = queryset.filter(**{'%s__gt' % pk_name: last_pk})
+
+        objs = list(batch[:batch_size])
+
+        if not objs:
+            break
+
+        write(''.join(
+            '%s\n' % json.dumps([_serialize_value(obj, field)
+                                 for field in fields],
+                                default=_encode_value)
+            for obj in objs
+        ))
+
+        count += len(objs)
+        last_pk = objs[-1].pk
+
+        if len(objs) < batch_size:
+            break
+
+    return count
+
+
+def _save_objects(model, objs):
+    """Save a batch of loaded objects.
+
+    Args:
+        model (type):
+            The model class of the objects.
+
+        objs (list of django.db.models.Model):
+            The objects to save.
+    """
+    if model._meta.parents:
+        # bulk_create doesn't support models inheriting from other concrete
+        # models. The parent rows are loaded separately.
+        for obj in objs:
+            obj.save_base(raw=True)
+    else:
+        model._base_manager.bulk_create(objs)
+
+
+def load_dump(lines, batch_size=DEFAULT_BATCH_SIZE, on_model_loaded=None):
+    """Load rows from a dump.
+
+    The first line of the dump, containing the version, must already have
+    been read. Loading is done with constraint checks disabled (where the
+    database supports it), and constraints are checked once all rows have
+    been loaded. This should be called within a transaction.
+
+    Args:
+        lines (iterable):
+            The remaining lines of the dump.
+
+        batch_size (int, optional):
+            The number of rows to insert at a time.
+
+        on_model_loaded (callable, optional):
+            A function called with the model class and the number of rows
+            loaded, once all rows for a model have been loaded.
+
+    Returns:
+        int:
+        The number of rows loaded.
+
+    Raises:
+        ValueError:
+            The dump contained invalid data.
+    """
+    loaded_models = []
+    total = 0
+    state = {
+        'model': None,
+        'fields': None,
+        'objs': [],
+        'count': 0,
+    }
+
+    def _flush():
+        if state['objs']:
+            _save_objects(state['model'], state['objs'])
+            state['objs'] = []
+
+    def _finish_model():
+        _flush()
+
+        if state['model'] is not None and on_model_loaded:
+            on_model_loaded(state['model'], state['count'])
+
+    with connection.constraint_checks_disabled():
+        for line_num, line in enumerate(lines, start=2):
+            if line.startswith(MODEL_HEADER_PREFIX):
+                _finish_model()
+
+                label, field_names = \
+                    line[len(MODEL_HEADER_PREFIX):].split(' ', 1)
+                model = get_model(*label.split('.'))
+
+                if model is None:
+                    raise ValueError('Unknown model "%s" on line %d'
+                                     % (label, line_num))
+
+                fields_by_attname = dict(
+                    (field.attname, field)
+                    for field in model._meta.local_fields
+                )
+
+                try:
+                    fields = [
+                        fields_by_attname[attname]
+                        for attname in json.loads(field_names)
+                    ]
+                except KeyError as e:
+                    raise ValueError('Unknown field %s for model "%s" on '
+                                     'line %d' % (e, label, line_num))
+
+                state.update({
+                    'model': model,
+                    'fields': fields,
+                    'count': 0,
+                })
+                loaded_models.append(model)
+            elif line.startswith('['):
+                if state['model'] is None:
+                    raise ValueError('Data before any model on line %d'
+                                     % line_num)
+
+                values = json.loads(line)
+                model = state['model']
+                state['objs'].append(model(**dict(
+                    (field.attname, _deserialize_value(field, value))
+                    for field, value in zip(state['fields'], values)
+                )))
+                state['count'] += 1
+                total += 1
+
+                if len(state['objs']) >= batch_size:
+                    _flush()
+            elif line.strip() and not line.startswith('#'):
+                raise ValueError('Junk data on line %d' % line_num)
+
+        _finish_model()
+
+    if loaded_models:
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in loaded_models])
+
+        # Primary keys were loaded explicitly, so any sequences need to
+        # continue after them.
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(),
+                                                         loaded_models)
+
+        if sequence_sql:
+            cursor = connection.cursor()
+
+            for sql in sequence_sql:
+                cursor.execute(sql)
+
+    return total
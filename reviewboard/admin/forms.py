@@ -131,6 +131,15 @@ class GeneralSettingsForm(SiteSettingsForm):
         required=True,
         help_text=_("The time zone used for all dates on this server."))
 
+    datagrid_keyset_pagination = forms.BooleanField(
+        label=_('Use keyset pagination in lists'),
+        help_text=_('Paginate the dashboard and the review request, user, '
+                    'and group lists by seeking to the last row shown, '
+                    'rather than counting rows from the start. This speeds '
+                    'up deep pages on large servers. Page counts may be '
+                    'approximate.'),
+        required=False)
+
     cache_type = forms.ChoiceField(
         label=_("Cache Backend"),
         choices=CACHE_TYPE_CHOICES,
@@ -370,6 +379,11 @@ class GeneralSettingsForm(SiteSettingsForm):
                 'title': _('Cache Settings'),
                 'fields': ('cache_type', 'cache_path', 'cache_host'),
             },
+            {
+                'classes': ('wide',),
+                'title': _('Advanced'),
+                'fields': ('datagrid_keyset_pagination',),
+            },
         )
 
 
@@ -870,6 +884,53 @@ class LoggingSettingsForm(SiteSettingsForm):
                     "size of log files."),
         required=False)
 
+    request_profiling_users = forms.CharField(
+        label=_('Profile requests by users'),
+        help_text=_('A comma-separated list of usernames whose requests '
+                    'will be profiled. Profiles include timed operations, '
+                    'database queries and cache usage, and are shown on '
+                    'the Request Profiles page.'),
+        required=False,
+        widget=forms.TextInput(attrs={'size': '60'}))
+
+    request_profiling_sample_rate = forms.FloatField(
+        label=_('Profile a percentage of requests'),
+        help_text=_('The percentage of all requests to profile. Set to 0 '
+                    'to only profile requests from the users above.'),
+        required=False,
+        min_value=0,
+        max_value=100)
+
+    def load(self):
+        """Load the form."""
+        super(LoggingSettingsForm, self).load()
+
+        self.fields['request_profiling_users'].initial = ', '.join(
+            self.siteconfig.get('request_profiling_users'))
+
+    def clean_request_profiling_users(self):
+        """Clean the list of usernames to profile requests for.
+
+        Returns:
+            list of unicode:
+            The list of usernames.
+        """
+        return [
+            username.strip()
+            for username in self.cleaned_data['request_profiling_users']
+            .split(',')
+            if username.strip()
+        ]
+
+    def clean_request_profiling_sample_rate(self):
+        """Clean the percentage of requests to profile.
+
+        Returns:
+            float:
+            The percentage of requests to profile.
+        """
+        return self.cleaned_data['request_profiling_sample_rate'] or 0
+
     def clean_logging_directory(self):
         """Validate that the logging_directory path is valid.
 
@@ -909,7 +970,9 @@ class LoggingSettingsForm(SiteSettingsForm):
             {
                 'title': _('Advanced'),
                 'classes': ('wide',),
-                'fields': ('logging_allow_profiling',),
+                'fields': ('logging_allow_profiling',
+                           'request_profiling_users',
+                           'request_profiling_sample_rate'),
             }
         )
 
@@ -0,0 +1,30 @@
+from __future__ import unicode_literals
+
+from django.core.management.base import NoArgsCommand
+from django.utils.translation import ugettext as _
+
+from reviewboard.admin.activity_stats import backfill_activity_stats
+
+
+class Command(NoArgsCommand):
+    """Management command to count existing objects for the dashboard."""
+
+    help = _('Counts existing review requests, reviews, comments and other '
+             'objects for the Administration Dashboard activity widgets')
+
+    def handle_noargs(self, **options):
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+        """
+        self.stdout.write(_('Counting existing objects. This may take a '
+                            'while on large databases...'))
+
+        totals = backfill_activity_stats()
+
+        for name, total in sorted(totals.items()):
+            self.stdout.write('  %s: %d' % (name, total))
+
+        self.stdout.write(_('Done.'))
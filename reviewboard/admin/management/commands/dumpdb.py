@@ -1,8 +1,50 @@
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
-from django.core import serializers
-from django.core.management.base import NoArgsCommand
-from django.db.models import get_apps, get_models
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+from optparse import make_option
+
+from django.core.management.base import CommandError, NoArgsCommand
+from django.db import connections
+from django.db.models import get_model
+
+from reviewboard.admin.dbdump import (DEFAULT_BATCH_SIZE,
+                                      DUMP_FORMAT_VERSION,
+                                      dump_model,
+                                      get_dump_models,
+                                      get_model_label)
+
+
+def _dump_model_to_file(label, filename, batch_size):
+    """Dump the rows for a model to a file.
+
+    This is run in a worker process.
+
+    Args:
+        label (unicode):
+            The label of the model to dump.
+
+        filename (unicode):
+            The file to write the rows to.
+
+        batch_size (int):
+            The number of rows to read at a time.
+
+    Returns:
+        tuple:
+        A 2-tuple of the number of rows dumped and the number of seconds
+        it took.
+    """
+    start_time = time.time()
+
+    with open(filename, 'w') as fp:
+        count = dump_model(get_model(*label.split('.')), fp.write,
+                           batch_size)
+
+    return count, time.time() - start_time
 
 
 class Command(NoArgsCommand):
@@ -10,46 +52,142 @@ class Command(NoArgsCommand):
 
     help = 'Dump a common serialized version of the database to stdout.'
 
+    option_list = NoArgsCommand.option_list + (
+        make_option('--processes',
+                    type='int',
+                    default=1,
+                    help='The number of worker processes used to dump '
+                         'models in parallel'),
+        make_option('--batch-size',
+                    type='int',
+                    default=DEFAULT_BATCH_SIZE,
+                    help='The number of rows to read from the database at '
+                         'a time'),
+    )
+
     def handle_noargs(self, **options):
-        """Handle the command."""
-        models = []
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+
+        Raises:
+            django.core.management.CommandError:
+                The options were invalid.
+        """
+        processes = options['processes']
+        batch_size = options['batch_size']
+
+        if processes < 1:
+            raise CommandError('--processes must be at least 1')
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        labels = [get_model_label(model) for model in get_dump_models()]
+
+        self.stderr.write('Dumping the database. This may take a while...')
+        self.stdout.write('# dbdump v%d' % DUMP_FORMAT_VERSION)
+
+        start_time = time.time()
+        total = 0
+
+        if processes == 1:
+            for label in labels:
+                model_start_time = time.time()
+                count = dump_model(
+                    get_model(*label.split('.')),
+                    lambda data: self.stdout.write(data, ending=''),
+                    batch_size)
+
+                self._report_progress(label, count,
+                                      time.time() - model_start_time)
+                total += count
+        else:
+            total = self._dump_in_parallel(labels, processes, batch_size)
+
+        self._report_progress('Total', total, time.time() - start_time)
+        self.stderr.write('Done.')
+
+    def _dump_in_parallel(self, labels, processes, batch_size):
+        """Dump models in parallel worker processes.
+
+        Each model is dumped to a temporary file, and the files are written
+        to stdout in order as they're finished.
+
+        Args:
+            labels (list of unicode):
+                The labels of the models to dump.
+
+            processes (int):
+                The number of worker processes.
+
+            batch_size (int):
+                The number of rows to read at a time.
+
+        Returns:
+            int:
+            The number of rows dumped.
+        """
+        tempdir = tempfile.mkdtemp(prefix='rb-dumpdb-')
+        total = 0
+
+        # The worker processes must open their own database connections.
+        for connection in connections.all():
+            connection.close()
+
+        pool = Pool(processes)
 
-        for app in get_apps():
-            models.extend(get_models(app))
+        try:
+            results = []
 
-        OBJECT_LIMIT = 150
+            for i, label in enumerate(labels):
+                filename = os.path.join(tempdir, '%d.dump' % i)
+                results.append((
+                    label,
+                    filename,
+                    pool.apply_async(_dump_model_to_file,
+                                     (label, filename, batch_size)),
+                ))
 
-        serializer = serializers.get_serializer("json")()
+            pool.close()
 
-        totalobjs = 0
-        for model in models:
-            totalobjs += model.objects.count()
+            for label, filename, result in results:
+                count, elapsed = result.get()
 
-        prev_pct = -1
-        i = 0
+                with open(filename, 'r') as fp:
+                    for data in iter(lambda: fp.read(64 * 1024), ''):
+                        self.stdout.write(data, ending='')
 
-        self.stderr.write("Dump the database. This may take a while...\n")
+                os.unlink(filename)
 
-        self.stdout.write("# dbdump v1 - %s objects" % totalobjs)
+                self._report_progress(label, count, elapsed)
+                total += count
+        finally:
+            pool.terminate()
+            pool.join()
+            shutil.rmtree(tempdir)
 
-        for model in models:
-            count = model.objects.count()
-            j = 0
+        return total
 
-            while j < count:
-                for obj in model.objects.all()[j:j + OBJECT_LIMIT].iterator():
-                    value = serializer.serialize([obj])
+    def _report_progress(self, name, count, elapsed):
+        """Report the number of rows dumped, and how quickly.
 
-                    if value != "[]":
-                        self.stdout.write(value[1:-1])  # Skip the "[" and "]"
+        Args:
+            name (unicode):
+                The name of what was dumped.
 
-                    i += 1
-                    pct = i * 100 / totalobjs
-                    if pct != prev_pct:
-                        self.stderr.write("  [%s%%]\r" % pct)
-                        self.stderr.flush()
-                        prev_pct = pct
+            count (int):
+                The number of rows dumped.
 
-                j += OBJECT_LIMIT
+            elapsed (float):
+                The number of seconds it took.
+        """
+        if elapsed > 0:
+            rate = count / elapsed
+        else:
+            rate = count
 
-        self.stderr.write("\nDone.\n")
+        self.stderr.write('  %s: %d objects in %.2fs (%.0f objects/s)'
+                          % (name, count, elapsed, rate))
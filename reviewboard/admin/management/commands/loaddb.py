@@ -1,7 +1,9 @@
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
 import os
 import re
+import time
+from optparse import make_option
 
 from django import db
 from django.core import serializers
@@ -10,6 +12,11 @@ from django.db import transaction
 from django.db.models import get_apps
 from django.utils.six.moves import input
 
+from reviewboard.admin.dbdump import (DEFAULT_BATCH_SIZE,
+                                      DUMP_FORMAT_VERSION,
+                                      get_model_label,
+                                      load_dump)
+
 
 class Command(BaseCommand):
     """Management command to load data into the database."""
@@ -17,6 +24,13 @@ class Command(BaseCommand):
     help = ('Loads data formatted by dumpdb, for migration across types '
             'of databases.')
 
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    type='int',
+                    default=DEFAULT_BATCH_SIZE,
+                    help='The number of rows to insert at a time'),
+    )
+
     def handle(self, *args, **options):
         """Handle the command."""
         if len(args) != 1:
@@ -53,59 +67,95 @@ Type 'yes' to continue, or 'no' to cancel: """)
         os.system('./reviewboard/manage.py reset --noinput %s'
                   % ' '.join(apps))
 
-        transaction_setup = False
+        start_time = time.time()
 
         try:
             with open(filename, 'r') as f:
                 line = f.readline()
 
-                m = re.match("^# dbdump v(\d+) - (\d+) objects$", line)
+                m = re.match("^# dbdump v(\d+)(?: - (\d+) objects)?$",
+                             line.rstrip('\n'))
                 if not m:
                     raise CommandError("Unknown dump format\n")
 
                 version = int(m.group(1))
-                totalobjs = int(m.group(2))
-                i = 0
-                prev_pct = -1
-
-                if version != 1:
-                    raise CommandError("Unknown dump version\n")
-
-                transaction.commit_unless_managed()
-                transaction.enter_transaction_management()
-                transaction.managed(True)
-                transaction_setup = True
-
-                self.stdout.write("Importing new style dump format (v%s)" %
-                                  version)
-                for line in f:
-                    if line[0] == "{":
-                        for obj in serializers.deserialize("json",
-                                                           "[%s]" % line):
-                            try:
-                                obj.save()
-                            except Exception as e:
-                                self.stderr.write("Error: %s\n" % e)
-                                self.stderr.write("Line %s: '%s'" % (i, line))
-                    elif line[0] != "#":
-                        self.stderr.write("Junk data on line %s" % i)
-
-                    db.reset_queries()
-
-                    i += 1
-                    pct = (i * 100 / totalobjs)
-                    if pct != prev_pct:
-                        self.stdout.write("  [%s%%]\r" % pct)
-                        self.stdout.flush()
-                        prev_pct = pct
-
-            transaction.commit()
-            transaction.leave_transaction_management()
+
+                with transaction.atomic():
+                    if version == 1:
+                        total = self._load_v1(f, int(m.group(2)))
+                    elif version == DUMP_FORMAT_VERSION:
+                        self.stdout.write("Importing new style dump format "
+                                          "(v%s)" % version)
+                        total = load_dump(
+                            f,
+                            batch_size=options['batch_size'],
+                            on_model_loaded=self._on_model_loaded)
+                    else:
+                        raise CommandError("Unknown dump version\n")
+        except CommandError:
+            raise
         except Exception as e:
             raise CommandError("Problem installing '%s': %s\n" % (filename, e))
 
-            if transaction_setup:
-                transaction.rollback()
-                transaction.leave_transaction_management()
+        elapsed = time.time() - start_time
+
+        self.stdout.write('\nLoaded %d objects in %.2fs (%.0f objects/s)'
+                          % (total, elapsed, total / max(elapsed, 0.001)))
+        self.stdout.write('Done.')
+
+    def _load_v1(self, f, totalobjs):
+        """Load a dump in the version 1 format.
+
+        Version 1 dumps contain one object per line, serialized by Django's
+        JSON serializer.
+
+        Args:
+            f (file):
+                The dump file, positioned after the first line.
+
+            totalobjs (int):
+                The number of objects in the dump.
+
+        Returns:
+            int:
+            The number of lines processed.
+        """
+        i = 0
+        prev_pct = -1
+
+        self.stdout.write("Importing old style dump format (v1)")
+
+        for line in f:
+            if line[0] == "{":
+                for obj in serializers.deserialize("json", "[%s]" % line):
+                    try:
+                        obj.save()
+                    except Exception as e:
+                        self.stderr.write("Error: %s\n" % e)
+                        self.stderr.write("Line %s: '%s'" % (i, line))
+            elif line[0] != "#":
+                self.stderr.write("Junk data on line %s" % i)
+
+            db.reset_queries()
+
+            i += 1
+            pct = (i * 100 // totalobjs)
+            if pct != prev_pct:
+                self.stdout.write("  [%s%%]\r" % pct)
+                self.stdout.flush()
+                prev_pct = pct
+
+        return i
+
+    def _on_model_loaded(self, model, count):
+        """Report that all rows for a model were loaded.
+
+        Args:
+            model (type):
+                The model class.
 
-        self.stdout.write('\nDone.')
+            count (int):
+                The number of rows loaded.
+        """
+        db.reset_queries()
+        self.stdout.write('  %s: %d objects' % (get_model_label(model), count))
@@ -16,6 +16,9 @@ except ImportError:
 
 from reviewboard import initialize
 from reviewboard.admin.checks import check_updates_required
+from reviewboard.admin.profiling import (PROFILE_HEADER, finish_profile,
+                                         should_profile, should_send_summary,
+                                         start_profile, store_profile)
 from reviewboard.admin.siteconfig import load_site_config
 from reviewboard.admin.views import manual_updates_required
 
@@ -110,6 +113,37 @@ class ExtraExceptionInfoMiddleware(object):
             request.META['LOCAL_SITE'] = request._local_site_name
 
 
+class RequestProfilingMiddleware(object):
+    """Middleware that profiles requests.
+
+    Requests are profiled based on the ``request_profiling_users`` and
+    ``request_profiling_sample_rate`` settings. For staff, a summary of each
+    profile is added to the response in the ``X-RB-Profile`` header. Every
+    profile is stored for display in the administration UI.
+    """
+
+    def process_request(self, request):
+        """Start profiling the request, if enabled."""
+        if should_profile(request):
+            start_profile(request)
+
+    def process_response(self, request, response):
+        """Finish profiling the request, and report the results."""
+        profile = finish_profile()
+
+        if profile is not None:
+            if should_send_summary(request):
+                response[PROFILE_HEADER] = profile.get_summary()
+
+            try:
+                store_profile(profile)
+            except Exception as e:
+                logging.error('Unable to store request profile for %s: %s',
+                              request.path, e)
+
+        return response
+
+
 class X509AuthMiddleware(object):
     """Middleware that authenticates a user using X509 certificates.
 
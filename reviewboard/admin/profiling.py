@@ -0,0 +1,552 @@
+"""Per-request performance profiles.
+
+When profiling is turned on for a request (see :py:func:`should_profile`),
+a :py:class:`RequestProfile` collects:
+
+* A tree of timed spans. Each call to :py:func:`log_timed` starts a span,
+  nested inside any span that's still running, and ends it when the timer's
+  ``done()`` is called.
+* The number of SQL queries run, and how long they took, both for the
+  request as a whole and for each span.
+* Cache hits and misses, grouped by key family (see
+  :py:func:`get_cache_key_family`).
+
+Profiling is controlled by the ``request_profiling_users`` and
+``request_profiling_sample_rate`` site configuration settings. Profiled
+requests made by staff get a summary in the ``X-RB-Profile`` response header,
+and the most recent profiles are listed in the administration UI.
+"""
+
+from __future__ import division, unicode_literals
+
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import six, timezone
+from django.utils.six.moves import range
+from djblets.cache.backend import make_cache_key
+from djblets.log import log_timed as djblets_log_timed
+from djblets.siteconfig.models import SiteConfiguration
+
+
+_local = threading.local()
+
+#: The response header containing a summary of the profile.
+PROFILE_HEADER = 'X-RB-Profile'
+
+#: The prefix for the cache keys storing recent profiles.
+#:
+#: Each profile is stored in one of :py:data:`MAX_RECENT_PROFILES` slots,
+#: with the slot picked by incrementing the counter stored in
+#: :py:data:`RECENT_PROFILES_COUNTER_CACHE_KEY`. This way, processes
+#: storing profiles at the same time don't overwrite each other's profiles.
+RECENT_PROFILES_CACHE_KEY = 'request-profiles'
+
+#: The cache key storing the number of profiles stored.
+RECENT_PROFILES_COUNTER_CACHE_KEY = 'request-profiles-counter'
+
+#: The number of recent profiles kept for display.
+MAX_RECENT_PROFILES = 50
+
+#: The number of seconds recent profiles are kept.
+RECENT_PROFILES_EXPIRATION = 24 * 60 * 60
+
+_CACHE_KEY_FAMILY_SEP_RE = re.compile(r'[-:]')
+
+
+def get_cache_key_family(key):
+    """Return the family a cache key belongs to.
+
+    The family is the leading part of the key that doesn't identify a
+    specific object. This is everything before the first ``:``, and before
+    the first ``-``-separated part containing a digit. For instance,
+    ``diff-sidebyside-hl-123`` is in the ``diff-sidebyside-hl`` family, and
+    ``file:1:README:abc123`` is in the ``file`` family.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+    Returns:
+        unicode:
+        The family of the key.
+    """
+    key = key.split(':', 1)[0]
+    parts = []
+
+    for part in key.split('-'):
+        if any(c.isdigit() for c in part):
+            break
+
+        parts.append(part)
+
+    return '-'.join(parts) or key
+
+
+class ProfileSpan(object):
+    """A timed section of a request.
+
+    Attributes:
+        name (unicode):
+            The name of the span. This is the message passed to
+            :py:func:`log_timed`.
+
+        start_time (float):
+            The time the span started.
+
+        end_time (float):
+            The time the span ended, or ``None`` if it's still running.
+
+        children (list of ProfileSpan):
+            The spans started while this span was running.
+
+        num_queries (int):
+            The number of SQL queries run during the span.
+    """
+
+    def __init__(self, name):
+        """Initialize the span.
+
+        Args:
+            name (unicode):
+                The name of the span.
+        """
+        self.name = name
+        self.start_time = time.time()
+        self.end_time = None
+        self.children = []
+        self.num_queries = 0
+        self._start_query_index = len(connection.queries)
+
+    @property
+    def duration(self):
+        """The number of seconds the span took, or has taken so far."""
+        return (self.end_time or time.time()) - self.start_time
+
+    def finish(self):
+        """Mark the span as finished."""
+        if self.end_time is None:
+            self.end_time = time.time()
+            self.num_queries = (len(connection.queries) -
+                                self._start_query_index)
+
+    def iter_rows(self, depth=0):
+        """Iterate through the span and its children, for display.
+
+        Args:
+            depth (int, optional):
+                The depth of this span in the tree.
+
+        Yields:
+            dict:
+            Information on each span, in depth-first order.
+        """
+        yield {
+            'name': self.name,
+            'depth': depth,
+            'duration_ms': self.duration * 1000,
+            'num_queries': self.num_queries,
+        }
+
+        for child in self.children:
+            for row in child.iter_rows(depth + 1):
+                yield row
+
+
+class RequestProfile(object):
+    """A profile of a single request.
+
+    Attributes:
+        path (unicode):
+            The path of the request.
+
+        method (unicode):
+            The HTTP method of the request.
+
+        username (unicode):
+            The username of the user making the request, or an empty string
+            for anonymous users.
+
+        timestamp (datetime.datetime):
+            When the request started.
+
+        root (ProfileSpan):
+            The span covering the whole request.
+
+        cache_stats (dict):
+            A mapping of cache key families to dictionaries with ``hits`` and
+            ``misses`` counts.
+
+        num_queries (int):
+            The number of SQL queries run during the request.
+
+        query_time (float):
+            The number of seconds spent running SQL queries.
+    """
+
+    def __init__(self, request):
+        """Initialize the profile.
+
+        Args:
+            request (django.http.HttpRequest):
+                The request being profiled.
+        """
+        user = getattr(request, 'user', None)
+
+        self.path = request.path
+        self.method = request.method
+        self.username = ''
+        self.timestamp = timezone.now()
+        self.root = ProfileSpan('%s %s' % (self.method, self.path))
+        self.cache_stats = defaultdict(lambda: {
+            'hits': 0,
+            'misses': 0,
+        })
+        self.num_queries = 0
+        self.query_time = 0.0
+        self._spans = [self.root]
+
+        if user is not None and user.is_authenticated():
+            self.username = user.username
+
+    def start_span(self, name):
+        """Start a span nested in the innermost running span.
+
+        Args:
+            name (unicode):
+                The name of the span.
+
+        Returns:
+            ProfileSpan:
+            The new span.
+        """
+        span = ProfileSpan(name)
+        self._spans[-1].children.append(span)
+        self._spans.append(span)
+
+        return span
+
+    def end_span(self, span):
+        """End a span.
+
+        Any spans nested in it that are still running are ended as well.
+
+        Args:
+            span (ProfileSpan):
+                The span to end.
+        """
+        if span not in self._spans:
+            span.finish()
+            return
+
+        while self._spans[-1] is not span:
+            self._spans.pop().finish()
+
+        self._spans.pop().finish()
+
+    def record_cache_lookup(self, key, hit):
+        """Record a cache lookup.
+
+        Args:
+            key (unicode):
+                The cache key, without the site prefix.
+
+            hit (bool):
+                Whether the value was found in the cache.
+        """
+        stats = self.cache_stats[get_cache_key_family(key)]
+
+        if hit:
+            stats['hits'] += 1
+        else:
+            stats['misses'] += 1
+
+    def finish(self):
+        """Finish the profile, ending all running spans."""
+        while len(self._spans) > 1:
+            self._spans.pop().finish()
+
+        self.root.finish()
+
+        queries = connection.queries[self.root._start_query_index:]
+        self.num_queries = len(queries)
+        self.query_time = sum(float(query['time']) for query in queries)
+
+    def get_summary(self):
+        """Return a one-line summary of the profile.
+
+        Returns:
+            unicode:
+            The summary, suitable for a response header.
+        """
+        hits = sum(stats['hits'] for stats in self.cache_stats.values())
+        misses = sum(stats['misses'] for stats in self.cache_stats.values())
+
+        return ('total=%.1fms; sql=%d; sql_time=%.1fms; cache_hits=%d; '
+                'cache_misses=%d'
+                % (self.root.duration * 1000, self.num_queries,
+                   self.query_time * 1000, hits, misses))
+
+    def serialize(self):
+        """Return the profile as a dictionary, for storage and display.
+
+        Returns:
+            dict:
+            The serialized profile.
+        """
+        return {
+            'path': self.path,
+            'method': self.method,
+            'username': self.username,
+            'timestamp': self.timestamp,
+            'duration_ms': self.root.duration * 1000,
+            'num_queries': self.num_queries,
+            'query_time_ms': self.query_time * 1000,
+            'summary': self.get_summary(),
+            'spans': list(self.root.iter_rows()),
+            'cache_stats': sorted(
+                (family, stats['hits'], stats['misses'])
+                for family, stats in self.cache_stats.items()
+            ),
+        }
+
+
+class _ProfiledTimeLogger(object):
+    """A timer that logs an operation and records it in a profile."""
+
+    def __init__(self, time_logger, profile, span):
+        """Initialize the timer.
+
+        Args:
+            time_logger (djblets.log.TimeLogger):
+                The timer logging the operation.
+
+            profile (RequestProfile):
+                The profile the span belongs to.
+
+            span (ProfileSpan):
+                The span for the operation.
+        """
+        self.time_logger = time_logger
+        self.profile = profile
+        self.span = span
+
+    def done(self):
+        """Mark the operation as done."""
+        self.time_logger.done()
+        self.profile.end_span(self.span)
+
+
+def log_timed(message, *args, **kwargs):
+    """Time an operation, logging it and recording it in the profile.
+
+    This takes the same arguments as :py:func:`djblets.log.log_timed`. If
+    the current request is being profiled, a span is started for the
+    operation, and ended when the returned timer's ``done()`` is called.
+
+    Args:
+        message (unicode):
+            The message describing the operation.
+
+        *args (tuple):
+            Additional positional arguments for the timer.
+
+        **kwargs (dict):
+            Additional keyword arguments for the timer.
+
+    Returns:
+        object:
+        The timer. Its ``done()`` method must be called once the operation
+        is done.
+    """
+    time_logger = djblets_log_timed(message, *args, **kwargs)
+    profile = get_current_profile()
+
+    if profile is None:
+        return time_logger
+
+    return _ProfiledTimeLogger(time_logger, profile,
+                               profile.start_span(message))
+
+
+def record_cache_lookup(key, hit):
+    """Record a cache lookup in the current profile, if any.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        hit (bool):
+            Whether the value was found in the cache.
+    """
+    profile = get_current_profile()
+
+    if profile is not None:
+        profile.record_cache_lookup(key, hit)
+
+
+def get_current_profile():
+    """Return the profile for the current request.
+
+    Returns:
+        RequestProfile:
+        The profile, or ``None`` if the current request isn't being profiled.
+    """
+    return getattr(_local, 'profile', None)
+
+
+def should_profile(request):
+    """Return whether a request should be profiled.
+
+    Requests are profiled if the user is listed in the
+    ``request_profiling_users`` setting, or if the request is picked based
+    on the ``request_profiling_sample_rate`` setting (a percentage).
+
+    Args:
+        request (django.http.HttpRequest):
+            The request.
+
+    Returns:
+        bool:
+        Whether to profile the request.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+    sample_rate = siteconfig.get('request_profiling_sample_rate')
+
+    if sample_rate and random.random() * 100 < sample_rate:
+        return True
+
+    usernames = siteconfig.get('request_profiling_users')
+    user = getattr(request, 'user', None)
+
+    return bool(usernames and
+                user is not None and
+                user.is_authenticated() and
+                user.username in usernames)
+
+
+def should_send_summary(request):
+    """Return whether a profile's summary can be sent in the response.
+
+    The summary reveals details on the server's performance, so it's only
+    sent to staff, even if other users' requests are profiled.
+
+    Args:
+        request (django.http.HttpRequest):
+            The request.
+
+    Returns:
+        bool:
+        Whether to add the ``X-RB-Profile`` header to the response.
+    """
+    user = getattr(request, 'user', None)
+
+    return bool(user is not None and
+                user.is_authenticated() and
+                user.is_staff)
+
+
+def start_profile(request):
+    """Start profiling a request.
+
+    While profiling, SQL queries are recorded even if ``DEBUG`` is off.
+
+    Args:
+        request (django.http.HttpRequest):
+            The request to profile.
+
+    Returns:
+        RequestProfile:
+        The new profile.
+    """
+    _local.old_use_debug_cursor = connection.use_debug_cursor
+    connection.use_debug_cursor = True
+
+    profile = RequestProfile(request)
+    _local.profile = profile
+
+    return profile
+
+
+def finish_profile():
+    """Finish profiling the current request.
+
+    Returns:
+        RequestProfile:
+        The finished profile, or ``None`` if the current request wasn't being
+        profiled.
+    """
+    profile = get_current_profile()
+
+    if profile is None:
+        return None
+
+    profile.finish()
+
+    connection.use_debug_cursor = _local.old_use_debug_cursor
+    del _local.profile
+    del _local.old_use_debug_cursor
+
+    return profile
+
+
+def _make_profile_slot_cache_key(slot):
+    """Return the cache key storing a recent profile.
+
+    Args:
+        slot (int):
+            The slot the profile is stored in.
+
+    Returns:
+        unicode:
+        The full cache key.
+    """
+    return make_cache_key('%s:%d' % (RECENT_PROFILES_CACHE_KEY, slot))
+
+
+def store_profile(profile):
+    """Store a profile for display in the administration UI.
+
+    Only the most recent :py:data:`MAX_RECENT_PROFILES` profiles are kept.
+
+    Args:
+        profile (RequestProfile):
+            The profile to store.
+    """
+    counter_key = make_cache_key(RECENT_PROFILES_COUNTER_CACHE_KEY)
+
+    try:
+        count = cache.incr(counter_key)
+    except ValueError:
+        # The counter doesn't exist yet. If another process creates it
+        # first, increment that one instead.
+        if cache.add(counter_key, 1, RECENT_PROFILES_EXPIRATION):
+            count = 1
+        else:
+            count = cache.incr(counter_key)
+
+    cache.set(_make_profile_slot_cache_key(count % MAX_RECENT_PROFILES),
+              profile.serialize(),
+              RECENT_PROFILES_EXPIRATION)
+
+
+def get_recent_profiles():
+    """Return the most recently stored profiles.
+
+    Returns:
+        list of dict:
+        The serialized profiles, newest first.
+    """
+    profiles = cache.get_many([
+        _make_profile_slot_cache_key(slot)
+        for slot in range(MAX_RECENT_PROFILES)
+    ])
+
+    return sorted(six.itervalues(profiles),
+                  key=lambda profile: profile['timestamp'],
+                  reverse=True)
@@ -141,6 +141,7 @@ defaults.update({
     'auth_x509_username_regex': '',
     'auth_x509_autocreate_users': False,
     'company': '',
+    'datagrid_keyset_pagination': False,
     'default_use_rich_text': True,
     'diffviewer_context_num_lines': 5,
     'diffviewer_include_space_patterns': [],
@@ -155,6 +156,8 @@ defaults.update({
     'mail_send_new_user_mail': False,
     'mail_send_password_changed_mail': False,
     'mail_enable_autogenerated_header': True,
+    'request_profiling_sample_rate': 0,
+    'request_profiling_users': [],
     'search_enable': False,
     'send_support_usage_stats': True,
     'site_domain_method': 'http',
@@ -385,8 +388,7 @@ def load_site_config(full_reload=False):
         )
 
         settings.WEB_API_AUTH_BACKENDS += (
-            'djblets.webapi.auth.backends.oauth2_tokens'
-            '.WebAPIOAuth2TokenAuthBackend',
+            'reviewboard.webapi.auth_backends.WebAPIOAuth2TokenAuthBackend',
         )
 
     # Set the storage backend
@@ -1,14 +1,28 @@
 from __future__ import unicode_literals
 
+import datetime
+import json
 import os
 import shutil
 import tempfile
 
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.forms import ValidationError
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from django.utils import timezone
 from djblets.siteconfig.models import SiteConfiguration
-
-from reviewboard.admin import checks
+from kgb import SpyAgency
+
+from reviewboard.admin import (activity_stats, cache_stats, checks, dbdump,
+                               profiling)
+from reviewboard.admin.background import BackgroundQueue
+from reviewboard.admin.cache_stats import cache_memoize
+from reviewboard.admin.middleware import RequestProfilingMiddleware
+from reviewboard.admin.widgets import DatabaseStatsWidget
+from reviewboard.reviews.models import (DailyActivityCount, Group, Review,
+                                        ReviewRequest)
 from reviewboard.ssh.client import SSHClient
 from reviewboard.admin.validation import validate_bug_tracker
 from reviewboard.site.urlresolvers import local_site_reverse
@@ -168,3 +182,433 @@ class SSHSettingsFormTestCase(TestCase):
 
         # Check whether the key has been deleted.
         self.assertEqual(self.ssh_client.get_user_key(), None)
+
+
+class ActivityStatsTests(TestCase):
+    """Unit tests for reviewboard.admin.activity_stats."""
+
+    fixtures = ['test_users']
+
+    def tearDown(self):
+        super(ActivityStatsTests, self).tearDown()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set(activity_stats.BACKFILLED_SITECONFIG_KEY, False)
+        siteconfig.save()
+
+    def test_object_created(self):
+        """Testing activity stats count created objects"""
+        review_request = self.create_review_request()
+
+        count = DailyActivityCount.objects.get(name='review_requests')
+        self.assertEqual(count.date,
+                         review_request.time_added.astimezone(
+                             timezone.utc).date())
+        self.assertEqual(count.count, 1)
+
+        self.create_review_request()
+        self.assertEqual(activity_stats.get_total_count('review_requests'),
+                         2)
+
+    def test_object_deleted(self):
+        """Testing activity stats count deleted objects"""
+        review_request = self.create_review_request()
+        self.create_review_request()
+
+        ReviewRequest.objects.get(pk=review_request.pk).delete()
+
+        self.assertEqual(activity_stats.get_total_count('review_requests'),
+                         1)
+
+    def test_object_timestamp_changed(self):
+        """Testing activity stats move the count when the timestamp changes"""
+        review_request = self.create_review_request()
+        review = self.create_review(review_request)
+        created_date = review.timestamp.astimezone(timezone.utc).date()
+        new_date = created_date - datetime.timedelta(days=3)
+
+        review.timestamp -= datetime.timedelta(days=3)
+        review.save()
+
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', new_date,
+                                            created_date),
+            [(new_date, 1)])
+
+        Review.objects.get(pk=review.pk).delete()
+
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', new_date,
+                                            created_date),
+            [])
+        self.assertEqual(activity_stats.get_total_count('reviews'), 0)
+
+    def test_record_timestamp_update(self):
+        """Testing record_timestamp_update moves counts for bulk updates"""
+        review_request = self.create_review_request()
+        review = self.create_review(review_request)
+        created_date = review.timestamp.astimezone(timezone.utc).date()
+        new_timestamp = review.timestamp - datetime.timedelta(days=3)
+        new_date = new_timestamp.astimezone(timezone.utc).date()
+
+        reviews = Review.objects.filter(pk=review.pk)
+        activity_stats.record_timestamp_update(reviews, new_timestamp)
+        reviews.update(timestamp=new_timestamp)
+
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', new_date,
+                                            created_date),
+            [(new_date, 1)])
+
+        Review.objects.get(pk=review.pk).delete()
+        self.assertEqual(activity_stats.get_total_count('reviews'), 0)
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', new_date,
+                                            created_date),
+            [])
+
+    def test_get_daily_counts_with_negative_count(self):
+        """Testing get_daily_counts includes negative counts"""
+        today = timezone.now().astimezone(timezone.utc).date()
+        activity_stats.record_activity('reviews', today, -1)
+
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', today, today),
+            [(today, -1)])
+
+    def test_backfill_activity_stats(self):
+        """Testing backfill_activity_stats"""
+        review_request = self.create_review_request()
+        self.create_review(review_request)
+        self.create_review(review_request)
+
+        DailyActivityCount.objects.all().delete()
+        self.assertFalse(activity_stats.is_backfilled())
+
+        totals = activity_stats.backfill_activity_stats()
+
+        self.assertTrue(activity_stats.is_backfilled())
+        self.assertEqual(totals['review_requests'], 1)
+        self.assertEqual(totals['reviews'], 2)
+        self.assertEqual(totals['comments'], 0)
+        self.assertEqual(activity_stats.get_total_count('reviews'), 2)
+
+        today = timezone.now().astimezone(timezone.utc).date()
+        self.assertEqual(
+            activity_stats.get_daily_counts('reviews', today, today),
+            [(today, 2)])
+
+    def test_database_stats_widget(self):
+        """Testing DatabaseStatsWidget uses activity stats once backfilled"""
+        review_request = self.create_review_request()
+        self.create_review(review_request)
+        activity_stats.backfill_activity_stats()
+
+        activity_stats.record_activity('reviews', timezone.now().date(), 5)
+
+        request = RequestFactory().get('/')
+        data = DatabaseStatsWidget().generate_data(request)
+
+        self.assertEqual(data['count_reviews'], 6)
+
+
+class BackgroundQueueTests(TestCase):
+    """Unit tests for reviewboard.admin.background."""
+
+    def test_run_with_full_queue(self):
+        """Testing BackgroundQueue.run doesn't queue more than max_pending
+        functions
+        """
+        # With no threads, nothing is taken off the queue.
+        background_queue = BackgroundQueue('test', num_threads=0,
+                                           max_pending=1)
+
+        self.assertTrue(background_queue.run(lambda: None))
+        self.assertFalse(background_queue.run(lambda: None))
+
+
+class DBDumpTests(TestCase):
+    """Unit tests for reviewboard.admin.dbdump."""
+
+    fixtures = ['test_users']
+
+    def _dump(self, model, batch_size=dbdump.DEFAULT_BATCH_SIZE):
+        chunks = []
+        count = dbdump.dump_model(model, chunks.append, batch_size)
+
+        return count, ''.join(chunks).splitlines(True)
+
+    def test_dump_model_in_batches(self):
+        """Testing dump_model with multiple batches"""
+        for i in range(5):
+            self.create_review_group(name='group%d' % i)
+
+        count, lines = self._dump(Group, batch_size=2)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith(
+            '%sreviews.group ' % dbdump.MODEL_HEADER_PREFIX))
+
+    def test_load_dump(self):
+        """Testing load_dump round-trips dumped rows"""
+        group = self.create_review_group(name='group1')
+        group.users.add(User.objects.get(username='doc'))
+
+        group_count, group_lines = self._dump(Group)
+        users_count, users_lines = self._dump(Group.users.through)
+        self.assertEqual(group_count, 1)
+        self.assertEqual(users_count, 1)
+
+        Group.objects.all().delete()
+
+        loaded = []
+        total = dbdump.load_dump(
+            group_lines + users_lines,
+            batch_size=1,
+            on_model_loaded=lambda model, count: loaded.append(
+                (model, count)))
+
+        self.assertEqual(total, 2)
+        self.assertEqual(loaded, [(Group, 1), (Group.users.through, 1)])
+
+        group = Group.objects.get(pk=group.pk)
+        self.assertEqual(group.name, 'group1')
+        self.assertEqual(list(group.users.values_list('username', flat=True)),
+                         ['doc'])
+
+    def test_load_dump_with_junk(self):
+        """Testing load_dump with junk data"""
+        with self.assertRaises(ValueError):
+            dbdump.load_dump(['junk\n'])
+
+
+class RequestProfilingTests(TestCase):
+    """Unit tests for reviewboard.admin.profiling."""
+
+    fixtures = ['test_users']
+
+    def tearDown(self):
+        super(RequestProfilingTests, self).tearDown()
+
+        profiling.finish_profile()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('request_profiling_users', [])
+        siteconfig.set('request_profiling_sample_rate', 0)
+        siteconfig.save()
+
+    def _make_request(self, username='doc'):
+        request = RequestFactory().get('/r/1/diff/')
+        request.user = User.objects.get(username=username)
+
+        return request
+
+    def test_get_cache_key_family(self):
+        """Testing get_cache_key_family"""
+        self.assertEqual(
+            profiling.get_cache_key_family('diff-sidebyside-hl-123'),
+            'diff-sidebyside-hl')
+        self.assertEqual(
+            profiling.get_cache_key_family('file:1:README:abc123'),
+            'file')
+        self.assertEqual(
+            profiling.get_cache_key_family('repository-branches:4'),
+            'repository-branches')
+        self.assertEqual(
+            profiling.get_cache_key_family('text-attachment-12-lines'),
+            'text-attachment')
+
+    def test_spans(self):
+        """Testing RequestProfile records nested log_timed spans"""
+        profile = profiling.start_profile(self._make_request())
+
+        outer_timer = profiling.log_timed('Outer')
+        inner_timer = profiling.log_timed('Inner')
+        inner_timer.done()
+        User.objects.count()
+        outer_timer.done()
+
+        self.assertIs(profiling.finish_profile(), profile)
+        self.assertIsNone(profiling.get_current_profile())
+
+        rows = list(profile.root.iter_rows())
+        self.assertEqual([(row['name'], row['depth']) for row in rows],
+                         [('GET /r/1/diff/', 0),
+                          ('Outer', 1),
+                          ('Inner', 2)])
+        self.assertEqual(rows[1]['num_queries'], 1)
+        self.assertEqual(rows[2]['num_queries'], 0)
+        self.assertEqual(profile.num_queries, 1)
+
+    def test_cache_lookups(self):
+        """Testing RequestProfile records cache hits and misses"""
+        profile = profiling.start_profile(self._make_request())
+
+        cache_memoize('profiling-test-1', lambda: 'value')
+        cache_memoize('profiling-test-1', lambda: 'value')
+
+        profiling.finish_profile()
+
+        self.assertEqual(profile.cache_stats['profiling-test'], {
+            'hits': 1,
+            'misses': 1,
+        })
+
+    def test_middleware_with_profiled_user(self):
+        """Testing RequestProfilingMiddleware with a profiled user who isn't
+        staff
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('request_profiling_users', ['doc'])
+        siteconfig.save()
+
+        middleware = RequestProfilingMiddleware()
+        request = self._make_request()
+        middleware.process_request(request)
+        self.assertIsNotNone(profiling.get_current_profile())
+
+        response = middleware.process_response(request, HttpResponse())
+
+        self.assertNotIn(profiling.PROFILE_HEADER, response)
+        self.assertIsNone(profiling.get_current_profile())
+
+        profiles = profiling.get_recent_profiles()
+        self.assertEqual(profiles[0]['path'], '/r/1/diff/')
+        self.assertEqual(profiles[0]['username'], 'doc')
+
+    def test_middleware_with_profiled_staff_user(self):
+        """Testing RequestProfilingMiddleware sends the profile summary to
+        staff
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('request_profiling_users', ['admin'])
+        siteconfig.save()
+
+        middleware = RequestProfilingMiddleware()
+        request = self._make_request('admin')
+        middleware.process_request(request)
+        response = middleware.process_response(request, HttpResponse())
+
+        self.assertIn(profiling.PROFILE_HEADER, response)
+
+    def test_store_profile(self):
+        """Testing store_profile keeps the most recent profiles"""
+        for i in range(profiling.MAX_RECENT_PROFILES + 2):
+            request = RequestFactory().get('/r/%d/' % i)
+            request.user = User.objects.get(username='doc')
+
+            profile = profiling.start_profile(request)
+            profiling.finish_profile()
+            profile.timestamp += datetime.timedelta(seconds=i)
+            profiling.store_profile(profile)
+
+        profiles = profiling.get_recent_profiles()
+        self.assertEqual(len(profiles), profiling.MAX_RECENT_PROFILES)
+        self.assertEqual(profiles[0]['path'],
+                         '/r/%d/' % (profiling.MAX_RECENT_PROFILES + 1))
+        self.assertEqual(profiles[-1]['path'], '/r/2/')
+
+    def test_middleware_with_other_user(self):
+        """Testing RequestProfilingMiddleware with a user not profiled"""
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('request_profiling_users', ['doc'])
+        siteconfig.save()
+
+        middleware = RequestProfilingMiddleware()
+        request = self._make_request('grumpy')
+        middleware.process_request(request)
+        response = middleware.process_response(request, HttpResponse())
+
+        self.assertNotIn(profiling.PROFILE_HEADER, response)
+
+
+class CacheFamilyStatsTests(SpyAgency, TestCase):
+    """Unit tests for cache key family statistics."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(CacheFamilyStatsTests, self).setUp()
+
+        cache_stats.reset_cache_family_stats()
+
+    def tearDown(self):
+        super(CacheFamilyStatsTests, self).tearDown()
+
+        cache_stats.reset_cache_family_stats()
+
+    def _get_family_stats(self, family):
+        for stats in cache_stats.get_cache_family_stats():
+            if stats['family'] == family:
+                return stats
+
+        return None
+
+    def test_cache_memoize(self):
+        """Testing cache_memoize records statistics by key family"""
+        cache_memoize('family-test-1', lambda: 'x' * 1000)
+        cache_memoize('family-test-1', lambda: 'x' * 1000)
+        cache_memoize('family-test-2', lambda: 'x' * 1000)
+
+        stats = self._get_family_stats('family-test')
+        self.assertIsNotNone(stats)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['fills'], 2)
+        self.assertEqual(stats['sized_fills'], 1)
+        self.assertGreater(stats['avg_stored_bytes'], 1000)
+        self.assertEqual(stats['estimated_stored_bytes'],
+                         stats['avg_stored_bytes'] * 2)
+        self.assertAlmostEqual(stats['hit_rate'], 100.0 / 3)
+
+    def test_stats_accumulate_across_flushes(self):
+        """Testing cache key family statistics add up across flushes"""
+        cache_memoize('family-test-1', lambda: 'value')
+        cache_stats.flush_family_stats()
+        cache_memoize('family-test-1', lambda: 'value')
+
+        stats = self._get_family_stats('family-test')
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_record_cache_fill_samples_size(self):
+        """Testing record_cache_fill only measures some values"""
+        self.spy_on(cache_stats._get_stored_size)
+
+        for i in range(cache_stats.STORED_BYTES_SAMPLE_INTERVAL + 1):
+            cache_stats.record_cache_fill('family-test-%d' % i, 'value', 0)
+
+        self.assertEqual(len(cache_stats._get_stored_size.calls), 2)
+
+        stats = self._get_family_stats('family-test')
+        self.assertEqual(stats['fills'],
+                         cache_stats.STORED_BYTES_SAMPLE_INTERVAL + 1)
+        self.assertEqual(stats['sized_fills'], 2)
+
+    def test_stats_flushed_in_background(self):
+        """Testing cache key family statistics are written to the cache on
+        a background thread
+        """
+        self.spy_on(cache_stats._flush_queue.run, call_original=False)
+        self.spy_on(cache_stats.flush_family_stats)
+        cache_stats._last_flush[0] = 0
+
+        cache_memoize('family-test-1', lambda: 'value')
+
+        self.assertTrue(cache_stats._flush_queue.run.called)
+        self.assertFalse(cache_stats.flush_family_stats.called)
+
+    def test_stats_endpoint(self):
+        """Testing the cache key family statistics endpoint"""
+        cache_memoize('family-test-1', lambda: 'value')
+
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(
+            local_site_reverse('admin-cache-family-stats'))
+
+        self.assertEqual(response.status_code, 200)
+
+        families = json.loads(response.content.decode('utf-8'))['families']
+        self.assertIn('family-test',
+                      [stats['family'] for stats in families])
@@ -41,6 +41,9 @@ urlpatterns = [
 
     url(r'^cache/$', views.cache_stats, name='admin-server-cache'),
 
+    url(r'^cache/families/$', views.cache_family_stats,
+        name='admin-cache-family-stats'),
+
     url(r'^db/', include(admin.site.urls)),
 
     url(r'^integrations/', include('reviewboard.integrations.urls')),
@@ -57,6 +60,9 @@ urlpatterns = [
 
     url(r'^log/', include('djblets.log.urls')),
 
+    url(r'^profiles/$', views.request_profiles,
+        name='admin-request-profiles'),
+
     url(r'^security/$', views.security, name='admin-security-checks'),
 
     url(r'^settings/', include([
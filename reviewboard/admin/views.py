@@ -16,9 +16,11 @@ from djblets.siteconfig.models import SiteConfiguration
 from djblets.siteconfig.views import site_settings as djblets_site_settings
 
 from reviewboard.accounts.models import Profile
-from reviewboard.admin.cache_stats import get_cache_stats
+from reviewboard.admin.cache_stats import (get_cache_family_stats,
+                                          get_cache_stats)
 from reviewboard.admin.decorators import superuser_required
 from reviewboard.admin.forms import SSHSettingsForm
+from reviewboard.admin.profiling import get_recent_profiles
 from reviewboard.admin.security_checks import SecurityCheckRunner
 from reviewboard.admin.support import get_support_url, serialize_support_data
 from reviewboard.admin.widgets import (dynamic_activity_data,
@@ -114,11 +116,38 @@ def cache_stats(request, template_name="admin/cache_stats.html"):
     return render_to_response(template_name, RequestContext(request, {
         'cache_hosts': cache_stats,
         'cache_backend': cache_info['BACKEND'],
+        'family_stats': get_cache_family_stats(),
         'title': _("Server Cache"),
         'root_path': settings.SITE_ROOT + "admin/db/"
     }))
 
 
+@staff_member_required
+def cache_family_stats(request):
+    """Return JSON statistics on cache usage by key family.
+
+    This includes hits, misses, and the time spent computing and the size of
+    values stored, for each family of cache keys used by Review Board.
+    """
+    return HttpResponse(json.dumps({
+        'families': get_cache_family_stats(),
+    }), content_type='application/json')
+
+
+@staff_member_required
+def request_profiles(request, template_name='admin/request_profiles.html'):
+    """Display the most recent request profiles.
+
+    Each profile shows the timed operations, database queries and cache
+    usage for a request.
+    """
+    return render_to_response(template_name, RequestContext(request, {
+        'profiles': get_recent_profiles(),
+        'title': _('Request Profiles'),
+        'root_path': settings.SITE_ROOT + 'admin/db/',
+    }))
+
+
 @staff_member_required
 def security(request, template_name="admin/security.html"):
     """Run security checks and report the results."""
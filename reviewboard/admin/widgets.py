@@ -13,9 +13,11 @@ from django.template.context import RequestContext
 from django.template.loader import render_to_string
 from django.utils import six, timezone
 from django.utils.translation import ugettext_lazy as _
-from djblets.cache.backend import cache_memoize
 
-from reviewboard.admin.cache_stats import get_cache_stats
+from reviewboard.admin import activity_stats
+from reviewboard.admin.cache_stats import (cache_memoize,
+                                          get_cache_family_stats,
+                                          get_cache_stats)
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.changedescs.models import ChangeDescription
 from reviewboard.diffviewer.models import DiffSet
@@ -273,7 +275,8 @@ class ReviewGroupsWidget(Widget):
 class ServerCacheWidget(Widget):
     """Cache statistics widget.
 
-    Displays a list of memcached statistics, if available.
+    Displays a list of memcached statistics, if available, along with
+    statistics on Review Board's own use of the cache, by key family.
     """
 
     widget_id = 'server-cache-widget'
@@ -300,6 +303,7 @@ class ServerCacheWidget(Widget):
 
         return {
             'cache_stats': cache_stats,
+            'family_stats': get_cache_family_stats(),
             'uptime': uptime
         }
 
@@ -338,6 +342,18 @@ class DatabaseStatsWidget(Widget):
 
     def generate_data(self, request):
         """Generate data for the widget."""
+        if activity_stats.is_backfilled():
+            get_total_count = activity_stats.get_total_count
+
+            return {
+                'count_comments': get_total_count('comments'),
+                'count_reviews': get_total_count('reviews'),
+                'count_attachments': get_total_count('file_attachments'),
+                'count_reviewdrafts': get_total_count('review_request_drafts'),
+                'count_screenshots': get_total_count('screenshots'),
+                'count_diffsets': get_total_count('diffsets'),
+            }
+
         return {
             'count_comments': Comment.objects.all().count(),
             'count_reviews': Review.objects.all().count(),
@@ -435,6 +451,28 @@ def dynamic_activity_data(request):
 
             return data
 
+        def get_daily_counts(name):
+            """Return the stored daily counts for a type of object.
+
+            The counts are prepared for the charting library, in the same
+            form as get_objects.
+            """
+            return [
+                [time.mktime(date.timetuple()) * 1000, count]
+                for date, count in activity_stats.get_daily_counts(
+                    name,
+                    range_start.astimezone(timezone.utc).date(),
+                    range_end.astimezone(timezone.utc).date())
+            ]
+
+        if activity_stats.is_backfilled():
+            return {
+                'change_descriptions': get_daily_counts('change_descriptions'),
+                'comments': get_daily_counts('comments'),
+                'reviews': get_daily_counts('reviews'),
+                'review_requests': get_daily_counts('review_requests'),
+            }
+
         comment_array = get_objects(Comment, "timestamp", "date(timestamp)")
         change_desc_array = get_objects(ChangeDescription, "timestamp",
                                         "date(timestamp)")
@@ -517,6 +555,8 @@ def init_widgets():
     post_delete.connect(_increment_sync_num, sender=Group)
     post_delete.connect(_increment_sync_num, sender=Repository)
 
+    activity_stats.connect_signals()
+
 
 def register_admin_widget(widget_cls, primary=False):
     """Register an administration widget.
@@ -19,4 +19,12 @@ def _register_mimetype_handlers(**kwargs):
     register_mimetype_handler(TextMimetype)
 
 
+def _connect_signals(**kwargs):
+    """Connect the signal handlers that generate thumbnails."""
+    from reviewboard.attachments.thumbnails import connect_signals
+
+    connect_signals()
+
+
 initializing.connect(_register_mimetype_handlers)
+initializing.connect(_connect_signals)
@@ -0,0 +1,9 @@
+from __future__ import unicode_literals
+
+from django_evolution.mutations import AddField
+from djblets.db.fields import JSONField
+
+
+MUTATIONS = [
+    AddField('FileAttachment', 'extra_data', JSONField, null=True),
+]
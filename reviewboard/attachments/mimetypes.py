@@ -9,7 +9,6 @@ from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.utils.html import escape
 from django.utils.encoding import smart_str, force_unicode
 from django.utils.safestring import mark_safe
-from djblets.cache.backend import cache_memoize
 from djblets.util.filesystem import is_exe_in_path
 from djblets.util.templatetags.djblets_images import thumbnail
 from pygments import highlight
@@ -19,6 +18,8 @@ import docutils.core
 import markdown
 import mimeparse
 
+from reviewboard.admin.cache_stats import cache_memoize
+
 
 _registered_mimetype_handlers = []
 
@@ -205,6 +206,13 @@ class MimetypeHandler(object):
     #: size thumbnails they should generate.
     use_hd_thumbnails = True
 
+    #: Whether thumbnails should be generated ahead of time.
+    #:
+    #: If set, the thumbnail is generated in the background when the file
+    #: attachment is saved, and stored with the attachment. This is useful
+    #: for handlers that must read the file to build the thumbnail.
+    precompute_thumbnail = False
+
     def __init__(self, attachment, mimetype):
         """Initialize the handler."""
         self.attachment = attachment
@@ -319,6 +327,8 @@ class TextMimetype(MimetypeHandler):
 
     supported_mimetypes = ['text/*']
 
+    precompute_thumbnail = True
+
     # Read up to 'FILE_CROP_CHAR_LIMIT' number of characters from
     # the file attachment to prevent long reads caused by malicious
     # or auto-generated files.
@@ -9,7 +9,7 @@ from django.db import models
 from django.db.models import Max
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
-from djblets.db.fields import RelationCounterField
+from djblets.db.fields import JSONField, RelationCounterField
 
 from reviewboard.admin.server import build_server_url
 from reviewboard.attachments.managers import FileAttachmentManager
@@ -121,6 +121,8 @@ class FileAttachment(models.Model):
                                            related_name='file_attachments')
     attachment_revision = models.IntegerField(default=0)
 
+    extra_data = JSONField(null=True)
+
     objects = FileAttachmentManager()
 
     @property
@@ -141,10 +143,22 @@ class FileAttachment(models.Model):
         return self._review_ui
 
     def _get_thumbnail(self):
-        """Return the thumbnail for display."""
+        """Return the thumbnail for display.
+
+        If a thumbnail was generated when the file was uploaded, and is still
+        up-to-date, it will be returned without reading the file.
+        """
+        from reviewboard.attachments.thumbnails import \
+            get_stored_attachment_thumbnail
+
         if not self.mimetype_handler:
             return None
 
+        thumbnail = get_stored_attachment_thumbnail(self)
+
+        if thumbnail is not None:
+            return thumbnail
+
         try:
             return self.mimetype_handler.get_thumbnail()
         except Exception as e:
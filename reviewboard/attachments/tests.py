@@ -13,13 +13,17 @@ from kgb import SpyAgency
 
 from reviewboard import initialize
 from reviewboard.attachments.forms import UploadFileForm, UploadUserFileForm
+from reviewboard.attachments import thumbnails
 from reviewboard.attachments.mimetypes import (MimetypeHandler,
+                                               TextMimetype,
                                                register_mimetype_handler,
                                                unregister_mimetype_handler)
 from reviewboard.attachments.models import (FileAttachment,
                                             FileAttachmentHistory)
 from reviewboard.diffviewer.models import DiffSet, DiffSetHistory, FileDiff
-from reviewboard.reviews.models import ReviewRequest
+from reviewboard.reviews.models import (FileAttachmentComment,
+                                        ReviewRequest)
+from reviewboard.reviews.ui.text import TextBasedReviewUI
 from reviewboard.scmtools.core import PRE_CREATION
 from reviewboard.site.models import LocalSite
 from reviewboard.testing import TestCase
@@ -794,3 +798,141 @@ class TextMimetypeTests(SpyAgency, TestCase):
         thumbnail = self.file_attachment.thumbnail
 
         self.assertIsInstance(thumbnail, SafeText)
+
+
+class ThumbnailTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.attachments.thumbnails."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(ThumbnailTests, self).setUp()
+
+        uploaded_file = SimpleUploadedFile(
+            'test.txt',
+            b'This is a test',
+            content_type='text/plain')
+
+        self.review_request = self.create_review_request(publish=True)
+
+        form = UploadFileForm(self.review_request, files={
+            'path': uploaded_file,
+        })
+        self.assertTrue(form.is_valid())
+
+        self.file_attachment = form.create()
+
+    def test_generate_attachment_thumbnail(self):
+        """Testing generate_attachment_thumbnail stores the thumbnail"""
+        self.spy_on(TextMimetype.get_thumbnail,
+                    call_fake=lambda self: '<div>My thumbnail</div>')
+
+        thumbnails.generate_attachment_thumbnail(self.file_attachment)
+
+        file_attachment = FileAttachment.objects.get(
+            pk=self.file_attachment.pk)
+        self.assertIn(thumbnails.THUMBNAIL_KEY, file_attachment.extra_data)
+
+        thumbnail = file_attachment.thumbnail
+        self.assertEqual(thumbnail, '<div>My thumbnail</div>')
+        self.assertIsInstance(thumbnail, SafeText)
+        self.assertEqual(len(TextMimetype.get_thumbnail.spy.calls), 1)
+
+    def test_stored_attachment_thumbnail_out_of_date(self):
+        """Testing FileAttachment.thumbnail with an out-of-date stored
+        thumbnail
+        """
+        self.spy_on(TextMimetype.get_thumbnail,
+                    call_fake=lambda self: '<div>My thumbnail</div>')
+
+        thumbnails.generate_attachment_thumbnail(self.file_attachment)
+
+        file_attachment = FileAttachment.objects.get(
+            pk=self.file_attachment.pk)
+        file_attachment.caption = 'New caption'
+
+        self.assertIsNone(
+            thumbnails.get_stored_attachment_thumbnail(file_attachment))
+        self.assertEqual(file_attachment.thumbnail, '<div>My thumbnail</div>')
+        self.assertEqual(len(TextMimetype.get_thumbnail.spy.calls), 2)
+
+    def test_generate_comment_thumbnail(self):
+        """Testing generate_comment_thumbnail stores the thumbnail"""
+        self.spy_on(TextBasedReviewUI.get_comment_thumbnail,
+                    call_fake=lambda self, comment: '<div>My comment</div>')
+
+        review = self.create_review(self.review_request)
+        comment = self.create_file_attachment_comment(
+            review, self.file_attachment,
+            extra_fields={
+                'beginLineNum': 1,
+                'endLineNum': 1,
+            })
+
+        thumbnails.generate_comment_thumbnail(comment)
+
+        comment = FileAttachmentComment.objects.get(pk=comment.pk)
+        self.assertEqual(comment.thumbnail, '<div>My comment</div>')
+        self.assertEqual(
+            len(TextBasedReviewUI.get_comment_thumbnail.spy.calls), 1)
+
+        # Changing the commented region makes the stored thumbnail
+        # out-of-date.
+        comment.extra_data['endLineNum'] = 2
+        self.assertIsNone(thumbnails.get_stored_comment_thumbnail(comment))
+
+    def test_thumbnail_generated_on_save(self):
+        """Testing FileAttachment.save generates the thumbnail in the
+        background
+        """
+        self.spy_on(TextMimetype.get_thumbnail,
+                    call_fake=lambda self: '<div>My thumbnail</div>')
+        self.spy_on(thumbnails._queue.run,
+                    call_fake=lambda queue, func, *args: func(*args))
+
+        with self.settings(RUNNING_TEST=False):
+            self.file_attachment.save()
+
+            # The thumbnail is up-to-date, so saving again won't generate
+            # it again.
+            FileAttachment.objects.get(pk=self.file_attachment.pk).save()
+
+        self.assertEqual(len(thumbnails._queue.run.spy.calls), 1)
+        self.assertIsNotNone(thumbnails.get_stored_attachment_thumbnail(
+            FileAttachment.objects.get(pk=self.file_attachment.pk)))
+
+        # The saved instance has the thumbnail too, so saving it again
+        # keeps it.
+        self.assertIsNotNone(thumbnails.get_stored_attachment_thumbnail(
+            self.file_attachment))
+
+    def test_generate_attachment_thumbnail_keeps_extra_data(self):
+        """Testing generate_attachment_thumbnail keeps changes made to
+        extra_data by others
+        """
+        self.spy_on(TextMimetype.get_thumbnail,
+                    call_fake=lambda self: '<div>My thumbnail</div>')
+
+        FileAttachment.objects.filter(pk=self.file_attachment.pk).update(
+            extra_data={'key': 'value'})
+
+        thumbnails.generate_attachment_thumbnail(self.file_attachment)
+
+        file_attachment = FileAttachment.objects.get(
+            pk=self.file_attachment.pk)
+        self.assertEqual(file_attachment.extra_data['key'], 'value')
+        self.assertIn(thumbnails.THUMBNAIL_KEY, file_attachment.extra_data)
+
+    def test_thumbnail_not_queued_twice(self):
+        """Testing FileAttachment.save doesn't queue a thumbnail that's
+        already waiting to be generated
+        """
+        self.spy_on(thumbnails._queue.run,
+                    call_fake=lambda queue, func, *args: True)
+        self.addCleanup(thumbnails._pending.clear)
+
+        with self.settings(RUNNING_TEST=False):
+            self.file_attachment.save()
+            self.file_attachment.save()
+
+        self.assertEqual(len(thumbnails._queue.run.spy.calls), 1)
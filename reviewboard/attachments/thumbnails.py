@@ -0,0 +1,404 @@
+"""Thumbnails generated ahead of time for file attachments and comments.
+
+Thumbnails for text files and comment thumbnails for images and text files
+have to read the file from storage, and may need to highlight or crop it.
+Doing that while rendering a page full of attachments and comments is slow.
+
+When a file attachment or comment is saved, its thumbnail is instead
+generated by a small pool of background threads, and stored in the object's
+``extra_data``. The stored thumbnail records a signature of everything it was
+generated from (such as the caption, or the commented region), and is only
+used while that signature still matches. Otherwise, the thumbnail is
+generated as it was before.
+
+At most :py:data:`MAX_PENDING_THUMBNAILS` thumbnails wait to be generated at
+a time. Any beyond that are skipped, and generated when first rendered.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import six
+from django.utils.safestring import mark_safe
+
+from reviewboard.admin.background import BackgroundQueue
+
+
+#: The key in ``extra_data`` that stores a generated thumbnail.
+#:
+#: This begins with ``__`` so that it's private to the API.
+THUMBNAIL_KEY = '__thumbnail'
+
+#: The number of background threads generating thumbnails.
+THUMBNAIL_WORKER_THREADS = 2
+
+#: The maximum number of thumbnails waiting to be generated.
+MAX_PENDING_THUMBNAILS = 200
+
+
+_queue = BackgroundQueue('thumbnails',
+                         num_threads=THUMBNAIL_WORKER_THREADS,
+                         max_pending=MAX_PENDING_THUMBNAILS)
+_queue_lock = threading.Lock()
+_pending = set()
+
+
+def _make_signature(*values):
+    """Return a signature for the values a thumbnail is generated from.
+
+    Args:
+        *values (tuple):
+            JSON-serializable values the thumbnail depends on.
+
+    Returns:
+        unicode:
+        The signature.
+    """
+    return hashlib.sha1(
+        json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _get_class_path(obj):
+    """Return the full path of an object's class.
+
+    Args:
+        obj (object):
+            The object.
+
+    Returns:
+        unicode:
+        The module and name of the class.
+    """
+    cls = type(obj)
+
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def get_attachment_thumbnail_signature(attachment):
+    """Return the signature for a file attachment's thumbnail.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+    Returns:
+        unicode:
+        The signature, or ``None`` if the thumbnail isn't generated ahead of
+        time.
+    """
+    handler = attachment.mimetype_handler
+
+    if not handler or not handler.precompute_thumbnail or not attachment.file:
+        return None
+
+    return _make_signature(_get_class_path(handler), attachment.file.name,
+                           attachment.caption)
+
+
+def get_comment_thumbnail_signature(comment):
+    """Return the signature for a file attachment comment's thumbnail.
+
+    Args:
+        comment (reviewboard.reviews.models.FileAttachmentComment):
+            The comment.
+
+    Returns:
+        unicode:
+        The signature, or ``None`` if the thumbnail isn't generated ahead of
+        time.
+    """
+    review_ui = comment.review_ui
+
+    if not review_ui or not review_ui.precompute_comment_thumbnails:
+        return None
+
+    extra_data = dict(
+        (key, value)
+        for key, value in six.iteritems(comment.extra_data or {})
+        if not key.startswith('__')
+    )
+
+    return _make_signature(_get_class_path(review_ui),
+                           comment.file_attachment_id,
+                           comment.diff_against_file_attachment_id,
+                           comment.text,
+                           extra_data)
+
+
+def _get_stored_thumbnail(obj, signature):
+    """Return a stored thumbnail, if it's up-to-date.
+
+    Args:
+        obj (django.db.models.Model):
+            The object the thumbnail was stored on.
+
+        signature (unicode):
+            The current signature for the thumbnail.
+
+    Returns:
+        django.utils.safestring.SafeText:
+        The thumbnail HTML, or ``None`` if there isn't an up-to-date stored
+        thumbnail.
+    """
+    if signature is None:
+        return None
+
+    stored = (obj.extra_data or {}).get(THUMBNAIL_KEY)
+
+    if not stored or stored.get('signature') != signature:
+        return None
+
+    return mark_safe(stored['html'])
+
+
+def get_stored_attachment_thumbnail(attachment):
+    """Return the stored thumbnail for a file attachment.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+    Returns:
+        django.utils.safestring.SafeText:
+        The thumbnail HTML, or ``None`` if there isn't an up-to-date stored
+        thumbnail.
+    """
+    return _get_stored_thumbnail(
+        attachment, get_attachment_thumbnail_signature(attachment))
+
+
+def get_stored_comment_thumbnail(comment):
+    """Return the stored thumbnail for a file attachment comment.
+
+    Args:
+        comment (reviewboard.reviews.models.FileAttachmentComment):
+            The comment.
+
+    Returns:
+        django.utils.safestring.SafeText:
+        The thumbnail HTML, or ``None`` if there isn't an up-to-date stored
+        thumbnail.
+    """
+    return _get_stored_thumbnail(comment,
+                                 get_comment_thumbnail_signature(comment))
+
+
+def _store_thumbnail(obj, signature, html):
+    """Store a generated thumbnail on an object.
+
+    This updates only the ``extra_data`` field, without saving the rest of
+    the object or emitting signals. The thumbnail is merged into the
+    ``extra_data`` currently in the database, with the row locked, so that
+    concurrent changes to ``extra_data`` aren't lost. It's also set on
+    ``obj``, so that saving ``obj`` later keeps the thumbnail.
+
+    Args:
+        obj (django.db.models.Model):
+            The object to store the thumbnail on.
+
+        signature (unicode):
+            The signature of the thumbnail.
+
+        html (unicode):
+            The thumbnail HTML.
+    """
+    model = type(obj)
+    stored = {
+        'html': six.text_type(html),
+        'signature': signature,
+    }
+
+    with transaction.atomic():
+        try:
+            extra_data = (
+                model.objects
+                .select_for_update()
+                .only('extra_data')
+                .get(pk=obj.pk)
+                .extra_data
+            ) or {}
+        except model.DoesNotExist:
+            return
+
+        extra_data[THUMBNAIL_KEY] = stored
+        model.objects.filter(pk=obj.pk).update(extra_data=extra_data)
+
+    if obj.extra_data is None:
+        obj.extra_data = {}
+
+    obj.extra_data[THUMBNAIL_KEY] = stored
+
+
+def generate_attachment_thumbnail(attachment):
+    """Generate and store the thumbnail for a file attachment.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+    """
+    signature = get_attachment_thumbnail_signature(attachment)
+
+    if signature is None:
+        return
+
+    html = attachment.mimetype_handler.get_thumbnail()
+
+    if html:
+        _store_thumbnail(attachment, signature, html)
+
+
+def generate_comment_thumbnail(comment):
+    """Generate and store the thumbnail for a file attachment comment.
+
+    Args:
+        comment (reviewboard.reviews.models.FileAttachmentComment):
+            The comment.
+    """
+    signature = get_comment_thumbnail_signature(comment)
+
+    if signature is None:
+        return
+
+    html = comment.review_ui.get_comment_thumbnail(comment)
+
+    if html:
+        _store_thumbnail(comment, signature, html)
+
+
+def _generate_in_background(instance, generate_func, pending_key):
+    """Generate a thumbnail for an object.
+
+    This is run in a background thread. The object is loaded again, so
+    that it's not shared with the thread that saved it. Once stored, the
+    thumbnail is also set on the saved instance, so that saving it again
+    doesn't remove the thumbnail.
+
+    Args:
+        instance (django.db.models.Model):
+            The instance that was saved.
+
+        generate_func (callable):
+            The function used to generate and store the thumbnail.
+
+        pending_key (tuple):
+            The key identifying the pending thumbnail.
+    """
+    model = type(instance)
+
+    try:
+        obj = model.objects.get(pk=instance.pk)
+        generate_func(obj)
+
+        stored = (obj.extra_data or {}).get(THUMBNAIL_KEY)
+
+        if stored:
+            if instance.extra_data is None:
+                instance.extra_data = {}
+
+            instance.extra_data[THUMBNAIL_KEY] = stored
+    except model.DoesNotExist:
+        pass
+    except Exception as e:
+        logging.exception('Unable to generate thumbnail for %s %s: %s',
+                          model.__name__, instance.pk, e)
+    finally:
+        with _queue_lock:
+            _pending.discard(pending_key)
+
+
+def _schedule_thumbnail(obj, get_signature, generate_func):
+    """Schedule generating a thumbnail, if it's out of date.
+
+    Args:
+        obj (django.db.models.Model):
+            The object that was saved.
+
+        get_signature (callable):
+            The function used to compute the signature for the thumbnail.
+
+        generate_func (callable):
+            The function used to generate and store the thumbnail.
+    """
+    # Generating thumbnails in the background would make tests depend on
+    # thread timing, so tests generate them explicitly instead.
+    if getattr(settings, 'RUNNING_TEST', False):
+        return
+
+    try:
+        signature = get_signature(obj)
+
+        if (signature is None or
+            _get_stored_thumbnail(obj, signature) is not None):
+            return
+    except Exception as e:
+        logging.exception('Unable to check the thumbnail for %s %s: %s',
+                          type(obj).__name__, obj.pk, e)
+        return
+
+    # Don't queue the same thumbnail twice.
+    pending_key = (type(obj), obj.pk, signature)
+
+    with _queue_lock:
+        if pending_key in _pending:
+            return
+
+        _pending.add(pending_key)
+
+    if not _queue.run(_generate_in_background, obj, generate_func,
+                      pending_key):
+        with _queue_lock:
+            _pending.discard(pending_key)
+
+
+def _on_file_attachment_saved(instance, raw=False, **kwargs):
+    """Handle a file attachment being saved.
+
+    Args:
+        instance (reviewboard.attachments.models.FileAttachment):
+            The file attachment that was saved.
+
+        raw (bool, optional):
+            Whether the file attachment was saved while loading a fixture.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    if not raw:
+        _schedule_thumbnail(instance, get_attachment_thumbnail_signature,
+                            generate_attachment_thumbnail)
+
+
+def _on_file_attachment_comment_saved(instance, raw=False, **kwargs):
+    """Handle a file attachment comment being saved.
+
+    Args:
+        instance (reviewboard.reviews.models.FileAttachmentComment):
+            The comment that was saved.
+
+        raw (bool, optional):
+            Whether the comment was saved while loading a fixture.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    if not raw:
+        _schedule_thumbnail(instance, get_comment_thumbnail_signature,
+                            generate_comment_thumbnail)
+
+
+def connect_signals():
+    """Connect the signal handlers that generate thumbnails."""
+    from django.db.models.signals import post_save
+
+    from reviewboard.attachments.models import FileAttachment
+    from reviewboard.reviews.models import FileAttachmentComment
+
+    post_save.connect(_on_file_attachment_saved, sender=FileAttachment)
+    post_save.connect(_on_file_attachment_comment_saved,
+                      sender=FileAttachmentComment)
@@ -0,0 +1,17 @@
+from __future__ import unicode_literals
+
+from django.dispatch import receiver
+
+from reviewboard.signals import initializing
+
+
+@receiver(initializing)
+def _on_initializing(*args, **kwargs):
+    """Handler for when Review Board is initializing.
+
+    This will begin listening for changes to users, groups and profiles,
+    invalidating the cached sidebar counts when they change.
+    """
+    from reviewboard.datagrids.sidebar_cache import connect_signals
+
+    connect_signals()
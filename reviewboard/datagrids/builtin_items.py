@@ -4,6 +4,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.datagrids.sidebar import (BaseSidebarItem,
                                            BaseSidebarSection, SidebarNavItem)
+from reviewboard.datagrids.sidebar_cache import get_user_page_sidebar_groups
 
 
 class OutgoingSection(BaseSidebarSection):
@@ -22,16 +23,16 @@ class OutgoingSection(BaseSidebarSection):
 
     def get_items(self):
         """Yield each of the items within this section."""
-        site_profile = self.datagrid.site_profile
+        counts = self.datagrid.sidebar_counts
 
         yield SidebarNavItem(self,
                              label=_('All'),
                              view_id='mine',
-                             count=site_profile.total_outgoing_request_count)
+                             count=counts['total_outgoing_request_count'])
         yield SidebarNavItem(self,
                              label=_('Open'),
                              view_id='outgoing',
-                             count=site_profile.pending_outgoing_request_count)
+                             count=counts['pending_outgoing_request_count'])
 
 
 class IncomingSection(BaseSidebarSection):
@@ -58,56 +59,53 @@ class IncomingSection(BaseSidebarSection):
 
     def get_items(self):
         """Yield each of the items within this section."""
-        profile = self.datagrid.profile
-        site_profile = self.datagrid.site_profile
+        counts = self.datagrid.sidebar_counts
+        group_ids, starred_group_ids = self.datagrid.sidebar_groups
 
         yield SidebarNavItem(self,
                              label=_('Open'),
                              view_id='incoming',
-                             count=site_profile.total_incoming_request_count)
+                             count=counts['total_incoming_request_count'])
 
         yield SidebarNavItem(self,
                              label=_('To Me'),
                              view_id='to-me',
-                             count=site_profile.direct_incoming_request_count)
+                             count=counts['direct_incoming_request_count'])
 
-        if site_profile.starred_public_request_count > 0:
+        if counts['starred_public_request_count'] > 0:
             yield SidebarNavItem(
                 self,
                 label=_('Starred'),
                 view_id='starred',
                 icon_name='rb-icon-star-on',
-                count=site_profile.starred_public_request_count)
+                count=counts['starred_public_request_count'])
 
-        groups = (
-            self.datagrid.user.review_groups
-            .filter(local_site=self.datagrid.local_site)
-            .order_by('name'))
-        seen_groups = set([group.name for group in groups])
-
-        for item in self._add_groups(groups, view_id='to-group'):
+        for item in self._add_groups(group_ids, counts['groups'],
+                                     view_id='to-group'):
             yield item
 
-        starred_groups = (
-            profile.starred_groups
-            .filter(local_site=self.datagrid.local_site)
-            .exclude(name__in=seen_groups)
-            .order_by('name'))
-
-        for item in self._add_groups(starred_groups,
+        for item in self._add_groups(starred_group_ids, counts['groups'],
                                      view_id='to-watched-group',
                                      icon_name='rb-icon-star-on'):
             yield item
 
-    def _add_groups(self, groups, view_id, icon_name=None):
-        for i, group in enumerate(groups):
-            name = group.name
+    def _add_groups(self, group_ids, group_counts, view_id, icon_name=None):
+        i = 0
+
+        for group_id in group_ids:
+            try:
+                name, count = group_counts[group_id]
+            except KeyError:
+                # The group was deleted after the list of groups was cached.
+                continue
 
             if i == 0:
                 css_classes = ['new-subsection']
             else:
                 css_classes = []
 
+            i += 1
+
             yield SidebarNavItem(self,
                                  label=name,
                                  view_id=view_id,
@@ -116,7 +114,7 @@ class IncomingSection(BaseSidebarSection):
                                  },
                                  icon_name=icon_name,
                                  css_classes=css_classes,
-                                 count=group.incoming_request_count)
+                                 count=count)
 
 
 class UserProfileItem(BaseSidebarItem):
@@ -150,14 +148,12 @@ class UserGroupsItem(BaseSidebarSection):
 
     def get_items(self):
         """Yield each of the items within this section."""
-        request = self.datagrid.request
-
-        groups = (
-            self.datagrid.user.review_groups.accessible(request.user)
-            .filter(local_site=self.datagrid.local_site)
-            .order_by('name'))
+        groups = get_user_page_sidebar_groups(
+            self.datagrid.user,
+            self.datagrid.request.user,
+            self.datagrid.local_site)
 
-        for group in groups:
+        for name, url in groups:
             yield SidebarNavItem(self,
-                                 label=group.name,
-                                 url=group.get_absolute_url())
+                                 label=name,
+                                 url=url)
@@ -14,7 +14,8 @@ from djblets.siteconfig.models import SiteConfiguration
 
 from reviewboard.accounts.models import Profile, ReviewRequestVisit
 from reviewboard.avatars import avatar_services
-from reviewboard.reviews.models import ReviewRequest
+from reviewboard.diffviewer.models import DiffSet, FileDiff
+from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.reviews.templatetags.reviewtags import render_star
 from reviewboard.site.urlresolvers import local_site_reverse
 
@@ -347,7 +348,38 @@ class GroupMemberCountColumn(Column):
 
     def render_data(self, state, group):
         """Return the rendered contents of the column."""
-        return six.text_type(group.users.count())
+        return six.text_type(group.member_count_annotated)
+
+    def augment_queryset(self, state, queryset):
+        """Add additional queries to the queryset.
+
+        This will annotate each group with the number of member users, so
+        that rendering the column doesn't require a query per row.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting queryset.
+        """
+        users_field = Group._meta.get_field('users')
+
+        return queryset.extra(select={
+            'member_count_annotated': """
+                SELECT COUNT(*)
+                  FROM %(users_table)s
+                  WHERE %(users_table)s.%(group_column)s = %(group_table)s.id
+            """ % {
+                'group_column': users_field.m2m_column_name(),
+                'group_table': Group._meta.db_table,
+                'users_table': users_field.m2m_db_table(),
+            }
+        })
 
     def link_to_object(self, state, group, value):
         """Return the link to the object in the column."""
@@ -497,9 +529,60 @@ class PendingCountColumn(Column):
 
     def render_data(self, state, obj):
         """Return the rendered contents of the column."""
-        return six.text_type(
-            getattr(obj, self.field_name).filter(
-                public=True, status='P').count())
+        return six.text_type(obj.pending_count_annotated)
+
+    def augment_queryset(self, state, queryset):
+        """Add additional queries to the queryset.
+
+        This will annotate each user or group with the number of pending
+        review requests, so that rendering the column doesn't require a query
+        per row.
+
+        The column's ``field_name`` is expected to be the related name of one
+        of the :py:class:`~reviewboard.reviews.models.ReviewRequest`
+        many-to-many fields (``directed_review_requests`` or
+        ``review_requests``).
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting queryset.
+        """
+        for field in ReviewRequest._meta.many_to_many:
+            if field.rel.related_name == self.field_name:
+                break
+        else:
+            raise ValueError('%r is not a review request relation'
+                             % self.field_name)
+
+        return queryset.extra(
+            select={
+                'pending_count_annotated': """
+                    SELECT COUNT(*)
+                      FROM %(through_table)s
+                      INNER JOIN %(review_request_table)s
+                        ON %(review_request_table)s.id =
+                           %(through_table)s.%(review_request_column)s
+                      WHERE %(review_request_table)s.public
+                        AND %(review_request_table)s.status = %%s
+                        AND %(through_table)s.%(target_column)s =
+                            %(target_table)s.%(target_pk)s
+                """ % {
+                    'review_request_column': field.m2m_column_name(),
+                    'review_request_table': ReviewRequest._meta.db_table,
+                    'target_column': field.m2m_reverse_name(),
+                    'target_pk': queryset.model._meta.pk.column,
+                    'target_table': queryset.model._meta.db_table,
+                    'through_table': field.m2m_db_table(),
+                },
+            },
+            select_params=(ReviewRequest.PENDING_REVIEW,))
 
 
 class PeopleColumn(Column):
@@ -861,19 +944,21 @@ class DiffSizeColumn(Column):
             shrink=True,
             *args, **kwargs)
 
+    def setup_state(self, state):
+        """Set up the state for this column."""
+        state.diffset_line_counts = {}
+
     def render_data(self, state, review_request):
         """Return the rendered contents of the column."""
         if review_request.repository_id is None:
             return ''
 
-        diffsets = list(review_request.diffset_history.diffsets.all())
+        counts = state.diffset_line_counts.get(
+            getattr(review_request, 'latest_diffset_id', None))
 
-        if not diffsets:
+        if not counts:
             return ''
 
-        diffset = diffsets[-1]
-
-        counts = diffset.get_total_line_counts()
         insert_count = counts.get('raw_insert_count')
         delete_count = counts.get('raw_delete_count')
         result = []
@@ -894,8 +979,9 @@ class DiffSizeColumn(Column):
     def augment_queryset(self, state, queryset):
         """Add additional queries to the queryset.
 
-        This will prefetch the diffsets and filediffs needed to perform the
-        line calculations.
+        This will annotate each review request with the ID of its latest
+        diffset. The file line counts for those diffsets are then fetched
+        for the whole page at once in :py:meth:`collect_objects`.
 
         Args:
             state (djblets.datagrid.grids.StatefulColumn):
@@ -908,7 +994,59 @@ class DiffSizeColumn(Column):
             django.db.models.query.QuerySet:
             The resulting queryset.
         """
-        # TODO: Update this to fetch only the specific fields when we move
-        #       to a newer version of Django.
-        return queryset.prefetch_related('diffset_history__diffsets',
-                                         'diffset_history__diffsets__files')
+        return queryset.extra(select={
+            'latest_diffset_id': """
+                SELECT %(diffset_table)s.id
+                  FROM %(diffset_table)s
+                  WHERE %(diffset_table)s.%(history_column)s =
+                        %(review_request_table)s.%(diffset_history_column)s
+                  ORDER BY %(diffset_table)s.revision DESC
+                  LIMIT 1
+            """ % {
+                'diffset_history_column':
+                    ReviewRequest._meta.get_field('diffset_history').column,
+                'diffset_table': DiffSet._meta.db_table,
+                'history_column': DiffSet._meta.get_field('history').column,
+                'review_request_table': ReviewRequest._meta.db_table,
+            }
+        })
+
+    def collect_objects(self, state, object_list):
+        """Load the line counts for all diffsets shown on the page.
+
+        This fetches the files for the latest diffset of every review request
+        in the page in a single query, and computes the total line counts
+        for each diffset.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+            object_list (list of reviewboard.reviews.models.ReviewRequest):
+                The review requests being rendered on the datagrid.
+        """
+        diffset_ids = set(
+            review_request.latest_diffset_id
+            for review_request in object_list
+            if (review_request.repository_id is not None and
+                getattr(review_request, 'latest_diffset_id', None)))
+
+        if not diffset_ids:
+            return
+
+        line_counts = state.diffset_line_counts
+
+        filediffs = (
+            FileDiff.objects
+            .filter(diffset__in=diffset_ids)
+            .defer('diff64', 'parent_diff64')
+        )
+
+        for filediff in filediffs:
+            counts = line_counts.setdefault(filediff.diffset_id, {})
+
+            for key, value in six.iteritems(filediff.get_line_counts()):
+                if counts.get(key) is None:
+                    counts[key] = value
+                elif value is not None:
+                    counts[key] += value
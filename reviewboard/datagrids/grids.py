@@ -4,12 +4,14 @@ import pytz
 
 from django.contrib.auth.models import User
 from django.http import Http404
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 from djblets.datagrid.grids import (
     Column,
     DateTimeColumn,
     DataGrid as DjbletsDataGrid,
     AlphanumericDataGrid as DjbletsAlphanumericDataGrid)
+from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.templatetags.djblets_utils import ageid
 
 from reviewboard.accounts.models import (LocalSiteProfile, Profile,
@@ -36,7 +38,11 @@ from reviewboard.datagrids.columns import (BugsColumn,
                                            SummaryColumn,
                                            ToMeColumn,
                                            UsernameColumn)
+from reviewboard.datagrids.paginators import (KeysetPaginator,
+                                              UnsupportedOrderingError)
 from reviewboard.datagrids.sidebar import Sidebar, DataGridSidebarMixin
+from reviewboard.datagrids.sidebar_cache import (get_dashboard_sidebar_counts,
+                                                 get_dashboard_sidebar_groups)
 from reviewboard.datagrids.builtin_items import (IncomingSection,
                                                  OutgoingSection,
                                                  UserGroupsItem,
@@ -103,7 +109,47 @@ class DataGridJSMixin(object):
     extra_js_model_data = None
 
 
-class DataGrid(DataGridJSMixin, DjbletsDataGrid):
+class KeysetPaginationMixin(object):
+    """Mixin for datagrids that can use keyset pagination.
+
+    When the ``datagrid_keyset_pagination`` site configuration setting is
+    enabled, the datagrid will be paginated using
+    :py:class:`~reviewboard.datagrids.paginators.KeysetPaginator`, which
+    seeks to the next or previous page using the sort key of the rows shown
+    instead of an ``OFFSET``. This keeps deep pages as fast as the first page.
+
+    If the datagrid is sorted in a way that can't be used for keyset
+    pagination (such as a column on a related model), standard pagination
+    will be used instead.
+    """
+
+    #: Whether this datagrid supports keyset pagination.
+    allow_keyset_pagination = True
+
+    def build_paginator(self, queryset):
+        """Build the paginator for the datagrid.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset to paginate.
+
+        Returns:
+            object:
+            The paginator for the datagrid.
+        """
+        if self.allow_keyset_pagination:
+            siteconfig = SiteConfiguration.objects.get_current()
+
+            if siteconfig.get('datagrid_keyset_pagination'):
+                try:
+                    return KeysetPaginator(queryset, self.paginate_by)
+                except UnsupportedOrderingError:
+                    pass
+
+        return super(KeysetPaginationMixin, self).build_paginator(queryset)
+
+
+class DataGrid(DataGridJSMixin, KeysetPaginationMixin, DjbletsDataGrid):
     """Base class for a datagrid in Review Board.
 
     This contains additional information on JavaScript views/models
@@ -111,7 +157,8 @@ class DataGrid(DataGridJSMixin, DjbletsDataGrid):
     """
 
 
-class AlphanumericDataGrid(DataGridJSMixin, DjbletsAlphanumericDataGrid):
+class AlphanumericDataGrid(DataGridJSMixin, KeysetPaginationMixin,
+                           DjbletsAlphanumericDataGrid):
     """Base class for an alphanumeric datagrid in Review Board.
 
     This contains additional information on JavaScript views/models
@@ -318,11 +365,44 @@ class DashboardDataGrid(DataGridSidebarMixin, ReviewRequestDataGrid):
         self.local_site = local_site
         self.user = self.request.user
         self.profile = Profile.objects.get_or_create(user=self.user)[0]
-        self.site_profile = LocalSiteProfile.objects.get_or_create(
+
+    @cached_property
+    def site_profile(self):
+        """The user's profile for the Local Site being viewed.
+
+        This is loaded on first access.
+        """
+        return LocalSiteProfile.objects.get_or_create(
             user=self.user,
-            local_site=local_site,
+            local_site=self.local_site,
             profile=self.profile)[0]
 
+    @cached_property
+    def sidebar_groups(self):
+        """The groups shown in the sidebar.
+
+        This is a 2-tuple of the list of IDs of groups the user is a member
+        of, and the list of IDs of other groups the user has starred.
+        """
+        return get_dashboard_sidebar_groups(self.user, self.profile,
+                                            self.local_site)
+
+    @cached_property
+    def sidebar_counts(self):
+        """The counts shown in the sidebar.
+
+        See :py:func:`~reviewboard.datagrids.sidebar_cache.
+        get_dashboard_sidebar_counts` for the contents.
+        """
+        group_ids, starred_group_ids = self.sidebar_groups
+
+        return get_dashboard_sidebar_counts(
+            self.user,
+            self.profile,
+            self.local_site,
+            group_ids + starred_group_ids,
+            get_site_profile=lambda: self.site_profile)
+
     def load_extra_state(self, profile):
         """Load extra state for the datagrid."""
         group_name = self.request.GET.get('group', '')
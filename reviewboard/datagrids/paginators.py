@@ -0,0 +1,473 @@
+"""Paginators used by the Review Board datagrids."""
+
+from __future__ import division, unicode_literals
+
+import base64
+import hashlib
+import json
+import logging
+import math
+
+from django.core.paginator import InvalidPage, Page, PageNotAnInteger
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
+from django.utils import six
+from djblets.util.serializers import DjbletsJSONEncoder
+
+try:
+    # Django >= 1.8
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    # Django < 1.8
+    from django.db.models.sql.datastructures import EmptyResultSet
+
+from reviewboard.admin.cache_stats import cache_memoize
+
+
+class UnsupportedOrderingError(ValueError):
+    """The queryset's ordering can't be used for keyset pagination.
+
+    Keyset pagination requires that every field the queryset is ordered by is
+    a non-null field on the model itself. Orderings on related fields,
+    nullable fields, or extra/annotated values aren't supported.
+    """
+
+
+class KeysetPage(Page):
+    """A page of results fetched by a :py:class:`KeysetPaginator`.
+
+    The next and previous page "numbers" returned by this page are page
+    tokens that contain both the page number and a cursor pointing to the
+    first or last row of this page. These can be passed back in as the
+    ``?page=`` argument of the datagrid, so the existing paginator templates
+    link to cursor-based pages without modification.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next=False,
+                 has_previous=False, first_key=None, last_key=None):
+        """Initialize the page.
+
+        Args:
+            object_list (django.db.models.query.QuerySet):
+                The objects shown on the page.
+
+            number (int):
+                The displayed number of the page.
+
+            paginator (KeysetPaginator):
+                The paginator that built this page.
+
+            has_next (bool, optional):
+                Whether there are objects after this page.
+
+            has_previous (bool, optional):
+                Whether there are objects before this page.
+
+            first_key (tuple, optional):
+                The sort key values of the first object on the page.
+
+            last_key (tuple, optional):
+                The sort key values of the last object on the page.
+        """
+        super(KeysetPage, self).__init__(object_list, number, paginator)
+
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.first_key = first_key
+        self.last_key = last_key
+
+    def has_next(self):
+        """Return whether there is a page after this one."""
+        return self._has_next
+
+    def has_previous(self):
+        """Return whether there is a page before this one."""
+        return self._has_previous
+
+    def has_other_pages(self):
+        """Return whether there are pages other than this one."""
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        """Return the page token for the next page.
+
+        Returns:
+            unicode:
+            A page token containing the next page number and a cursor
+            following the last object on this page.
+        """
+        return self.paginator.make_page_token(self.number + 1, 'a',
+                                              self.last_key)
+
+    def previous_page_number(self):
+        """Return the page token for the previous page.
+
+        Returns:
+            unicode:
+            A page token containing the previous page number and a cursor
+            preceding the first object on this page.
+        """
+        if self.number <= 2:
+            return 1
+
+        return self.paginator.make_page_token(self.number - 1, 'b',
+                                              self.first_key)
+
+
+class KeysetPaginator(object):
+    """A paginator that seeks to pages using the sort key of the rows.
+
+    Standard pagination uses ``OFFSET`` to reach a page, which requires the
+    database to scan and discard every row before the page. This paginator
+    instead filters on the sort key (the ordered fields plus the primary key)
+    of the last row seen, so following the next or previous links costs the
+    same on any page.
+
+    Jumping directly to a numbered page (without a cursor) still falls back to
+    an offset query.
+
+    The total count is only used for display, and is cached for
+    :py:attr:`count_cache_period` seconds, so it may be approximate.
+    """
+
+    #: The number of seconds to cache the total count of results.
+    count_cache_period = 5 * 60
+
+    def __init__(self, queryset, per_page, count_cache_period=None):
+        """Initialize the paginator.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The ordered queryset to paginate.
+
+            per_page (int):
+                The number of objects to show on each page.
+
+            count_cache_period (int, optional):
+                The number of seconds to cache the total count of results.
+
+        Raises:
+            UnsupportedOrderingError:
+                The ordering of the queryset can't be used for keyset
+                pagination.
+        """
+        self.per_page = per_page
+        self.key_fields = self.get_key_fields(queryset)
+        self._count = None
+
+        # The database must order the results by the full sort key, including
+        # the primary key, or rows with equal sort values could be skipped or
+        # repeated between pages.
+        self.queryset = queryset.order_by(*[
+            '%s%s' % (descending and '-' or '', field_name)
+            for field_name, field, descending in self.key_fields
+        ])
+
+        if count_cache_period is not None:
+            self.count_cache_period = count_cache_period
+
+    @classmethod
+    def get_key_fields(cls, queryset):
+        """Return the fields making up the sort key for a queryset.
+
+        The primary key is always added as the final field, in order to
+        ensure the sort key is unique.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The ordered queryset.
+
+        Returns:
+            list of tuple:
+            A list of ``(field_name, field, descending)`` tuples.
+
+        Raises:
+            UnsupportedOrderingError:
+                The ordering of the queryset can't be used for keyset
+                pagination.
+        """
+        opts = queryset.model._meta
+        ordering = (queryset.query.order_by or
+                    (queryset.query.default_ordering and opts.ordering) or
+                    [])
+        key_fields = []
+
+        for order_field in ordering:
+            if not isinstance(order_field, six.string_types):
+                raise UnsupportedOrderingError(
+                    'Ordering by %r is not supported' % (order_field,))
+
+            descending = order_field.startswith('-')
+            field_name = order_field.lstrip('-')
+
+            if field_name == 'pk':
+                field_name = opts.pk.name
+
+            if (field_name == '?' or
+                '__' in field_name or
+                '.' in field_name):
+                raise UnsupportedOrderingError(
+                    'Ordering by "%s" is not supported' % order_field)
+
+            try:
+                field = opts.get_field(field_name)
+            except FieldDoesNotExist:
+                raise UnsupportedOrderingError(
+                    'Ordering by "%s" is not supported' % order_field)
+
+            if field.null:
+                raise UnsupportedOrderingError(
+                    'Ordering by nullable field "%s" is not supported'
+                    % order_field)
+
+            key_fields.append((field.name, field, descending))
+
+            if field.primary_key:
+                break
+        else:
+            if key_fields:
+                descending = key_fields[-1][2]
+            else:
+                descending = False
+
+            key_fields.append((opts.pk.name, opts.pk, descending))
+
+        return key_fields
+
+    @property
+    def count(self):
+        """The total number of objects, across all pages.
+
+        This is cached, and may be slightly out of date.
+        """
+        if self._count is None:
+            try:
+                sql = six.text_type(self.queryset.query)
+            except EmptyResultSet:
+                self._count = 0
+            else:
+                # The count is wrapped in a list, since cache_memoize
+                # requires a value with a length.
+                self._count = cache_memoize(
+                    'datagrid-count-%s'
+                    % hashlib.sha1(sql.encode('utf-8')).hexdigest(),
+                    lambda: [self.queryset.count()],
+                    expiration=self.count_cache_period)[0]
+
+        return self._count
+
+    @property
+    def num_pages(self):
+        """The total number of pages."""
+        return max(1, int(math.ceil(self.count / self.per_page)))
+
+    @property
+    def page_range(self):
+        """A 1-based range of the page numbers."""
+        return range(1, self.num_pages + 1)
+
+    def validate_number(self, number):
+        """Validate a page number.
+
+        Args:
+            number (int or unicode):
+                The page number.
+
+        Returns:
+            int:
+            The page number.
+
+        Raises:
+            django.core.paginator.PageNotAnInteger:
+                The page number was not an integer.
+
+            django.core.paginator.InvalidPage:
+                The page number was less than 1.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+
+        if number < 1:
+            raise InvalidPage('That page number is less than 1')
+
+        return number
+
+    def page(self, number):
+        """Return a page of results.
+
+        Args:
+            number (int or unicode):
+                The page number, or a page token returned by
+                :py:meth:`KeysetPage.next_page_number` or
+                :py:meth:`KeysetPage.previous_page_number`.
+
+        Returns:
+            KeysetPage:
+            The page of results.
+
+        Raises:
+            django.core.paginator.InvalidPage:
+                The page number or token was invalid.
+        """
+        direction = None
+        key = None
+
+        if isinstance(number, six.string_types) and '.' in number:
+            number, direction, key = self.parse_page_token(number)
+
+        number = self.validate_number(number)
+        field_names = [field_name for field_name, field, desc
+                       in self.key_fields]
+        queryset = self.queryset
+
+        if direction == 'a':
+            queryset = queryset.filter(self._build_seek_q(key, False))
+        elif direction == 'b':
+            queryset = queryset.filter(self._build_seek_q(key, True))
+            queryset = queryset.reverse()
+
+        if direction is None:
+            offset = (number - 1) * self.per_page
+        else:
+            offset = 0
+
+        keys = list(queryset.values_list(*field_names)
+                    [offset:offset + self.per_page + 1])
+        has_more = len(keys) > self.per_page
+        keys = keys[:self.per_page]
+
+        if direction == 'b':
+            keys.reverse()
+            has_next = True
+            has_previous = has_more
+        elif direction == 'a':
+            has_next = has_more
+            has_previous = True
+        else:
+            if not keys and number > 1:
+                raise InvalidPage('That page contains no results')
+
+            has_next = has_more
+            has_previous = number > 1
+
+        if keys:
+            first_key = tuple(keys[0])
+            last_key = tuple(keys[-1])
+        else:
+            first_key = None
+            last_key = None
+
+        return KeysetPage(
+            self.queryset.filter(pk__in=[row[-1] for row in keys]),
+            number,
+            self,
+            has_next=has_next,
+            has_previous=has_previous,
+            first_key=first_key,
+            last_key=last_key)
+
+    def make_page_token(self, number, direction, key):
+        """Return a page token for seeking to a page.
+
+        Args:
+            number (int):
+                The displayed page number.
+
+            direction (unicode):
+                ``a`` to seek to rows after the key, or ``b`` to seek to rows
+                before the key.
+
+            key (tuple):
+                The sort key values to seek from.
+
+        Returns:
+            unicode:
+            The page token.
+        """
+        data = json.dumps(
+            [
+                field.get_prep_value(value)
+                for (field_name, field, desc), value in zip(self.key_fields,
+                                                            key)
+            ],
+            cls=DjbletsJSONEncoder)
+        cursor = base64.urlsafe_b64encode(data.encode('utf-8'))
+
+        return '%d.%s.%s' % (number, direction,
+                             cursor.decode('utf-8').rstrip('='))
+
+    def parse_page_token(self, token):
+        """Parse a page token.
+
+        Args:
+            token (unicode):
+                The page token returned by :py:meth:`make_page_token`.
+
+        Returns:
+            tuple:
+            A 3-tuple of the page number, direction, and sort key.
+
+        Raises:
+            django.core.paginator.InvalidPage:
+                The page token was invalid.
+        """
+        try:
+            number, direction, cursor = token.split('.', 2)
+            cursor = cursor.encode('utf-8')
+            cursor += b'=' * (-len(cursor) % 4)
+            values = json.loads(
+                base64.urlsafe_b64decode(cursor).decode('utf-8'))
+
+            if (direction not in ('a', 'b') or
+                not isinstance(values, list) or
+                len(values) != len(self.key_fields)):
+                raise ValueError('Invalid page token')
+
+            key = tuple(
+                field.to_python(value)
+                for (field_name, field, desc), value in zip(self.key_fields,
+                                                            values)
+            )
+        except Exception as e:
+            logging.debug('Invalid datagrid page token "%s": %s', token, e)
+            raise InvalidPage('Invalid page token')
+
+        return number, direction, key
+
+    def _build_seek_q(self, key, before):
+        """Return a Q object matching rows after or before a sort key.
+
+        Args:
+            key (tuple):
+                The sort key values to seek from.
+
+            before (bool):
+                Whether to match rows before the key, rather than after.
+
+        Returns:
+            django.db.models.Q:
+            The resulting query.
+        """
+        q = None
+        equal_q = None
+
+        for (field_name, field, descending), value in zip(self.key_fields,
+                                                          key):
+            if descending != before:
+                lookup = 'lt'
+            else:
+                lookup = 'gt'
+
+            seek_q = Q(**{'%s__%s' % (field_name, lookup): value})
+            field_equal_q = Q(**{field_name: value})
+
+            if equal_q is None:
+                q = seek_q
+                equal_q = field_equal_q
+            else:
+                q |= equal_q & seek_q
+                equal_q &= field_equal_q
+
+        return q
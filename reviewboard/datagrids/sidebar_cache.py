@@ -0,0 +1,417 @@
+"""Caching for the counts and groups shown in datagrid sidebars.
+
+The Dashboard sidebar shows counters from the user's
+:py:class:`~reviewboard.accounts.models.LocalSiteProfile` and the incoming
+review request counts for each group the user is a member of or has starred.
+The user page sidebar shows the groups the user belongs to.
+
+This data is cached under versioned keys. Each user and each group has a
+version stored in the cache, along with a global version. The cache keys for
+a user's sidebar data contain the versions of the user, the global version,
+and the versions of every group shown in the sidebar. Whenever something that
+affects those counts changes, the relevant versions are replaced, and any
+cached data using the old versions will no longer be looked up.
+
+Versions are random values, rather than incrementing numbers, so that a
+version evicted from the cache will never match a stale cache entry.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+
+
+#: The names of the LocalSiteProfile counters cached for the sidebar.
+SITE_PROFILE_COUNTERS = (
+    'direct_incoming_request_count',
+    'total_incoming_request_count',
+    'pending_outgoing_request_count',
+    'total_outgoing_request_count',
+    'starred_public_request_count',
+)
+
+
+_GLOBAL_VERSION_KEY = 'sidebar-version'
+_USER_VERSION_KEY = 'sidebar-version-user:%s'
+_GROUP_VERSION_KEY = 'sidebar-version-group:%s'
+
+
+def _new_version():
+    """Return a new unique version value.
+
+    Returns:
+        unicode:
+        The new version.
+    """
+    return uuid.uuid4().hex
+
+
+def _get_versions(keys):
+    """Return the current versions for a list of version keys.
+
+    Any versions not in the cache will be created.
+
+    Args:
+        keys (list of unicode):
+            The version keys, without the site prefix.
+
+    Returns:
+        list of unicode:
+        The versions, in the same order as ``keys``.
+    """
+    full_keys = [make_cache_key(key) for key in keys]
+    versions = cache.get_many(full_keys)
+    missing = dict(
+        (full_key, _new_version())
+        for full_key in full_keys
+        if full_key not in versions
+    )
+
+    if missing:
+        for full_key, version in missing.items():
+            # Another process may have just created this version, in which
+            # case we want to use that one.
+            if not cache.add(full_key, version):
+                version = cache.get(full_key) or version
+
+            versions[full_key] = version
+
+    return [versions[full_key] for full_key in full_keys]
+
+
+def _set_new_versions(keys):
+    """Replace the versions for a list of version keys.
+
+    Args:
+        keys (list of unicode):
+            The version keys, without the site prefix.
+    """
+    if keys:
+        cache.set_many(dict(
+            (make_cache_key(key), _new_version())
+            for key in keys
+        ))
+
+
+def _make_versioned_key(prefix, version_keys):
+    """Return a cache key built from the current versions of other keys.
+
+    Args:
+        prefix (unicode):
+            The prefix for the cache key.
+
+        version_keys (list of unicode):
+            The version keys the cached data depends on.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    versions = _get_versions(version_keys)
+
+    return '%s:%s' % (
+        prefix,
+        hashlib.sha1(':'.join(versions).encode('utf-8')).hexdigest())
+
+
+def _get_local_site_id(local_site):
+    """Return the ID used for a Local Site in cache keys.
+
+    Args:
+        local_site (reviewboard.site.models.LocalSite):
+            The Local Site, or ``None``.
+
+    Returns:
+        unicode:
+        The ID to use in the cache key.
+    """
+    if local_site is None:
+        return 'global'
+
+    return '%s' % local_site.pk
+
+
+def invalidate_user_sidebar_counts(user_ids):
+    """Invalidate the cached sidebar data for users.
+
+    This must be called whenever the users' Local Site profile counters,
+    group memberships, starred groups, or permissions change.
+
+    Args:
+        user_ids (list of int):
+            The IDs of the users.
+    """
+    _set_new_versions([
+        _USER_VERSION_KEY % user_id
+        for user_id in set(user_ids)
+    ])
+
+
+def invalidate_group_sidebar_counts(group_ids):
+    """Invalidate the cached sidebar data involving groups.
+
+    This must be called whenever the incoming review request counts for the
+    groups change. This will also invalidate the Local Site profile counters
+    cached for members of those groups.
+
+    Args:
+        group_ids (list of int):
+            The IDs of the groups.
+    """
+    _set_new_versions([
+        _GROUP_VERSION_KEY % group_id
+        for group_id in set(group_ids)
+    ])
+
+
+def invalidate_all_sidebar_counts():
+    """Invalidate all cached sidebar data."""
+    _set_new_versions([_GLOBAL_VERSION_KEY])
+
+
+def get_dashboard_sidebar_groups(user, profile, local_site):
+    """Return the groups shown in a user's Dashboard sidebar.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user viewing the Dashboard.
+
+        profile (reviewboard.accounts.models.Profile):
+            The user's profile.
+
+        local_site (reviewboard.site.models.LocalSite):
+            The Local Site being viewed, if any.
+
+    Returns:
+        tuple:
+        A 2-tuple containing the list of IDs of groups the user is a member
+        of, and the list of IDs of groups the user has starred but is not a
+        member of. Both are sorted by group name.
+    """
+    cache_key = make_cache_key(_make_versioned_key(
+        'dashboard-sidebar-groups:%s:%s' % (user.pk,
+                                            _get_local_site_id(local_site)),
+        [_GLOBAL_VERSION_KEY, _USER_VERSION_KEY % user.pk]))
+    result = cache.get(cache_key)
+
+    if result is None:
+        group_ids = list(
+            user.review_groups
+            .filter(local_site=local_site)
+            .order_by('name')
+            .values_list('pk', flat=True))
+        starred_group_ids = list(
+            profile.starred_groups
+            .filter(local_site=local_site)
+            .exclude(pk__in=group_ids)
+            .order_by('name')
+            .values_list('pk', flat=True))
+
+        result = (group_ids, starred_group_ids)
+        cache.set(cache_key, result)
+
+    return result
+
+
+def get_dashboard_sidebar_counts(user, profile, local_site, group_ids,
+                                 get_site_profile):
+    """Return the counts shown in a user's Dashboard sidebar.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user viewing the Dashboard.
+
+        profile (reviewboard.accounts.models.Profile):
+            The user's profile.
+
+        local_site (reviewboard.site.models.LocalSite):
+            The Local Site being viewed, if any.
+
+        group_ids (list of int):
+            The IDs of all groups shown in the sidebar.
+
+        get_site_profile (callable):
+            A function returning the user's
+            :py:class:`~reviewboard.accounts.models.LocalSiteProfile`. This
+            is only called if the counts aren't cached.
+
+    Returns:
+        dict:
+        A dictionary containing the values for each counter in
+        :py:data:`SITE_PROFILE_COUNTERS`, and a ``groups`` key mapping
+        group IDs to a ``(name, incoming_request_count)`` tuple.
+    """
+    from reviewboard.reviews.models import Group
+
+    cache_key = make_cache_key(_make_versioned_key(
+        'dashboard-sidebar-counts:%s:%s' % (user.pk,
+                                            _get_local_site_id(local_site)),
+        [_GLOBAL_VERSION_KEY, _USER_VERSION_KEY % user.pk] +
+        [_GROUP_VERSION_KEY % group_id for group_id in group_ids]))
+    counts = cache.get(cache_key)
+
+    if counts is None:
+        site_profile = get_site_profile()
+        counts = dict(
+            (counter_name, getattr(site_profile, counter_name))
+            for counter_name in SITE_PROFILE_COUNTERS
+        )
+
+        if group_ids:
+            counts['groups'] = dict(
+                (group.pk, (group.name, group.incoming_request_count))
+                for group in Group.objects.filter(pk__in=group_ids)
+            )
+        else:
+            counts['groups'] = {}
+
+        cache.set(cache_key, counts)
+
+    return counts
+
+
+def get_user_page_sidebar_groups(user, viewer, local_site):
+    """Return the groups shown on the sidebar of a user page.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user whose page is being viewed.
+
+        viewer (django.contrib.auth.models.User):
+            The user viewing the page.
+
+        local_site (reviewboard.site.models.LocalSite):
+            The Local Site being viewed, if any.
+
+    Returns:
+        list of tuple:
+        A list of ``(name, url)`` tuples for each group accessible by the
+        viewer, sorted by name.
+    """
+    version_keys = [_GLOBAL_VERSION_KEY, _USER_VERSION_KEY % user.pk]
+
+    if viewer.is_authenticated():
+        viewer_id = viewer.pk
+        version_keys.append(_USER_VERSION_KEY % viewer_id)
+    else:
+        viewer_id = 'anonymous'
+
+    cache_key = make_cache_key(_make_versioned_key(
+        'user-page-sidebar-groups:%s:%s:%s' % (
+            user.pk, viewer_id, _get_local_site_id(local_site)),
+        version_keys))
+    result = cache.get(cache_key)
+
+    if result is None:
+        result = [
+            (group.name, group.get_absolute_url())
+            for group in (user.review_groups.accessible(viewer)
+                          .filter(local_site=local_site)
+                          .order_by('name'))
+        ]
+        cache.set(cache_key, result)
+
+    return result
+
+
+def _on_user_groups_changed(instance, action, pk_set, reverse, model,
+                            **kwargs):
+    """Handle changes to group memberships or starred groups.
+
+    Args:
+        instance (django.db.models.Model):
+            The instance whose relation changed.
+
+        action (unicode):
+            The change action.
+
+        pk_set (set of int):
+            The primary keys of the objects added or removed.
+
+        reverse (bool):
+            Whether the reverse side of the relation changed.
+
+        model (type):
+            The model class of the objects in ``pk_set``.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    from django.contrib.auth.models import User
+
+    from reviewboard.accounts.models import Profile
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if action == 'pre_clear' and not isinstance(instance, (User, Profile)):
+        # All users in a group or starring a group are being removed.
+        # Fetching them all isn't worth it for such a rare operation.
+        invalidate_all_sidebar_counts()
+    elif isinstance(instance, User):
+        invalidate_user_sidebar_counts([instance.pk])
+    elif isinstance(instance, Profile):
+        invalidate_user_sidebar_counts([instance.user_id])
+    elif model is User:
+        invalidate_user_sidebar_counts(pk_set or [])
+    elif model is Profile:
+        invalidate_user_sidebar_counts(
+            Profile.objects.filter(pk__in=pk_set or [])
+            .values_list('user_id', flat=True))
+
+
+def _on_user_changed(instance, **kwargs):
+    """Handle a user or their profiles being saved.
+
+    Args:
+        instance (django.db.models.Model):
+            The user, profile or Local Site profile that was saved.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    from django.contrib.auth.models import User
+
+    if isinstance(instance, User):
+        invalidate_user_sidebar_counts([instance.pk])
+    else:
+        invalidate_user_sidebar_counts([instance.user_id])
+
+
+def _on_group_changed(**kwargs):
+    """Handle a group being saved or deleted.
+
+    Group names and access controls are shown or checked in every sidebar
+    showing that group, so this invalidates all cached sidebar data.
+
+    Args:
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    invalidate_all_sidebar_counts()
+
+
+def connect_signals():
+    """Connect the signal handlers that invalidate the sidebar caches."""
+    from django.contrib.auth.models import User
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    from reviewboard.accounts.models import LocalSiteProfile, Profile
+    from reviewboard.reviews.models import Group
+    from reviewboard.site.models import LocalSite
+
+    for sender in (Group.users.through,
+                   Profile.starred_groups.through,
+                   LocalSite.users.through):
+        m2m_changed.connect(_on_user_groups_changed, sender=sender)
+
+    for sender in (User, LocalSiteProfile):
+        post_save.connect(_on_user_changed, sender=sender)
+        post_delete.connect(_on_user_changed, sender=sender)
+
+    post_save.connect(_on_group_changed, sender=Group)
+    post_delete.connect(_on_group_changed, sender=Group)
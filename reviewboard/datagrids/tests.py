@@ -1,16 +1,27 @@
 from __future__ import print_function, unicode_literals
 
 from django.contrib.auth.models import User
+from django.core.paginator import InvalidPage
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import six
 from djblets.datagrid.grids import DataGrid
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.testing.decorators import add_fixtures
 
-from reviewboard.accounts.models import ReviewRequestVisit
+from reviewboard.accounts.models import LocalSiteProfile, ReviewRequestVisit
 from reviewboard.datagrids.builtin_items import UserGroupsItem, UserProfileItem
 from reviewboard.datagrids.columns import SummaryColumn
+from reviewboard.datagrids.grids import (GroupDataGrid,
+                                         ReviewRequestDataGrid,
+                                         UsersDataGrid)
+from reviewboard.datagrids.paginators import (KeysetPaginator,
+                                              UnsupportedOrderingError)
+from reviewboard.datagrids.sidebar_cache import (get_dashboard_sidebar_counts,
+                                                 get_dashboard_sidebar_groups,
+                                                 get_user_page_sidebar_groups)
 from reviewboard.reviews.models import (Group,
                                         ReviewRequest,
                                         ReviewRequestDraft,
@@ -60,6 +71,92 @@ class BaseColumnTestCase(TestCase):
         self.stateful_column = self.grid.get_stateful_column(self.column)
 
 
+class BaseQueryCountTestCase(TestCase):
+    """Base class for tests checking the number of queries a datagrid runs.
+
+    Columns are expected to fetch the data they need through
+    ``augment_queryset`` or ``collect_objects``, rather than running queries
+    for each row. These tests render a datagrid with different page sizes
+    and ensure the number of queries stays the same.
+    """
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(BaseQueryCountTestCase, self).setUp()
+
+        self.request_factory = RequestFactory()
+
+    def get_datagrid_query_count(self, datagrid_cls, columns, page_size,
+                                 **kwargs):
+        """Return the number of queries needed to compute a datagrid page.
+
+        Args:
+            datagrid_cls (type):
+                The datagrid class to render.
+
+            columns (list of unicode):
+                The IDs of the columns to show.
+
+            page_size (int):
+                The number of rows to show on the page.
+
+            **kwargs (dict):
+                Additional keyword arguments for the datagrid.
+
+        Returns:
+            int:
+            The number of queries run to compute the rows for the page.
+        """
+        request = self.request_factory.get('/', {
+            'columns': ','.join(columns),
+        })
+        request.user = User.objects.get(username='doc')
+
+        datagrid = datagrid_cls(request, **kwargs)
+        datagrid.paginate_by = page_size
+        datagrid.load_state()
+
+        with CaptureQueriesContext(connection) as ctx:
+            datagrid.precompute_objects()
+
+        self.assertEqual(len(datagrid.rows), page_size)
+
+        return len(ctx.captured_queries)
+
+    def assertConstantQueryCount(self, datagrid_cls, columns, page_sizes,
+                                 **kwargs):
+        """Assert that the number of queries doesn't depend on page size.
+
+        Args:
+            datagrid_cls (type):
+                The datagrid class to render.
+
+            columns (list of unicode):
+                The IDs of the columns to show.
+
+            page_sizes (list of int):
+                The page sizes to compare. There must be at least as many
+                objects in the datagrid as the largest page size.
+
+            **kwargs (dict):
+                Additional keyword arguments for the datagrid.
+
+        Raises:
+            AssertionError:
+                The number of queries differed between page sizes.
+        """
+        query_counts = [
+            self.get_datagrid_query_count(datagrid_cls, columns, page_size,
+                                          **kwargs)
+            for page_size in page_sizes
+        ]
+
+        self.assertEqual(len(set(query_counts)), 1,
+                         'Query counts differ between page sizes %r: %r'
+                         % (page_sizes, query_counts))
+
+
 class AllReviewRequestViewTests(BaseViewTestCase):
     """Unit tests for the all_review_requests view."""
 
@@ -545,6 +642,24 @@ class GroupListViewTests(BaseViewTestCase):
         response = self.client.get('/groups/')
         self.assertEqual(response.status_code, 302)
 
+    @add_fixtures(['test_users'])
+    def test_with_keyset_pagination(self):
+        """Testing group_list view with keyset pagination enabled"""
+        self.siteconfig.set('datagrid_keyset_pagination', True)
+        self.siteconfig.save()
+
+        self.create_review_group(name='devgroup')
+        self.create_review_group(name='emptygroup')
+
+        response = self.client.get('/groups/')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertIsInstance(datagrid.paginator, KeysetPaginator)
+        self.assertEqual(len(datagrid.rows), 2)
+        self.assertEqual(datagrid.rows[0]['object'].name, 'devgroup')
+        self.assertEqual(datagrid.rows[1]['object'].name, 'emptygroup')
+
 
 class SubmitterListViewTests(BaseViewTestCase):
     """Unit tests for the users_list view."""
@@ -869,3 +984,324 @@ class SummaryColumnTests(BaseColumnTestCase):
             self.column.render_data(self.stateful_column, review_request),
             '<label class="label-discarded">Discarded</label>'
             '<span>Summary 1</span>')
+
+
+class ColumnQueryCountTests(BaseQueryCountTestCase):
+    """Unit tests for the number of queries run by datagrid columns."""
+
+    def test_group_columns(self):
+        """Testing GroupDataGrid with pending_count and member_count columns
+        query count
+        """
+        users = list(User.objects.all())
+
+        for i in range(5):
+            group = self.create_review_group(name='group%s' % i)
+            group.users = users
+
+            review_request = self.create_review_request(publish=True)
+            review_request.target_groups.add(group)
+
+        self.assertConstantQueryCount(
+            GroupDataGrid,
+            ['name', 'pending_count', 'member_count'],
+            [1, 5])
+
+    def test_group_member_count_values(self):
+        """Testing GroupMemberCountColumn and PendingCountColumn values"""
+        group1 = self.create_review_group(name='group1')
+        group1.users.add(User.objects.get(username='doc'),
+                         User.objects.get(username='grumpy'))
+        group2 = self.create_review_group(name='group2')
+
+        review_request = self.create_review_request(publish=True)
+        review_request.target_groups.add(group1)
+
+        review_request = self.create_review_request(publish=True,
+                                                    status='S')
+        review_request.target_groups.add(group1)
+
+        request = RequestFactory().get('/', {
+            'columns': 'name,pending_count,member_count',
+        })
+        request.user = User.objects.get(username='doc')
+
+        datagrid = GroupDataGrid(request)
+        datagrid.load_state()
+        datagrid.precompute_objects()
+
+        self.assertEqual(len(datagrid.rows), 2)
+        self.assertEqual(datagrid.rows[0]['object'], group1)
+        self.assertEqual(datagrid.rows[0]['object'].member_count_annotated, 2)
+        self.assertEqual(datagrid.rows[0]['object'].pending_count_annotated, 1)
+        self.assertEqual(datagrid.rows[1]['object'], group2)
+        self.assertEqual(datagrid.rows[1]['object'].member_count_annotated, 0)
+        self.assertEqual(datagrid.rows[1]['object'].pending_count_annotated, 0)
+
+    def test_users_pending_count(self):
+        """Testing UsersDataGrid with pending_count column query count"""
+        for user in User.objects.all():
+            review_request = self.create_review_request(publish=True)
+            review_request.target_people.add(user)
+
+        self.assertConstantQueryCount(
+            UsersDataGrid,
+            ['username', 'pending_count'],
+            [1, User.objects.filter(is_active=True).count()])
+
+    @add_fixtures(['test_scmtools'])
+    def test_diff_size(self):
+        """Testing ReviewRequestDataGrid with diff_size column query count"""
+        repository = self.create_repository(tool_name='Test')
+
+        for i in range(5):
+            review_request = self.create_review_request(
+                repository=repository,
+                publish=True)
+
+            for revision in (1, 2):
+                diffset = self.create_diffset(review_request,
+                                              revision=revision)
+                self.create_filediff(diffset, source_file='/file1')
+                self.create_filediff(diffset, source_file='/file2')
+
+                # Make sure any line counts are computed and stored up-front,
+                # so that they don't affect the query counts below.
+                diffset.get_total_line_counts()
+
+        self.assertConstantQueryCount(
+            ReviewRequestDataGrid,
+            ['summary', 'diff_size'],
+            [1, 5],
+            queryset=ReviewRequest.objects.all())
+
+    @add_fixtures(['test_scmtools'])
+    def test_diff_size_render_data(self):
+        """Testing DiffSizeColumn.render_data uses the latest diffset"""
+        repository = self.create_repository(tool_name='Test')
+        review_request = self.create_review_request(repository=repository,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request, revision=1)
+        self.create_filediff(diffset)
+
+        diffset = self.create_diffset(review_request, revision=2)
+        self.create_filediff(diffset, source_file='/file1')
+        self.create_filediff(diffset, source_file='/file2')
+
+        request = RequestFactory().get('/', {
+            'columns': 'summary,diff_size',
+        })
+        request.user = User.objects.get(username='doc')
+
+        datagrid = ReviewRequestDataGrid(
+            request,
+            queryset=ReviewRequest.objects.all())
+        datagrid.load_state()
+        datagrid.precompute_objects()
+
+        self.assertEqual(len(datagrid.rows), 1)
+
+        counts = diffset.get_total_line_counts()
+        state = datagrid.get_stateful_column(datagrid.diff_size)
+
+        self.assertEqual(state.diffset_line_counts, {
+            diffset.pk: counts,
+        })
+
+
+class KeysetPaginatorTests(TestCase):
+    """Unit tests for reviewboard.datagrids.paginators.KeysetPaginator."""
+
+    def setUp(self):
+        super(KeysetPaginatorTests, self).setUp()
+
+        # Create groups sharing display names, so that the primary key is
+        # needed to break ties in the sort key.
+        self.groups = [
+            self.create_review_group(name='group%s' % i)
+            for i in range(7)
+        ]
+
+        for i, group in enumerate(self.groups):
+            group.display_name = 'Group %s' % (i // 2)
+            group.save()
+
+    def test_get_key_fields(self):
+        """Testing KeysetPaginator.get_key_fields appends the primary key"""
+        key_fields = KeysetPaginator.get_key_fields(
+            Group.objects.order_by('-display_name'))
+
+        self.assertEqual(
+            [(field_name, descending)
+             for field_name, field, descending in key_fields],
+            [('display_name', True), ('id', True)])
+
+    def test_get_key_fields_with_related_field(self):
+        """Testing KeysetPaginator.get_key_fields with ordering on a related
+        field
+        """
+        with self.assertRaises(UnsupportedOrderingError):
+            KeysetPaginator.get_key_fields(
+                Group.objects.order_by('local_site__name'))
+
+    def test_get_key_fields_with_nullable_field(self):
+        """Testing KeysetPaginator.get_key_fields with ordering on a nullable
+        field
+        """
+        with self.assertRaises(UnsupportedOrderingError):
+            KeysetPaginator.get_key_fields(
+                Group.objects.order_by('local_site'))
+
+    def test_page_seek_forward_and_back(self):
+        """Testing KeysetPaginator.page following next and previous tokens"""
+        paginator = KeysetPaginator(
+            Group.objects.order_by('-display_name'), 3)
+        expected = list(
+            Group.objects.order_by('-display_name', '-pk'))
+
+        page1 = paginator.page(1)
+        self.assertEqual(list(page1.object_list), expected[:3])
+        self.assertFalse(page1.has_previous())
+        self.assertTrue(page1.has_next())
+
+        page2 = paginator.page(page1.next_page_number())
+        self.assertEqual(page2.number, 2)
+        self.assertEqual(list(page2.object_list), expected[3:6])
+        self.assertTrue(page2.has_previous())
+        self.assertTrue(page2.has_next())
+
+        page3 = paginator.page(page2.next_page_number())
+        self.assertEqual(page3.number, 3)
+        self.assertEqual(list(page3.object_list), expected[6:])
+        self.assertTrue(page3.has_previous())
+        self.assertFalse(page3.has_next())
+
+        page2 = paginator.page(page3.previous_page_number())
+        self.assertEqual(page2.number, 2)
+        self.assertEqual(list(page2.object_list), expected[3:6])
+        self.assertEqual(page2.previous_page_number(), 1)
+
+    def test_page_with_number(self):
+        """Testing KeysetPaginator.page with a plain page number"""
+        paginator = KeysetPaginator(Group.objects.order_by('name'), 3)
+
+        self.assertEqual(paginator.count, 7)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertEqual(list(paginator.page(3).object_list),
+                         self.groups[6:])
+
+    def test_page_with_invalid_token(self):
+        """Testing KeysetPaginator.page with an invalid page token"""
+        paginator = KeysetPaginator(Group.objects.order_by('name'), 3)
+
+        with self.assertRaises(InvalidPage):
+            paginator.page('2.a.bad!')
+
+        with self.assertRaises(InvalidPage):
+            paginator.page('2.x.%s' % paginator.make_page_token(
+                2, 'a', ('group2', self.groups[2].pk)).split('.', 2)[2])
+
+
+class SidebarCacheTests(TestCase):
+    """Unit tests for reviewboard.datagrids.sidebar_cache."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(SidebarCacheTests, self).setUp()
+
+        self.user = User.objects.get(username='doc')
+        self.profile = self.user.get_profile()
+
+    def _get_counts(self, group_ids):
+        return get_dashboard_sidebar_counts(
+            self.user, self.profile, None, group_ids,
+            get_site_profile=lambda: LocalSiteProfile.objects.get_or_create(
+                user=self.user,
+                profile=self.profile,
+                local_site=None)[0])
+
+    def test_dashboard_sidebar_cached(self):
+        """Testing dashboard sidebar data is served from cache"""
+        group = self.create_review_group(name='devgroup')
+        group.users.add(self.user)
+
+        starred_group = self.create_review_group(name='starred')
+        self.profile.star_review_group(starred_group)
+
+        self.assertEqual(
+            get_dashboard_sidebar_groups(self.user, self.profile, None),
+            ([group.pk], [starred_group.pk]))
+        counts = self._get_counts([group.pk, starred_group.pk])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                get_dashboard_sidebar_groups(self.user, self.profile, None),
+                ([group.pk], [starred_group.pk]))
+            self.assertEqual(self._get_counts([group.pk, starred_group.pk]),
+                             counts)
+
+    def test_dashboard_sidebar_invalidated_on_publish(self):
+        """Testing dashboard sidebar counts are invalidated when publishing
+        a review request to a group
+        """
+        group = self.create_review_group(name='devgroup')
+        group.users.add(self.user)
+
+        counts = self._get_counts([group.pk])
+        self.assertEqual(counts['total_incoming_request_count'], 0)
+        self.assertEqual(counts['groups'], {
+            group.pk: ('devgroup', 0),
+        })
+
+        review_request = self.create_review_request(submitter='grumpy')
+        draft = ReviewRequestDraft.create(review_request)
+        draft.target_groups.add(group)
+        review_request.publish(review_request.submitter)
+
+        counts = self._get_counts([group.pk])
+        self.assertEqual(counts['total_incoming_request_count'], 1)
+        self.assertEqual(counts['groups'], {
+            group.pk: ('devgroup', 1),
+        })
+
+    def test_dashboard_sidebar_invalidated_on_membership(self):
+        """Testing dashboard sidebar groups are invalidated when group
+        membership changes
+        """
+        group = self.create_review_group(name='devgroup')
+
+        self.assertEqual(
+            get_dashboard_sidebar_groups(self.user, self.profile, None),
+            ([], []))
+
+        group.users.add(self.user)
+
+        self.assertEqual(
+            get_dashboard_sidebar_groups(self.user, self.profile, None),
+            ([group.pk], []))
+
+        self.user.review_groups.remove(group)
+
+        self.assertEqual(
+            get_dashboard_sidebar_groups(self.user, self.profile, None),
+            ([], []))
+
+    def test_user_page_sidebar_invalidated_on_group_change(self):
+        """Testing user page sidebar groups are invalidated when a group's
+        access controls change
+        """
+        viewer = User.objects.get(username='grumpy')
+        group = self.create_review_group(name='devgroup')
+        group.users.add(self.user)
+
+        self.assertEqual(
+            get_user_page_sidebar_groups(self.user, viewer, None),
+            [('devgroup', group.get_absolute_url())])
+
+        group.invite_only = True
+        group.save()
+
+        self.assertEqual(
+            get_user_page_sidebar_groups(self.user, viewer, None),
+            [])
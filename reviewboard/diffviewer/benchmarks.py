@@ -0,0 +1,726 @@
+"""Benchmarks for the diff parsing, diffing and rendering pipeline.
+
+Each benchmark times one stage of the diff viewer against generated file
+content. Content is generated from a fixed seed, so every run times the
+same inputs. Two shapes of content are used:
+
+``synthetic``
+    Lines of random words, with scattered single-line edits.
+
+``source``
+    Indented, Python-like source code with functions and classes, with
+    edits that replace, insert and delete blocks of lines and move whole
+    functions. This resembles the changes seen in real code reviews, and
+    exercises move detection and interesting line (header) scanning.
+
+Results are plain dictionaries that can be stored as JSON and compared
+against a stored baseline with :py:func:`compare_results`. These are run
+through the ``benchmark-diffviewer`` management command.
+"""
+
+from __future__ import division, unicode_literals
+
+import difflib
+import gc
+import json
+import platform
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from django.utils import six
+from django.utils.six.moves import range
+
+from reviewboard.diffviewer.chunk_generator import RawDiffChunkGenerator
+from reviewboard.diffviewer.differ import DiffCompatVersion, get_differ
+from reviewboard.diffviewer.opcode_generator import get_diff_opcode_generator
+from reviewboard.diffviewer.parser import DiffParser
+from reviewboard.diffviewer.renderers import DiffRenderer
+
+
+#: The version of the results format.
+RESULTS_FORMAT_VERSION = 1
+
+#: The sizes of files benchmarked, in lines.
+BENCHMARK_SIZES = OrderedDict([
+    ('small', 100),
+    ('medium', 5000),
+    ('large', 100000),
+])
+
+#: The shapes of content benchmarked.
+BENCHMARK_SHAPES = ('synthetic', 'source')
+
+#: The default allowed slowdown before a result counts as a regression.
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+_WORDS = (
+    'review', 'board', 'diff', 'chunk', 'file', 'commit', 'branch', 'value',
+    'result', 'request', 'repository', 'change', 'line', 'data', 'index',
+    'parser', 'render', 'cache', 'user', 'group', 'comment', 'count',
+)
+
+
+class BenchmarkInput(object):
+    """Generated content for a benchmark.
+
+    Attributes:
+        name (unicode):
+            The name of the input, in ``shape-size`` form.
+
+        filename (unicode):
+            The filename used for the content. This determines the lexer
+            used for syntax highlighting.
+
+        old_lines (list of unicode):
+            The lines of the original file.
+
+        new_lines (list of unicode):
+            The lines of the modified file.
+    """
+
+    def __init__(self, name, filename, old_lines, new_lines):
+        """Initialize the input.
+
+        Args:
+            name (unicode):
+                The name of the input.
+
+            filename (unicode):
+                The filename used for the content.
+
+            old_lines (list of unicode):
+                The lines of the original file.
+
+            new_lines (list of unicode):
+                The lines of the modified file.
+        """
+        self.name = name
+        self.filename = filename
+        self.old_lines = old_lines
+        self.new_lines = new_lines
+
+    @property
+    def old_content(self):
+        """The content of the original file."""
+        return '\n'.join(self.old_lines) + '\n'
+
+    @property
+    def new_content(self):
+        """The content of the modified file."""
+        return '\n'.join(self.new_lines) + '\n'
+
+    def make_diff(self, git=False):
+        """Return a diff of the content.
+
+        Args:
+            git (bool, optional):
+                Whether to return a Git-style diff. Otherwise, a plain
+                unified diff is returned, with timestamps in the file
+                headers, as expected by
+                :py:class:`~reviewboard.diffviewer.parser.DiffParser`.
+
+        Returns:
+            bytes:
+            The diff.
+        """
+        if git:
+            diff_lines = [
+                'diff --git a/%s b/%s' % (self.filename, self.filename),
+                'index 1234567..89abcde 100644',
+            ]
+            fromfiledate = ''
+            tofiledate = ''
+        else:
+            diff_lines = []
+            fromfiledate = '2016-01-01 00:00:00.000000000 +0000'
+            tofiledate = '2016-01-02 00:00:00.000000000 +0000'
+
+        diff_lines += [
+            line.rstrip('\n')
+            for line in difflib.unified_diff(self.old_lines,
+                                             self.new_lines,
+                                             'a/%s' % self.filename,
+                                             'b/%s' % self.filename,
+                                             fromfiledate,
+                                             tofiledate,
+                                             lineterm='')
+        ]
+
+        return ('\n'.join(diff_lines) + '\n').encode('utf-8')
+
+
+def _make_words(rand, count):
+    """Return a string of random words.
+
+    Args:
+        rand (random.Random):
+            The random number generator.
+
+        count (int):
+            The number of words.
+
+    Returns:
+        unicode:
+        The words, separated by spaces.
+    """
+    return ' '.join(rand.choice(_WORDS) for i in range(count))
+
+
+def _make_function(rand, name, indent):
+    """Return the lines of a generated function.
+
+    Args:
+        rand (random.Random):
+            The random number generator.
+
+        name (unicode):
+            The name of the function.
+
+        indent (unicode):
+            The indentation of the function definition.
+
+    Returns:
+        list of unicode:
+        The lines of the function.
+    """
+    body_indent = indent + '    '
+    lines = ['%sdef %s(self, %s):' % (indent, name, rand.choice(_WORDS)),
+             '%s"""%s."""' % (body_indent, _make_words(rand, 6).capitalize())]
+
+    for i in range(rand.randint(3, 12)):
+        if rand.random() < 0.2:
+            lines += [
+                '%sif %s_%d > %d:' % (body_indent, rand.choice(_WORDS), i,
+                                      rand.randint(0, 100)),
+                '%s    %s = %s(%d)' % (body_indent, rand.choice(_WORDS),
+                                       rand.choice(_WORDS), i),
+            ]
+        else:
+            lines.append('%s%s_%d = %s.%s(%r)'
+                         % (body_indent, rand.choice(_WORDS), i,
+                            rand.choice(_WORDS), rand.choice(_WORDS),
+                            _make_words(rand, 3)))
+
+    lines.append('')
+
+    return lines
+
+
+def _generate_source(rand, num_lines):
+    """Return generated, Python-like source code.
+
+    Args:
+        rand (random.Random):
+            The random number generator.
+
+        num_lines (int):
+            The minimum number of lines to generate.
+
+    Returns:
+        list of list of unicode:
+        The generated functions, as lists of lines. Class definitions are
+        included as part of the first function in each class.
+    """
+    functions = []
+    num_generated = 0
+
+    while num_generated < num_lines:
+        lines = ['', 'class %s%d(object):' % (rand.choice(_WORDS).title(),
+                                              len(functions))]
+
+        for i in range(rand.randint(2, 8)):
+            lines += _make_function(rand,
+                                    '%s_%d' % (rand.choice(_WORDS), i),
+                                    '    ')
+            functions.append(lines)
+            num_generated += len(lines)
+            lines = []
+
+    return functions
+
+
+def make_input(shape, num_lines, seed=0):
+    """Return generated content for a benchmark.
+
+    Args:
+        shape (unicode):
+            The shape of the content. This is one of
+            :py:data:`BENCHMARK_SHAPES`.
+
+        num_lines (int):
+            The approximate number of lines in the file.
+
+        seed (int, optional):
+            The seed for the random number generator.
+
+    Returns:
+        BenchmarkInput:
+        The generated content.
+
+    Raises:
+        ValueError:
+            The shape was invalid.
+    """
+    rand = random.Random('%s-%s-%s' % (shape, num_lines, seed))
+
+    if shape == 'synthetic':
+        old_lines = [_make_words(rand, rand.randint(1, 12))
+                     for i in range(num_lines)]
+        new_lines = [
+            _make_words(rand, 4) if rand.random() < 0.05 else line
+            for line in old_lines
+        ]
+        filename = 'benchmark.txt'
+    elif shape == 'source':
+        functions = _generate_source(rand, num_lines)
+        old_lines = [line for lines in functions for line in lines]
+        new_functions = []
+
+        for lines in functions:
+            r = rand.random()
+
+            if r < 0.05:
+                # Delete the function.
+                continue
+            elif r < 0.15:
+                # Edit a few lines of the function.
+                lines = [
+                    line + '  # %s' % rand.choice(_WORDS)
+                    if line and rand.random() < 0.3 else line
+                    for line in lines
+                ]
+            elif r < 0.2:
+                # Add a new function after this one.
+                new_functions.append(lines)
+                lines = _make_function(rand, 'new_%s' % rand.choice(_WORDS),
+                                       '    ')
+
+            new_functions.append(lines)
+
+        # Move some functions elsewhere in the file.
+        for i in range(max(1, len(new_functions) // 50)):
+            lines = new_functions.pop(rand.randrange(len(new_functions)))
+            new_functions.insert(rand.randrange(len(new_functions) + 1),
+                                 lines)
+
+        new_lines = [line for lines in new_functions for line in lines]
+        filename = 'benchmark.py'
+    else:
+        raise ValueError('Unknown benchmark shape "%s"' % shape)
+
+    return BenchmarkInput('%s-%s' % (shape, num_lines), filename,
+                          old_lines, new_lines)
+
+
+def bench_parse_diff(bench_input):
+    """Benchmark parsing a diff with DiffParser.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    data = bench_input.make_diff()
+
+    return lambda: DiffParser(data).parse()
+
+
+def bench_parse_git_diff(bench_input):
+    """Benchmark parsing a diff with GitDiffParser.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    from reviewboard.scmtools.git import GitDiffParser
+
+    data = bench_input.make_diff(git=True)
+
+    return lambda: GitDiffParser(data).parse()
+
+
+def bench_myers_opcodes(bench_input):
+    """Benchmark computing opcodes with MyersDiffer.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    def _run():
+        differ = get_differ(bench_input.old_lines, bench_input.new_lines,
+                            compat_version=DiffCompatVersion.DEFAULT)
+
+        return list(differ.get_opcodes())
+
+    return _run
+
+
+def bench_opcode_generator(bench_input):
+    """Benchmark generating opcodes with DiffOpcodeGenerator.
+
+    This includes move detection.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    def _run():
+        differ = get_differ(bench_input.old_lines, bench_input.new_lines,
+                            compat_version=DiffCompatVersion.DEFAULT)
+
+        return list(get_diff_opcode_generator(differ))
+
+    return _run
+
+
+def _make_chunk_generator(bench_input, enable_syntax_highlighting):
+    """Return a chunk generator for the content.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+        enable_syntax_highlighting (bool):
+            Whether to enable syntax highlighting.
+
+    Returns:
+        reviewboard.diffviewer.chunk_generator.RawDiffChunkGenerator:
+        The chunk generator.
+    """
+    return RawDiffChunkGenerator(
+        old=bench_input.old_content,
+        new=bench_input.new_content,
+        orig_filename=bench_input.filename,
+        modified_filename=bench_input.filename,
+        enable_syntax_highlighting=enable_syntax_highlighting)
+
+
+def bench_chunks(bench_input):
+    """Benchmark generating chunks without syntax highlighting.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    return lambda: list(
+        _make_chunk_generator(bench_input, False).get_chunks_uncached())
+
+
+def bench_chunks_highlighted(bench_input):
+    """Benchmark generating chunks with syntax highlighting.
+
+    Highlighting may still be turned off for the largest inputs, based on
+    the size limits in the chunk generator and the site configuration.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    return lambda: list(
+        _make_chunk_generator(bench_input, True).get_chunks_uncached())
+
+
+def bench_render(bench_input):
+    """Benchmark rendering a file's diff to HTML with DiffRenderer.
+
+    Chunks are generated before timing, so only rendering is timed.
+
+    Args:
+        bench_input (BenchmarkInput):
+            The content to benchmark.
+
+    Returns:
+        callable:
+        The function to time.
+    """
+    from django.test.client import RequestFactory
+
+    chunks = list(_make_chunk_generator(bench_input,
+                                        False).get_chunks_uncached())
+    changed_chunk_indexes = []
+    whitespace_only = len(chunks) > 0
+
+    for i, chunk in enumerate(chunks):
+        chunk['index'] = i
+
+        if chunk['change'] != 'equal':
+            changed_chunk_indexes.append(i)
+
+            if not chunk.get('meta', {}).get('whitespace_chunk', False):
+                whitespace_only = False
+
+    request = RequestFactory().get('/')
+
+    def _run():
+        diff_file = {
+            'depot_filename': bench_input.filename,
+            'dest_filename': bench_input.filename,
+            'revision': 'abc123',
+            'dest_revision': 'New Change',
+            'filediff': None,
+            'interfilediff': None,
+            'force_interdiff': False,
+            'binary': False,
+            'deleted': False,
+            'moved': False,
+            'copied': False,
+            'moved_or_copied': False,
+            'newfile': False,
+            'index': 0,
+            'is_new_file': False,
+            'chunks': chunks,
+            'num_chunks': len(chunks),
+            'changed_chunk_indexes': changed_chunk_indexes,
+            'num_changes': len(changed_chunk_indexes),
+            'whitespace_only': whitespace_only,
+            'chunks_loaded': True,
+        }
+
+        renderer = DiffRenderer(diff_file, allow_caching=False)
+
+        return renderer.render_to_string(request)
+
+    return _run
+
+
+#: The available benchmarks, by name.
+BENCHMARKS = OrderedDict([
+    ('parse_diff', bench_parse_diff),
+    ('parse_git_diff', bench_parse_git_diff),
+    ('myers_opcodes', bench_myers_opcodes),
+    ('opcode_generator', bench_opcode_generator),
+    ('chunks', bench_chunks),
+    ('chunks_highlighted', bench_chunks_highlighted),
+    ('render', bench_render),
+])
+
+
+def _time_func(func, repeat):
+    """Time a function.
+
+    Garbage collection is disabled while timing, to reduce noise.
+
+    Args:
+        func (callable):
+            The function to time.
+
+        repeat (int):
+            The number of times to call the function.
+
+    Returns:
+        list of float:
+        The number of seconds each call took.
+    """
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        for i in range(repeat):
+            start = time.time()
+            func()
+            timings.append(time.time() - start)
+            gc.collect()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return timings
+
+
+def run_benchmarks(names=None, sizes=None, shapes=None, repeat=3,
+                   on_result=None):
+    """Run benchmarks and return their results.
+
+    Args:
+        names (list of unicode, optional):
+            The names of the benchmarks to run. Defaults to all of
+            :py:data:`BENCHMARKS`.
+
+        sizes (list of unicode, optional):
+            The names of the sizes to run. Defaults to all of
+            :py:data:`BENCHMARK_SIZES`.
+
+        shapes (list of unicode, optional):
+            The shapes of content to run. Defaults to all of
+            :py:data:`BENCHMARK_SHAPES`.
+
+        repeat (int, optional):
+            The number of times to time each benchmark.
+
+        on_result (callable, optional):
+            A function called with the key and result of each benchmark as
+            it finishes.
+
+    Returns:
+        dict:
+        The results, suitable for storing as JSON.
+
+    Raises:
+        ValueError:
+            An unknown benchmark, size or shape was requested.
+    """
+    names = names or list(six.iterkeys(BENCHMARKS))
+    sizes = sizes or list(six.iterkeys(BENCHMARK_SIZES))
+    shapes = shapes or list(BENCHMARK_SHAPES)
+
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError('Unknown benchmark "%s"' % name)
+
+    for size in sizes:
+        if size not in BENCHMARK_SIZES:
+            raise ValueError('Unknown benchmark size "%s"' % size)
+
+    for shape in shapes:
+        if shape not in BENCHMARK_SHAPES:
+            raise ValueError('Unknown benchmark shape "%s"' % shape)
+
+    results = OrderedDict()
+
+    for size in sizes:
+        for shape in shapes:
+            bench_input = make_input(shape, BENCHMARK_SIZES[size])
+
+            for name in names:
+                func = BENCHMARKS[name](bench_input)
+                timings = _time_func(func, repeat)
+                key = '%s/%s/%s' % (name, shape, size)
+
+                result = {
+                    'min': min(timings),
+                    'mean': sum(timings) / len(timings),
+                    'max': max(timings),
+                    'runs': len(timings),
+                    'old_lines': len(bench_input.old_lines),
+                    'new_lines': len(bench_input.new_lines),
+                }
+                results[key] = result
+
+                if on_result:
+                    on_result(key, result)
+
+    return {
+        'version': RESULTS_FORMAT_VERSION,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv,
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, results,
+                    threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Compare benchmark results against a baseline.
+
+    Benchmarks are compared by their fastest run, which is the least
+    affected by other activity on the system.
+
+    Args:
+        baseline (dict):
+            The baseline results, as returned by :py:func:`run_benchmarks`.
+
+        results (dict):
+            The new results, as returned by :py:func:`run_benchmarks`.
+
+        threshold (float, optional):
+            The fraction a benchmark may slow down by before it counts as a
+            regression.
+
+    Returns:
+        list of dict:
+        The comparison for each benchmark present in both sets of results.
+        Each contains ``key``, ``baseline``, ``current`` and ``change``
+        (the fractional change in time), and ``regressed``.
+    """
+    baseline_results = baseline.get('results', {})
+    comparisons = []
+
+    for key, result in six.iteritems(results['results']):
+        if key not in baseline_results:
+            continue
+
+        old_time = baseline_results[key]['min']
+        new_time = result['min']
+
+        if old_time > 0:
+            change = (new_time - old_time) / old_time
+        else:
+            change = 0.0
+
+        comparisons.append({
+            'key': key,
+            'baseline': old_time,
+            'current': new_time,
+            'change': change,
+            'regressed': change > threshold,
+        })
+
+    return comparisons
+
+
+def load_results(filename):
+    """Load benchmark results from a file.
+
+    Args:
+        filename (unicode):
+            The file to load.
+
+    Returns:
+        dict:
+        The results.
+
+    Raises:
+        ValueError:
+            The file did not contain benchmark results.
+    """
+    with open(filename, 'r') as fp:
+        results = json.load(fp, object_pairs_hook=OrderedDict)
+
+    if (not isinstance(results, dict) or
+        results.get('version') != RESULTS_FORMAT_VERSION):
+        raise ValueError('%s does not contain benchmark results' % filename)
+
+    return results
+
+
+def save_results(filename, results):
+    """Save benchmark results to a file.
+
+    Args:
+        filename (unicode):
+            The file to save to.
+
+        results (dict):
+            The results, as returned by :py:func:`run_benchmarks`.
+    """
+    with open(filename, 'w') as fp:
+        json.dump(results, fp, indent=2)
+        fp.write('\n')
@@ -10,13 +10,13 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.six.moves import range
 from django.utils.translation import get_language
-from djblets.log import log_timed
-from djblets.cache.backend import cache_memoize
 from djblets.siteconfig.models import SiteConfiguration
 from pygments import highlight
 from pygments.lexers import guess_lexer_for_filename
 from pygments.formatters import HtmlFormatter
 
+from reviewboard.admin.cache_stats import cache_memoize
+from reviewboard.admin.profiling import log_timed
 from reviewboard.diffviewer.differ import DiffCompatVersion, get_differ
 from reviewboard.diffviewer.diffutils import (get_line_changed_regions,
                                               get_original_file,
@@ -8,13 +8,15 @@ import subprocess
 import tempfile
 from difflib import SequenceMatcher
 
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import six
 from django.utils.translation import ugettext as _
-from djblets.log import log_timed
+from djblets.cache.backend import make_cache_key
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.contextmanagers import controlled_subprocess
 
+from reviewboard.admin.profiling import log_timed
 from reviewboard.diffviewer.errors import PatchError
 from reviewboard.scmtools.core import PRE_CREATION, HEAD
 
@@ -254,6 +256,71 @@ def get_original_file(filediff, request, encoding_list):
     return data
 
 
+def prefetch_original_files(files, request):
+    """Fetch the original versions of files in a diff into the cache.
+
+    When the repository supports fetching files in batches, this fetches the
+    source files for all the given diff files at once, rather than having
+    :py:func:`get_original_file` fetch each one separately as it's rendered.
+
+    Files whose rendered chunks are already cached are skipped, since
+    rendering them won't need the original file. Files in repositories that
+    can't fetch files in batches are skipped without checking the cache.
+
+    Args:
+        files (list of dict):
+            The files to fetch, as returned by :py:func:`get_diff_files`.
+
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+    """
+    from reviewboard.diffviewer.chunk_generator import get_diff_chunk_generator
+
+    enable_highlighting = get_enable_highlighting(request.user)
+    supports_prefetch = {}
+    to_fetch = {}
+
+    for f in files:
+        # Checking the cache below costs a round trip per file, so skip
+        # repositories that won't prefetch anything first.
+        repository = f['filediff'].diffset.repository
+
+        if repository.pk not in supports_prefetch:
+            supports_prefetch[repository.pk] = \
+                repository.supports_batched_file_fetch
+
+        if not supports_prefetch[repository.pk]:
+            continue
+
+        generator = get_diff_chunk_generator(request,
+                                             f['filediff'],
+                                             f['interfilediff'],
+                                             f['force_interdiff'],
+                                             enable_highlighting)
+
+        if make_cache_key(generator.make_cache_key()) in cache:
+            continue
+
+        for filediff in (f['filediff'], f['interfilediff']):
+            if filediff is None or filediff.is_new or filediff.binary:
+                continue
+
+            diffset = filediff.diffset
+            key = (diffset.repository_id, diffset.base_commit_id)
+
+            if key not in to_fetch:
+                to_fetch[key] = (diffset.repository, diffset.base_commit_id,
+                                 [])
+
+            to_fetch[key][2].append((filediff.source_file,
+                                     filediff.source_revision))
+
+    for repository, base_commit_id, repo_files in six.itervalues(to_fetch):
+        repository.prefetch_files(repo_files,
+                                  base_commit_id=base_commit_id,
+                                  request=request)
+
+
 def get_patched_file(buffer, filediff, request):
     tool = filediff.diffset.repository.get_scmtool()
     diff = tool.normalize_patch(filediff.diff, filediff.source_file,
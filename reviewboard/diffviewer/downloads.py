@@ -0,0 +1,287 @@
+"""Responses for downloading diffs and files from diffs.
+
+Diffs are immutable once uploaded, and so are the original and patched
+versions of the files they modify. The functions here let views take
+advantage of that when sending them to clients:
+
+* Conditional GET requests (using ``If-None-Match`` or
+  ``If-Modified-Since``) are answered with :http:`304` before any diff or file
+  content is loaded.
+
+* Requests for a single byte range (using ``Range``, optionally with
+  ``If-Range``) are answered with :http:`206` and only that part of the
+  content, so that interrupted downloads can be resumed.
+
+* Content can be streamed a file at a time, instead of building the entire
+  response in memory.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from djblets.util.dates import http_date
+from djblets.util.http import (encode_etag, etag_if_none_match,
+                               get_modified_since, set_etag,
+                               set_last_modified)
+
+from reviewboard.admin.cache_stats import cache_memoize
+
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class HttpResponseRangeNotSatisfiable(HttpResponse):
+    """A response for a byte range outside of the content."""
+
+    status_code = 416
+
+
+def get_raw_diff_etag(diffset):
+    """Return the ETag for the raw diff of a diffset.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.DiffSet):
+            The diffset.
+
+    Returns:
+        unicode:
+        The ETag for the raw diff.
+    """
+    return encode_etag('raw-diff:%s:%s' % (diffset.pk, diffset.timestamp))
+
+
+def get_raw_diff_length(diffset, parser):
+    """Return the length of the raw diff of a diffset.
+
+    This is only needed for byte range requests. Computing it means
+    decompressing each file's diff, so the result is cached.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.DiffSet):
+            The diffset.
+
+        parser (reviewboard.diffviewer.parser.DiffParser):
+            The parser used to build the raw diff.
+
+    Returns:
+        int:
+        The length of the raw diff, in bytes.
+    """
+    return cache_memoize(
+        'raw-diff-length-%s' % diffset.pk,
+        lambda: sum(len(data) for data in parser.iter_raw_diff(diffset)))
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """Return a response if the client already has the content.
+
+    This should be called before loading any content, so that none is loaded
+    if the client's copy is up-to-date.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        etag (unicode):
+            The ETag for the content.
+
+        last_modified (datetime.datetime):
+            The time the content was created.
+
+    Returns:
+        django.http.HttpResponseNotModified:
+        The response to send if the client's copy is up-to-date, or ``None``
+        if the content must be sent.
+    """
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        not_modified = etag_if_none_match(request, etag)
+    else:
+        not_modified = get_modified_since(request, last_modified)
+
+    if not not_modified:
+        return None
+
+    response = HttpResponseNotModified()
+    set_etag(response, etag)
+    set_last_modified(response, last_modified)
+
+    return response
+
+
+def _get_requested_range(request, etag, last_modified, get_length):
+    """Return the byte range requested by the client.
+
+    Only a single range is supported. Requests for multiple ranges, or with
+    an ``If-Range`` header that doesn't match the content, are answered with
+    the full content.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        etag (unicode):
+            The ETag for the content.
+
+        last_modified (datetime.datetime):
+            The time the content was created.
+
+        get_length (callable):
+            A function returning the length of the content.
+
+    Returns:
+        tuple:
+        A 3-tuple of the first and last byte positions (inclusive) and the
+        length of the content. The positions are ``None`` if the range can't
+        be satisfied. ``None`` is returned instead if the full content should
+        be sent.
+    """
+    if request.method != 'GET' or get_length is None:
+        return None
+
+    m = _RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+
+    if if_range is not None and if_range not in (etag,
+                                                 http_date(last_modified)):
+        return None
+
+    length = get_length()
+
+    if m.group(1):
+        start = int(m.group(1))
+
+        if m.group(2):
+            end = min(int(m.group(2)), length - 1)
+        else:
+            end = length - 1
+
+        if start > end:
+            return None, None, length
+    else:
+        # This is a suffix range, covering the last N bytes.
+        suffix_length = int(m.group(2))
+
+        if suffix_length == 0 or length == 0:
+            return None, None, length
+
+        start = max(length - suffix_length, 0)
+        end = length - 1
+
+    return start, end, length
+
+
+def _iter_byte_range(chunks, start, end):
+    """Yield the part of the content within a byte range.
+
+    Args:
+        chunks (iterable):
+            The chunks of content.
+
+        start (int):
+            The position of the first byte to yield.
+
+        end (int):
+            The position of the last byte to yield.
+
+    Yields:
+        bytes:
+        The chunks of content within the range.
+    """
+    offset = 0
+
+    for chunk in chunks:
+        chunk_end = offset + len(chunk)
+
+        if chunk_end > start:
+            data = chunk[max(start - offset, 0):end + 1 - offset]
+
+            if data:
+                yield data
+
+        offset = chunk_end
+
+        if offset > end:
+            break
+
+
+def build_download_response(request, chunks, content_type, etag,
+                            last_modified, get_length=None, streaming=True):
+    """Return a response for downloading a diff or file.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        chunks (iterable):
+            The chunks of content to send. If ``streaming`` is set, these
+            won't be loaded until they're sent to the client.
+
+        content_type (unicode):
+            The content type for the response.
+
+        etag (unicode):
+            The ETag for the content.
+
+        last_modified (datetime.datetime):
+            The time the content was created.
+
+        get_length (callable, optional):
+            A function returning the length of the content. This is called
+            only for byte range requests, which aren't supported if this
+            isn't provided.
+
+        streaming (bool, optional):
+            Whether to stream the content to the client.
+
+    Returns:
+        django.http.HttpResponseBase:
+        The response to send to the client.
+    """
+    byte_range = _get_requested_range(request, etag, last_modified,
+                                      get_length)
+
+    if byte_range is None:
+        status = 200
+        content_range = None
+    else:
+        start, end, length = byte_range
+
+        if start is None:
+            response = HttpResponseRangeNotSatisfiable()
+            response['Content-Range'] = 'bytes */%d' % length
+
+            return response
+
+        status = 206
+        content_range = 'bytes %d-%d/%d' % (start, end, length)
+        chunks = _iter_byte_range(chunks, start, end)
+
+    if streaming:
+        response = StreamingHttpResponse(chunks, content_type=content_type,
+                                         status=status)
+    else:
+        response = HttpResponse(b''.join(chunks), content_type=content_type,
+                                status=status)
+
+    if content_range:
+        response['Content-Range'] = content_range
+        response['Content-Length'] = '%d' % (end - start + 1)
+
+        # The range refers to the uncompressed content, so GZipMiddleware
+        # must not compress the response.
+        response['Content-Encoding'] = 'identity'
+
+    if get_length is not None:
+        response['Accept-Ranges'] = 'bytes'
+
+    set_etag(response, etag)
+    set_last_modified(response, last_modified)
+
+    return response
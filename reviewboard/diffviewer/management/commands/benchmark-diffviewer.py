@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+
+import sys
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import CommandError, NoArgsCommand
+from django.utils import six
+
+from reviewboard.diffviewer.benchmarks import (BENCHMARKS,
+                                               BENCHMARK_SHAPES,
+                                               BENCHMARK_SIZES,
+                                               DEFAULT_REGRESSION_THRESHOLD,
+                                               compare_results,
+                                               load_results,
+                                               run_benchmarks,
+                                               save_results)
+
+
+def _split_option(value):
+    """Return the values in a comma-separated option.
+
+    Args:
+        value (unicode):
+            The value of the option.
+
+    Returns:
+        list of unicode:
+        The values, or ``None`` if the option wasn't provided.
+    """
+    if value:
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    return None
+
+
+class Command(NoArgsCommand):
+    """Management command to benchmark the diff viewer."""
+
+    help = ('Times parsing, diffing, chunk generation and rendering of '
+            'diffs, optionally comparing against a stored baseline')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--benchmarks',
+                    default=None,
+                    help='A comma-separated list of benchmarks to run (%s)'
+                         % ', '.join(six.iterkeys(BENCHMARKS))),
+        make_option('--sizes',
+                    default=None,
+                    help='A comma-separated list of file sizes to run (%s)'
+                         % ', '.join(six.iterkeys(BENCHMARK_SIZES))),
+        make_option('--shapes',
+                    default=None,
+                    help='A comma-separated list of content shapes to run '
+                         '(%s)' % ', '.join(BENCHMARK_SHAPES)),
+        make_option('--repeat',
+                    type='int',
+                    default=3,
+                    help='The number of times to time each benchmark'),
+        make_option('--output',
+                    default=None,
+                    help='A file to write the results to, as JSON. This can '
+                         'be used as a baseline for later runs.'),
+        make_option('--baseline',
+                    default=None,
+                    help='A file containing baseline results to compare '
+                         'against'),
+        make_option('--threshold',
+                    type='float',
+                    default=DEFAULT_REGRESSION_THRESHOLD,
+                    help='The fraction a benchmark may slow down by before '
+                         'it is reported as a regression (default: %s)'
+                         % DEFAULT_REGRESSION_THRESHOLD),
+    )
+
+    def handle_noargs(self, **options):
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+
+        Raises:
+            django.core.management.CommandError:
+                The options were invalid, or benchmarks regressed compared
+                to the baseline.
+        """
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        baseline = None
+
+        if options['baseline']:
+            try:
+                baseline = load_results(options['baseline'])
+            except (IOError, ValueError) as e:
+                raise CommandError('Unable to load the baseline: %s' % e)
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        try:
+            results = run_benchmarks(
+                names=_split_option(options['benchmarks']),
+                sizes=_split_option(options['sizes']),
+                shapes=_split_option(options['shapes']),
+                repeat=options['repeat'],
+                on_result=self._on_result)
+        except ValueError as e:
+            raise CommandError(six.text_type(e))
+
+        if options['output']:
+            save_results(options['output'], results)
+            self.stdout.write('Wrote results to %s' % options['output'])
+
+        if baseline is not None:
+            self._report_comparison(
+                compare_results(baseline, results, options['threshold']))
+
+    def _on_result(self, key, result):
+        """Report the result of a benchmark.
+
+        Args:
+            key (unicode):
+                The benchmark's key, in ``name/shape/size`` form.
+
+            result (dict):
+                The result of the benchmark.
+        """
+        self.stdout.write('%-45s min %9.4fs  mean %9.4fs'
+                          % (key, result['min'], result['mean']))
+        sys.stdout.flush()
+
+    def _report_comparison(self, comparisons):
+        """Report how results compare to the baseline.
+
+        Args:
+            comparisons (list of dict):
+                The comparisons, as returned by
+                :py:func:`~reviewboard.diffviewer.benchmarks.compare_results`.
+
+        Raises:
+            django.core.management.CommandError:
+                One or more benchmarks regressed.
+        """
+        self.stdout.write('\nCompared to baseline:')
+
+        regressions = []
+
+        for comparison in comparisons:
+            if comparison['regressed']:
+                regressions.append(comparison['key'])
+                status = 'REGRESSED'
+            else:
+                status = ''
+
+            self.stdout.write('%-45s %9.4fs -> %9.4fs (%+.1f%%) %s'
+                              % (comparison['key'],
+                                 comparison['baseline'],
+                                 comparison['current'],
+                                 comparison['change'] * 100,
+                                 status))
+
+        if regressions:
+            raise CommandError('%d benchmark(s) regressed: %s'
+                               % (len(regressions), ', '.join(regressions)))
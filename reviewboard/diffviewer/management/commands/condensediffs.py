@@ -1,16 +1,43 @@
 from __future__ import unicode_literals, division
 
+import json
+import os
 import sys
 from datetime import datetime, timedelta
+from multiprocessing import Pool
+from optparse import make_option
 
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import intcomma
-from django.core.management.base import NoArgsCommand
+from django.core.management.base import CommandError, NoArgsCommand
+from django.db import connections
 from django.utils.translation import ugettext as _, ungettext_lazy as N_
 
 from reviewboard.diffviewer.models import FileDiff
 
 
+def _migrate_range(args):
+    """Migrate a range of diffs.
+
+    This is run in a worker process.
+
+    Args:
+        args (tuple):
+            A tuple of the index of the range, the range itself (as returned
+            by :py:meth:`FileDiffManager.get_migration_ranges
+            <reviewboard.diffviewer.managers.FileDiffManager.
+            get_migration_ranges>`), and the initial batch size.
+
+    Returns:
+        tuple:
+        A 2-tuple of the index of the range and the result of the migration.
+    """
+    i, (task_name, start, end), batch_size = args
+
+    return i, FileDiff.objects.migrate_range(task_name, start, end,
+                                             batch_size=batch_size)
+
+
 class Command(NoArgsCommand):
     help = ('Condenses the diffs stored in the database, reducing space '
             'requirements')
@@ -32,11 +59,52 @@ class Command(NoArgsCommand):
 
     CALC_TIME_REMAINING_STR = _('Calculating time remaining')
 
+    #: The version of the checkpoint file's contents.
+    CHECKPOINT_VERSION = 1
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--processes',
+                    type='int',
+                    default=1,
+                    help='The number of worker processes used to migrate '
+                         'diffs in parallel'),
+        make_option('--batch-size',
+                    type='int',
+                    default=40,
+                    help='The initial number of diffs to migrate at a time. '
+                         'This is adjusted based on throughput.'),
+        make_option('--checkpoint-file',
+                    default=None,
+                    help='The file used to record progress, so that an '
+                         'interrupted run can resume. Defaults to '
+                         'condensediffs-checkpoint.json in the site\'s data '
+                         'directory.'),
+        make_option('--restart',
+                    action='store_true',
+                    default=False,
+                    help='Ignore any recorded progress from a previous run'),
+    )
+
     def handle_noargs(self, **options):
+        processes = options['processes']
+        batch_size = options['batch_size']
+
+        if processes < 1:
+            raise CommandError('--processes must be at least 1')
+
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.checkpoint_file = (
+            options['checkpoint_file'] or
+            os.path.join(settings.SITE_DATA_DIR,
+                         'condensediffs-checkpoint.json'))
+
         counts = FileDiff.objects.get_migration_counts()
         total_count = counts['total_count']
 
         if total_count == 0:
+            self._remove_checkpoint()
             self.stdout.write(_('All diffs have already been migrated.\n'))
             return
 
@@ -57,10 +125,81 @@ class Command(NoArgsCommand):
         self.prev_time_remaining_s = ''
         self.show_remaining = False
 
-        info = FileDiff.objects.migrate_all(self._on_batch_done, counts)
+        checkpoint = None
+
+        if not options['restart']:
+            checkpoint = self._load_checkpoint()
+
+        if checkpoint:
+            ranges = checkpoint['ranges']
+            done = set(checkpoint['done'])
+            old_diff_size = checkpoint['old_diff_size']
+            new_diff_size = checkpoint['new_diff_size']
+
+            self.stdout.write(
+                _('Resuming from %(done)d of %(total)d completed ranges.\n\n')
+                % {
+                    'done': len(done),
+                    'total': len(ranges),
+                })
+        else:
+            ranges = [
+                list(migration_range)
+                for migration_range in FileDiff.objects.get_migration_ranges()
+            ]
+            done = set()
+            old_diff_size = 0
+            new_diff_size = 0
+
+        self.checkpoint = {
+            'version': self.CHECKPOINT_VERSION,
+            'ranges': ranges,
+            'done': sorted(done),
+            'old_diff_size': old_diff_size,
+            'new_diff_size': new_diff_size,
+        }
+        self._save_checkpoint()
+
+        self.processed_count = 0
+        self.total_count = total_count
+
+        pending = [
+            (i, migration_range, batch_size)
+            for i, migration_range in enumerate(ranges)
+            if i not in done
+        ]
+
+        if processes == 1:
+            for i, (task_name, start, end), batch_size in pending:
+                info = FileDiff.objects.migrate_range(
+                    task_name, start, end,
+                    batch_done_cb=self._on_range_batch_done,
+                    batch_size=batch_size)
+                self._on_range_done(i, info, report_progress=False)
+        else:
+            # The worker processes must open their own database connections.
+            for connection in connections.all():
+                connection.close()
+
+            pool = Pool(processes)
+
+            try:
+                for i, info in pool.imap_unordered(_migrate_range, pending):
+                    self._on_range_done(i, info)
+
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+
+        old_diff_size = self.checkpoint['old_diff_size']
+        new_diff_size = self.checkpoint['new_diff_size']
+
+        self._remove_checkpoint()
 
-        old_diff_size = info['old_diff_size']
-        new_diff_size = info['new_diff_size']
+        if old_diff_size == 0:
+            self.stdout.write(_('\n\nNo diff content needed condensing.\n'))
+            return
 
         self.stdout.write(
             _('\n'
@@ -74,6 +213,80 @@ class Command(NoArgsCommand):
                                 float(old_diff_size) * 100),
             })
 
+    def _on_range_batch_done(self, batch_count):
+        """Handler for when a batch of diffs in a range are processed.
+
+        Args:
+            batch_count (int):
+                The number of diffs processed in the batch.
+        """
+        self.processed_count += batch_count
+        self._on_batch_done(min(self.processed_count, self.total_count),
+                            self.total_count)
+
+    def _on_range_done(self, i, info, report_progress=True):
+        """Handler for when a range of diffs has been processed.
+
+        This records the range in the checkpoint file.
+
+        Args:
+            i (int):
+                The index of the range.
+
+            info (dict):
+                The result of the migration of the range.
+
+            report_progress (bool, optional):
+                Whether to report progress for the diffs in the range.
+        """
+        self.checkpoint['done'].append(i)
+        self.checkpoint['old_diff_size'] += info['old_diff_size']
+        self.checkpoint['new_diff_size'] += info['new_diff_size']
+        self._save_checkpoint()
+
+        if report_progress and info['diffs_migrated'] > 0:
+            self._on_range_batch_done(info['diffs_migrated'])
+
+    def _load_checkpoint(self):
+        """Load progress recorded by a previous run.
+
+        Returns:
+            dict:
+            The recorded progress, or ``None`` if there isn't any usable
+            progress recorded.
+        """
+        try:
+            with open(self.checkpoint_file, 'r') as fp:
+                checkpoint = json.load(fp)
+        except (IOError, ValueError):
+            return None
+
+        if (not isinstance(checkpoint, dict) or
+            checkpoint.get('version') != self.CHECKPOINT_VERSION):
+            return None
+
+        return checkpoint
+
+    def _save_checkpoint(self):
+        """Record the current progress in the checkpoint file.
+
+        The file is written atomically, so an interrupted write won't lose
+        previously-recorded progress.
+        """
+        temp_filename = '%s.tmp' % self.checkpoint_file
+
+        with open(temp_filename, 'w') as fp:
+            json.dump(self.checkpoint, fp)
+
+        os.rename(temp_filename, self.checkpoint_file)
+
+    def _remove_checkpoint(self):
+        """Remove the checkpoint file, if it exists."""
+        try:
+            os.unlink(self.checkpoint_file)
+        except OSError:
+            pass
+
     def _on_batch_done(self, processed_count, total_count):
         """Handler for when a batch of diffs are processed.
 
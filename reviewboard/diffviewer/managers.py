@@ -4,12 +4,15 @@ import bz2
 import gc
 import hashlib
 import os
+import time
 import warnings
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
-from django.db import models, reset_queries, connection
-from django.db.models import Count, Q
+from django.db import models, reset_queries, connection, transaction
+from django.db.models import Count, Max, Min, Q
 from django.db.utils import IntegrityError
+from django.utils import six
 from django.utils.encoding import smart_unicode
 from django.utils.six.moves import range
 from django.utils.translation import ugettext as _
@@ -28,6 +31,18 @@ class FileDiffManager(models.Manager):
     """
     MIGRATE_OBJECT_LIMIT = 200
 
+    #: The types of data migrated by migrate_all(), in order.
+    MIGRATION_TASKS = ('filediffs', 'legacy_file_diff_data')
+
+    #: The number of seconds each batch of a migration should aim to take.
+    MIGRATE_TARGET_BATCH_SECS = 2.0
+
+    #: The largest number of diffs migrated in a single batch.
+    MIGRATE_MAX_BATCH_SIZE = 1000
+
+    #: Boundaries for splitting LegacyFileDiffData hashes into ranges.
+    LEGACY_HASH_RANGE_BOUNDARIES = '123456789abcdef'
+
     def unmigrated(self):
         """Queries FileDiffs that store their own diff content."""
         return self.exclude(
@@ -60,50 +75,145 @@ class FileDiffManager(models.Manager):
 
         This will return a dictionary with the result of the process.
         """
+        if counts:
+            total_count = counts['total_count']
+        else:
+            total_count = self.get_migration_counts()['total_count']
+
+        totals = {
+            'diffs_migrated': 0,
+            'old_diff_size': 0,
+            'new_diff_size': 0,
+            'bytes_saved': 0,
+        }
+
+        def _on_batch_done(batch_count):
+            totals['diffs_migrated'] += batch_count
+
+            if callable(batch_done_cb):
+                batch_done_cb(totals['diffs_migrated'], total_count)
+
+        for task_name in self.MIGRATION_TASKS:
+            info = self.migrate_range(task_name,
+                                      batch_done_cb=_on_batch_done,
+                                      batch_size=batch_size)
+
+            for key in ('old_diff_size', 'new_diff_size', 'bytes_saved'):
+                totals[key] += info[key]
+
+        return totals
+
+    def get_migration_ranges(self, range_size=10000):
+        """Return ranges of primary keys that can be migrated independently.
+
+        Unmigrated FileDiffs are split into ranges of IDs, and
+        LegacyFileDiffData entries are split by the first character of their
+        hashes. Each range can be passed to :py:meth:`migrate_range`, in any
+        order and from any process.
+
+        Args:
+            range_size (int, optional):
+                The number of FileDiff IDs covered by each range.
+
+        Returns:
+            list of tuple:
+            A list of ``(task_name, start, end)`` tuples. ``start`` is
+            inclusive and ``end`` is exclusive. Either may be ``None`` for an
+            unbounded range.
+        """
         from reviewboard.diffviewer.models import LegacyFileDiffData
 
-        total_diffs_migrated = 0
-        total_diff_size = 0
-        total_bytes_saved = 0
+        ranges = []
 
-        unmigrated_filediffs = self.unmigrated()
-        legacy_data_items = LegacyFileDiffData.objects.all()
+        pk_range = self.unmigrated().aggregate(min_pk=Min('pk'),
+                                               max_pk=Max('pk'))
 
-        if counts:
-            unmigrated_filediffs_count = counts['filediffs']
-            legacy_data_items_count = counts['legacy_file_diff_data']
-            total_count = counts['total_count']
+        if pk_range['min_pk'] is not None:
+            for start in range(pk_range['min_pk'], pk_range['max_pk'] + 1,
+                               range_size):
+                ranges.append(('filediffs', start, start + range_size))
+
+        if LegacyFileDiffData.objects.exists():
+            boundaries = ([None] + list(self.LEGACY_HASH_RANGE_BOUNDARIES) +
+                          [None])
+
+            for start, end in zip(boundaries, boundaries[1:]):
+                ranges.append(('legacy_file_diff_data', start, end))
+
+        return ranges
+
+    def migrate_range(self, task_name, start=None, end=None,
+                      batch_done_cb=None, batch_size=40):
+        """Migrates a range of diff content to use RawFileDiffData.
+
+        Batches start at the provided size, and grow or shrink based on how
+        long each batch takes to process, aiming for
+        :py:attr:`MIGRATE_TARGET_BATCH_SECS` seconds per batch.
+
+        Args:
+            task_name (unicode):
+                The type of data to migrate. This is one of
+                :py:attr:`MIGRATION_TASKS`.
+
+            start (object, optional):
+                The first primary key in the range.
+
+            end (object, optional):
+                The primary key ending the range. This is exclusive.
+
+            batch_done_cb (callable, optional):
+                A function called with the number of diffs migrated after
+                each batch.
+
+            batch_size (int, optional):
+                The initial number of diffs to migrate per batch.
+
+        Returns:
+            dict:
+            The result of the migration, in the same form as
+            :py:meth:`migrate_all`.
+
+        Raises:
+            ValueError:
+                The task name was invalid.
+        """
+        from reviewboard.diffviewer.models import LegacyFileDiffData
+
+        if task_name == 'filediffs':
+            migrate_func = self._migrate_filediffs
+            queryset = self.unmigrated()
+        elif task_name == 'legacy_file_diff_data':
+            migrate_func = self._migrate_legacy_fdd
+            queryset = LegacyFileDiffData.objects.all()
         else:
-            unmigrated_filediffs_count = unmigrated_filediffs.count()
-            legacy_data_items_count = legacy_data_items.count()
-            total_count = legacy_data_items_count + unmigrated_filediffs_count
-
-        migration_tasks = (
-            (self._migrate_filediffs,
-             unmigrated_filediffs,
-             unmigrated_filediffs_count),
-            (self._migrate_legacy_fdd,
-             legacy_data_items,
-             legacy_data_items_count),
-        )
-
-        for migrate_func, queryset, count in migration_tasks:
-            for batch_info in migrate_func(queryset, count, batch_size):
-                total_diffs_migrated += batch_info[0]
-                total_diff_size += batch_info[1]
-                total_bytes_saved += batch_info[2]
-
-                if callable(batch_done_cb):
-                    batch_done_cb(total_diffs_migrated, total_count)
+            raise ValueError('Unknown migration task "%s"' % task_name)
+
+        if start is not None:
+            queryset = queryset.filter(pk__gte=start)
+
+        if end is not None:
+            queryset = queryset.filter(pk__lt=end)
+
+        diffs_migrated = 0
+        diff_size = 0
+        bytes_saved = 0
+
+        for batch_info in migrate_func(queryset, batch_size):
+            diffs_migrated += batch_info[0]
+            diff_size += batch_info[1]
+            bytes_saved += batch_info[2]
+
+            if callable(batch_done_cb):
+                batch_done_cb(batch_info[0])
 
         return {
-            'diffs_migrated': total_diffs_migrated,
-            'old_diff_size': total_diff_size,
-            'new_diff_size': total_diff_size - total_bytes_saved,
-            'bytes_saved': total_bytes_saved,
+            'diffs_migrated': diffs_migrated,
+            'old_diff_size': diff_size,
+            'new_diff_size': diff_size - bytes_saved,
+            'bytes_saved': bytes_saved,
         }
 
-    def _migrate_legacy_fdd(self, legacy_data_items, count, batch_size):
+    def _migrate_legacy_fdd(self, legacy_data_items, batch_size):
         """Migrates data from LegacyFileDiffData to RawFileDiffData.
 
         This will go through every LegacyFileDiffData and convert them to
@@ -119,7 +229,7 @@ class FileDiffManager(models.Manager):
             num_filediffs=Count('filediffs'),
             num_parent_filediffs=Count('parent_filediffs'))
 
-        for batch in self._iter_batches(legacy_data_items, count, batch_size):
+        for batch in self._iter_batches(legacy_data_items, batch_size):
             batch_total_diff_size = 0
             batch_total_bytes_saved = 0
             raw_fdds = []
@@ -150,18 +260,23 @@ class FileDiffManager(models.Manager):
                 all_diff_hashes.append(binary_hash)
 
             try:
-                # Attempt to create all the entries we want in one go.
-                RawFileDiffData.objects.bulk_create(raw_fdds)
+                # Attempt to create all the entries we want in one go. This
+                # is done in a savepoint, so that a conflict doesn't break
+                # any transaction we're in.
+                with transaction.atomic():
+                    RawFileDiffData.objects.bulk_create(raw_fdds)
             except IntegrityError:
-                # One or more entries in the batch conflicte with an existing
-                # entry, meaning it was already created. We'll just need to
-                # operate on the contents of this batch one-by-one.
+                # One or more entries in the batch conflicted with an
+                # existing entry, meaning it was already created (possibly
+                # by another process migrating FileDiffs with the same
+                # hash). We'll just need to operate on the contents of this
+                # batch one-by-one, keeping any existing entries.
                 for raw_fdd in raw_fdds:
                     try:
-                        raw_fdd.save()
+                        with transaction.atomic():
+                            raw_fdd.save()
                     except IntegrityError:
-                        raw_fdd = RawFileDiffData.objects.get(
-                            binary_hash=raw_fdd.binary_hash)
+                        pass
 
             if filediff_hashes:
                 self._transition_hashes(cursor, 'diff_hash', filediff_hashes)
@@ -176,9 +291,9 @@ class FileDiffManager(models.Manager):
                    batch_total_bytes_saved, filediff_hashes,
                    parent_filediff_hashes, all_diff_hashes)
 
-    def _migrate_filediffs(self, queryset, count, batch_size):
+    def _migrate_filediffs(self, queryset, batch_size):
         """Migrates old diff data from a FileDiff into a RawFileDiffData."""
-        for batch in self._iter_batches(queryset, count, batch_size):
+        for batch in self._iter_batches(queryset, batch_size):
             batch_total_diff_size = 0
             batch_total_bytes_saved = 0
 
@@ -199,44 +314,70 @@ class FileDiffManager(models.Manager):
 
             yield len(batch), batch_total_diff_size, batch_total_bytes_saved
 
-    def _iter_batches(self, queryset, count, batch_size, object_limit=200):
+    def _iter_batches(self, queryset, batch_size):
         """Iterates through items in a queryset, yielding batches.
 
-        This will gather up to a specified number of items from a
-        queryset at a time, process them into batches of a specified
-        size, and yield them.
+        Items are fetched in primary key order, with each query starting
+        after the last item of the previous batch. This keeps each query
+        fast regardless of how far along the migration is, and works
+        whether or not processed items remain in the queryset.
+
+        The batch size is adjusted after each batch, based on how long the
+        batch took to fetch and process, aiming for
+        :py:attr:`MIGRATE_TARGET_BATCH_SECS` seconds per batch.
 
         After each set of objects fetched from the database, garbage
         collection will be forced and stored queries reset, in order to
         reduce memory usage.
         """
-        if count == 0:
-            return
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        num_since_gc = 0
 
-        batch = []
+        while True:
+            batch_start = time.time()
 
-        for i in range(0, count, object_limit):
-            # Every time we work on a batch,, we're re-querying the list of
-            # objects. This result from the query is expected not to have any
-            # previously-processed objects from a yielded batch. It may,
-            # however, have objects we've previously seen that haven't been
-            # yielded in a batch yet. That's why we're indexing from the
-            # length of the batch to the object limit.
-            for item in queryset[len(batch):object_limit].iterator():
-                batch.append(item)
+            if last_pk is None:
+                batch = list(queryset[:batch_size])
+            else:
+                batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
 
-                if len(batch) == batch_size:
-                    yield batch
-                    batch = []
+            if not batch:
+                break
+
+            last_pk = batch[-1].pk
+
+            yield batch
+
+            elapsed = time.time() - batch_start
 
             # Do all we can to limit the memory usage by resetting any stored
             # queries (if DEBUG is True), and force garbage collection of
             # anything we may have from processing an object.
             reset_queries()
-            gc.collect()
+            num_since_gc += len(batch)
 
-        if batch:
-            yield batch
+            if num_since_gc >= self.MIGRATE_OBJECT_LIMIT:
+                gc.collect()
+                num_since_gc = 0
+
+            if len(batch) < batch_size:
+                break
+
+            # Scale the batch size toward the target time, without changing
+            # it by more than a factor of 2 at a time.
+            if elapsed > 0:
+                new_batch_size = int(batch_size *
+                                     self.MIGRATE_TARGET_BATCH_SECS /
+                                     elapsed)
+            else:
+                new_batch_size = batch_size * 2
+
+            batch_size = max(1,
+                             batch_size // 2,
+                             min(new_batch_size,
+                                 batch_size * 2,
+                                 self.MIGRATE_MAX_BATCH_SIZE))
 
     def _transition_hashes(self, cursor, hash_field_name, diff_hashes):
         """Transitions FileDiff-associated hashes to RawFileDiffData.
@@ -361,6 +502,97 @@ class RawFileDiffDataManager(models.Manager):
                 'compression': compression,
             })
 
+    def get_or_create_many_from_data(self, diffs):
+        """Return entries for several diffs, creating any that don't exist.
+
+        This looks up all the existing entries in one query, and creates all
+        the missing ones in one batch, rather than running queries for each
+        diff.
+
+        Args:
+            diffs (list of tuple):
+                A list of ``(data, extra_data)`` tuples. ``data`` is the raw
+                diff content, and ``extra_data`` is an optional dictionary of
+                values (such as line counts) to store in the entry. These will
+                be updated on existing entries if they differ.
+
+        Returns:
+            list of reviewboard.diffviewer.models.RawFileDiffData:
+            The entries for each of the diffs, in the same order.
+        """
+        hashes = []
+        new_entries = {}
+
+        for data, extra_data in diffs:
+            binary_hash = self._hash_hexdigest(data)
+            hashes.append(binary_hash)
+
+            if binary_hash not in new_entries:
+                new_entries[binary_hash] = (data, extra_data)
+
+        # These aren't loaded with .defer('binary'), since extra_data isn't
+        # decoded on deferred instances.
+        entries = dict(
+            (entry.binary_hash, entry)
+            for entry in self.filter(binary_hash__in=list(new_entries)))
+
+        for binary_hash in entries:
+            del new_entries[binary_hash]
+
+        if new_entries:
+            self._create_many(new_entries)
+
+            entries.update(
+                (entry.binary_hash, entry)
+                for entry in self.filter(binary_hash__in=list(new_entries)))
+
+        for binary_hash, (data, extra_data) in zip(hashes, diffs):
+            entry = entries[binary_hash]
+
+            if extra_data:
+                if entry.extra_data is None:
+                    entry.extra_data = {}
+
+                if any(entry.extra_data.get(key) != value
+                       for key, value in six.iteritems(extra_data)):
+                    entry.extra_data.update(extra_data)
+                    entry.save(update_fields=['extra_data'])
+
+        return [entries[binary_hash] for binary_hash in hashes]
+
+    def _create_many(self, new_entries):
+        """Create several new entries.
+
+        If another process creates any of the same entries at the same time,
+        this will fall back on creating them one at a time.
+
+        Args:
+            new_entries (dict):
+                A mapping of hashes to ``(data, extra_data)`` tuples for the
+                entries to create.
+        """
+        objs = []
+
+        for binary_hash, (data, extra_data) in six.iteritems(new_entries):
+            processed_data, compression = self.process_diff_data(data)
+            obj = self.model(binary_hash=binary_hash,
+                             binary=processed_data,
+                             compression=compression)
+            obj.extra_data = extra_data or {}
+            objs.append(obj)
+
+        try:
+            with transaction.atomic():
+                self.bulk_create(objs)
+        except IntegrityError:
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        obj.save()
+                except IntegrityError:
+                    # Another process already created this entry.
+                    pass
+
     def create_from_legacy(self, legacy, save=True):
         processed_data, compression = self.process_diff_data(legacy.binary)
 
@@ -392,6 +624,16 @@ class DiffSetManager(models.Manager):
     HEADER_EXTENSIONS = ["h", "H", "hh", "hpp", "hxx", "h++"]
     IMPL_EXTENSIONS = ["c", "C", "cc", "cpp", "cxx", "c++", "m", "mm", "M"]
 
+    #: The number of files processed in each batch when creating a DiffSet.
+    #:
+    #: This bounds the number of FileDiffs and diff contents held in memory
+    #: at once while they're being stored, along with the number of files
+    #: checked for existence at once.
+    FILEDIFF_BATCH_SIZE = 100
+
+    #: The maximum number of files checked for existence concurrently.
+    FILE_EXISTS_CHECK_WORKERS = 4
+
     def create_from_upload(self, repository, diff_file, parent_diff_file=None,
                            diffset_history=None, basedir=None, request=None,
                            base_commit_id=None, validate_only=False, **kwargs):
@@ -591,9 +833,6 @@ class DiffSetManager(models.Manager):
                 could not be used to look up the file. This is applicable only
                 to Git.
         """
-        from reviewboard.diffviewer.diffutils import convert_to_unicode
-        from reviewboard.diffviewer.models import FileDiff
-
         if 'save' in kwargs:
             warnings.warn('The save parameter to '
                           'DiffSet.objects.create_from_data is deprecated. '
@@ -653,76 +892,182 @@ class DiffSetManager(models.Manager):
             diffcompat=DiffCompatVersion.DEFAULT,
             base_commit_id=base_commit_id)
 
-        if not validate_only:
+        encoding_list = repository.get_encoding_list()
+
+        if validate_only:
+            # Build the FileDiffs without storing anything, in order to
+            # validate the filenames.
+            for f in files:
+                self._build_filediff(diffset, f, parent_files,
+                                     parent_commit_id, parser, encoding_list)
+
+            return None
+
+        batch_size = self.FILEDIFF_BATCH_SIZE
+
+        # The FileDiffs and their diff data are created and stored a batch at
+        # a time, so that only one batch needs to be held in memory.
+        with transaction.atomic():
             diffset.save()
 
-        encoding_list = repository.get_encoding_list()
+            for i in range(0, len(files), batch_size):
+                self._create_filediffs(diffset, files[i:i + batch_size],
+                                       parent_files, parent_commit_id,
+                                       parser, encoding_list)
+
+        return diffset
+
+    def _build_filediff(self, diffset, f, parent_files, parent_commit_id,
+                        parser, encoding_list):
+        """Build a FileDiff for a parsed file, without saving it.
+
+        Args:
+            diffset (reviewboard.diffviewer.models.DiffSet):
+                The DiffSet the FileDiff belongs to.
+
+            f (reviewboard.diffviewer.parser.File):
+                The parsed file.
+
+            parent_files (dict):
+                A mapping of filenames to parsed files from the parent diff.
+
+            parent_commit_id (unicode):
+                The commit ID the parent diff is based on, for tools that
+                identify file versions by commit IDs.
+
+            parser (reviewboard.diffviewer.parser.DiffParser):
+                The parser used for the diff.
+
+            encoding_list (list of unicode):
+                The encodings to try when decoding filenames.
+
+        Returns:
+            tuple:
+            A tuple of ``(filediff, parent_file)``. ``parent_file`` is the
+            parsed file from the parent diff, or ``None``.
+        """
+        from reviewboard.diffviewer.diffutils import convert_to_unicode
+        from reviewboard.diffviewer.models import FileDiff
+
+        parent_file = parent_files.get(f.origFile)
+        orig_rev = None
+
+        if parent_file:
+            orig_rev = parent_file.origInfo
+
+        # If there is a parent file there is not necessarily an original
+        # revision for the parent file in the case of a renamed file in
+        # git.
+        if not orig_rev:
+            if parent_commit_id and f.origInfo != PRE_CREATION:
+                orig_rev = parent_commit_id
+            else:
+                orig_rev = f.origInfo
+
+        enc, orig_file = convert_to_unicode(f.origFile, encoding_list)
+        enc, dest_file = convert_to_unicode(f.newFile, encoding_list)
+
+        if f.deleted:
+            status = FileDiff.DELETED
+        elif f.moved:
+            status = FileDiff.MOVED
+        elif f.copied:
+            status = FileDiff.COPIED
+        else:
+            status = FileDiff.MODIFIED
+
+        filediff = FileDiff(
+            diffset=diffset,
+            source_file=parser.normalize_diff_filename(orig_file),
+            dest_file=parser.normalize_diff_filename(dest_file),
+            source_revision=smart_unicode(orig_rev),
+            dest_detail=f.newInfo,
+            binary=f.binary,
+            status=status)
+
+        if (parent_file and
+            (parent_file.moved or parent_file.copied) and
+            parent_file.insert_count == 0 and
+            parent_file.delete_count == 0):
+            filediff.extra_data = {'parent_moved': True}
+
+        return filediff, parent_file
+
+    def _create_filediffs(self, diffset, files, parent_files,
+                          parent_commit_id, parser, encoding_list):
+        """Create and store the FileDiffs for a batch of files.
+
+        The diff data for all the files is stored using a single lookup for
+        existing data, and the FileDiffs are then created in one query.
+
+        Args:
+            diffset (reviewboard.diffviewer.models.DiffSet):
+                The DiffSet the FileDiffs belong to.
+
+            files (list of reviewboard.diffviewer.parser.File):
+                The parsed files in the batch.
+
+            parent_files (dict):
+                A mapping of filenames to parsed files from the parent diff.
+
+            parent_commit_id (unicode):
+                The commit ID the parent diff is based on, for tools that
+                identify file versions by commit IDs.
+
+            parser (reviewboard.diffviewer.parser.DiffParser):
+                The parser used for the diff.
+
+            encoding_list (list of unicode):
+                The encodings to try when decoding filenames.
+        """
+        from reviewboard.diffviewer.models import FileDiff, RawFileDiffData
+
         filediffs = []
+        diffs = []
+        parent_filediffs = []
+        parent_diffs = []
 
         for f in files:
-            parent_file = None
-            orig_rev = None
-            parent_content = b''
-
-            if f.origFile in parent_files:
-                parent_file = parent_files[f.origFile]
-                parent_content = parent_file.data
-                orig_rev = parent_file.origInfo
-
-            # If there is a parent file there is not necessarily an original
-            # revision for the parent file in the case of a renamed file in
-            # git.
-            if not orig_rev:
-                if parent_commit_id and f.origInfo != PRE_CREATION:
-                    orig_rev = parent_commit_id
-                else:
-                    orig_rev = f.origInfo
-
-            enc, orig_file = convert_to_unicode(f.origFile, encoding_list)
-            enc, dest_file = convert_to_unicode(f.newFile, encoding_list)
-
-            if f.deleted:
-                status = FileDiff.DELETED
-            elif f.moved:
-                status = FileDiff.MOVED
-            elif f.copied:
-                status = FileDiff.COPIED
-            else:
-                status = FileDiff.MODIFIED
-
-            filediff = FileDiff(
-                diffset=diffset,
-                source_file=parser.normalize_diff_filename(orig_file),
-                dest_file=parser.normalize_diff_filename(dest_file),
-                source_revision=smart_unicode(orig_rev),
-                dest_detail=f.newInfo,
-                binary=f.binary,
-                status=status)
-
-            if (parent_file and
-                (parent_file.moved or parent_file.copied) and
-                parent_file.insert_count == 0 and
-                parent_file.delete_count == 0):
-                filediff.extra_data = {'parent_moved': True}
-
-            if not validate_only:
-                # This state all requires making modifications to the database.
-                # We only want to do this if we're saving.
-                filediff.diff = f.data
-                filediff.parent_diff = parent_content
-
-                filediff.set_line_counts(raw_insert_count=f.insert_count,
-                                         raw_delete_count=f.delete_count)
-
-                filediffs.append(filediff)
+            filediff, parent_file = self._build_filediff(
+                diffset, f, parent_files, parent_commit_id, parser,
+                encoding_list)
+
+            # This is normally set along with the diff data through
+            # FileDiff.diff and FileDiff.set_line_counts(), which would cost
+            # several queries per file.
+            filediff.diff64 = ''
+            filediff.extra_data.update({
+                'raw_insert_count': f.insert_count,
+                'raw_delete_count': f.delete_count,
+            })
+            filediffs.append(filediff)
 
-        if validate_only:
-            return None
+            diffs.append((f.data, {
+                'insert_count': f.insert_count,
+                'delete_count': f.delete_count,
+            }))
 
-        if filediffs:
-            FileDiff.objects.bulk_create(filediffs)
+            if parent_file and parent_file.data:
+                filediff.parent_diff64 = ''
+                parent_filediffs.append(filediff)
+                parent_diffs.append((parent_file.data, None))
 
-        return diffset
+        raw_diffs = RawFileDiffData.objects.get_or_create_many_from_data(
+            diffs + parent_diffs)
+
+        for filediff, raw_diff in zip(filediffs, raw_diffs):
+            filediff.diff_hash = raw_diff
+
+        for filediff, raw_diff in zip(parent_filediffs,
+                                      raw_diffs[len(diffs):]):
+            filediff.parent_diff_hash = raw_diff
+
+        FileDiff.objects.bulk_create(filediffs)
+
+        # The diff data is now stored, and won't be needed again. Drop it so
+        # that memory use is bounded by the batch size.
+        for f in files:
+            f.data = None
 
     def _normalize_filename(self, filename, basedir):
         """Normalize a file name to be relative to the repository root."""
@@ -734,6 +1079,7 @@ class DiffSetManager(models.Manager):
     def _process_files(self, parser, basedir, repository, base_commit_id,
                        request, check_existence=False, limit_to=None):
         tool = repository.get_scmtool()
+        files = []
 
         for f in parser.parse():
             source_filename, source_revision = tool.parse_diff_revision(
@@ -751,26 +1097,103 @@ class DiffSetManager(models.Manager):
                 # ourselves a remote file existence check and some storage.
                 continue
 
-            # FIXME: this would be a good place to find permissions errors
-            if (source_revision != PRE_CREATION and
-                source_revision != UNKNOWN and
+            f.origFile = source_filename
+            f.origInfo = source_revision
+            f.newFile = dest_filename
+
+            files.append(f)
+
+        if check_existence:
+            self._check_files_exist(files, repository, base_commit_id,
+                                    request)
+
+        return files
+
+    def _check_files_exist(self, files, repository, base_commit_id,
+                           request):
+        """Check that the original versions of parsed files exist.
+
+        Files are checked in batches. Each batch is fetched from the
+        repository up-front, if supported. Otherwise, the files in the batch
+        are checked concurrently.
+
+        Args:
+            files (list of reviewboard.diffviewer.parser.File):
+                The parsed files to check.
+
+            repository (reviewboard.scmtools.models.Repository):
+                The repository the files are in.
+
+            base_commit_id (unicode):
+                The ID of the commit that the diff is based upon.
+
+            request (django.http.HttpRequest):
+                The current HTTP request, if any.
+
+        Raises:
+            reviewboard.scmtools.core.FileNotFoundError:
+                One of the files could not be found in the repository.
+
+            reviewboard.scmtools.core.SCMError:
+                There was an error talking to the repository.
+        """
+        existing_files = [
+            (f.origFile, f.origInfo)
+            for f in files
+            if (f.origInfo != PRE_CREATION and
+                f.origInfo != UNKNOWN and
                 not f.binary and
                 not f.deleted and
                 not f.moved and
-                not f.copied and
-                (check_existence and
-                 not repository.get_file_exists(source_filename,
-                                                source_revision,
-                                                base_commit_id=base_commit_id,
-                                                request=request))):
-                raise FileNotFoundError(source_filename, source_revision,
-                                        base_commit_id)
+                not f.copied)
+        ]
 
-            f.origFile = source_filename
-            f.origInfo = source_revision
-            f.newFile = dest_filename
+        batch_size = self.FILEDIFF_BATCH_SIZE
+        concurrent = (self.FILE_EXISTS_CHECK_WORKERS > 1 and
+                      not repository.get_scmtool().supports_batched_file_fetch)
+
+        def _check_file_exists(file_info):
+            # FIXME: this would be a good place to find permissions errors
+            return repository.get_file_exists(file_info[0], file_info[1],
+                                              base_commit_id=base_commit_id,
+                                              request=request)
 
-            yield f
+        def _check_file_exists_in_thread(file_info):
+            try:
+                return _check_file_exists(file_info)
+            finally:
+                connection.close()
+
+        for i in range(0, len(existing_files), batch_size):
+            batch = existing_files[i:i + batch_size]
+
+            # When the repository supports it, fetch the whole batch at once.
+            # The existence checks below will then be answered from the
+            # cache, rather than talking to the repository once per file.
+            repository.prefetch_files(batch,
+                                      base_commit_id=base_commit_id,
+                                      request=request)
+
+            if concurrent and len(batch) > 1:
+                pool = ThreadPool(min(self.FILE_EXISTS_CHECK_WORKERS,
+                                      len(batch)))
+
+                try:
+                    results = pool.map(_check_file_exists_in_thread, batch)
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                results = [
+                    _check_file_exists(file_info)
+                    for file_info in batch
+                ]
+
+            for (source_filename, source_revision), exists in zip(batch,
+                                                                 results):
+                if not exists:
+                    raise FileNotFoundError(source_filename, source_revision,
+                                            base_commit_id)
 
     def _compare_files(self, filename1, filename2):
         """
@@ -339,7 +339,24 @@ class DiffParser(object):
 
         The returned diff as composed of all FileDiffs in the provided diffset.
         """
-        return b''.join([filediff.diff for filediff in diffset.files.all()])
+        return b''.join(self.iter_raw_diff(diffset))
+
+    def iter_raw_diff(self, diffset):
+        """Yield the raw diff for each FileDiff in a diffset.
+
+        This loads one FileDiff's diff at a time, so that a large raw diff
+        can be sent to the client without holding all of it in memory.
+
+        Args:
+            diffset (reviewboard.diffviewer.models.DiffSet):
+                The diffset to build the raw diff from.
+
+        Yields:
+            bytes:
+            The diff for each FileDiff.
+        """
+        for filediff in diffset.files.all().iterator():
+            yield filediff.diff
 
     def get_orig_commit_id(self):
         """Returns the commit ID of the original revision for the diff.
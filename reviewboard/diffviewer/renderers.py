@@ -6,8 +6,8 @@ from django.template import Context
 from django.template.loader import render_to_string
 from django.utils import six
 from django.utils.translation import ugettext as _, get_language
-from djblets.cache.backend import cache_memoize
 
+from reviewboard.admin.cache_stats import cache_memoize
 from reviewboard.diffviewer.chunk_generator import compute_chunk_last_header
 from reviewboard.diffviewer.diffutils import populate_diff_chunks
 from reviewboard.diffviewer.errors import UserVisibleError
@@ -0,0 +1,90 @@
+from __future__ import unicode_literals
+
+from reviewboard.diffviewer.benchmarks import (BENCHMARKS,
+                                               compare_results,
+                                               make_input,
+                                               run_benchmarks)
+from reviewboard.diffviewer.parser import DiffParser
+from reviewboard.scmtools.git import GitDiffParser
+from reviewboard.testing import TestCase
+
+
+class BenchmarkTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.benchmarks."""
+
+    def test_make_input(self):
+        """Testing make_input generates the same content for a seed"""
+        for shape in ('synthetic', 'source'):
+            bench_input = make_input(shape, 200)
+
+            self.assertGreaterEqual(len(bench_input.old_lines), 200)
+            self.assertNotEqual(bench_input.old_lines, bench_input.new_lines)
+            self.assertEqual(make_input(shape, 200).new_lines,
+                             bench_input.new_lines)
+
+    def test_make_input_diff(self):
+        """Testing BenchmarkInput.make_diff produces a parseable diff"""
+        files = DiffParser(make_input('source', 200).make_diff()).parse()
+
+        self.assertEqual(len(files), 1)
+        self.assertEqual(files[0].origFile, 'a/benchmark.py')
+        self.assertTrue(files[0].insert_count > 0)
+
+    def test_make_input_diff_with_git(self):
+        """Testing BenchmarkInput.make_diff with git=True produces a
+        parseable diff
+        """
+        files = GitDiffParser(
+            make_input('source', 200).make_diff(git=True)).parse()
+
+        self.assertEqual(len(files), 1)
+        self.assertEqual(files[0].origFile, 'benchmark.py')
+        self.assertTrue(files[0].insert_count > 0)
+
+    def test_run_benchmarks(self):
+        """Testing run_benchmarks runs each benchmark"""
+        keys = []
+        results = run_benchmarks(sizes=['small'],
+                                 shapes=['source'],
+                                 repeat=1,
+                                 on_result=lambda key, result:
+                                     keys.append(key))
+
+        self.assertEqual(
+            keys,
+            ['%s/source/small' % name for name in BENCHMARKS])
+        self.assertEqual(list(results['results'].keys()), keys)
+
+        for result in results['results'].values():
+            self.assertEqual(result['runs'], 1)
+            self.assertGreaterEqual(result['min'], 0)
+
+    def test_run_benchmarks_with_invalid_name(self):
+        """Testing run_benchmarks with an unknown benchmark"""
+        with self.assertRaises(ValueError):
+            run_benchmarks(names=['invalid'])
+
+    def test_compare_results(self):
+        """Testing compare_results"""
+        baseline = {
+            'results': {
+                'chunks/source/small': {'min': 1.0},
+                'render/source/small': {'min': 2.0},
+            },
+        }
+        results = {
+            'results': {
+                'chunks/source/small': {'min': 1.5},
+                'render/source/small': {'min': 2.1},
+                'render/source/large': {'min': 10.0},
+            },
+        }
+
+        comparisons = compare_results(baseline, results, threshold=0.2)
+
+        self.assertEqual(
+            [(comparison['key'], comparison['regressed'])
+             for comparison in comparisons],
+            [('chunks/source/small', True),
+             ('render/source/small', False)])
+        self.assertAlmostEqual(comparisons[0]['change'], 0.5)
@@ -2,7 +2,9 @@ from __future__ import unicode_literals
 
 from kgb import SpyAgency
 
-from reviewboard.diffviewer.models import DiffSet, FileDiff
+from reviewboard.diffviewer.managers import DiffSetManager
+from reviewboard.diffviewer.models import DiffSet, FileDiff, RawFileDiffData
+from reviewboard.scmtools.core import FileNotFoundError
 from reviewboard.testing import TestCase
 
 
@@ -11,6 +13,31 @@ class DiffSetManagerTests(SpyAgency, TestCase):
 
     fixtures = ['test_scmtools']
 
+    multi_file_diff = (
+        b'diff --git a/README b/README\n'
+        b'index 94bdd3e..197009f 100644\n'
+        b'--- README\n'
+        b'+++ README\n'
+        b'@@ -2 +2 @@\n'
+        b'-blah blah\n'
+        b'+blah!\n'
+        b'diff --git a/foo.c b/foo.c\n'
+        b'index 94bdd3e..197009f 100644\n'
+        b'--- foo.c\n'
+        b'+++ foo.c\n'
+        b'@@ -2 +2,2 @@\n'
+        b'-blah blah\n'
+        b'+blah!\n'
+        b'+blah!!\n'
+        b'diff --git a/foo.h b/foo.h\n'
+        b'index 94bdd3e..197009f 100644\n'
+        b'--- foo.h\n'
+        b'+++ foo.h\n'
+        b'@@ -2 +2 @@\n'
+        b'-blah blah\n'
+        b'+blah!\n'
+    )
+
     def test_create_from_data(self):
         """Testing DiffSetManager.create_from_data"""
         repository = self.create_repository(tool_name='Test')
@@ -86,3 +113,116 @@ class DiffSetManagerTests(SpyAgency, TestCase):
         self.assertIsNone(diffset)
         self.assertEqual(DiffSet.objects.count(), 0)
         self.assertEqual(FileDiff.objects.count(), 0)
+
+    def test_create_from_data_with_batches(self):
+        """Testing DiffSetManager.create_from_data stores files in batches"""
+        repository = self.create_repository(tool_name='Test')
+
+        self.spy_on(repository.get_file_exists,
+                    call_fake=lambda *args, **kwargs: True)
+        self.spy_on(RawFileDiffData.objects.get_or_create_many_from_data)
+        self.spy_on(FileDiff.objects.bulk_create)
+
+        old_batch_size = DiffSetManager.FILEDIFF_BATCH_SIZE
+        DiffSetManager.FILEDIFF_BATCH_SIZE = 2
+
+        try:
+            diffset = DiffSet.objects.create_from_data(
+                repository=repository,
+                diff_file_name='diff',
+                diff_file_contents=self.multi_file_diff,
+                basedir='/')
+        finally:
+            DiffSetManager.FILEDIFF_BATCH_SIZE = old_batch_size
+
+        self.assertEqual(
+            len(RawFileDiffData.objects.get_or_create_many_from_data.spy
+                .calls),
+            2)
+        self.assertEqual(len(FileDiff.objects.bulk_create.spy.calls), 2)
+
+        filediffs = list(diffset.files.order_by('pk'))
+        self.assertEqual(
+            [filediff.source_file for filediff in filediffs],
+            ['README', 'foo.h', 'foo.c'])
+        self.assertEqual(len(repository.get_file_exists.spy.calls), 3)
+
+        self.assertEqual(RawFileDiffData.objects.count(), 3)
+
+        filediff = filediffs[2]
+        self.assertEqual(filediff.get_line_counts()['raw_insert_count'], 2)
+        self.assertEqual(filediff.get_line_counts()['raw_delete_count'], 1)
+        self.assertEqual(filediff.diff_hash.insert_count, 2)
+        self.assertEqual(filediff.diff_hash.delete_count, 1)
+        self.assertIn(b'+blah!!\n', filediff.diff)
+
+    def test_create_from_data_with_existing_diff_data(self):
+        """Testing DiffSetManager.create_from_data reuses existing diff data"""
+        repository = self.create_repository(tool_name='Test')
+
+        self.spy_on(repository.get_file_exists,
+                    call_fake=lambda *args, **kwargs: True)
+
+        diffset1 = DiffSet.objects.create_from_data(
+            repository=repository,
+            diff_file_name='diff',
+            diff_file_contents=self.DEFAULT_GIT_FILEDIFF_DATA,
+            basedir='/')
+        diffset2 = DiffSet.objects.create_from_data(
+            repository=repository,
+            diff_file_name='diff',
+            diff_file_contents=self.DEFAULT_GIT_FILEDIFF_DATA,
+            basedir='/')
+
+        self.assertEqual(RawFileDiffData.objects.count(), 1)
+        self.assertEqual(diffset1.files.get().diff_hash_id,
+                         diffset2.files.get().diff_hash_id)
+
+    def test_create_from_data_with_parent_diff(self):
+        """Testing DiffSetManager.create_from_data with a parent diff"""
+        repository = self.create_repository(tool_name='Test')
+        parent_diff = (
+            b'diff --git a/README b/README\n'
+            b'index 1111111..94bdd3e 100644\n'
+            b'--- README\n'
+            b'+++ README\n'
+            b'@@ -2 +2 @@\n'
+            b'-blah\n'
+            b'+blah blah\n'
+        )
+
+        self.spy_on(repository.get_file_exists,
+                    call_fake=lambda *args, **kwargs: True)
+
+        diffset = DiffSet.objects.create_from_data(
+            repository=repository,
+            diff_file_name='diff',
+            diff_file_contents=self.DEFAULT_GIT_FILEDIFF_DATA,
+            parent_diff_file_name='parent_diff',
+            parent_diff_file_contents=parent_diff,
+            basedir='/')
+
+        filediff = diffset.files.get()
+        self.assertEqual(filediff.source_revision, '1111111')
+        self.assertEqual(filediff.diff, self.DEFAULT_GIT_FILEDIFF_DATA)
+        self.assertEqual(filediff.parent_diff, parent_diff)
+
+    def test_create_from_data_with_missing_file(self):
+        """Testing DiffSetManager.create_from_data with a file that doesn't
+        exist in the repository
+        """
+        repository = self.create_repository(tool_name='Test')
+
+        self.spy_on(repository.get_file_exists,
+                    call_fake=lambda self, path, *args, **kwargs:
+                        not path.endswith('foo.c'))
+
+        with self.assertRaises(FileNotFoundError):
+            DiffSet.objects.create_from_data(
+                repository=repository,
+                diff_file_name='diff',
+                diff_file_contents=self.multi_file_diff,
+                basedir='/')
+
+        self.assertEqual(DiffSet.objects.count(), 0)
+        self.assertEqual(FileDiff.objects.count(), 0)
@@ -0,0 +1,183 @@
+"""Unit tests for reviewboard.diffviewer.downloads."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+from django.test import RequestFactory
+from django.utils import timezone
+from djblets.util.dates import http_date
+
+from reviewboard.diffviewer.downloads import (build_download_response,
+                                              get_not_modified_response)
+from reviewboard.testing import TestCase
+
+
+class DownloadResponseTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.downloads."""
+
+    def setUp(self):
+        super(DownloadResponseTests, self).setUp()
+
+        self.factory = RequestFactory()
+        self.timestamp = timezone.make_aware(datetime(2017, 1, 2, 3, 4, 5),
+                                             timezone.utc)
+        self.chunks = [b'0123', b'4567', b'89']
+
+    def _build_response(self, streaming=True, **headers):
+        """Return a download response for the test content.
+
+        Args:
+            streaming (bool, optional):
+                Whether to stream the content.
+
+            **headers (dict):
+                Headers for the request, in ``request.META`` form.
+
+        Returns:
+            django.http.HttpResponseBase:
+            The response.
+        """
+        request = self.factory.get('/', **headers)
+
+        return build_download_response(
+            request,
+            iter(self.chunks),
+            content_type='text/x-patch',
+            etag='abc123',
+            last_modified=self.timestamp,
+            get_length=lambda: 10,
+            streaming=streaming)
+
+    def _get_content(self, response):
+        """Return the content of a response.
+
+        Args:
+            response (django.http.HttpResponseBase):
+                The response.
+
+        Returns:
+            bytes:
+            The content.
+        """
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        else:
+            return response.content
+
+    def test_build_download_response(self):
+        """Testing build_download_response"""
+        rsp = self._build_response()
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(rsp.streaming)
+        self.assertEqual(self._get_content(rsp), b'0123456789')
+        self.assertEqual(rsp['ETag'], 'abc123')
+        self.assertEqual(rsp['Accept-Ranges'], 'bytes')
+        self.assertEqual(rsp['Last-Modified'], http_date(self.timestamp))
+
+    def test_build_download_response_not_streaming(self):
+        """Testing build_download_response with streaming=False"""
+        rsp = self._build_response(streaming=False)
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertFalse(rsp.streaming)
+        self.assertEqual(rsp.content, b'0123456789')
+
+    def test_build_download_response_with_range(self):
+        """Testing build_download_response with Range"""
+        rsp = self._build_response(HTTP_RANGE='bytes=3-6')
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertEqual(self._get_content(rsp), b'3456')
+        self.assertEqual(rsp['Content-Range'], 'bytes 3-6/10')
+        self.assertEqual(rsp['Content-Length'], '4')
+
+    def test_build_download_response_with_open_range(self):
+        """Testing build_download_response with Range without an end"""
+        rsp = self._build_response(HTTP_RANGE='bytes=8-')
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertEqual(self._get_content(rsp), b'89')
+        self.assertEqual(rsp['Content-Range'], 'bytes 8-9/10')
+
+    def test_build_download_response_with_suffix_range(self):
+        """Testing build_download_response with Range for the last bytes"""
+        rsp = self._build_response(HTTP_RANGE='bytes=-3',
+                                   streaming=False)
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertEqual(rsp.content, b'789')
+        self.assertEqual(rsp['Content-Range'], 'bytes 7-9/10')
+
+    def test_build_download_response_with_unsatisfiable_range(self):
+        """Testing build_download_response with Range past the content"""
+        rsp = self._build_response(HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(rsp.status_code, 416)
+        self.assertEqual(rsp['Content-Range'], 'bytes */10')
+
+    def test_build_download_response_with_multiple_ranges(self):
+        """Testing build_download_response with multiple ranges sends the
+        full content
+        """
+        rsp = self._build_response(HTTP_RANGE='bytes=0-1,4-5')
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(self._get_content(rsp), b'0123456789')
+
+    def test_build_download_response_with_if_range_mismatch(self):
+        """Testing build_download_response with Range and a non-matching
+        If-Range sends the full content
+        """
+        rsp = self._build_response(HTTP_RANGE='bytes=3-6',
+                                   HTTP_IF_RANGE='def456')
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(self._get_content(rsp), b'0123456789')
+
+    def test_build_download_response_with_if_range_match(self):
+        """Testing build_download_response with Range and a matching
+        If-Range
+        """
+        rsp = self._build_response(HTTP_RANGE='bytes=3-6',
+                                   HTTP_IF_RANGE='abc123')
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertEqual(self._get_content(rsp), b'3456')
+
+    def test_get_not_modified_response_with_etag(self):
+        """Testing get_not_modified_response with a matching If-None-Match"""
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='abc123')
+        rsp = get_not_modified_response(request, 'abc123', self.timestamp)
+
+        self.assertIsNotNone(rsp)
+        self.assertEqual(rsp.status_code, 304)
+        self.assertEqual(rsp['ETag'], 'abc123')
+
+    def test_get_not_modified_response_with_etag_mismatch(self):
+        """Testing get_not_modified_response with a non-matching
+        If-None-Match
+        """
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='def456',
+                                   HTTP_IF_MODIFIED_SINCE=http_date(
+                                       self.timestamp))
+
+        self.assertIsNone(
+            get_not_modified_response(request, 'abc123', self.timestamp))
+
+    def test_get_not_modified_response_with_modified_since(self):
+        """Testing get_not_modified_response with If-Modified-Since"""
+        request = self.factory.get(
+            '/', HTTP_IF_MODIFIED_SINCE=http_date(self.timestamp))
+        rsp = get_not_modified_response(request, 'abc123', self.timestamp)
+
+        self.assertIsNotNone(rsp)
+        self.assertEqual(rsp.status_code, 304)
+
+    def test_get_not_modified_response_without_headers(self):
+        """Testing get_not_modified_response without conditional headers"""
+        request = self.factory.get('/')
+
+        self.assertIsNone(
+            get_not_modified_response(request, 'abc123', self.timestamp))
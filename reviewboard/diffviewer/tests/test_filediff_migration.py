@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+from django.db import transaction
 from djblets.db.fields import Base64DecodedValue
 
 from reviewboard.diffviewer.models import (DiffSet, FileDiff,
@@ -323,3 +324,82 @@ class FileDiffMigrationTests(TestCase):
         self.assertEqual(filediff2.parent_diff64, '')
         self.assertEqual(filediff1.parent_diff_hash.content, self.parent_diff)
         self.assertEqual(filediff2.parent_diff_hash.content, self.parent_diff)
+
+    def test_get_migration_ranges(self):
+        """Testing FileDiffManager.get_migration_ranges"""
+        self.filediff.diff64 = self.DEFAULT_GIT_FILEDIFF_DATA
+        self.filediff.save()
+
+        LegacyFileDiffData.objects.create(
+            binary_hash='abc123',
+            binary=Base64DecodedValue(self.DEFAULT_GIT_FILEDIFF_DATA))
+
+        ranges = FileDiff.objects.get_migration_ranges(range_size=100)
+
+        self.assertEqual(ranges[0], ('filediffs', self.filediff.pk,
+                                     self.filediff.pk + 100))
+        self.assertEqual(ranges[1], ('legacy_file_diff_data', None, '1'))
+        self.assertEqual(ranges[-1], ('legacy_file_diff_data', 'f', None))
+        self.assertEqual(len(ranges), 17)
+
+    def test_migrate_range(self):
+        """Testing FileDiffManager.migrate_range migrates only diffs in the
+        range
+        """
+        self.filediff.diff64 = self.DEFAULT_GIT_FILEDIFF_DATA
+        self.filediff.save()
+
+        diffset = DiffSet.objects.create(name='test',
+                                         revision=1,
+                                         repository=self.repository)
+        filediff2 = FileDiff.objects.create(
+            source_file='README',
+            dest_file='README',
+            diffset=diffset,
+            diff64=self.DEFAULT_GIT_FILEDIFF_DATA,
+            parent_diff64='')
+
+        batch_counts = []
+        info = FileDiff.objects.migrate_range(
+            'filediffs', self.filediff.pk, filediff2.pk,
+            batch_done_cb=batch_counts.append,
+            batch_size=1)
+
+        self.assertEqual(info['diffs_migrated'], 1)
+        self.assertEqual(batch_counts, [1])
+        self.assertEqual(
+            list(FileDiff.objects.unmigrated().values_list('pk', flat=True)),
+            [filediff2.pk])
+
+        info = FileDiff.objects.migrate_range('filediffs', filediff2.pk)
+
+        # The content was identical to the first diff, so all of it was
+        # condensed.
+        self.assertEqual(info['diffs_migrated'], 1)
+        self.assertEqual(info['bytes_saved'], info['old_diff_size'])
+        self.assertFalse(FileDiff.objects.unmigrated().exists())
+
+    def test_migrate_range_legacy_with_existing_raw_data(self):
+        """Testing FileDiffManager.migrate_range with LegacyFileDiffData
+        already migrated by another process
+        """
+        legacy = LegacyFileDiffData.objects.create(
+            binary_hash='abc123',
+            binary=Base64DecodedValue(self.DEFAULT_GIT_FILEDIFF_DATA))
+
+        self.filediff.legacy_diff_hash = legacy
+        self.filediff.save()
+
+        # Simulate another process creating the same entry first.
+        raw_fdd = RawFileDiffData.objects.create_from_legacy(legacy)
+
+        with transaction.atomic():
+            info = FileDiff.objects.migrate_range('legacy_file_diff_data')
+
+        self.assertEqual(info['diffs_migrated'], 1)
+        self.assertEqual(RawFileDiffData.objects.count(), 1)
+        self.assertEqual(LegacyFileDiffData.objects.count(), 0)
+
+        filediff = FileDiff.objects.get(pk=self.filediff.pk)
+        self.assertEqual(filediff.diff_hash, raw_fdd)
+        self.assertIsNone(filediff.legacy_diff_hash_id)
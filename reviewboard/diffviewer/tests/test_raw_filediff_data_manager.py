@@ -55,3 +55,40 @@ class RawFileDiffDataManagerTests(TestCase):
 
         self.assertEqual(data, bz2.compress(self.large_diff, 9))
         self.assertEqual(compression, RawFileDiffData.COMPRESSION_BZIP2)
+
+    def test_get_or_create_many_from_data(self):
+        """Testing RawFileDiffDataManager.get_or_create_many_from_data"""
+        existing, is_new = \
+            RawFileDiffData.objects.get_or_create_from_data(self.small_diff)
+
+        raw_diffs = RawFileDiffData.objects.get_or_create_many_from_data([
+            (self.large_diff, {'insert_count': 10}),
+            (self.small_diff, None),
+            (self.large_diff, None),
+        ])
+
+        self.assertEqual(len(raw_diffs), 3)
+        self.assertEqual(raw_diffs[1].pk, existing.pk)
+        self.assertEqual(raw_diffs[0].pk, raw_diffs[2].pk)
+        self.assertEqual(RawFileDiffData.objects.count(), 2)
+
+        raw_diff = RawFileDiffData.objects.get(pk=raw_diffs[0].pk)
+        self.assertEqual(raw_diff.content, self.large_diff)
+        self.assertEqual(raw_diff.compression,
+                         RawFileDiffData.COMPRESSION_BZIP2)
+        self.assertEqual(raw_diff.insert_count, 10)
+
+    def test_get_or_create_many_from_data_updates_extra_data(self):
+        """Testing RawFileDiffDataManager.get_or_create_many_from_data
+        updates extra_data on existing entries
+        """
+        RawFileDiffData.objects.get_or_create_from_data(self.small_diff)
+
+        raw_diffs = RawFileDiffData.objects.get_or_create_many_from_data([
+            (self.small_diff, {'insert_count': 1, 'delete_count': 1}),
+        ])
+
+        raw_diff = RawFileDiffData.objects.get(pk=raw_diffs[0].pk)
+        self.assertEqual(raw_diff.insert_count, 1)
+        self.assertEqual(raw_diff.delete_count, 1)
+        self.assertEqual(raw_diff.content, self.small_diff)
@@ -26,7 +26,8 @@ from pygments.formatters import HtmlFormatter
 from pygments.lexers import get_lexer_by_name
 
 from reviewboard.diffviewer.diffutils import (get_diff_files,
-                                              get_enable_highlighting)
+                                              get_enable_highlighting,
+                                              prefetch_original_files)
 from reviewboard.diffviewer.errors import PatchError, UserVisibleError
 from reviewboard.diffviewer.models import DiffSet, FileDiff
 from reviewboard.diffviewer.renderers import (get_diff_renderer,
@@ -202,6 +203,11 @@ class DiffViewerView(TemplateView):
             },
         }
 
+        # Each file on the page will be rendered in its own request. Fetch
+        # their original versions now, in one batch, so that those requests
+        # don't each need to go to the repository.
+        prefetch_original_files(page.object_list, self.request)
+
         if page.has_next():
             diff_context['pagination']['next_page'] = page.next_page_number()
 
@@ -768,7 +768,8 @@ class Bitbucket(HostingService):
             data, headers = self.client.http_get(
                 url,
                 username=self.account.username,
-                password=decrypt_password(self.account.data['password']))
+                password=decrypt_password(self.account.data['password']),
+                use_http_cache=not raw_content)
 
             if raw_content:
                 return data
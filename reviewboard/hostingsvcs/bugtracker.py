@@ -1,6 +1,6 @@
 from __future__ import unicode_literals
 
-from djblets.cache.backend import cache_memoize
+from reviewboard.admin.cache_stats import cache_memoize
 
 
 class BugTracker(object):
@@ -122,7 +122,8 @@ class GitHubAPIPaginator(APIPaginator):
 
     def fetch_url(self, url):
         """Fetches the page data from a URL."""
-        data, headers = self.client.api_get(url, return_headers=True)
+        data, headers = self.client.api_get(url, return_headers=True,
+                                            use_http_cache=True)
 
         # Find all the links in the Link header and key off by the link
         # name ('prev', 'next', etc.).
@@ -146,28 +147,6 @@ class GitHubClient(HostingServiceClient):
         super(GitHubClient, self).__init__(hosting_service)
         self.account = hosting_service.account
 
-    #
-    # HTTP method overrides
-    #
-
-    def http_delete(self, url, *args, **kwargs):
-        data, headers = super(GitHubClient, self).http_delete(
-            url, *args, **kwargs)
-        self._check_rate_limits(headers)
-        return data, headers
-
-    def http_get(self, url, *args, **kwargs):
-        data, headers = super(GitHubClient, self).http_get(
-            url, *args, **kwargs)
-        self._check_rate_limits(headers)
-        return data, headers
-
-    def http_post(self, url, *args, **kwargs):
-        data, headers = super(GitHubClient, self).http_post(
-            url, *args, **kwargs)
-        self._check_rate_limits(headers)
-        return data, headers
-
     #
     # API wrappers around HTTP/JSON methods
     #
@@ -179,15 +158,21 @@ class GitHubClient(HostingServiceClient):
         except (URLError, HTTPError) as e:
             self._check_api_error(e)
 
-    def api_get(self, url, return_headers=False, *args, **kwargs):
+    def api_get(self, url, return_headers=False, use_http_cache=False,
+                *args, **kwargs):
         """Performs an HTTP GET to the GitHub API and returns the results.
 
         If `return_headers` is True, then the result of each call (or
         each generated set of data, if using pagination) will be a tuple
         of (data, headers). Otherwise, the result will just be the data.
+
+        If `use_http_cache` is True, the result will be revalidated against
+        the HTTP response cache. GitHub doesn't count unchanged responses
+        against the rate limit.
         """
         try:
-            data, headers = self.json_get(url, *args, **kwargs)
+            data, headers = self.json_get(url, use_http_cache=use_http_cache,
+                                          *args, **kwargs)
 
             if return_headers:
                 return data, headers
@@ -246,7 +231,7 @@ class GitHubClient(HostingServiceClient):
             url += '&sha=%s' % start
 
         try:
-            return self.api_get(url)
+            return self.api_get(url, use_http_cache=True)
         except Exception as e:
             logging.warning('Failed to fetch commits from %s: %s',
                             url, e, exc_info=1)
@@ -280,7 +265,7 @@ class GitHubClient(HostingServiceClient):
         url = self._build_api_url(repo_api_url, 'git/refs/heads')
 
         try:
-            rsp = self.api_get(url)
+            rsp = self.api_get(url, use_http_cache=True)
             return [ref for ref in rsp if ref['ref'].startswith('refs/heads/')]
         except Exception as e:
             logging.warning('Failed to fetch commits from %s: %s',
@@ -362,15 +347,12 @@ class GitHubClient(HostingServiceClient):
         return url
 
     def _check_rate_limits(self, headers):
-        rate_limit_remaining = headers.get('X-RateLimit-Remaining', None)
+        super(GitHubClient, self)._check_rate_limits(headers)
 
-        try:
-            if (rate_limit_remaining is not None and
-                int(rate_limit_remaining) <= 100):
-                logging.warning('GitHub rate limit for %s is down to %s',
-                                self.account.username, rate_limit_remaining)
-        except ValueError:
-            pass
+        if (self.rate_limit_remaining is not None and
+            self.rate_limit_remaining <= 100):
+            logging.warning('GitHub rate limit for %s is down to %s',
+                            self.account.username, self.rate_limit_remaining)
 
     def _check_api_error(self, e):
         data = e.read()
@@ -628,7 +628,8 @@ class GitLab(HostingService):
                 headers={
                     b'Accept': b'application/json',
                     b'PRIVATE-TOKEN': self._get_private_token(),
-                })
+                },
+                use_http_cache=not raw_content)
 
             if raw_content:
                 return data, headers
@@ -3,24 +3,28 @@
 from __future__ import unicode_literals
 
 import base64
+import hashlib
 import json
 import logging
 import mimetools
 import re
 
 from django.conf.urls import include, url
+from django.core.cache import cache
 from django.dispatch import receiver
 from django.utils import six
+from django.utils.six.moves.urllib.error import HTTPError
 from django.utils.six.moves.urllib.parse import urlparse
 from django.utils.six.moves.urllib.request import (Request as BaseURLRequest,
-                                                   HTTPBasicAuthHandler,
-                                                   urlopen)
+                                                   HTTPBasicAuthHandler)
 from django.utils.translation import ugettext_lazy as _
+from djblets.cache.backend import make_cache_key
 from djblets.registries.errors import ItemLookupError
 from djblets.registries.registry import (ALREADY_REGISTERED, LOAD_ENTRY_POINT,
                                          NOT_REGISTERED)
 
 import reviewboard.hostingsvcs.urls as hostingsvcs_urls
+from reviewboard.hostingsvcs.transport import get_http_transport
 from reviewboard.registries.registry import EntryPointRegistry
 from reviewboard.signals import initializing
 
@@ -84,6 +88,39 @@ class URLRequest(BaseURLRequest):
                         b'Basic %s' % base64.b64encode(auth))
 
 
+class CachedResponseHeaders(dict):
+    """Response headers stored in the HTTP response cache.
+
+    Header names are looked up case-insensitively, like the headers returned
+    for live responses.
+    """
+
+    def __init__(self, headers=()):
+        """Initialize the headers.
+
+        Args:
+            headers (dict or list, optional):
+                The headers, as a dictionary or a list of ``(name, value)``
+                tuples.
+        """
+        if isinstance(headers, dict):
+            headers = six.iteritems(headers)
+
+        super(CachedResponseHeaders, self).__init__(
+            (name.lower(), value)
+            for name, value in headers
+        )
+
+    def __getitem__(self, name):
+        return super(CachedResponseHeaders, self).__getitem__(name.lower())
+
+    def __contains__(self, name):
+        return super(CachedResponseHeaders, self).__contains__(name.lower())
+
+    def get(self, name, default=None):
+        return super(CachedResponseHeaders, self).get(name.lower(), default)
+
+
 class HostingServiceClient(object):
     """Client for communicating with a hosting service's API.
 
@@ -93,19 +130,71 @@ class HostingServiceClient(object):
     HostingService subclasses can also include an override of this class to add
     additional checking (such as GitHub's checking of rate limit headers), or
     add higher-level API functionality.
+
+    HTTP requests are made through a pooled, keep-alive transport (see
+    :py:mod:`reviewboard.hostingsvcs.transport`), which is shared by all
+    clients for the same hosting service account.
     """
 
+    #: The maximum number of idle connections kept open to each server.
+    http_pool_size = 4
+
+    #: The socket timeout for HTTP requests, in seconds.
+    http_timeout = 60
+
+    #: Whether to ask the server to compress responses.
+    http_use_gzip = True
+
+    #: The number of seconds to keep responses in the HTTP response cache.
+    #:
+    #: Cached responses are always revalidated with the server using their
+    #: :mailheader:`ETag` or :mailheader:`Last-Modified` headers. This only
+    #: controls how long the validators are kept around.
+    http_cache_expiration = 7 * 24 * 60 * 60
+
+    #: The remaining number of API requests allowed by the server.
+    #:
+    #: This is set by :py:meth:`_check_rate_limits` whenever a response
+    #: includes rate limit information, and is ``None`` otherwise.
+    rate_limit_remaining = None
+
+    #: The response headers that may contain the remaining API rate limit.
+    rate_limit_headers = ('X-RateLimit-Remaining', 'RateLimit-Remaining')
+
     def __init__(self, hosting_service):
         """Initialize the client.
 
-        This method is a no-op. Subclasses requiring access to the hosting
-        service or account should override this method.
+        Subclasses requiring access to the hosting service or account should
+        override this method.
 
         Args:
             hosting_service (HostingService):
                 The hosting service that is using this client.
         """
-        pass
+        self.hosting_service = hosting_service
+
+    @property
+    def http_transport(self):
+        """The HTTP transport used for requests.
+
+        This is shared between all clients for the same hosting service
+        account.
+
+        Type:
+            reviewboard.hostingsvcs.transport.HTTPTransport
+        """
+        hosting_service = getattr(self, 'hosting_service', None)
+        account = getattr(hosting_service, 'account', None)
+
+        if account is not None and account.pk is not None:
+            key = ('hosting-account', account.pk)
+        else:
+            key = None
+
+        return get_http_transport(key=key,
+                                  pool_size=self.http_pool_size,
+                                  timeout=self.http_timeout,
+                                  use_gzip=self.http_use_gzip)
 
     #
     # HTTP utility methods
@@ -146,9 +235,17 @@ class HostingServiceClient(object):
         return self.http_request(url, headers=headers, method='DELETE',
                                  **kwargs)
 
-    def http_get(self, url, headers=None, *args, **kwargs):
+    def http_get(self, url, headers=None, use_http_cache=False, *args,
+                 **kwargs):
         """Perform an HTTP GET on the given URL.
 
+        If ``use_http_cache`` is set, the response will be stored in the
+        HTTP response cache, if it contains an :mailheader:`ETag` or
+        :mailheader:`Last-Modified` header. Later requests for the same URL
+        will ask the server whether the response has changed, and a
+        ``304 Not Modified`` response will be served from the cache. Hosting
+        services generally don't count these against their rate limits.
+
         Args:
             url (unicode):
                 The URL to perform the request on.
@@ -156,6 +253,11 @@ class HostingServiceClient(object):
             headers (dict, optional):
                 Extra headers to include with the request.
 
+            use_http_cache (bool, optional):
+                Whether to use the HTTP response cache. This should only be
+                used for API responses that are small and may change over
+                time, such as lists of branches or commits.
+
             *args (tuple):
                 Additional positional arguments to pass to
                 :py:meth:`http_request`.
@@ -178,6 +280,9 @@ class HostingServiceClient(object):
             urllib2.URLError:
                 When there is an error communicating with the URL.
         """
+        if use_http_cache:
+            return self._http_get_cached(url, headers=headers, **kwargs)
+
         return self.http_request(url, headers=headers, method='GET', **kwargs)
 
     def http_post(self, url, body=None, fields=None, files=None,
@@ -294,9 +399,146 @@ class HostingServiceClient(object):
         if username is not None and password is not None:
             request.add_basic_auth(username, password)
 
-        response = urlopen(request)
+        try:
+            data, headers = self.http_transport.request(request)
+        except HTTPError as e:
+            self._check_rate_limits(e.info())
+            raise
+
+        self._check_rate_limits(headers)
+
+        return data, headers
+
+    def _http_get_cached(self, url, headers=None, **kwargs):
+        """Perform an HTTP GET using the HTTP response cache.
+
+        Args:
+            url (unicode):
+                The URL to perform the request on.
+
+            headers (dict, optional):
+                Extra headers to include with the request.
+
+            **kwargs (dict):
+                Additional keyword arguments to pass to
+                :py:meth:`http_request`.
+
+        Returns:
+            tuple:
+            A tuple of:
+
+            * The response body (:py:class:`bytes`)
+            * The response headers (:py:class:`dict`)
+
+        Raises:
+            urllib2.HTTPError:
+                When the HTTP request fails.
+
+            urllib2.URLError:
+                When there is an error communicating with the URL.
+        """
+        cache_key = self._make_http_cache_key(url, headers,
+                                              kwargs.get('username'))
+        entry = cache.get(cache_key)
+
+        if headers:
+            headers = headers.copy()
+        else:
+            headers = {}
+
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            data, response_headers = self.http_request(
+                url, headers=headers, method='GET', **kwargs)
+        except HTTPError as e:
+            if e.code == 304 and entry:
+                return entry['data'], CachedResponseHeaders(entry['headers'])
+
+            raise
+
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+
+        if etag or last_modified:
+            cache.set(
+                cache_key,
+                {
+                    'data': data,
+                    'etag': etag,
+                    'headers': list(response_headers.items()),
+                    'last_modified': last_modified,
+                },
+                self.http_cache_expiration)
+        elif entry:
+            cache.delete(cache_key)
+
+        return data, response_headers
+
+    def _make_http_cache_key(self, url, headers, username):
+        """Return the key for a response in the HTTP response cache.
+
+        The key covers everything that may change the response, including
+        any credentials, so different users never share cached responses.
+
+        Args:
+            url (unicode):
+                The URL being requested.
+
+            headers (dict):
+                The headers for the request.
+
+            username (unicode):
+                The username used for HTTP Basic Authentication, if any.
+
+        Returns:
+            unicode:
+            The cache key.
+        """
+        parts = [url, username or '']
+
+        for name, value in sorted(six.iteritems(headers or {})):
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+
+            parts.append('%s: %s' % (name.lower(), value))
+
+        return make_cache_key('hosting-http-cache:%s' % hashlib.sha256(
+            '\n'.join(parts).encode('utf-8')).hexdigest())
+
+    def _check_rate_limits(self, headers):
+        """Check the rate limit information in a response.
+
+        This records the remaining number of API requests allowed in
+        :py:attr:`rate_limit_remaining`. It's called for every response,
+        including errors and ``304 Not Modified`` responses. Subclasses can
+        override this to warn when the limit is running low.
+
+        Args:
+            headers (dict):
+                The response headers.
+        """
+        if not headers:
+            return
+
+        for header in self.rate_limit_headers:
+            value = headers.get(header)
+
+            if value is not None:
+                try:
+                    self.rate_limit_remaining = int(value)
+                except ValueError:
+                    pass
 
-        return response.read(), response.headers
+                break
 
     #
     # JSON utility methods
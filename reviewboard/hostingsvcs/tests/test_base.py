@@ -3,12 +3,17 @@
 from __future__ import unicode_literals
 
 import base64
+from io import BytesIO
 
-from django.utils.six.moves.urllib.request import (HTTPBasicAuthHandler,
-                                                   urlopen)
+from django.utils.six.moves.urllib.error import HTTPError
+from django.utils.six.moves.urllib.request import HTTPBasicAuthHandler
 from kgb import SpyAgency
 
-from reviewboard.hostingsvcs.service import HostingServiceClient, URLRequest
+from reviewboard.hostingsvcs.models import HostingServiceAccount
+from reviewboard.hostingsvcs.service import (CachedResponseHeaders,
+                                             HostingService,
+                                             HostingServiceClient,
+                                             URLRequest)
 from reviewboard.testing.testcase import TestCase
 
 
@@ -38,30 +43,100 @@ class URLRequestTests(TestCase):
         _test_basic_auth(self, request)
 
 
-class FakeResponse(object):
-    """A fake response from urllopen"""
-
-    def read(self):
-        return ''
-
-    @property
-    def headers(self):
-        return {}
-
-
 class HostingServiceClientTests(SpyAgency, TestCase):
     """Tests for HostingServiceClient"""
 
     def test_http_request_basic_auth(self):
         """Testing HostingServiceClient.http_request with basic auth"""
-        self.spy_on(urlopen, call_fake=lambda *args, **kwargs: FakeResponse())
-
         client = HostingServiceClient(None)
+        transport = client.http_transport
+
+        self.spy_on(transport.request,
+                    call_fake=lambda *args, **kwargs: (b'', {}))
+
         client.http_get('http://example.com',
                         username=b'username',
                         password=b'password')
 
-        self.assertTrue(urlopen.spy.called)
-        request = urlopen.spy.calls[0].args[0]
+        self.assertTrue(transport.request.spy.called)
+        request = transport.request.spy.calls[0].args[0]
 
         _test_basic_auth(self, request)
+
+    def test_http_transport_shared_per_account(self):
+        """Testing HostingServiceClient.http_transport is shared per hosting
+        account
+        """
+        service = HostingService(HostingServiceAccount(pk=1))
+        client1 = HostingServiceClient(service)
+        client2 = HostingServiceClient(service)
+        client3 = HostingServiceClient(
+            HostingService(HostingServiceAccount(pk=2)))
+
+        self.assertIs(client1.http_transport, client2.http_transport)
+        self.assertIsNot(client1.http_transport, client3.http_transport)
+
+    def test_http_get_with_http_cache(self):
+        """Testing HostingServiceClient.http_get with use_http_cache=True
+        serves unchanged responses from the cache
+        """
+        client = HostingServiceClient(None)
+        requests = []
+
+        def _request(request):
+            requests.append(request)
+
+            if len(requests) == 1:
+                return b'data', CachedResponseHeaders({
+                    'ETag': '"abc123"',
+                    'Link': '<http://example.com/?page=2>; rel="next"',
+                    'X-RateLimit-Remaining': '100',
+                })
+            else:
+                raise HTTPError(request.get_full_url(), 304, 'Not Modified',
+                                CachedResponseHeaders({
+                                    'X-RateLimit-Remaining': '99',
+                                }),
+                                BytesIO(b''))
+
+        self.spy_on(client.http_transport.request, call_fake=_request)
+
+        data, headers = client.http_get('http://example.com/',
+                                        use_http_cache=True)
+        self.assertEqual(data, b'data')
+        self.assertEqual(client.rate_limit_remaining, 100)
+
+        data, headers = client.http_get('http://example.com/',
+                                        use_http_cache=True)
+        self.assertEqual(data, b'data')
+        self.assertEqual(headers['link'],
+                         '<http://example.com/?page=2>; rel="next"')
+        self.assertEqual(client.rate_limit_remaining, 99)
+
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn('If-none-match', requests[0].headers)
+        self.assertEqual(requests[1].headers['If-none-match'], '"abc123"')
+
+    def test_http_get_with_http_cache_different_headers(self):
+        """Testing HostingServiceClient.http_get with use_http_cache=True
+        doesn't share cached responses between different credentials
+        """
+        client = HostingServiceClient(None)
+        requests = []
+
+        def _request(request):
+            requests.append(request)
+
+            return b'data', CachedResponseHeaders({
+                'Last-Modified': 'Tue, 01 Nov 2016 00:00:00 GMT',
+            })
+
+        self.spy_on(client.http_transport.request, call_fake=_request)
+
+        client.http_get('http://example.com/', headers={'Token': 'a'},
+                        use_http_cache=True)
+        client.http_get('http://example.com/', headers={'Token': 'b'},
+                        use_http_cache=True)
+
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn('If-modified-since', requests[1].headers)
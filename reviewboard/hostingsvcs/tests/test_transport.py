@@ -0,0 +1,252 @@
+"""Unit tests for reviewboard.hostingsvcs.transport."""
+
+from __future__ import unicode_literals
+
+import gzip
+import socket
+from io import BytesIO
+
+from django.utils.six.moves.urllib.error import HTTPError
+from django.utils.six.moves.urllib.request import getproxies
+from kgb import SpyAgency
+
+from reviewboard.hostingsvcs import transport as transport_module
+from reviewboard.hostingsvcs.service import URLRequest
+from reviewboard.hostingsvcs.transport import (HTTPConnectionPool,
+                                               HTTPTransport,
+                                               get_http_transport)
+from reviewboard.testing.testcase import TestCase
+
+
+class FakeHTTPResponse(object):
+    """A fake response from an HTTP connection."""
+
+    def __init__(self, status=200, data=b'', headers=None, will_close=False):
+        self.status = status
+        self.reason = 'Reason'
+        self.msg = headers or {}
+        self.will_close = will_close
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class FakeHTTPConnection(object):
+    """A fake HTTP connection returning canned responses."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+        self.closed = False
+
+    def request(self, method, path, body, headers):
+        self.requests.append((method, path, body, headers))
+
+    def getresponse(self):
+        response = self.responses.pop(0)
+
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+    def close(self):
+        self.closed = True
+
+
+class HTTPTransportTests(SpyAgency, TestCase):
+    """Unit tests for HTTPTransport."""
+
+    def setUp(self):
+        super(HTTPTransportTests, self).setUp()
+
+        self.transport = HTTPTransport(pool_size=2)
+        self.connections = []
+
+        # Make sure any proxies configured in the environment don't cause
+        # requests to go through urlopen.
+        self.spy_on(getproxies, call_fake=lambda: {})
+
+    def _set_responses(self, *response_lists):
+        """Set the responses returned by each new connection.
+
+        Args:
+            *response_lists (tuple):
+                A list of responses for each connection to be created.
+        """
+        response_lists = list(response_lists)
+
+        def _create_connection(pool):
+            conn = FakeHTTPConnection(response_lists.pop(0))
+            self.connections.append(conn)
+
+            return conn
+
+        self.spy_on(HTTPConnectionPool._create_connection,
+                    call_fake=_create_connection)
+
+    def test_request_reuses_connection(self):
+        """Testing HTTPTransport.request reuses keep-alive connections"""
+        self._set_responses([
+            FakeHTTPResponse(data=b'one'),
+            FakeHTTPResponse(data=b'two'),
+        ])
+
+        data1, headers1 = self.transport.request(
+            URLRequest('https://example.com/one?a=1'))
+        data2, headers2 = self.transport.request(
+            URLRequest('https://example.com/two'))
+
+        self.assertEqual(data1, b'one')
+        self.assertEqual(data2, b'two')
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(
+            [(method, path) for method, path, body, headers
+             in self.connections[0].requests],
+            [('GET', '/one?a=1'), ('GET', '/two')])
+
+    def test_request_with_will_close(self):
+        """Testing HTTPTransport.request doesn't reuse connections the server
+        is closing
+        """
+        self._set_responses(
+            [FakeHTTPResponse(data=b'one', will_close=True)],
+            [FakeHTTPResponse(data=b'two')])
+
+        self.transport.request(URLRequest('https://example.com/one'))
+        self.transport.request(URLRequest('https://example.com/two'))
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_request_retries_stale_connection(self):
+        """Testing HTTPTransport.request retries idempotent requests when a
+        pooled connection was closed by the server
+        """
+        self._set_responses(
+            [
+                FakeHTTPResponse(data=b'one'),
+                socket.error('Connection reset by peer'),
+            ],
+            [FakeHTTPResponse(data=b'two')])
+
+        self.transport.request(URLRequest('https://example.com/one'))
+        data, headers = self.transport.request(
+            URLRequest('https://example.com/two'))
+
+        self.assertEqual(data, b'two')
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_request_post_uses_new_connection(self):
+        """Testing HTTPTransport.request sends POST requests on a new
+        connection
+        """
+        self._set_responses(
+            [FakeHTTPResponse(data=b'one')],
+            [FakeHTTPResponse(data=b'two')])
+
+        self.transport.request(URLRequest('https://example.com/one'))
+        data, headers = self.transport.request(
+            URLRequest('https://example.com/two', body=b'data',
+                       method='POST'))
+
+        self.assertEqual(data, b'two')
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1].requests[0][0], 'POST')
+
+    def test_request_with_gzip(self):
+        """Testing HTTPTransport.request with gzip-encoded responses"""
+        buf = BytesIO()
+
+        with gzip.GzipFile(fileobj=buf, mode='wb') as fp:
+            fp.write(b'compressed data')
+
+        self._set_responses([
+            FakeHTTPResponse(data=buf.getvalue(),
+                             headers={
+                                 'content-encoding': 'gzip',
+                                 'content-length': '%d' % len(buf.getvalue()),
+                             }),
+        ])
+
+        data, headers = self.transport.request(
+            URLRequest('https://example.com/'))
+
+        self.assertEqual(data, b'compressed data')
+        self.assertNotIn('content-encoding', headers)
+        self.assertEqual(headers['content-length'], '15')
+        self.assertEqual(
+            self.connections[0].requests[0][3]['Accept-Encoding'],
+            'gzip')
+
+    def test_request_without_gzip(self):
+        """Testing HTTPTransport.request with use_gzip=False"""
+        self.transport = HTTPTransport(use_gzip=False)
+        self._set_responses([FakeHTTPResponse()])
+
+        self.transport.request(URLRequest('https://example.com/'))
+
+        self.assertNotIn('Accept-Encoding',
+                         self.connections[0].requests[0][3])
+
+    def test_request_with_redirect(self):
+        """Testing HTTPTransport.request follows redirects"""
+        self._set_responses([
+            FakeHTTPResponse(status=302,
+                             headers={'location': '/new'}),
+            FakeHTTPResponse(data=b'moved'),
+        ])
+
+        data, headers = self.transport.request(
+            URLRequest('https://example.com/old'))
+
+        self.assertEqual(data, b'moved')
+        self.assertEqual(self.connections[0].requests[1][1], '/new')
+
+    def test_request_with_http_error(self):
+        """Testing HTTPTransport.request raises HTTPError for error
+        responses
+        """
+        self._set_responses([
+            FakeHTTPResponse(status=404, data=b'Not found'),
+        ])
+
+        with self.assertRaises(HTTPError) as cm:
+            self.transport.request(URLRequest('https://example.com/'))
+
+        self.assertEqual(cm.exception.code, 404)
+        self.assertEqual(cm.exception.read(), b'Not found')
+
+    def test_get_http_transport_shared(self):
+        """Testing get_http_transport returns shared transports"""
+        self.assertIs(get_http_transport(key=('test', 1)),
+                      get_http_transport(key=('test', 1)))
+        self.assertIsNot(get_http_transport(key=('test', 1)),
+                         get_http_transport(key=('test', 2)))
+        self.assertIsNot(get_http_transport(key=('test', 1)),
+                         get_http_transport(key=('test', 1), timeout=5))
+
+    def test_get_http_transport_evicts(self):
+        """Testing get_http_transport drops the least recently used
+        transports
+        """
+        self.spy_on(HTTPTransport.close)
+        transport_module._transports.clear()
+        self.addCleanup(transport_module._transports.clear)
+
+        old_max = transport_module.MAX_SHARED_TRANSPORTS
+        transport_module.MAX_SHARED_TRANSPORTS = 2
+        self.addCleanup(setattr, transport_module, 'MAX_SHARED_TRANSPORTS',
+                        old_max)
+
+        transport1 = get_http_transport(key=('test', 1))
+        get_http_transport(key=('test', 2))
+        self.assertIs(get_http_transport(key=('test', 1)), transport1)
+
+        get_http_transport(key=('test', 3))
+
+        self.assertEqual(len(transport_module._transports), 2)
+        self.assertIs(get_http_transport(key=('test', 1)), transport1)
+        self.assertTrue(HTTPTransport.close.called)
@@ -0,0 +1,438 @@
+"""Pooled HTTP transport used by hosting service clients.
+
+Opening a new connection for every API call means a new TCP (and usually TLS)
+handshake for every file, commit page or existence check fetched from a
+hosting service. On a diff viewer fetching hundreds of files, that overhead
+dominates the time spent talking to the service.
+
+:py:class:`HTTPTransport` keeps a small pool of keep-alive connections for
+each server it talks to, and can be safely shared between threads. Transports
+are shared between all clients for the same hosting service account (see
+:py:func:`get_http_transport`).
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+import zlib
+from collections import OrderedDict
+from io import BytesIO
+
+from django.utils import six
+from django.utils.six.moves import http_client
+from django.utils.six.moves.urllib.error import HTTPError, URLError
+from django.utils.six.moves.urllib.parse import urljoin, urlparse
+from django.utils.six.moves.urllib.request import getproxies, urlopen
+
+
+#: The HTTP methods that may be sent on a reused keep-alive connection.
+#:
+#: If a reused connection turns out to have been closed by the server, these
+#: are retried once on a new connection. A failure on a reused connection
+#: can't be told apart from the server having processed the request, so all
+#: other methods (such as ``POST``, ``PUT`` and ``PATCH``) are always sent
+#: on a new connection.
+POOLED_METHODS = ('DELETE', 'GET', 'HEAD', 'OPTIONS')
+
+#: The maximum number of redirects followed for a request.
+MAX_REDIRECTS = 5
+
+#: The maximum number of shared transports kept by get_http_transport.
+MAX_SHARED_TRANSPORTS = 100
+
+
+_transports = OrderedDict()
+_transports_lock = threading.Lock()
+
+
+class HTTPConnectionPool(object):
+    """A pool of keep-alive connections to a single server.
+
+    Connections are handed out by :py:meth:`get_connection` and returned by
+    :py:meth:`release_connection`. Up to :py:attr:`max_size` idle connections
+    are kept open. If more connections are needed at once, new ones will be
+    opened, and closed again when released.
+    """
+
+    def __init__(self, scheme, host, port, max_size, timeout):
+        """Initialize the pool.
+
+        Args:
+            scheme (unicode):
+                The URL scheme (``http`` or ``https``).
+
+            host (unicode):
+                The hostname of the server.
+
+            port (int):
+                The port of the server, or ``None`` for the default.
+
+            max_size (int):
+                The maximum number of idle connections to keep open.
+
+            timeout (float):
+                The socket timeout for connections, in seconds.
+        """
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get_connection(self, reuse=True):
+        """Return a connection to the server.
+
+        Args:
+            reuse (bool, optional):
+                Whether an idle connection from the pool may be returned.
+                If ``False``, a new connection will always be opened.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the connection and a boolean indicating if
+            the connection was reused from the pool.
+        """
+        if reuse:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop(), True
+
+        return self._create_connection(), False
+
+    def _create_connection(self):
+        """Return a new connection to the server.
+
+        Returns:
+            httplib.HTTPConnection:
+            The new connection. It will connect on first use.
+        """
+        if self.scheme == 'https':
+            conn_cls = http_client.HTTPSConnection
+        else:
+            conn_cls = http_client.HTTPConnection
+
+        return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def release_connection(self, conn):
+        """Return a connection to the pool.
+
+        If the pool is already full, the connection will be closed.
+
+        Args:
+            conn (httplib.HTTPConnection):
+                The connection to return.
+        """
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(conn)
+                return
+
+        conn.close()
+
+    def close(self):
+        """Close all idle connections in the pool."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+
+        for conn in idle:
+            conn.close()
+
+
+class HTTPTransport(object):
+    """A thread-safe HTTP transport using pools of keep-alive connections.
+
+    This behaves like :py:func:`urllib2.urlopen` as far as callers are
+    concerned: redirects are followed, non-2xx responses are raised as
+    :py:class:`urllib2.HTTPError`, and connection errors are raised as
+    :py:class:`urllib2.URLError`.
+
+    If a proxy is configured for a URL's scheme, requests will go through
+    :py:func:`urllib2.urlopen` instead, so proxy settings are respected.
+    """
+
+    def __init__(self, pool_size=4, timeout=60, use_gzip=True):
+        """Initialize the transport.
+
+        Args:
+            pool_size (int, optional):
+                The maximum number of idle connections kept open for each
+                server.
+
+            timeout (float, optional):
+                The socket timeout for connections, in seconds.
+
+            use_gzip (bool, optional):
+                Whether to ask servers to compress responses.
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.use_gzip = use_gzip
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def request(self, request):
+        """Perform an HTTP request.
+
+        Args:
+            request (reviewboard.hostingsvcs.service.URLRequest):
+                The request to perform.
+
+        Returns:
+            tuple:
+            A tuple of:
+
+            * The response body (:py:class:`bytes`)
+            * The response headers (:py:class:`httplib.HTTPMessage`)
+
+        Raises:
+            urllib2.HTTPError:
+                When the HTTP request fails.
+
+            urllib2.URLError:
+                When there is an error communicating with the URL.
+        """
+        url = request.get_full_url()
+
+        if urlparse(url).scheme in getproxies():
+            response = urlopen(request)
+
+            return response.read(), response.headers
+
+        method = request.get_method()
+        body = request.data
+        headers = dict(request.header_items())
+
+        for i in range(MAX_REDIRECTS + 1):
+            status, reason, data, response_headers = self._send(
+                url, method, body, headers)
+
+            location = response_headers.get('location')
+
+            if status not in (301, 302, 303, 307) or not location:
+                break
+
+            if status != 307 and method not in ('GET', 'HEAD'):
+                # As with urllib2, redirected POSTs become GETs.
+                method = 'GET'
+                body = None
+                headers = dict(
+                    (key, value)
+                    for key, value in six.iteritems(headers)
+                    if key.lower() not in ('content-length', 'content-type')
+                )
+
+            url = urljoin(url, location)
+        else:
+            raise HTTPError(url, status,
+                            'Too many redirects (last was "%s")' % reason,
+                            response_headers, BytesIO(data))
+
+        if not (200 <= status < 300):
+            # As with urllib2, any other status (including 304 Not Modified)
+            # is raised as an error.
+            raise HTTPError(url, status, reason, response_headers,
+                            BytesIO(data))
+
+        return data, response_headers
+
+    def close(self):
+        """Close all idle connections held by the transport."""
+        with self._lock:
+            pools = list(self._pools.values())
+
+        for pool in pools:
+            pool.close()
+
+    def _get_pool(self, scheme, host, port):
+        """Return the connection pool for a server.
+
+        Args:
+            scheme (unicode):
+                The URL scheme.
+
+            host (unicode):
+                The hostname of the server.
+
+            port (int):
+                The port of the server, or ``None`` for the default.
+
+        Returns:
+            HTTPConnectionPool:
+            The connection pool.
+        """
+        key = (scheme, host, port)
+
+        with self._lock:
+            try:
+                return self._pools[key]
+            except KeyError:
+                pool = HTTPConnectionPool(scheme, host, port,
+                                          max_size=self.pool_size,
+                                          timeout=self.timeout)
+                self._pools[key] = pool
+
+                return pool
+
+    def _send(self, url, method, body, headers):
+        """Send a single request and read the response.
+
+        Requests using one of :py:data:`POOLED_METHODS` may be sent on a
+        pooled connection. If that connection turns out to have been closed
+        by the server, the request will be retried once on a new connection.
+        Other requests are always sent on a new connection.
+
+        Args:
+            url (unicode):
+                The URL to request.
+
+            method (unicode):
+                The HTTP method.
+
+            body (bytes):
+                The request body, if any.
+
+            headers (dict):
+                The request headers.
+
+        Returns:
+            tuple:
+            A 4-tuple containing the status code, reason, response body
+            and response headers.
+
+        Raises:
+            urllib2.URLError:
+                There was an error communicating with the server.
+        """
+        parsed = urlparse(url)
+
+        if parsed.scheme not in ('http', 'https'):
+            raise URLError('Unsupported URL scheme "%s"' % parsed.scheme)
+
+        pool = self._get_pool(parsed.scheme, parsed.hostname, parsed.port)
+        path = parsed.path or '/'
+
+        if parsed.query:
+            path = '%s?%s' % (path, parsed.query)
+
+        headers = headers.copy()
+        requested_gzip = (
+            self.use_gzip and
+            method != 'HEAD' and
+            not any(key.lower() == 'accept-encoding' for key in headers))
+
+        if requested_gzip:
+            headers['Accept-Encoding'] = 'gzip'
+
+        can_reuse = method in POOLED_METHODS
+
+        while True:
+            conn, reused = pool.get_connection(reuse=can_reuse)
+
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (socket.error, http_client.HTTPException) as e:
+                conn.close()
+
+                if reused:
+                    logging.debug('Pooled connection to %s was closed (%s); '
+                                  'retrying on a new connection',
+                                  parsed.netloc, e)
+                    continue
+
+                raise URLError(e)
+
+            break
+
+        if response.will_close:
+            conn.close()
+        else:
+            pool.release_connection(conn)
+
+        response_headers = response.msg
+
+        if (requested_gzip and
+            response_headers.get('content-encoding', '').lower() == 'gzip'):
+            try:
+                data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+            except zlib.error as e:
+                raise URLError('Unable to decompress the response from '
+                               '%s: %s' % (url, e))
+
+            # Callers get the decompressed body, so the headers shouldn't
+            # describe the compressed one.
+            del response_headers['content-encoding']
+
+            if 'content-length' in response_headers:
+                del response_headers['content-length']
+                response_headers['content-length'] = '%d' % len(data)
+
+        return response.status, response.reason, data, response_headers
+
+
+def get_http_transport(key=None, pool_size=4, timeout=60, use_gzip=True):
+    """Return a shared HTTP transport.
+
+    Transports are shared between all callers passing the same key and
+    settings. Hosting service clients use the ID of the hosting service
+    account as the key, so connections are pooled per account.
+
+    Up to :py:data:`MAX_SHARED_TRANSPORTS` transports are kept. Beyond that,
+    the least recently used transport is dropped and its idle connections
+    are closed.
+
+    Args:
+        key (object, optional):
+            A hashable key identifying who the transport is for.
+
+        pool_size (int, optional):
+            The maximum number of idle connections kept open for each server.
+
+        timeout (float, optional):
+            The socket timeout for connections, in seconds.
+
+        use_gzip (bool, optional):
+            Whether to ask servers to compress responses.
+
+    Returns:
+        HTTPTransport:
+        The shared transport.
+    """
+    full_key = (key, pool_size, timeout, use_gzip)
+    evicted = []
+
+    with _transports_lock:
+        try:
+            transport = _transports.pop(full_key)
+        except KeyError:
+            transport = HTTPTransport(pool_size=pool_size,
+                                      timeout=timeout,
+                                      use_gzip=use_gzip)
+
+            while len(_transports) >= MAX_SHARED_TRANSPORTS:
+                evicted.append(_transports.popitem(last=False)[1])
+
+        # Re-insert the transport so it's the most recently used.
+        _transports[full_key] = transport
+
+    for old_transport in evicted:
+        old_transport.close()
+
+    return transport
+
+
+def close_http_transports():
+    """Close all idle connections in all shared transports."""
+    with _transports_lock:
+        transports = list(_transports.values())
+
+    for transport in transports:
+        transport.close()
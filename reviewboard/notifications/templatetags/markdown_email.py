@@ -1,40 +1,46 @@
 from __future__ import unicode_literals
 
-import markdown
 from django import template
 from django.utils.safestring import mark_safe
 from djblets.markdown import markdown_unescape
 
+from reviewboard.reviews.markdown_cache import get_rendered_markdown
+
 
 register = template.Library()
 
 
+# Keyword arguments used when rendering Markdown for e-mails.
+#
+# We use XHTML1 instead of HTML5 to ensure the results can be parsed by
+# an XML parser. This is actually needed for the main Markdown renderer
+# for the web UI, but consistency is good here.
+MARKDOWN_EMAIL_KWARGS = {
+    'output_format': 'xhtml1',
+    'extensions': [
+        'markdown.extensions.fenced_code',
+        'markdown.extensions.codehilite',
+        'markdown.extensions.tables',
+        'markdown.extensions.sane_lists',
+        'markdown.extensions.smart_strong',
+        'pymdownx.tilde',
+        'djblets.markdown.extensions.escape_html',
+        'djblets.markdown.extensions.wysiwyg_email',
+    ],
+    'extension_configs': {
+        'codehilite': {
+            'noclasses': True,
+        },
+    },
+}
+
+
 @register.filter
 def markdown_email_html(text, is_rich_text):
     if not is_rich_text:
         return text
 
-    # We use XHTML1 instead of HTML5 to ensure the results can be parsed by
-    # an XML parser. This is actually needed for the main Markdown renderer
-    # for the web UI, but consistency is good here.
-    return mark_safe(markdown.markdown(
-        text,
-        output_format='xhtml1',
-        extensions=[
-            'markdown.extensions.fenced_code',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.tables',
-            'markdown.extensions.sane_lists',
-            'markdown.extensions.smart_strong',
-            'pymdownx.tilde',
-            'djblets.markdown.extensions.escape_html',
-            'djblets.markdown.extensions.wysiwyg_email',
-        ],
-        extension_configs={
-            'codehilite': {
-                'noclasses': True,
-            },
-        }))
+    return mark_safe(get_rendered_markdown(text, MARKDOWN_EMAIL_KWARGS))
 
 
 @register.filter
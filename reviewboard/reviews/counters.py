@@ -0,0 +1,486 @@
+"""Batched maintenance of review request counters.
+
+Review requests keep several counters up to date as they're created,
+published, closed, reopened and deleted:
+
+* The outgoing and incoming counters on
+  :py:class:`~reviewboard.accounts.models.LocalSiteProfile`.
+* The incoming counter on :py:class:`~reviewboard.reviews.models.Group`.
+
+Rather than updating these as each change is made, changes are recorded as
+deltas in a :py:class:`CounterUpdateBatch` while inside a
+:py:func:`deferred_counter_updates` block. When the outermost block finishes,
+the deltas for each counter are summed, and all profiles or groups sharing
+the same set of deltas are updated with a single ``UPDATE`` statement.
+
+Deltas that cancel out (such as the decrement and increment of every
+reviewer's counters when re-publishing a review request with the same
+reviewers) don't result in any writes at all.
+"""
+
+from __future__ import unicode_literals
+
+import threading
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+
+from django.db.models import Count, F
+from django.utils import six
+
+from reviewboard.datagrids.sidebar_cache import (
+    invalidate_group_sidebar_counts,
+    invalidate_user_sidebar_counts)
+
+
+_local = threading.local()
+
+
+#: A counter whose stored value doesn't match its computed value.
+#:
+#: ``model`` is the model class owning the counter, ``pk`` is the ID of the
+#: instance, ``field_name`` is the name of the counter, and ``stored`` and
+#: ``expected`` are the stored and computed values.
+CounterDrift = namedtuple('CounterDrift',
+                          ['model', 'pk', 'field_name', 'stored', 'expected'])
+
+
+class CounterUpdateBatch(object):
+    """A batch of pending counter changes.
+
+    Attributes:
+        site_profile_deltas (dict):
+            A mapping of ``(user_id, local_site_id)`` to a dictionary mapping
+            :py:class:`~reviewboard.accounts.models.LocalSiteProfile` counter
+            field names to the amount they'll change by.
+
+        group_deltas (dict):
+            A mapping of group IDs to the amount their
+            ``incoming_request_count`` will change by.
+
+        ensure_profiles (set):
+            A set of ``(user_id, local_site_id)`` tuples for profiles that
+            must exist once the batch is applied.
+    """
+
+    def __init__(self):
+        """Initialize the batch."""
+        self.site_profile_deltas = defaultdict(lambda: defaultdict(int))
+        self.group_deltas = defaultdict(int)
+        self.ensure_profiles = set()
+        self._pending_reviewer_changes = []
+
+    def add_site_profile_delta(self, user_id, local_site_id, field_name,
+                               delta, ensure_exists=False):
+        """Record a change to a LocalSiteProfile counter.
+
+        Args:
+            user_id (int):
+                The ID of the user owning the profile.
+
+            local_site_id (int):
+                The ID of the profile's Local Site, or ``None``.
+
+            field_name (unicode):
+                The name of the counter field.
+
+            delta (int):
+                The amount to change the counter by.
+
+            ensure_exists (bool, optional):
+                Whether to create the profile if it doesn't exist when the
+                batch is applied.
+        """
+        key = (user_id, local_site_id)
+        self.site_profile_deltas[key][field_name] += delta
+
+        if ensure_exists:
+            self.ensure_profiles.add(key)
+
+    def add_reviewer_delta(self, review_request, delta):
+        """Record a change to the incoming counters for a review request.
+
+        This will change the counters for the review request's target groups,
+        the target people, members of the target groups, and users who have
+        starred the review request.
+
+        The reviewers are looked up immediately, since they may change
+        before the batch is applied (for instance, when publishing a draft).
+
+        Args:
+            review_request (reviewboard.reviews.models.ReviewRequest):
+                The review request.
+
+            delta (int):
+                The amount to change the counters by.
+        """
+        from reviewboard.accounts.models import Profile
+
+        self._pending_reviewer_changes.append((
+            review_request.local_site_id,
+            delta,
+            list(review_request.target_groups.values_list('pk', flat=True)),
+            list(review_request.target_people.values_list('pk', flat=True)),
+            list(Profile.objects
+                 .filter(starred_review_requests=review_request)
+                 .values_list('user_id', flat=True)),
+        ))
+
+    def apply(self):
+        """Apply all changes in the batch to the database."""
+        self._compute_reviewer_deltas()
+        self._apply_group_deltas()
+        self._apply_site_profile_deltas()
+
+    def _compute_reviewer_deltas(self):
+        """Convert the recorded reviewer changes into counter deltas."""
+        if not self._pending_reviewer_changes:
+            return
+
+        from reviewboard.reviews.models import Group
+
+        group_ids = set()
+
+        for local_site_id, delta, target_group_ids, user_ids, starred_ids in \
+                self._pending_reviewer_changes:
+            group_ids.update(target_group_ids)
+
+        group_members = defaultdict(set)
+
+        if group_ids:
+            for group_id, user_id in (Group.users.through.objects
+                                      .filter(group__in=group_ids)
+                                      .values_list('group_id', 'user_id')):
+                group_members[group_id].add(user_id)
+
+        for local_site_id, delta, target_group_ids, user_ids, starred_ids in \
+                self._pending_reviewer_changes:
+            total_user_ids = set(user_ids)
+
+            for group_id in target_group_ids:
+                self.group_deltas[group_id] += delta
+                total_user_ids.update(group_members[group_id])
+
+            for user_id in set(user_ids):
+                self.add_site_profile_delta(user_id, local_site_id,
+                                            'direct_incoming_request_count',
+                                            delta)
+
+            for user_id in total_user_ids:
+                self.add_site_profile_delta(user_id, local_site_id,
+                                            'total_incoming_request_count',
+                                            delta)
+
+            for user_id in set(starred_ids):
+                self.add_site_profile_delta(user_id, local_site_id,
+                                            'starred_public_request_count',
+                                            delta)
+
+        self._pending_reviewer_changes = []
+
+    def _apply_group_deltas(self):
+        """Apply the changes to group counters."""
+        from reviewboard.reviews.models import Group
+
+        groups_by_delta = defaultdict(list)
+
+        for group_id, delta in six.iteritems(self.group_deltas):
+            if delta != 0:
+                groups_by_delta[delta].append(group_id)
+
+        for delta, group_ids in six.iteritems(groups_by_delta):
+            Group.objects.filter(pk__in=group_ids).update(
+                incoming_request_count=F('incoming_request_count') + delta)
+
+        if self.group_deltas:
+            invalidate_group_sidebar_counts(list(self.group_deltas))
+
+    def _apply_site_profile_deltas(self):
+        """Apply the changes to LocalSiteProfile counters."""
+        from django.contrib.auth.models import User
+
+        from reviewboard.accounts.models import LocalSiteProfile, Profile
+
+        # Group together all profiles that will have the exact same changes
+        # made to their counters, so they can be updated at once.
+        users_by_deltas = defaultdict(list)
+
+        for (user_id, local_site_id), deltas in \
+                six.iteritems(self.site_profile_deltas):
+            deltas = tuple(sorted(
+                (field_name, delta)
+                for field_name, delta in six.iteritems(deltas)
+                if delta != 0
+            ))
+
+            if deltas:
+                users_by_deltas[(local_site_id, deltas)].append(user_id)
+
+        updated = set()
+
+        for (local_site_id, deltas), user_ids in \
+                six.iteritems(users_by_deltas):
+            queryset = LocalSiteProfile.objects.filter(
+                local_site=local_site_id,
+                user__in=user_ids)
+
+            if self.ensure_profiles.intersection(
+                    (user_id, local_site_id) for user_id in user_ids):
+                updated.update(
+                    (user_id, local_site_id)
+                    for user_id in queryset.values_list('user_id', flat=True)
+                )
+
+            queryset.update(**dict(
+                (field_name, F(field_name) + delta)
+                for field_name, delta in deltas
+            ))
+
+        # Any profiles that must exist but weren't updated need to be
+        # created. Their counters will be initialized the first time they're
+        # loaded, so the deltas don't need to be applied to them.
+        for user_id, local_site_id in self.ensure_profiles - updated:
+            profile = Profile.objects.get_or_create(user=User(pk=user_id))[0]
+            LocalSiteProfile.objects.get_or_create(
+                user_id=user_id,
+                profile=profile,
+                local_site_id=local_site_id)
+
+        if self.site_profile_deltas:
+            invalidate_user_sidebar_counts([
+                user_id
+                for user_id, local_site_id in self.site_profile_deltas
+            ])
+
+
+def get_counter_update_batch():
+    """Return the active batch of counter updates.
+
+    Returns:
+        CounterUpdateBatch:
+        The active batch, or ``None`` if not inside a
+        :py:func:`deferred_counter_updates` block.
+    """
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def deferred_counter_updates():
+    """Defer counter updates until the end of a block.
+
+    Counter changes made through the active :py:class:`CounterUpdateBatch`
+    within the block will be applied when the block finishes. If the block
+    is nested inside another, the changes will be applied when the outermost
+    block finishes.
+
+    If the block raises an exception, the changes are discarded.
+
+    Context:
+        CounterUpdateBatch:
+        The batch collecting the counter changes.
+    """
+    batch = get_counter_update_batch()
+
+    if batch is not None:
+        yield batch
+        return
+
+    batch = CounterUpdateBatch()
+    _local.batch = batch
+
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+
+    batch.apply()
+
+
+def _compute_expected_counts():
+    """Compute the expected values of all review request counters.
+
+    These match the values computed by the counter initializers on
+    :py:class:`~reviewboard.accounts.models.LocalSiteProfile` and
+    :py:class:`~reviewboard.reviews.models.Group`, but are computed using a
+    fixed number of queries, rather than several queries per profile and
+    group.
+
+    Returns:
+        tuple:
+        A 2-tuple containing a dictionary mapping ``(user_id, local_site_id)``
+        to a dictionary of expected counter values, and a dictionary mapping
+        group IDs to their expected incoming request counts.
+    """
+    from reviewboard.accounts.models import Profile
+    from reviewboard.reviews.models import Group, ReviewRequest
+
+    site_profile_counts = defaultdict(lambda: defaultdict(int))
+
+    # Outgoing review requests include unpublished ones.
+    outgoing = (
+        ReviewRequest.objects
+        .filter(submitter__is_active=True)
+        .values('submitter', 'local_site', 'status')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+
+    for item in outgoing:
+        counts = site_profile_counts[(item['submitter'], item['local_site'])]
+        counts['total_outgoing_request_count'] += item['count']
+
+        if item['status'] == ReviewRequest.PENDING_REVIEW:
+            counts['pending_outgoing_request_count'] += item['count']
+
+    # Incoming review requests only include open, published review requests.
+    open_review_requests = dict(
+        ReviewRequest.objects
+        .filter(public=True,
+                status=ReviewRequest.PENDING_REVIEW,
+                submitter__is_active=True)
+        .values_list('pk', 'local_site_id'))
+    publicly_visible_ids = set(
+        ReviewRequest.objects
+        .public(user=None, show_all_local_sites=True)
+        .values_list('pk', flat=True))
+    profile_user_ids = dict(Profile.objects.values_list('pk', 'user_id'))
+
+    group_members = defaultdict(list)
+
+    for group_id, user_id in (Group.users.through.objects
+                              .values_list('group_id', 'user_id')):
+        group_members[group_id].append(user_id)
+
+    direct_ids = defaultdict(set)
+    group_ids = defaultdict(set)
+    starred_public_ids = defaultdict(set)
+
+    for review_request_id, user_id in (ReviewRequest.target_people.through
+                                       .objects
+                                       .values_list('reviewrequest_id',
+                                                    'user_id')):
+        if review_request_id in open_review_requests:
+            direct_ids[user_id].add(review_request_id)
+
+    for profile_id, review_request_id in (Profile.starred_review_requests
+                                          .through.objects
+                                          .values_list('profile_id',
+                                                       'reviewrequest_id')):
+        user_id = profile_user_ids[profile_id]
+
+        if review_request_id in open_review_requests:
+            direct_ids[user_id].add(review_request_id)
+
+        if review_request_id in publicly_visible_ids:
+            starred_public_ids[user_id].add(review_request_id)
+
+    group_counts = defaultdict(int)
+    group_local_site_ids = dict(Group.objects.values_list('pk',
+                                                          'local_site_id'))
+
+    for review_request_id, group_id in (ReviewRequest.target_groups.through
+                                        .objects
+                                        .values_list('reviewrequest_id',
+                                                     'group_id')):
+        if (review_request_id in open_review_requests and
+            (open_review_requests[review_request_id] ==
+             group_local_site_ids[group_id])):
+            group_counts[group_id] += 1
+
+            for user_id in group_members[group_id]:
+                group_ids[user_id].add(review_request_id)
+
+    for user_id, review_request_ids in six.iteritems(direct_ids):
+        for review_request_id in review_request_ids:
+            key = (user_id, open_review_requests[review_request_id])
+            site_profile_counts[key]['direct_incoming_request_count'] += 1
+
+    for user_id in set(direct_ids) | set(group_ids):
+        for review_request_id in direct_ids[user_id] | group_ids[user_id]:
+            key = (user_id, open_review_requests[review_request_id])
+            site_profile_counts[key]['total_incoming_request_count'] += 1
+
+    for user_id, review_request_ids in six.iteritems(starred_public_ids):
+        for review_request_id in review_request_ids:
+            key = (user_id, open_review_requests[review_request_id])
+            site_profile_counts[key]['starred_public_request_count'] += 1
+
+    return site_profile_counts, group_counts
+
+
+def find_counter_drift(fix=False):
+    """Find review request counters that don't match their computed values.
+
+    Unlike :py:func:`~reviewboard.accounts.admin.fix_review_counts`, which
+    resets every counter so they're recomputed one at a time as they're
+    loaded, this computes all counters up-front using aggregate queries and
+    only reports (and optionally fixes) the ones that are wrong.
+
+    Counters that haven't yet been initialized are skipped.
+
+    Args:
+        fix (bool, optional):
+            Whether to update any incorrect counters with their computed
+            values.
+
+    Returns:
+        list of CounterDrift:
+        The counters with incorrect values.
+    """
+    from reviewboard.accounts.models import LocalSiteProfile
+    from reviewboard.reviews.models import Group
+
+    counter_fields = [
+        'direct_incoming_request_count',
+        'total_incoming_request_count',
+        'pending_outgoing_request_count',
+        'total_outgoing_request_count',
+        'starred_public_request_count',
+    ]
+
+    site_profile_counts, group_counts = _compute_expected_counts()
+    drift = []
+
+    for row in LocalSiteProfile.objects.values_list('pk', 'user_id',
+                                                    'local_site_id',
+                                                    *counter_fields):
+        pk, user_id, local_site_id = row[:3]
+        expected_counts = site_profile_counts.get((user_id, local_site_id),
+                                                  {})
+
+        for field_name, stored in zip(counter_fields, row[3:]):
+            expected = expected_counts.get(field_name, 0)
+
+            if stored is not None and stored != expected:
+                drift.append(CounterDrift(LocalSiteProfile, pk, field_name,
+                                          stored, expected))
+
+    for pk, stored in Group.objects.values_list('pk',
+                                                'incoming_request_count'):
+        expected = group_counts.get(pk, 0)
+
+        if stored is not None and stored != expected:
+            drift.append(CounterDrift(Group, pk, 'incoming_request_count',
+                                      stored, expected))
+
+    if fix and drift:
+        updates = defaultdict(dict)
+
+        for item in drift:
+            updates[(item.model, item.pk)][item.field_name] = item.expected
+
+        for (model, pk), values in six.iteritems(updates):
+            model.objects.filter(pk=pk).update(**values)
+
+        invalidate_group_sidebar_counts([
+            item.pk
+            for item in drift
+            if item.model is Group
+        ])
+        invalidate_user_sidebar_counts(
+            LocalSiteProfile.objects
+            .filter(pk__in=[item.pk
+                            for item in drift
+                            if item.model is LocalSiteProfile])
+            .values_list('user_id', flat=True))
+
+    return drift
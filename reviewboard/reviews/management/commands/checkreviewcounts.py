@@ -0,0 +1,39 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from reviewboard.reviews.counters import find_counter_drift
+
+
+class Command(NoArgsCommand):
+    help = ('Checks all review request-related counters against their '
+            'computed values, reporting any that are incorrect.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--fix',
+                    action='store_true',
+                    default=False,
+                    dest='fix',
+                    help='Updates any incorrect counters with their '
+                         'computed values.'),
+    )
+
+    def handle_noargs(self, **options):
+        fix = options.get('fix')
+        drift = find_counter_drift(fix=fix)
+
+        for item in drift:
+            self.stdout.write('%s %s: %s is %s, expected %s'
+                              % (item.model._meta.verbose_name, item.pk,
+                                 item.field_name, item.stored,
+                                 item.expected))
+
+        if not drift:
+            self.stdout.write('All counters are correct.')
+        elif fix:
+            self.stdout.write('%d incorrect counter(s) fixed.' % len(drift))
+        else:
+            self.stdout.write('%d incorrect counter(s) found. Run with --fix '
+                              'to correct them.' % len(drift))
@@ -10,6 +10,7 @@ from django.db.models.query import QuerySet
 from django.utils import six
 from djblets.db.managers import ConcurrencyManager
 
+from reviewboard.accounts.access_cache import get_accessible_ids
 from reviewboard.diffviewer.models import DiffSetHistory
 from reviewboard.scmtools.errors import ChangeNumberInUseError
 from reviewboard.scmtools.models import Repository
@@ -53,9 +54,19 @@ class ReviewGroupManager(Manager):
 
         return qs.filter(local_site=local_site)
 
-    def accessible_ids(self, *args, **kwargs):
-        """Return IDs of groups that are accessible by the given user."""
-        return self.accessible(*args, **kwargs).values_list('pk', flat=True)
+    def accessible_ids(self, user, visible_only=True, local_site=None):
+        """Return IDs of groups that are accessible by the given user.
+
+        The result is remembered for the rest of the request (see
+        :py:mod:`reviewboard.accounts.access_cache`). If the user can access
+        too many groups, this returns a subquery instead of a list.
+        """
+        return get_accessible_ids(
+            'group', user, visible_only, local_site,
+            lambda: (self.accessible(user,
+                                     visible_only=visible_only,
+                                     local_site=local_site)
+                     .values_list('pk', flat=True)))
 
     def can_create(self, user, local_site=None):
         """Returns whether the user can create groups."""
@@ -363,8 +374,8 @@ class ReviewRequestManager(ConcurrencyManager):
                     Repository.objects.accessible_ids(user, visible_only=False,
                                                       local_site=local_site)
                 accessible_group_ids = \
-                    Group.objects.accessible(user, visible_only=False,
-                                             local_site=local_site)
+                    Group.objects.accessible_ids(user, visible_only=False,
+                                                 local_site=local_site)
 
                 repo_query = repo_query | Q(repository__in=accessible_repo_ids)
                 group_query = (group_query |
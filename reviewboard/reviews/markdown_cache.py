@@ -0,0 +1,180 @@
+"""Caching for rendered Markdown.
+
+Rendering Markdown is one of the most expensive parts of showing a review
+request. Every review body, comment and change description is rendered each
+time a page is shown, an e-mail is sent, or the API is asked for HTML.
+
+:py:func:`get_rendered_markdown` caches the rendered HTML by a hash of the
+source text and the renderer configuration. Since the key depends only on the
+content, the same text is rendered once no matter where it's shown, and
+nothing needs to be invalidated when the text changes. Recently rendered
+HTML is also kept in a small in-process cache in front of the shared cache.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import djblets
+import markdown
+
+from reviewboard.admin.cache_stats import cache_memoize
+
+
+#: The number of seconds rendered Markdown is kept in the shared cache.
+RENDER_CACHE_EXPIRATION = 7 * 24 * 60 * 60
+
+
+class LRUCache(object):
+    """A thread-safe, bounded, in-process cache.
+
+    Once the cache is full, the least recently used entries are removed to
+    make room for new ones.
+    """
+
+    def __init__(self, max_size):
+        """Initialize the cache.
+
+        Args:
+            max_size (int):
+                The maximum number of entries to keep.
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return an entry from the cache.
+
+        Args:
+            key (unicode):
+                The key of the entry.
+
+        Returns:
+            object:
+            The value of the entry, or ``None`` if it's not in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return None
+
+            # Move the entry to the end, marking it as most recently used.
+            self._entries[key] = value
+
+        return value
+
+    def set(self, key, value):
+        """Store an entry in the cache.
+
+        Args:
+            key (unicode):
+                The key of the entry.
+
+            value (object):
+                The value to store.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """Return the number of entries in the cache.
+
+        Returns:
+            int:
+            The number of entries.
+        """
+        return len(self._entries)
+
+
+#: The in-process cache of recently rendered Markdown.
+local_cache = LRUCache(max_size=1000)
+
+
+def _serialize_config_value(value):
+    """Return a stable representation of a renderer configuration value.
+
+    Args:
+        value (object):
+            A value that JSON can't serialize, such as a function.
+
+    Returns:
+        unicode:
+        A representation of the value that's the same in every process.
+    """
+    if hasattr(value, '__module__') and hasattr(value, '__name__'):
+        return '%s.%s' % (value.__module__, value.__name__)
+
+    return repr(value)
+
+
+def get_config_fingerprint(markdown_kwargs):
+    """Return a fingerprint for a Markdown renderer configuration.
+
+    The fingerprint covers the keyword arguments passed to the renderer,
+    along with the versions of Markdown and Djblets (which provides several
+    of the extensions), so that HTML rendered by another configuration is
+    never used.
+
+    Args:
+        markdown_kwargs (dict):
+            The keyword arguments passed to the Markdown renderer.
+
+    Returns:
+        unicode:
+        The fingerprint.
+    """
+    config = json.dumps(
+        {
+            'djblets': djblets.get_package_version(),
+            'kwargs': markdown_kwargs,
+            'markdown': getattr(markdown, '__version__',
+                                getattr(markdown, 'version', None)),
+        },
+        default=_serialize_config_value,
+        sort_keys=True)
+
+    return hashlib.sha1(config.encode('utf-8')).hexdigest()
+
+
+def get_rendered_markdown(text, markdown_kwargs):
+    """Return the rendered HTML for Markdown text, using the cache if possible.
+
+    Args:
+        text (unicode):
+            The Markdown text to render.
+
+        markdown_kwargs (dict):
+            The keyword arguments passed to the Markdown renderer.
+
+    Returns:
+        unicode:
+        The rendered HTML.
+    """
+    key = 'markdown-html:%s:%s' % (
+        get_config_fingerprint(markdown_kwargs),
+        hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    html = local_cache.get(key)
+
+    if html is None:
+        html = cache_memoize(
+            key,
+            lambda: markdown.markdown(text, **markdown_kwargs),
+            expiration=RENDER_CACHE_EXPIRATION)
+        local_cache.set(key, html)
+
+    return html
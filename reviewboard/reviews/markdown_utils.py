@@ -8,7 +8,8 @@ from django.db.models import Model
 from django.utils.html import escape
 from djblets import markdown as djblets_markdown
 from djblets.siteconfig.models import SiteConfiguration
-from markdown import markdown
+
+from reviewboard.reviews.markdown_cache import get_rendered_markdown
 
 
 # Keyword arguments used when calling a Markdown renderer function.
@@ -223,11 +224,14 @@ def render_markdown(text):
 
     The Markdown text will be sanitized to prevent injecting custom HTML.
     It will also enable a few plugins for code highlighting and sane lists.
+
+    The rendered HTML is cached by the content of the text, so the same text
+    is only rendered once.
     """
     if isinstance(text, bytes):
         text = text.decode('utf-8')
 
-    return markdown(text, **MARKDOWN_KWARGS)
+    return get_rendered_markdown(text, MARKDOWN_KWARGS)
 
 
 def render_markdown_from_file(f):
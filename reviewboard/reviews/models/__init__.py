@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
 from reviewboard.reviews.models.base_comment import BaseComment
+from reviewboard.reviews.models.daily_activity_count import \
+    DailyActivityCount
 from reviewboard.reviews.models.default_reviewer import DefaultReviewer
 from reviewboard.reviews.models.diff_comment import Comment
 from reviewboard.reviews.models.file_attachment_comment import \
@@ -18,6 +20,7 @@ from reviewboard.reviews.models.status_update import StatusUpdate
 __all__ = [
     'BaseComment',
     'Comment',
+    'DailyActivityCount',
     'DefaultReviewer',
     'FileAttachmentComment',
     'GeneralComment',
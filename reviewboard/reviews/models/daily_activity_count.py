@@ -0,0 +1,41 @@
+"""Definitions for the DailyActivityCount model."""
+
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+
+@python_2_unicode_compatible
+class DailyActivityCount(models.Model):
+    """The number of objects of one type created on one day.
+
+    These are used by the Administration Dashboard widgets, instead of
+    counting the objects themselves. They're kept up-to-date as objects are
+    created and deleted, and can be rebuilt with the
+    ``backfill-activity-stats`` management command.
+
+    For objects without a creation timestamp, the count is instead the net
+    number of objects added on that day, and may be negative. The total
+    across all days is the number of objects that exist.
+    """
+
+    #: The type of object being counted (such as ``reviews``).
+    name = models.CharField(_('name'), max_length=64)
+
+    #: The day (in UTC) the objects were created on.
+    date = models.DateField(_('date'))
+
+    #: The number of objects.
+    count = models.IntegerField(_('count'), default=0)
+
+    def __str__(self):
+        return '%s on %s: %d' % (self.name, self.date, self.count)
+
+    class Meta:
+        app_label = 'reviews'
+        db_table = 'reviews_dailyactivitycount'
+        unique_together = (('name', 'date'),)
+        verbose_name = _('Daily Activity Count')
+        verbose_name_plural = _('Daily Activity Counts')
@@ -54,12 +54,21 @@ class FileAttachmentComment(BaseComment):
         """Returns the thumbnail for this comment, if any, as HTML.
 
         The thumbnail will be generated from the appropriate ReviewUI,
-        if there is one for this type of file.
+        if there is one for this type of file, unless an up-to-date
+        thumbnail was already generated and stored with the comment.
         """
+        from reviewboard.attachments.thumbnails import \
+            get_stored_comment_thumbnail
+
         review_ui = self.review_ui
 
         if review_ui:
             try:
+                thumbnail = get_stored_comment_thumbnail(self)
+
+                if thumbnail is not None:
+                    return thumbnail
+
                 return review_ui.get_comment_thumbnail(self)
             except Exception as e:
                 logging.error('Error when calling get_comment_thumbnail for '
@@ -12,6 +12,7 @@ from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import CounterField, JSONField
 from djblets.db.query import get_object_or_none
 
+from reviewboard.admin.activity_stats import record_timestamp_update
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.reviews.errors import RevokeShipItError
 from reviewboard.reviews.managers import ReviewManager
@@ -347,6 +348,9 @@ class Review(models.Model):
 
         self.save()
 
+        # Comments are counted on the day of their timestamp in the
+        # Administration Dashboard, so the counts need to be moved.
+        record_timestamp_update(self.comments.all(), self.timestamp)
         self.comments.update(timestamp=self.timestamp)
         self.screenshot_comments.update(timestamp=self.timestamp)
         self.file_attachment_comments.update(timestamp=self.timestamp)
@@ -18,6 +18,7 @@ from reviewboard.attachments.models import (FileAttachment,
                                             FileAttachmentHistory)
 from reviewboard.changedescs.models import ChangeDescription
 from reviewboard.diffviewer.models import DiffSet, DiffSetHistory
+from reviewboard.reviews.counters import deferred_counter_updates
 from reviewboard.reviews.errors import (PermissionError,
                                         PublishError)
 from reviewboard.reviews.fields import get_review_request_field
@@ -726,40 +727,33 @@ class ReviewRequest(BaseReviewRequestDetails):
         return self._blocks
 
     def save(self, update_counts=False, old_submitter=None, **kwargs):
-        if update_counts or self.id is None:
-            self._update_counts(old_submitter)
+        with deferred_counter_updates():
+            if update_counts or self.id is None:
+                self._update_counts(old_submitter)
 
-        if self.status != self.PENDING_REVIEW:
-            # If this is not a pending review request now, delete any
-            # and all ReviewRequestVisit objects.
-            self.visits.all().delete()
+            if self.status != self.PENDING_REVIEW:
+                # If this is not a pending review request now, delete any
+                # and all ReviewRequestVisit objects.
+                self.visits.all().delete()
 
-        super(ReviewRequest, self).save(**kwargs)
+            super(ReviewRequest, self).save(**kwargs)
 
     def delete(self, **kwargs):
-        from reviewboard.accounts.models import Profile, LocalSiteProfile
+        with deferred_counter_updates() as batch:
+            batch.add_site_profile_delta(self.submitter_id,
+                                         self.local_site_id,
+                                         'total_outgoing_request_count', -1)
 
-        profile, profile_is_new = \
-            Profile.objects.get_or_create(user=self.submitter)
+            if self.status == self.PENDING_REVIEW:
+                batch.add_site_profile_delta(self.submitter_id,
+                                             self.local_site_id,
+                                             'pending_outgoing_request_count',
+                                             -1)
 
-        if profile_is_new:
-            profile.save()
-
-        local_site = self.local_site
-        site_profile, site_profile_is_new = \
-            LocalSiteProfile.objects.get_or_create(user=self.submitter,
-                                                   profile=profile,
-                                                   local_site=local_site)
-
-        site_profile.decrement_total_outgoing_request_count()
-
-        if self.status == self.PENDING_REVIEW:
-            site_profile.decrement_pending_outgoing_request_count()
-
-            if self.public:
-                self._decrement_reviewer_counts()
+                if self.public:
+                    self._decrement_reviewer_counts()
 
-        super(ReviewRequest, self).delete(**kwargs)
+            super(ReviewRequest, self).delete(**kwargs)
 
     def can_publish(self):
         return not self.public or get_object_or_none(self.draft) is not None
@@ -953,41 +947,45 @@ class ReviewRequest(BaseReviewRequestDetails):
         review_request_publishing.send(sender=self.__class__, user=user,
                                        review_request_draft=draft)
 
-        # Decrement the counts on everything. we lose them.
-        # We'll increment the resulting set during ReviewRequest.save.
-        # This should be done before the draft is published.
-        # Once the draft is published, the target people
-        # and groups will be updated with new values.
-        # Decrement should not happen while publishing
-        # a new request or a discarded request
-        if self.public:
-            self._decrement_reviewer_counts()
-
-        if draft is not None:
-            # This will in turn save the review request, so we'll be done.
-            try:
-                changes = draft.publish(self, send_notification=False,
-                                        user=user)
-            except Exception:
-                # The draft failed to publish, for one reason or another.
-                # Check if we need to re-increment those counters we
-                # previously decremented.
-                if self.public:
-                    self._increment_reviewer_counts()
-
-                raise
+        # Counter changes are batched up until the review request is saved,
+        # so the decrement and re-increment of the counters for reviewers
+        # who haven't changed will cancel each other out.
+        with deferred_counter_updates():
+            # Decrement the counts on everything. we lose them.
+            # We'll increment the resulting set during ReviewRequest.save.
+            # This should be done before the draft is published.
+            # Once the draft is published, the target people
+            # and groups will be updated with new values.
+            # Decrement should not happen while publishing
+            # a new request or a discarded request
+            if self.public:
+                self._decrement_reviewer_counts()
 
-            draft.delete()
-        else:
-            changes = None
+            if draft is not None:
+                # This will in turn save the review request, so we'll be done.
+                try:
+                    changes = draft.publish(self, send_notification=False,
+                                            user=user)
+                except Exception:
+                    # The draft failed to publish, for one reason or another.
+                    # Check if we need to re-increment those counters we
+                    # previously decremented.
+                    if self.public:
+                        self._increment_reviewer_counts()
+
+                    raise
+
+                draft.delete()
+            else:
+                changes = None
 
-        if not self.public and self.changedescs.count() == 0:
-            # This is a brand new review request that we're publishing
-            # for the first time. Set the creation timestamp to now.
-            self.time_added = timezone.now()
+            if not self.public and self.changedescs.count() == 0:
+                # This is a brand new review request that we're publishing
+                # for the first time. Set the creation timestamp to now.
+                self.time_added = timezone.now()
 
-        self.public = True
-        self.save(update_counts=True, old_submitter=old_submitter)
+            self.public = True
+            self.save(update_counts=True, old_submitter=old_submitter)
 
         review_request_published.send(sender=self.__class__, user=user,
                                       review_request=self, trivial=trivial,
@@ -1027,110 +1025,93 @@ class ReviewRequest(BaseReviewRequestDetails):
         return self.submitter
 
     def _update_counts(self, old_submitter):
-        from reviewboard.accounts.models import Profile, LocalSiteProfile
-
-        submitter_changed = (old_submitter is not None and
-                             old_submitter != self.submitter)
-
-        profile, profile_is_new = \
-            Profile.objects.get_or_create(user=self.submitter)
+        """Update the counters affected by saving the review request.
 
-        if profile_is_new:
-            profile.save()
-
-        local_site = self.local_site
-        site_profile, site_profile_is_new = \
-            LocalSiteProfile.objects.get_or_create(
-                user=self.submitter,
-                profile=profile,
-                local_site=local_site)
-
-        if site_profile_is_new:
-            site_profile.save()
-
-        if self.id is None:
-            # This hasn't been created yet. Bump up the outgoing request
-            # count for the user.
-            site_profile.increment_total_outgoing_request_count()
-            old_status = None
-            old_public = False
-        else:
-            # We need to see if the status has changed, so that means
-            # finding out what's in the database.
-            r = ReviewRequest.objects.get(pk=self.id)
-            old_status = r.status
-            old_public = r.public
+        The changes are recorded in the active counter update batch, and
+        are applied once the review request has been saved.
 
-            if submitter_changed:
-                if not site_profile_is_new:
-                    site_profile.increment_total_outgoing_request_count()
+        Args:
+            old_submitter (django.contrib.auth.models.User):
+                The submitter of the review request before it was changed,
+                if known.
+        """
+        with deferred_counter_updates() as batch:
+            submitter_changed = (old_submitter is not None and
+                                 old_submitter != self.submitter)
+            local_site_id = self.local_site_id
+
+            def _update_submitter_count(user_id, field_name, delta,
+                                        ensure_exists=False):
+                batch.add_site_profile_delta(user_id, local_site_id,
+                                             field_name, delta,
+                                             ensure_exists=ensure_exists)
+
+            # The submitter's profile must exist once this is saved. If it
+            # has to be created, its counters will be initialized when it's
+            # first loaded.
+            _update_submitter_count(self.submitter_id,
+                                    'total_outgoing_request_count', 0,
+                                    ensure_exists=True)
+
+            if self.id is None:
+                # This hasn't been created yet. Bump up the outgoing request
+                # count for the user.
+                _update_submitter_count(self.submitter_id,
+                                        'total_outgoing_request_count', 1)
+                old_status = None
+                old_public = False
+            else:
+                # We need to see if the status has changed, so that means
+                # finding out what's in the database.
+                old_status, old_public = (
+                    ReviewRequest.objects
+                    .filter(pk=self.id)
+                    .values_list('status', 'public')
+                    .get())
+
+                if submitter_changed:
+                    _update_submitter_count(self.submitter_id,
+                                            'total_outgoing_request_count', 1)
+                    _update_submitter_count(old_submitter.pk,
+                                            'total_outgoing_request_count',
+                                            -1)
 
                     if self.status == self.PENDING_REVIEW:
-                        site_profile.increment_pending_outgoing_request_count()
-
-                try:
-                    old_profile = LocalSiteProfile.objects.get(
-                        user=old_submitter, local_site=local_site)
-                    old_profile.decrement_total_outgoing_request_count()
+                        _update_submitter_count(
+                            self.submitter_id,
+                            'pending_outgoing_request_count', 1)
 
                     if old_status == self.PENDING_REVIEW:
-                        old_profile.decrement_pending_outgoing_request_count()
-                except LocalSiteProfile.DoesNotExist:
-                    pass
+                        _update_submitter_count(
+                            old_submitter.pk,
+                            'pending_outgoing_request_count', -1)
 
-        if self.status == self.PENDING_REVIEW:
-            if old_status != self.status and not submitter_changed:
-                site_profile.increment_pending_outgoing_request_count()
+            if self.status == self.PENDING_REVIEW:
+                if old_status != self.status and not submitter_changed:
+                    _update_submitter_count(self.submitter_id,
+                                            'pending_outgoing_request_count',
+                                            1)
 
-            if self.public and self.id is not None:
-                self._increment_reviewer_counts()
-        elif old_status == self.PENDING_REVIEW:
-            if old_status != self.status and not submitter_changed:
-                site_profile.decrement_pending_outgoing_request_count()
+                if self.public and self.id is not None:
+                    self._increment_reviewer_counts()
+            elif old_status == self.PENDING_REVIEW:
+                if old_status != self.status and not submitter_changed:
+                    _update_submitter_count(self.submitter_id,
+                                            'pending_outgoing_request_count',
+                                            -1)
 
-            if old_public:
-                self._decrement_reviewer_counts()
+                if old_public:
+                    self._decrement_reviewer_counts()
 
     def _increment_reviewer_counts(self):
-        from reviewboard.accounts.models import LocalSiteProfile
-
-        groups = self.target_groups.all()
-        people = self.target_people.all()
-
-        Group.incoming_request_count.increment(groups)
-        LocalSiteProfile.direct_incoming_request_count.increment(
-            LocalSiteProfile.objects.filter(user__in=people,
-                                            local_site=self.local_site))
-        LocalSiteProfile.total_incoming_request_count.increment(
-            LocalSiteProfile.objects.filter(
-                Q(local_site=self.local_site) &
-                Q(Q(user__review_groups__in=groups) |
-                  Q(user__in=people))))
-        LocalSiteProfile.starred_public_request_count.increment(
-            LocalSiteProfile.objects.filter(
-                profile__starred_review_requests=self,
-                local_site=self.local_site))
+        """Increment the incoming counters for the reviewers."""
+        with deferred_counter_updates() as batch:
+            batch.add_reviewer_delta(self, 1)
 
     def _decrement_reviewer_counts(self):
-        from reviewboard.accounts.models import LocalSiteProfile
-
-        groups = self.target_groups.all()
-        people = self.target_people.all()
-
-        Group.incoming_request_count.decrement(groups)
-        LocalSiteProfile.direct_incoming_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                user__in=people,
-                local_site=self.local_site))
-        LocalSiteProfile.total_incoming_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                Q(local_site=self.local_site) &
-                Q(Q(user__review_groups__in=groups) |
-                  Q(user__in=people))))
-        LocalSiteProfile.starred_public_request_count.decrement(
-            LocalSiteProfile.objects.filter(
-                profile__starred_review_requests=self,
-                local_site=self.local_site))
+        """Decrement the incoming counters for the reviewers."""
+        with deferred_counter_updates() as batch:
+            batch.add_reviewer_delta(self, -1)
 
     def _calculate_approval(self):
         """Calculates the approval information for the review request."""
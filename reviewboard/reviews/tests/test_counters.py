@@ -1,9 +1,14 @@
 from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from kgb import SpyAgency
 
 from reviewboard.accounts.models import Profile, LocalSiteProfile
+from reviewboard.reviews.counters import (CounterDrift,
+                                          deferred_counter_updates,
+                                          find_counter_drift)
 from reviewboard.reviews.errors import NotModifiedError
 from reviewboard.reviews.models import (Group, ReviewRequest,
                                         ReviewRequestDraft)
@@ -68,6 +73,25 @@ class ReviewRequestCounterTests(SpyAgency, TestCase):
         self.assertEqual(self.site_profile.pending_outgoing_request_count, 1)
         self.assertEqual(self.site_profile.starred_public_request_count, 1)
 
+    def test_publish_without_profile(self):
+        """Testing counters when publishing for a user without a Profile"""
+        user = User.objects.create(username='newuser', password='')
+        review_request = ReviewRequest.objects.create(
+            user, Repository.objects.get(name='Test1'))
+
+        LocalSiteProfile.objects.filter(user=user).delete()
+        Profile.objects.filter(user=user).delete()
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        review_request.publish(user)
+
+        profile = Profile.objects.get(user=user)
+        site_profile = LocalSiteProfile.objects.get(user=user,
+                                                    profile=profile,
+                                                    local_site=None)
+        self.assertEqual(site_profile.total_outgoing_request_count, 1)
+        self.assertEqual(site_profile.pending_outgoing_request_count, 1)
+
     def test_outgoing_requests(self):
         """Testing counters with creating outgoing review requests"""
         # The review request was already created
@@ -550,6 +574,109 @@ class ReviewRequestCounterTests(SpyAgency, TestCase):
         self._check_counters_on_profile(site_profile, total_outgoing=1,
                                         pending_outgoing=1)
 
+    def test_republish_with_same_reviewers(self):
+        """Testing counters when re-publishing with the same reviewers"""
+        self.test_add_person()
+
+        ReviewRequestDraft.create(self.review_request)
+
+        # The counter decrements and increments cancel out, so no counters
+        # should be updated.
+        with CaptureQueriesContext(connection) as ctx:
+            self.review_request.publish(self.user)
+
+        for query in ctx.captured_queries:
+            self.assertFalse(
+                query['sql'].startswith('UPDATE') and
+                ('accounts_localsiteprofile' in query['sql'] or
+                 'reviews_group' in query['sql']),
+                'Unexpected counter update: %s' % query['sql'])
+
+        self._check_counters(total_outgoing=1,
+                             pending_outgoing=1,
+                             direct_incoming=1,
+                             total_incoming=1,
+                             starred_public=1)
+
+    def test_deferred_counter_updates(self):
+        """Testing deferred_counter_updates applies changes at the end of the
+        outermost block
+        """
+        draft = ReviewRequestDraft.create(self.review_request)
+        draft.target_groups.add(self.group)
+        draft.target_people.add(self.user)
+
+        with deferred_counter_updates():
+            with deferred_counter_updates():
+                self.review_request.publish(self.user)
+
+            self._check_counters(total_outgoing=1,
+                                 pending_outgoing=1)
+
+        self._check_counters(total_outgoing=1,
+                             pending_outgoing=1,
+                             direct_incoming=1,
+                             total_incoming=1,
+                             starred_public=1,
+                             group_incoming=1)
+
+    def test_deferred_counter_updates_with_exception(self):
+        """Testing deferred_counter_updates discards changes when an
+        exception is raised
+        """
+        with self.assertRaises(ValueError):
+            with deferred_counter_updates() as batch:
+                batch.add_site_profile_delta(self.user.pk, None,
+                                             'total_outgoing_request_count', 1)
+
+                raise ValueError
+
+        self._check_counters(total_outgoing=1,
+                             pending_outgoing=1)
+
+    def test_find_counter_drift(self):
+        """Testing find_counter_drift"""
+        draft = ReviewRequestDraft.create(self.review_request)
+        draft.target_groups.add(self.group)
+        draft.target_people.add(self.user)
+        self.review_request.publish(self.user)
+
+        self.assertEqual(find_counter_drift(), [])
+
+        LocalSiteProfile.objects.filter(pk=self.site_profile.pk).update(
+            total_incoming_request_count=5,
+            pending_outgoing_request_count=0)
+        LocalSiteProfile.objects.filter(pk=self.site_profile2.pk).update(
+            direct_incoming_request_count=None)
+        Group.objects.filter(pk=self.group.pk).update(
+            incoming_request_count=3)
+
+        drift = find_counter_drift()
+        self.assertEqual(
+            set(drift),
+            set([
+                CounterDrift(LocalSiteProfile, self.site_profile.pk,
+                             'total_incoming_request_count', 5, 1),
+                CounterDrift(LocalSiteProfile, self.site_profile.pk,
+                             'pending_outgoing_request_count', 0, 1),
+                CounterDrift(Group, self.group.pk,
+                             'incoming_request_count', 3, 1),
+            ]))
+
+        # Nothing should have changed yet.
+        self._reload_objects()
+        self.assertEqual(self.site_profile.total_incoming_request_count, 5)
+
+        self.assertEqual(set(find_counter_drift(fix=True)), set(drift))
+        self.assertEqual(find_counter_drift(), [])
+
+        self._check_counters(total_outgoing=1,
+                             pending_outgoing=1,
+                             direct_incoming=1,
+                             total_incoming=1,
+                             starred_public=1,
+                             group_incoming=1)
+
     def _check_counters(self, total_outgoing=0, pending_outgoing=0,
                         direct_incoming=0, total_incoming=0,
                         starred_public=0, group_incoming=0,
@@ -0,0 +1,108 @@
+"""Unit tests for reviewboard.reviews.markdown_cache."""
+
+from __future__ import unicode_literals
+
+import markdown
+from django.core.cache import cache
+from kgb import SpyAgency
+
+from reviewboard.reviews.markdown_cache import (LRUCache,
+                                                get_config_fingerprint,
+                                                get_rendered_markdown,
+                                                local_cache)
+from reviewboard.reviews.markdown_utils import MARKDOWN_KWARGS
+from reviewboard.testing import TestCase
+
+
+class LRUCacheTests(TestCase):
+    """Unit tests for reviewboard.reviews.markdown_cache.LRUCache."""
+
+    def test_get_and_set(self):
+        """Testing LRUCache.get and set"""
+        lru_cache = LRUCache(max_size=2)
+        lru_cache.set('a', 1)
+
+        self.assertEqual(lru_cache.get('a'), 1)
+        self.assertIsNone(lru_cache.get('b'))
+
+    def test_eviction(self):
+        """Testing LRUCache removes least recently used entries when full"""
+        lru_cache = LRUCache(max_size=2)
+        lru_cache.set('a', 1)
+        lru_cache.set('b', 2)
+        lru_cache.get('a')
+        lru_cache.set('c', 3)
+
+        self.assertEqual(len(lru_cache), 2)
+        self.assertEqual(lru_cache.get('a'), 1)
+        self.assertIsNone(lru_cache.get('b'))
+        self.assertEqual(lru_cache.get('c'), 3)
+
+
+class MarkdownCacheTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.reviews.markdown_cache."""
+
+    def setUp(self):
+        super(MarkdownCacheTests, self).setUp()
+
+        cache.clear()
+        local_cache.clear()
+
+    def tearDown(self):
+        super(MarkdownCacheTests, self).tearDown()
+
+        cache.clear()
+        local_cache.clear()
+
+    def test_get_rendered_markdown(self):
+        """Testing get_rendered_markdown"""
+        self.assertEqual(get_rendered_markdown('**foo**', MARKDOWN_KWARGS),
+                         '<p><strong>foo</strong></p>')
+
+    def test_get_rendered_markdown_cached_locally(self):
+        """Testing get_rendered_markdown uses the in-process cache"""
+        self.spy_on(markdown.markdown)
+
+        get_rendered_markdown('**foo**', MARKDOWN_KWARGS)
+        cache.clear()
+
+        self.assertEqual(get_rendered_markdown('**foo**', MARKDOWN_KWARGS),
+                         '<p><strong>foo</strong></p>')
+        self.assertEqual(len(markdown.markdown.spy.calls), 1)
+
+    def test_get_rendered_markdown_cached_shared(self):
+        """Testing get_rendered_markdown uses the shared cache"""
+        self.spy_on(markdown.markdown)
+
+        get_rendered_markdown('**foo**', MARKDOWN_KWARGS)
+        local_cache.clear()
+
+        self.assertEqual(get_rendered_markdown('**foo**', MARKDOWN_KWARGS),
+                         '<p><strong>foo</strong></p>')
+        self.assertEqual(len(markdown.markdown.spy.calls), 1)
+
+    def test_get_rendered_markdown_with_different_text(self):
+        """Testing get_rendered_markdown with different text"""
+        self.assertEqual(get_rendered_markdown('**foo**', MARKDOWN_KWARGS),
+                         '<p><strong>foo</strong></p>')
+        self.assertEqual(get_rendered_markdown('*foo*', MARKDOWN_KWARGS),
+                         '<p><em>foo</em></p>')
+
+    def test_get_rendered_markdown_with_different_config(self):
+        """Testing get_rendered_markdown with a different renderer
+        configuration
+        """
+        markdown_kwargs = dict(MARKDOWN_KWARGS, output_format='html5')
+
+        self.assertNotEqual(get_config_fingerprint(MARKDOWN_KWARGS),
+                            get_config_fingerprint(markdown_kwargs))
+
+        self.assertEqual(get_rendered_markdown('a\nb', MARKDOWN_KWARGS),
+                         '<p>a<br />\nb</p>')
+        self.assertEqual(get_rendered_markdown('a\nb', markdown_kwargs),
+                         '<p>a<br>\nb</p>')
+
+    def test_get_config_fingerprint_stable(self):
+        """Testing get_config_fingerprint with equal configurations"""
+        self.assertEqual(get_config_fingerprint(MARKDOWN_KWARGS),
+                         get_config_fingerprint(dict(MARKDOWN_KWARGS)))
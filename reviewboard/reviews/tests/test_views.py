@@ -1546,6 +1546,65 @@ class DownloadFileTests(TestCase):
         self.assertEquals(rsp.status_code, 404)
 
 
+class DownloadRawDiffTests(TestCase):
+    """Tests for reviewboard.reviews.views.DownloadRawDiffView."""
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def setUp(self):
+        super(DownloadRawDiffTests, self).setUp()
+
+        self.review_request = self.create_review_request(
+            create_repository=True, publish=True)
+        self.diffset = self.create_diffset(review_request=self.review_request)
+        self.filediff = self.create_filediff(self.diffset)
+        self.url = local_site_reverse('raw-diff', kwargs={
+            'review_request_id': self.review_request.display_id,
+        })
+
+    def test_download(self):
+        """Testing DownloadRawDiffView streams the diff"""
+        rsp = self.client.get(self.url)
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertTrue(rsp.streaming)
+        self.assertEqual(b''.join(rsp.streaming_content), self.filediff.diff)
+        self.assertIn('ETag', rsp)
+        self.assertEqual(rsp['Accept-Ranges'], 'bytes')
+
+    def test_download_not_modified(self):
+        """Testing DownloadRawDiffView with a matching If-None-Match"""
+        etag = self.client.get(self.url)['ETag']
+        rsp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(rsp.status_code, 304)
+
+    def test_download_with_range(self):
+        """Testing DownloadRawDiffView with Range"""
+        rsp = self.client.get(self.url, HTTP_RANGE='bytes=5-')
+        diff = self.filediff.diff
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertEqual(b''.join(rsp.streaming_content), diff[5:])
+        self.assertEqual(rsp['Content-Range'],
+                         'bytes 5-%d/%d' % (len(diff) - 1, len(diff)))
+
+    def test_download_with_range_and_gzip(self):
+        """Testing DownloadRawDiffView with Range doesn't compress the
+        partial content
+        """
+        rsp = self.client.get(self.url,
+                              HTTP_RANGE='bytes=5-',
+                              HTTP_ACCEPT_ENCODING='gzip')
+        diff = self.filediff.diff
+
+        self.assertEqual(rsp.status_code, 206)
+        self.assertNotEqual(rsp['Content-Encoding'], 'gzip')
+        self.assertEqual(b''.join(rsp.streaming_content), diff[5:])
+        self.assertEqual(rsp['Content-Range'],
+                         'bytes 5-%d/%d' % (len(diff) - 1, len(diff)))
+
+
 class UserInfoboxTests(TestCase):
     def test_unicode(self):
         """Testing user_infobox with a user with non-ascii characters"""
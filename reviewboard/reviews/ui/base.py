@@ -37,6 +37,12 @@ class ReviewUI(object):
     allow_inline = False
     supports_diffing = False
 
+    #: Whether comment thumbnails should be generated ahead of time.
+    #:
+    #: If set, a comment's thumbnail is generated in the background when the
+    #: comment is saved, and stored with the comment.
+    precompute_comment_thumbnails = False
+
     css_bundle_names = []
     js_bundle_names = []
     js_files = []
@@ -14,6 +14,7 @@ class ImageReviewUI(FileAttachmentReviewUI):
 
     allow_inline = True
     supports_diffing = True
+    precompute_comment_thumbnails = True
 
     js_model_class = 'RB.ImageReviewable'
     js_view_class = 'RB.ImageReviewableView'
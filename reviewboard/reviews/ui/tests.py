@@ -1,9 +1,12 @@
 from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
 from django.test import RequestFactory
 from djblets.util.templatetags.djblets_images import crop_image
 from kgb import SpyAgency
+from pygments.lexers import TextLexer
 
 from reviewboard.reviews.templatetags.reviewtags import has_usable_review_ui
 from reviewboard.admin.server import build_server_url
@@ -11,6 +14,7 @@ from reviewboard.reviews.ui.base import (FileAttachmentReviewUI,
                                          register_ui,
                                          unregister_ui)
 from reviewboard.reviews.ui.image import ImageReviewUI
+from reviewboard.reviews.ui.text import TextBasedReviewUI
 from reviewboard.testing import TestCase
 
 
@@ -283,3 +287,197 @@ class ImageReviewUITests(TestCase):
                build_server_url(crop_image(self.attachment.file, 0, 0, 1, 1)),
                comment.text)
         )
+
+
+class TextBasedReviewUIRangedRenderingTests(SpyAgency, TestCase):
+    """Unit tests for TextBasedReviewUI rendering text in blocks of lines."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(TextBasedReviewUIRangedRenderingTests, self).setUp()
+
+        self._old_min_size = TextBasedReviewUI.ranged_rendering_min_size
+        self._old_lines_per_block = TextBasedReviewUI.lines_per_block
+        TextBasedReviewUI.ranged_rendering_min_size = 1
+        TextBasedReviewUI.lines_per_block = 10
+
+        self.review_request = self.create_review_request(publish=True)
+        self.attachment = self.create_file_attachment(
+            self.review_request,
+            orig_filename='test.txt',
+            mimetype='text/plain',
+            has_file=False)
+        self.attachment.file.save(
+            'test.txt',
+            ContentFile(b''.join(
+                b'line %d\n' % i
+                for i in range(1, 26)
+            )))
+
+        self.review_ui = TextBasedReviewUI(self.review_request,
+                                           self.attachment)
+
+    def tearDown(self):
+        super(TextBasedReviewUIRangedRenderingTests, self).tearDown()
+
+        TextBasedReviewUI.ranged_rendering_min_size = self._old_min_size
+        TextBasedReviewUI.lines_per_block = self._old_lines_per_block
+        cache.clear()
+
+    def test_uses_ranged_rendering_small_file(self):
+        """Testing TextBasedReviewUI.uses_ranged_rendering with a file smaller
+        than the minimum size
+        """
+        TextBasedReviewUI.ranged_rendering_min_size = 1024 * 1024
+        review_ui = TextBasedReviewUI(self.review_request, self.attachment)
+
+        self.assertFalse(review_ui.uses_ranged_rendering())
+
+    def test_uses_ranged_rendering_diff(self):
+        """Testing TextBasedReviewUI.uses_ranged_rendering when diffing"""
+        self.review_ui.set_diff_against(self.attachment)
+
+        self.assertFalse(self.review_ui.uses_ranged_rendering())
+
+    def test_get_text_block_index(self):
+        """Testing TextBasedReviewUI.get_text_block_index"""
+        self.assertTrue(self.review_ui.uses_ranged_rendering())
+        self.assertEqual(
+            self.review_ui.get_text_block_index(),
+            {
+                'num_lines': 25,
+                'offsets': [0, 71, 151],
+            })
+
+    def test_get_text_block(self):
+        """Testing TextBasedReviewUI.get_text_block"""
+        self.assertEqual(
+            self.review_ui.get_text_block(2),
+            [
+                '<pre>line %d</pre>' % i
+                for i in range(21, 26)
+            ])
+
+    def test_get_text_block_with_other_line_breaks(self):
+        """Testing TextBasedReviewUI.get_text_block with characters that
+        splitlines() treats as line breaks
+        """
+        self.attachment.file.save(
+            'test.txt',
+            ContentFile(b'a\x0cb\nc\x1cd\n\ne\n'))
+        review_ui = TextBasedReviewUI(self.review_request, self.attachment)
+
+        self.assertEqual(
+            review_ui.get_text_block(0),
+            [
+                '<pre>a\x0cb</pre>',
+                '<pre>c\x1cd</pre>',
+                '<pre></pre>',
+                '<pre>e</pre>',
+            ])
+
+    def test_get_text_block_uses_source_lexer(self):
+        """Testing TextBasedReviewUI.get_text_block uses the lexer from
+        get_source_lexer
+        """
+        lexer = TextLexer()
+        self.spy_on(self.review_ui.get_source_lexer,
+                    call_fake=lambda *args: lexer)
+        self.spy_on(lexer.get_tokens)
+
+        self.review_ui.get_text_block(1)
+
+        self.assertTrue(lexer.get_tokens.called)
+
+    def test_uses_ranged_rendering_with_custom_highlighting(self):
+        """Testing TextBasedReviewUI.uses_ranged_rendering with a subclass
+        overriding generate_highlighted_text
+        """
+        class CustomReviewUI(TextBasedReviewUI):
+            def generate_highlighted_text(self):
+                return ['custom']
+
+        review_ui = CustomReviewUI(self.review_request, self.attachment)
+
+        self.assertFalse(review_ui.uses_ranged_rendering())
+        self.assertEqual(review_ui.get_text_lines_in_range(1, 1),
+                         ['custom'])
+
+    def test_get_text_block_out_of_range(self):
+        """Testing TextBasedReviewUI.get_text_block with a block past the end
+        of the file
+        """
+        self.assertEqual(self.review_ui.get_text_block(3), [])
+
+    def test_get_text_lines_in_range(self):
+        """Testing TextBasedReviewUI.get_text_lines_in_range across blocks"""
+        self.spy_on(self.review_ui.get_text_lines)
+
+        self.assertEqual(
+            self.review_ui.get_text_lines_in_range(9, 12),
+            [
+                '<pre>line %d</pre>' % i
+                for i in range(9, 13)
+            ])
+        self.assertFalse(self.review_ui.get_text_lines.called)
+
+    def test_render_comment_thumbnail(self):
+        """Testing TextBasedReviewUI.render_comment_thumbnail with ranged
+        rendering
+        """
+        self.spy_on(self.review_ui.get_text_lines)
+        self.spy_on(self.review_ui.get_text_block)
+
+        review = self.create_review(self.review_request)
+        comment = self.create_file_attachment_comment(
+            review,
+            self.attachment,
+            extra_fields={
+                'beginLineNum': 21,
+                'endLineNum': 22,
+                'viewMode': 'source',
+            })
+
+        thumbnail = self.review_ui.render_comment_thumbnail(
+            comment, 21, 22, 'source')
+
+        self.assertIn('line 21', thumbnail)
+        self.assertIn('line 22', thumbnail)
+        self.assertNotIn('line 20', thumbnail)
+        self.assertFalse(self.review_ui.get_text_lines.called)
+        self.assertEqual(len(self.review_ui.get_text_block.spy.calls), 1)
+        self.assertEqual(self.review_ui.get_text_block.spy.calls[0].args,
+                         (2,))
+
+    def test_get_extra_context(self):
+        """Testing TextBasedReviewUI.get_extra_context with ranged rendering
+        """
+        context = self.review_ui.get_extra_context(
+            RequestFactory().get('/'))
+
+        self.assertEqual(len(context['text_lines']), 10)
+        self.assertEqual(
+            [
+                (block['block_num'], block['first_line_num'],
+                 block['num_lines'])
+                for block in context['pending_text_blocks']
+            ],
+            [(1, 11, 10), (2, 21, 5)])
+
+    def test_text_block_view(self):
+        """Testing ReviewFileAttachmentTextBlockView"""
+        response = self.client.get(self.review_ui.get_text_block_url(1))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<tr line="11">', response.content)
+        self.assertIn(b'<tr line="20">', response.content)
+        self.assertNotIn(b'<tr line="21">', response.content)
+
+    def test_text_block_view_out_of_range(self):
+        """Testing ReviewFileAttachmentTextBlockView with a block past the end
+        of the file
+        """
+        response = self.client.get(self.review_ui.get_text_block_url(3))
+
+        self.assertEqual(response.status_code, 404)
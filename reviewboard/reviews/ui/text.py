@@ -4,17 +4,19 @@ import logging
 
 from django.template.context import Context
 from django.template.loader import render_to_string
+from django.utils import six
 from django.utils.safestring import mark_safe
-from djblets.cache.backend import cache_memoize
 from pygments import highlight
 from pygments.lexers import (ClassNotFound, guess_lexer_for_filename,
                              TextLexer)
 
+from reviewboard.admin.cache_stats import cache_memoize
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.diffviewer.chunk_generator import (NoWrapperHtmlFormatter,
                                                     RawDiffChunkGenerator)
 from reviewboard.diffviewer.diffutils import get_chunks_in_range
 from reviewboard.reviews.ui.base import FileAttachmentReviewUI
+from reviewboard.site.urlresolvers import local_site_reverse
 
 
 class TextBasedReviewUI(FileAttachmentReviewUI):
@@ -30,12 +32,23 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
     comment_thumbnail_template_name = 'reviews/ui/text_comment_thumbnail.html'
     can_render_text = False
     supports_diffing = True
+    precompute_comment_thumbnails = True
 
     source_chunk_generator_cls = RawDiffChunkGenerator
     rendered_chunk_generator_cls = RawDiffChunkGenerator
 
     extra_css_classes = []
 
+    #: The minimum file size, in bytes, for rendering the source in blocks.
+    #:
+    #: Files at least this large are highlighted and cached a block of lines
+    #: at a time, and blocks past the first are loaded as the user scrolls
+    #: to them. This only applies when not showing a diff.
+    ranged_rendering_min_size = 1024 * 1024
+
+    #: The number of lines in each block when rendering in blocks.
+    lines_per_block = 1000
+
     js_model_class = 'RB.TextBasedReviewable'
     js_view_class = 'RB.TextBasedReviewableView'
 
@@ -48,6 +61,15 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
         else:
             data['viewMode'] = 'source'
 
+        if self.uses_ranged_rendering():
+            block_index = self.get_text_block_index()
+
+            data.update({
+                'rangedRendering': True,
+                'numLines': block_index['num_lines'],
+                'linesPerBlock': self.lines_per_block,
+            })
+
         return data
 
     def get_extra_context(self, request):
@@ -71,6 +93,34 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
 
                 chunk_generator = self._get_rendered_diff_chunk_generator()
                 context['rendered_chunks'] = chunk_generator.get_chunks()
+        elif self.uses_ranged_rendering():
+            # Only the first block is rendered into the page. The rest are
+            # loaded as the user scrolls to them.
+            block_index = self.get_text_block_index()
+            lines_per_block = self.lines_per_block
+
+            context.update({
+                'text_lines': [
+                    mark_safe(line)
+                    for line in self.get_text_block(0)
+                ],
+                'pending_text_blocks': [
+                    {
+                        'block_num': block_num,
+                        'first_line_num': block_num * lines_per_block + 1,
+                        'num_lines': min(
+                            lines_per_block,
+                            block_index['num_lines'] -
+                            block_num * lines_per_block),
+                        'url': self.get_text_block_url(block_num),
+                    }
+                    for block_num in range(1, len(block_index['offsets']))
+                ],
+                'rendered_lines': [
+                    mark_safe(line)
+                    for line in self.get_rendered_lines()
+                ],
+            })
         else:
             file_line_list = [
                 mark_safe(line)
@@ -135,6 +185,287 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
         else:
             return []
 
+    def uses_ranged_rendering(self):
+        """Return whether the source is rendered in blocks of lines.
+
+        Returns:
+            bool:
+            ``True`` if the file is large enough to be rendered in blocks,
+            no diff is being shown, and the subclass doesn't override
+            :py:meth:`generate_highlighted_text`.
+        """
+        if self.diff_against_obj is not None:
+            return False
+
+        # Subclasses with their own highlighting need the whole file.
+        if (six.get_unbound_function(type(self).generate_highlighted_text) is
+            not six.get_unbound_function(
+                TextBasedReviewUI.generate_highlighted_text)):
+            return False
+
+        if not hasattr(self, '_uses_ranged_rendering'):
+            try:
+                size = self.obj.file.size
+            except Exception as e:
+                logging.warning('Unable to determine the size of file '
+                                'attachment %s: %s',
+                                self.obj.pk, e)
+                size = 0
+
+            self._uses_ranged_rendering = \
+                size >= self.ranged_rendering_min_size
+
+        return self._uses_ranged_rendering
+
+    def get_text_block_index(self):
+        """Return the index of blocks of lines in the file.
+
+        The index is built by reading through the file once, and is then
+        cached.
+
+        Returns:
+            dict:
+            A dictionary containing ``offsets`` (the byte offset of the start
+            of each block) and ``num_lines`` (the total number of lines).
+        """
+        return cache_memoize(
+            'text-attachment-%d-block-index-%d' % (self.obj.pk,
+                                                   self.lines_per_block),
+            self._build_text_block_index)
+
+    def get_text_block(self, block_num):
+        """Return a block of syntax-highlighted lines from the file.
+
+        Only the block's lines are read from the file and highlighted. The
+        result is then cached for future renders.
+
+        Args:
+            block_num (int):
+                The 0-based index of the block.
+
+        Returns:
+            list of unicode:
+            The highlighted lines in the block. This will be empty if the
+            block doesn't exist.
+        """
+        return cache_memoize(
+            'text-attachment-%d-lines-block-%d-%d' % (self.obj.pk,
+                                                      self.lines_per_block,
+                                                      block_num),
+            lambda: self._generate_highlighted_block(block_num))
+
+    def get_text_block_url(self, block_num):
+        """Return the URL for loading a block of lines.
+
+        Args:
+            block_num (int):
+                The 0-based index of the block.
+
+        Returns:
+            unicode:
+            The URL to the rendered rows for the block.
+        """
+        local_site_name = None
+
+        if self.review_request.local_site:
+            local_site_name = self.review_request.local_site.name
+
+        return local_site_reverse(
+            'file-attachment-text-block',
+            local_site_name=local_site_name,
+            kwargs={
+                'review_request_id': self.review_request.display_id,
+                'file_attachment_id': self.obj.pk,
+                'block_num': block_num,
+            })
+
+    def get_text_lines_in_range(self, begin_line_num, end_line_num):
+        """Return a range of syntax-highlighted lines from the file.
+
+        When rendering in blocks, only the blocks containing the lines are
+        loaded.
+
+        Args:
+            begin_line_num (int):
+                The first line number to return (1-based).
+
+            end_line_num (int):
+                The last line number to return (1-based, inclusive).
+
+        Returns:
+            list of unicode:
+            The highlighted lines.
+        """
+        if not self.uses_ranged_rendering():
+            return self.get_text_lines()[begin_line_num - 1:end_line_num]
+
+        if begin_line_num < 1 or end_line_num < begin_line_num:
+            return []
+
+        lines_per_block = self.lines_per_block
+        first_block = (begin_line_num - 1) // lines_per_block
+        last_block = (end_line_num - 1) // lines_per_block
+        lines = []
+
+        for block_num in range(first_block, last_block + 1):
+            lines += self.get_text_block(block_num)
+
+        start = begin_line_num - 1 - first_block * lines_per_block
+
+        return lines[start:start + end_line_num - begin_line_num + 1]
+
+    def _build_text_block_index(self):
+        """Build the index of blocks of lines in the file.
+
+        Returns:
+            dict:
+            The index. See :py:meth:`get_text_block_index` for details.
+        """
+        offsets = []
+        num_lines = 0
+        offset = 0
+
+        self.obj.file.open()
+
+        with self.obj.file as f:
+            for line in self._iter_file_lines(f):
+                if num_lines % self.lines_per_block == 0:
+                    offsets.append(offset)
+
+                offset += len(line)
+                num_lines += 1
+
+        return {
+            'num_lines': num_lines,
+            'offsets': offsets,
+        }
+
+    def _read_text_block(self, offset):
+        """Read a block of lines from the file.
+
+        Args:
+            offset (int):
+                The byte offset of the start of the block.
+
+        Returns:
+            list of bytes:
+            The lines in the block, including their line endings.
+        """
+        lines = []
+
+        self.obj.file.open()
+
+        with self.obj.file as f:
+            f.seek(offset)
+
+            for line in self._iter_file_lines(f):
+                lines.append(line)
+
+                if len(lines) == self.lines_per_block:
+                    break
+
+        return lines
+
+    def _get_text_block_lexer(self):
+        """Return the lexer used to highlight blocks of lines.
+
+        The lexer is chosen by :py:meth:`get_source_lexer` based on the
+        first block, so that all blocks are highlighted the same way.
+
+        Returns:
+            pygments.lexer.Lexer:
+            The lexer.
+        """
+        if not hasattr(self, '_text_block_lexer'):
+            lexer = self.get_source_lexer(self.obj.filename,
+                                          b''.join(self._read_text_block(0)))
+
+            # Blocks must keep their leading and trailing blank lines, so
+            # that they stay in step with the line numbers.
+            lexer.stripnl = False
+
+            self._text_block_lexer = lexer
+
+        return self._text_block_lexer
+
+    def _generate_highlighted_block(self, block_num):
+        """Read and highlight a block of lines from the file.
+
+        Each block is highlighted on its own, so constructs spanning a block
+        boundary (such as multi-line strings) may be highlighted differently
+        than when highlighting the whole file.
+
+        Args:
+            block_num (int):
+                The 0-based index of the block.
+
+        Returns:
+            list of unicode:
+            The highlighted lines in the block.
+        """
+        block_index = self.get_text_block_index()
+        offsets = block_index['offsets']
+
+        if block_num < 0 or block_num >= len(offsets):
+            return []
+
+        lines = self._read_text_block(offsets[block_num])
+        highlighted = highlight(b''.join(lines),
+                                self._get_text_block_lexer(),
+                                NoWrapperHtmlFormatter())
+
+        # Lines are only split on "\n", as they are when building the index.
+        # splitlines() would also split on characters such as "\r" and
+        # "\x0c".
+        if highlighted.endswith('\n'):
+            highlighted = highlighted[:-1]
+
+        highlighted = highlighted.split('\n')
+
+        # Keep the lines in step with the line numbers, even if the
+        # highlighter split them differently.
+        highlighted = highlighted[:len(lines)]
+        highlighted += [''] * (len(lines) - len(highlighted))
+
+        return [
+            '<pre>%s</pre>' % line
+            for line in highlighted
+        ]
+
+    def _iter_file_lines(self, f, chunk_size=64 * 1024):
+        """Iterate through the lines of a file from its current position.
+
+        Unlike iterating through a Django file directly, this doesn't seek
+        back to the start of the file first.
+
+        Args:
+            f (django.core.files.File):
+                The file to read.
+
+            chunk_size (int, optional):
+                The number of bytes to read at a time.
+
+        Yields:
+            bytes:
+            Each line, including its line ending.
+        """
+        remainder = b''
+
+        while True:
+            chunk = f.read(chunk_size)
+
+            if not chunk:
+                break
+
+            lines = (remainder + chunk).split(b'\n')
+            remainder = lines.pop()
+
+            for line in lines:
+                yield line + b'\n'
+
+        if remainder:
+            yield remainder
+
     def _get_text_uncached(self):
         """Return the text from the file."""
         self.obj.file.open()
@@ -261,20 +592,21 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
         else:
             try:
                 if view_mode == 'source':
-                    lines = self.get_text_lines()
+                    lines = self.get_text_lines_in_range(begin_line_num,
+                                                         end_line_num)
                 elif view_mode == 'rendered':
-                    lines = self.get_rendered_lines()
+                    # Grab only the lines we care about.
+                    #
+                    # The line numbers are stored 1-indexed, so normalize
+                    # to 0.
+                    lines = self.get_rendered_lines()[begin_line_num - 1:
+                                                      end_line_num]
             except Exception as e:
                 logging.error('Unable to generate text attachment comment '
                               'thumbnail for comment %s: %s',
                               comment, e)
                 return ''
 
-            # Grab only the lines we care about.
-            #
-            # The line numbers are stored 1-indexed, so normalize to 0.
-            lines = lines[begin_line_num - 1:end_line_num]
-
             context['lines'] = [
                 {
                     'line_num': begin_line_num + i,
@@ -104,6 +104,11 @@ review_request_urls = [
         views.ReviewFileAttachmentView.as_view(),
         name='file-attachment'),
 
+    url(r'^file/(?P<file_attachment_id>\d+)/_text-blocks/'
+        r'(?P<block_num>\d+)/$',
+        views.ReviewFileAttachmentTextBlockView.as_view(),
+        name='file-attachment-text-block'),
+
     # Screenshots
     url(r'^s/(?P<screenshot_id>\d+)/$',
         views.ReviewScreenshotView.as_view(),
@@ -27,7 +27,7 @@ from django.views.generic.base import (ContextMixin, RedirectView,
                                        TemplateView, View)
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.dates import get_latest_timestamp
-from djblets.util.http import set_last_modified
+from djblets.util.http import encode_etag
 from djblets.views.generic.base import (CheckRequestMethodViewMixin,
                                         PrePostDispatchViewMixin)
 from djblets.views.generic.etag import ETagViewMixin
@@ -44,6 +44,10 @@ from reviewboard.diffviewer.diffutils import (convert_to_unicode,
                                               get_last_line_number_in_diff,
                                               get_original_file,
                                               get_patched_file)
+from reviewboard.diffviewer.downloads import (build_download_response,
+                                              get_not_modified_response,
+                                              get_raw_diff_etag,
+                                              get_raw_diff_length)
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.diffviewer.views import (DiffFragmentView,
                                           DiffViewerView,
@@ -69,6 +73,7 @@ from reviewboard.reviews.models import (Comment,
                                         ReviewRequest,
                                         Screenshot)
 from reviewboard.reviews.ui.base import FileAttachmentReviewUI
+from reviewboard.reviews.ui.text import TextBasedReviewUI
 from reviewboard.scmtools.errors import FileNotFoundError
 from reviewboard.scmtools.models import Repository
 from reviewboard.site.mixins import CheckLocalSiteAccessViewMixin
@@ -1229,12 +1234,16 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
 
     This will generate a single raw diff file spanning all the FileDiffs
     in a diffset for the revision specified in the URL.
+
+    The raw diff is streamed to the client one FileDiff at a time. Since a
+    diffset never changes, conditional GET and byte range requests are
+    supported as well.
     """
 
     def get(self, request, revision=None, *args, **kwargs):
         """Handle HTTP GET requests for this view.
 
-        This will generate the raw diff file and send it to the client.
+        This will generate the raw diff file and stream it to the client.
 
         Args:
             request (django.http.HttpRequest):
@@ -1251,18 +1260,30 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
                 Keyword arguments passed to the handler.
 
         Returns:
-            django.http.HttpResponse:
+            django.http.HttpResponseBase:
             The HTTP response to send to the client.
         """
         review_request = self.review_request
 
         draft = review_request.get_draft(request.user)
         diffset = self.get_diff(revision, draft)
+        etag = get_raw_diff_etag(diffset)
+
+        resp = get_not_modified_response(request, etag, diffset.timestamp)
+
+        if resp is not None:
+            return resp
 
         tool = review_request.repository.get_scmtool()
-        data = tool.get_parser('').raw_diff(diffset)
+        parser = tool.get_parser('')
 
-        resp = HttpResponse(data, content_type='text/x-patch')
+        resp = build_download_response(
+            request,
+            parser.iter_raw_diff(diffset),
+            content_type='text/x-patch',
+            etag=etag,
+            last_modified=diffset.timestamp,
+            get_length=lambda: get_raw_diff_length(diffset, parser))
 
         if diffset.name == 'diff':
             filename = 'rb%d.patch' % review_request.display_id
@@ -1275,7 +1296,6 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
             filename = filename.replace(',', '_')
 
         resp['Content-Disposition'] = 'attachment; filename=%s' % filename
-        set_last_modified(resp, diffset.timestamp)
 
         return resp
 
@@ -1897,6 +1917,34 @@ class ReviewFileAttachmentView(ReviewRequestViewMixin, View):
             django.http.HttpResponse:
             The resulting HTTP response from the handler.
         """
+        review_ui = self.get_review_ui(request, file_attachment_id,
+                                       file_attachment_diff_id)
+
+        return review_ui.render_to_response(request)
+
+    def get_review_ui(self, request, file_attachment_id,
+                      file_attachment_diff_id=None):
+        """Return the review UI for a file attachment.
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            file_attachment_id (int):
+                The ID of the file attachment to review.
+
+            file_attachment_diff_id (int, optional):
+                The ID of the file attachment to diff against.
+
+        Returns:
+            reviewboard.reviews.ui.base.FileAttachmentReviewUI:
+            The review UI for the file attachment.
+
+        Raises:
+            django.http.Http404:
+                The file attachment could not be found, or the review UI
+                is not enabled for the user.
+        """
         review_request = self.review_request
         draft = review_request.get_draft(request.user)
 
@@ -1936,11 +1984,63 @@ class ReviewFileAttachmentView(ReviewRequestViewMixin, View):
                           review_ui, e, exc_info=1)
             is_enabled_for = False
 
-        if review_ui and is_enabled_for:
-            return review_ui.render_to_response(request)
-        else:
+        if not review_ui or not is_enabled_for:
+            raise Http404
+
+        return review_ui
+
+
+class ReviewFileAttachmentTextBlockView(ReviewFileAttachmentView):
+    """Renders a block of lines from a large text file attachment.
+
+    Large text files are shown by :py:class:`~reviewboard.reviews.ui.text.
+    TextBasedReviewUI` a block of lines at a time. This returns the table
+    rows for one of those blocks, as the user scrolls to it.
+    """
+
+    def get(self, request, file_attachment_id, block_num, *args, **kwargs):
+        """Handle a HTTP GET request.
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            file_attachment_id (int):
+                The ID of the file attachment.
+
+            block_num (unicode):
+                The 0-based index of the block to render.
+
+            *args (tuple):
+                Positional arguments passed to the handler.
+
+            **kwargs (dict):
+                Keyword arguments passed to the handler.
+
+        Returns:
+            django.http.HttpResponse:
+            The resulting HTTP response containing the rendered rows.
+        """
+        review_ui = self.get_review_ui(request, file_attachment_id)
+
+        if (not isinstance(review_ui, TextBasedReviewUI) or
+            not review_ui.uses_ranged_rendering()):
+            raise Http404
+
+        block_num = int(block_num)
+        lines = review_ui.get_text_block(block_num)
+
+        if not lines:
             raise Http404
 
+        return render(request, 'reviews/ui/_text_lines.html', {
+            'line_offset': block_num * review_ui.lines_per_block,
+            'lines': [
+                mark_safe(line)
+                for line in lines
+            ],
+        })
+
 
 class ReviewScreenshotView(ReviewRequestViewMixin, View):
     """Displays a review UI for a screenshot.
@@ -2266,6 +2366,9 @@ class DownloadDiffFileView(ReviewRequestViewMixin, View):
 
     This will fetch the file from a FileDiff, optionally patching it,
     and return the result as an HttpResponse.
+
+    Since the file never changes, conditional GET requests are answered
+    without fetching the file, and byte range requests are supported.
     """
 
     TYPE_ORIG = 0
@@ -2301,6 +2404,14 @@ class DownloadDiffFileView(ReviewRequestViewMixin, View):
         diffset = self.get_diff(revision, draft)
         filediff = get_object_or_404(diffset.files, pk=filediff_id)
         encoding_list = diffset.repository.get_encoding_list()
+        etag = encode_etag('diff-file:%s:%s:%s:%s' % (
+            filediff.pk, self.file_type, diffset.timestamp,
+            ','.join(encoding_list)))
+
+        resp = get_not_modified_response(request, etag, diffset.timestamp)
+
+        if resp is not None:
+            return resp
 
         try:
             data = get_original_file(filediff, request, encoding_list)
@@ -2314,6 +2425,13 @@ class DownloadDiffFileView(ReviewRequestViewMixin, View):
         if self.file_type == self.TYPE_MODIFIED:
             data = get_patched_file(data, filediff, request)
 
-        data = convert_to_unicode(data, encoding_list)[1]
+        data = convert_to_unicode(data, encoding_list)[1].encode('utf-8')
 
-        return HttpResponse(data, content_type='text/plain; charset=utf-8')
+        return build_download_response(
+            request,
+            [data],
+            content_type='text/plain; charset=utf-8',
+            etag=etag,
+            last_modified=diffset.timestamp,
+            get_length=lambda: len(data),
+            streaming=False)
@@ -0,0 +1,149 @@
+"""Caching for slow repository listings.
+
+Listing branches or commits can take many seconds on large repositories. The
+results are cached, but with a normal cache, the first user to come along
+after the cache entry has expired has to wait for the listing to be rebuilt.
+
+:py:func:`cache_memoize_stale` instead stores entries with two expiration
+periods. Once the soft expiration period has passed, the stale entry is still
+returned right away, and a single background thread refreshes it. Only once
+the hard expiration period has passed (or the entry is evicted) will callers
+have to wait for the data.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+from time import time
+
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+
+from reviewboard.admin.background import BackgroundQueue
+from reviewboard.admin.cache_stats import (record_cache_fill,
+                                          record_cache_lookup)
+
+
+#: The maximum number of seconds a background refresh can hold its lock.
+#:
+#: If a refresh takes longer than this (or the process dies during one),
+#: another refresh may be started. If a refresh fails, the lock is kept until
+#: this period has passed, so a failing backend isn't retried on every
+#: request.
+REFRESH_LOCK_PERIOD = 5 * 60
+
+
+_refresh_queue = BackgroundQueue('repository-cache-refresh',
+                                 num_threads=2)
+
+
+def cache_memoize_stale(key, lookup_callable, soft_expiration,
+                        hard_expiration):
+    """Return a cached value, refreshing it in the background when stale.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        lookup_callable (callable):
+            A function returning the value to cache. This may be called in
+            a background thread.
+
+        soft_expiration (int):
+            The number of seconds after which the value is considered stale
+            and will be refreshed in the background.
+
+        hard_expiration (int):
+            The number of seconds after which the value is removed from the
+            cache, and must be looked up again before returning.
+
+    Returns:
+        object:
+        The cached or newly looked up value.
+    """
+    full_key = make_cache_key(key)
+    entry = cache.get(full_key)
+
+    # Anything other than a (value, refresh_at) tuple was stored by
+    # something else under this key, and is treated as a miss.
+    is_valid = (isinstance(entry, tuple) and
+                len(entry) == 2 and
+                isinstance(entry[1], (int, float)))
+    record_cache_lookup(key, hit=is_valid)
+
+    if not is_valid:
+        return _update_cache(key, lookup_callable, soft_expiration,
+                             hard_expiration)
+
+    value, refresh_at = entry
+
+    if time() >= refresh_at:
+        lock_key = make_cache_key('%s:refresh-lock' % key)
+
+        # Only one process or thread gets to refresh the entry. Everyone
+        # else keeps using the stale value until it's done.
+        if cache.add(lock_key, True, REFRESH_LOCK_PERIOD):
+            if not _refresh_queue.run(_refresh_cache, key, lock_key,
+                                      lookup_callable, soft_expiration,
+                                      hard_expiration):
+                cache.delete(lock_key)
+
+    return value
+
+
+def _update_cache(key, lookup_callable, soft_expiration, hard_expiration):
+    """Look up a value and store it in the cache.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        lookup_callable (callable):
+            A function returning the value to cache.
+
+        soft_expiration (int):
+            The number of seconds after which the value is stale.
+
+        hard_expiration (int):
+            The number of seconds after which the value is removed.
+
+    Returns:
+        object:
+        The value.
+    """
+    start_time = time()
+    value = lookup_callable()
+    fill_time = time() - start_time
+
+    cache.set(make_cache_key(key), (value, time() + soft_expiration),
+              hard_expiration)
+    record_cache_fill(key, value, fill_time)
+
+    return value
+
+
+def _refresh_cache(key, lock_key, *args):
+    """Refresh a stale cache entry.
+
+    This is run in a background thread. Errors are logged, and the stale
+    entry is left in the cache. The refresh lock is only released if the
+    refresh succeeds. If it fails, the lock is left to expire, so no other
+    refresh is attempted until :py:data:`REFRESH_LOCK_PERIOD` has passed.
+
+    Args:
+        key (unicode):
+            The cache key, without the site prefix.
+
+        lock_key (unicode):
+            The full cache key of the refresh lock.
+
+        *args (tuple):
+            Additional arguments for :py:func:`_update_cache`.
+    """
+    try:
+        _update_cache(key, *args)
+    except Exception as e:
+        logging.exception('Unable to refresh stale cache entry "%s": %s',
+                          key, e)
+    else:
+        cache.delete(lock_key)
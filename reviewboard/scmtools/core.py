@@ -432,6 +432,14 @@ class SCMTool(object):
     #: the repository. It's up to the SCMTool to make use of it.
     supports_ticket_auth = False
 
+    #: Whether many files can be fetched at once more efficiently.
+    #:
+    #: If ``True``, :py:meth:`get_files` is expected to fetch a batch of
+    #: files faster than fetching each individually, and callers needing many
+    #: files (such as the diff viewer and diff upload validation) will use
+    #: it to prefetch them.
+    supports_batched_file_fetch = False
+
     #: Overridden help text for the configuration form fields.
     #:
     #: This allows the form fields to have custom help text for the SCMTool,
@@ -542,6 +550,37 @@ class SCMTool(object):
         """
         raise NotImplementedError
 
+    def get_files(self, files, base_commit_id=None):
+        """Return the contents of several files from a repository.
+
+        By default, this fetches each file using :py:meth:`get_file`.
+        Subclasses that can fetch many files more efficiently should override
+        this and set :py:attr:`supports_batched_file_fetch`.
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision)`` tuples for the files to fetch.
+
+            base_commit_id (unicode, optional):
+                The ID of the commit that the files were changed in. This may
+                not be provided, and is dependent on the type of repository.
+
+        Returns:
+            dict:
+            A dictionary mapping each ``(path, revision)`` tuple to the file
+            contents. Files that could not be found will not be included.
+        """
+        results = {}
+
+        for path, revision in files:
+            try:
+                results[(path, revision)] = self.get_file(
+                    path, revision, base_commit_id=base_commit_id)
+            except FileNotFoundError:
+                pass
+
+        return results
+
     def file_exists(self, path, revision=HEAD, base_commit_id=None, **kwargs):
         """Return whether a particular file exists in a repository.
 
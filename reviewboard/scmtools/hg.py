@@ -1,9 +1,16 @@
 from __future__ import unicode_literals
 
+import atexit
 import json
 import logging
+import os
+import struct
+import subprocess
+import threading
 from datetime import datetime
+from io import BytesIO
 
+from django.conf import settings
 from django.utils import six
 from django.utils.six.moves.urllib.parse import quote as urllib_quote, urlparse
 from djblets.util.filesystem import is_exe_in_path
@@ -39,7 +46,10 @@ class HgTool(SCMTool):
                                       credentials['username'],
                                       credentials['password'])
         else:
-            self.client = HgClient(repository.path, repository.local_site)
+            self.client = HgClient(
+                repository.path,
+                repository.local_site,
+                use_cmdserver=getattr(settings, 'HG_USE_CMDSERVER', False))
 
     def get_file(self, path, revision=HEAD, base_commit_id=None, **kwargs):
         if base_commit_id is not None:
@@ -431,12 +441,343 @@ class HgWebClient(SCMClient):
         raise SCMError('Cannot load changeset %s from hgweb' % revision)
 
 
+class HgCommandServerError(Exception):
+    """An error communicating with a Mercurial command server."""
+
+
+class HgCommandResult(object):
+    """The result of a command run through a Mercurial command server.
+
+    This provides the parts of the :py:class:`subprocess.Popen` interface
+    used by :py:class:`HgClient`, so results can be handled the same way
+    as those from a new :command:`hg` process.
+    """
+
+    def __init__(self, stdout, stderr, returncode):
+        """Initialize the result.
+
+        Args:
+            stdout (bytes):
+                The output of the command.
+
+            stderr (bytes):
+                The error output of the command.
+
+            returncode (int):
+                The exit code of the command.
+        """
+        self.stdout = BytesIO(stdout)
+        self.stderr = BytesIO(stderr)
+        self.returncode = returncode
+
+    def wait(self):
+        """Return the exit code of the command.
+
+        Returns:
+            int:
+            The exit code of the command.
+        """
+        return self.returncode
+
+
+class HgCommandServer(object):
+    """A persistent Mercurial command server for a repository.
+
+    This runs :command:`hg serve --cmdserver pipe` and sends commands to it,
+    avoiding the startup cost of :command:`hg` (and any extensions) for
+    every command.
+
+    The server only runs one command at a time, so commands from multiple
+    threads are queued and sent to it in turn. If the server exits or stops
+    responding properly, it will be restarted and the command retried once.
+    """
+
+    def __init__(self, path, local_site_name=None):
+        """Initialize the command server.
+
+        The server is started when the first command is run.
+
+        Args:
+            path (unicode):
+                The path to the repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site for the repository, if any.
+        """
+        self.path = path
+        self.local_site_name = local_site_name
+
+        self._process = None
+        self._lock = threading.Lock()
+
+    def run_command(self, args):
+        """Run a command on the server.
+
+        Args:
+            args (list of unicode):
+                The command line arguments, without the leading ``hg``.
+
+        Returns:
+            HgCommandResult:
+            The result of the command.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The command server could not be started or communicated
+                with.
+        """
+        args = [
+            arg.encode('utf-8') if isinstance(arg, six.text_type) else arg
+            for arg in args
+        ]
+
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if (self._process is None or
+                        self._process.poll() is not None):
+                        self._start()
+
+                    return self._run_command(args)
+                except (HgCommandServerError, IOError, OSError) as e:
+                    self._stop()
+
+                    if attempt > 0:
+                        raise SCMError(
+                            'Unable to communicate with the Mercurial '
+                            'command server for %s: %s' % (self.path, e))
+
+                    logging.warning('Restarting the Mercurial command server '
+                                    'for %s: %s',
+                                    self.path, e)
+
+    def close(self):
+        """Shut down the server."""
+        with self._lock:
+            self._stop()
+
+    def _start(self):
+        """Start the server and read its hello message.
+
+        Raises:
+            HgCommandServerError:
+                The server didn't send a valid hello message.
+        """
+        env = os.environ.copy()
+
+        if self.local_site_name:
+            env[b'RB_LOCAL_SITE'] = self.local_site_name.encode('utf-8')
+
+        with open(os.devnull, 'wb') as devnull:
+            self._process = subprocess.Popen(
+                ['hg', 'serve', '--cmdserver', 'pipe',
+                 '--config', 'ui.interactive=False',
+                 '--repository', self.path,
+                 '--cwd', self.path],
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                close_fds=(os.name != 'nt'))
+
+        channel, data = self._read_channel()
+
+        if channel != b'o':
+            raise HgCommandServerError('Unexpected hello message on channel '
+                                       '"%s"' % channel)
+
+        for line in data.splitlines():
+            if line.startswith(b'capabilities:'):
+                if b'runcommand' not in line.split()[1:]:
+                    raise HgCommandServerError(
+                        'The command server does not support runcommand')
+
+                break
+        else:
+            raise HgCommandServerError('The command server did not report '
+                                       'its capabilities')
+
+    def _stop(self):
+        """Stop the server, if it's running."""
+        process = self._process
+        self._process = None
+
+        if process is not None and process.poll() is None:
+            try:
+                process.stdin.close()
+                process.kill()
+                process.wait()
+            except (IOError, OSError):
+                pass
+
+    def _run_command(self, args):
+        """Send a command to the server and collect the result.
+
+        Args:
+            args (list of bytes):
+                The command line arguments.
+
+        Returns:
+            HgCommandResult:
+            The result of the command.
+
+        Raises:
+            HgCommandServerError:
+                The server sent an invalid response.
+        """
+        data = b'\0'.join(args)
+        stdin = self._process.stdin
+        stdin.write(b'runcommand\n' + struct.pack(b'>I', len(data)) + data)
+        stdin.flush()
+
+        stdout = []
+        stderr = []
+
+        while True:
+            channel, data = self._read_channel()
+
+            if channel == b'o':
+                stdout.append(data)
+            elif channel == b'e':
+                stderr.append(data)
+            elif channel == b'r':
+                return HgCommandResult(b''.join(stdout),
+                                       b''.join(stderr),
+                                       struct.unpack(b'>i', data)[0])
+            elif channel in (b'I', b'L'):
+                # The command wants input. We never have any to give it.
+                stdin.write(struct.pack(b'>I', 0))
+                stdin.flush()
+            elif channel.isupper():
+                raise HgCommandServerError('Unexpected required channel '
+                                           '"%s"' % channel)
+
+    def _read_channel(self):
+        """Read a message from the server.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the channel name and the data. Input
+            channels contain no data.
+
+        Raises:
+            HgCommandServerError:
+                The server exited.
+        """
+        header = self._read_exact(5)
+        channel = header[:1]
+        length = struct.unpack(b'>I', header[1:])[0]
+
+        if channel in (b'I', b'L'):
+            return channel, b''
+
+        return channel, self._read_exact(length)
+
+    def _read_exact(self, length):
+        """Read an exact number of bytes from the server.
+
+        Args:
+            length (int):
+                The number of bytes to read.
+
+        Returns:
+            bytes:
+            The data read.
+
+        Raises:
+            HgCommandServerError:
+                The server exited before sending enough data.
+        """
+        chunks = []
+
+        while length > 0:
+            chunk = self._process.stdout.read(length)
+
+            if not chunk:
+                raise HgCommandServerError('The command server exited '
+                                           'unexpectedly')
+
+            chunks.append(chunk)
+            length -= len(chunk)
+
+        return b''.join(chunks)
+
+
+_command_servers = {}
+_command_servers_lock = threading.Lock()
+_command_servers_pid = os.getpid()
+
+
+def get_hg_command_server(path, local_site_name=None):
+    """Return the command server for a repository in this process.
+
+    Args:
+        path (unicode):
+            The path to the repository.
+
+        local_site_name (unicode, optional):
+            The name of the Local Site for the repository, if any.
+
+    Returns:
+        HgCommandServer:
+        The command server for the repository.
+    """
+    global _command_servers, _command_servers_pid
+
+    key = (path, local_site_name)
+
+    with _command_servers_lock:
+        if os.getpid() != _command_servers_pid:
+            # These servers belong to the parent process.
+            _command_servers = {}
+            _command_servers_pid = os.getpid()
+
+        try:
+            return _command_servers[key]
+        except KeyError:
+            server = HgCommandServer(path, local_site_name)
+            _command_servers[key] = server
+
+            return server
+
+
+def close_hg_command_servers():
+    """Shut down all command servers started by this process."""
+    with _command_servers_lock:
+        if os.getpid() != _command_servers_pid:
+            return
+
+        servers = list(_command_servers.values())
+        _command_servers.clear()
+
+    for server in servers:
+        server.close()
+
+
+atexit.register(close_hg_command_servers)
+
+
 class HgClient(SCMClient):
     COMMITS_PAGE_LIMIT = '31'
 
-    def __init__(self, path, local_site):
+    def __init__(self, path, local_site, use_cmdserver=False):
+        """Initialize the client.
+
+        Args:
+            path (unicode):
+                The path to the repository.
+
+            local_site (reviewboard.site.models.LocalSite):
+                The Local Site for the repository, if any.
+
+            use_cmdserver (bool, optional):
+                Whether to run commands through a persistent Mercurial
+                command server (see :py:class:`HgCommandServer`), instead
+                of starting :command:`hg` for each command.
+        """
         super(HgClient, self).__init__(path)
         self.default_args = None
+        self.use_cmdserver = use_cmdserver
 
         if local_site:
             self.local_site_name = local_site.name
@@ -618,10 +959,18 @@ class HgClient(SCMClient):
         return contents.strip()
 
     def _run_hg(self, args):
-        """Runs the Mercurial command, returning a subprocess.Popen."""
+        """Runs the Mercurial command, returning a subprocess.Popen.
+
+        If using a command server, this returns a HgCommandResult instead.
+        """
         if not self.default_args:
             self._calculate_default_args()
 
+        if self.use_cmdserver:
+            server = get_hg_command_server(self.path, self.local_site_name)
+
+            return server.run_command(self.default_args + args)
+
         return SCMTool.popen(
             ['hg'] + self.default_args + args,
             local_site_name=self.local_site_name)
@@ -3,6 +3,8 @@ from __future__ import unicode_literals
 from django.db.models import Manager, Q
 from django.db.models.query import QuerySet
 
+from reviewboard.accounts.access_cache import get_accessible_ids
+
 
 _TOOL_CACHE = {}
 
@@ -75,9 +77,19 @@ class RepositoryManager(Manager):
 
         return qs.filter(local_site=local_site)
 
-    def accessible_ids(self, *args, **kwargs):
-        """Return IDs of repositories that are accessible by the given user."""
-        return self.accessible(*args, **kwargs).values_list('pk', flat=True)
+    def accessible_ids(self, user, visible_only=True, local_site=None):
+        """Return IDs of repositories that are accessible by the given user.
+
+        The result is remembered for the rest of the request (see
+        :py:mod:`reviewboard.accounts.access_cache`). If the user can access
+        too many repositories, this returns a subquery instead of a list.
+        """
+        return get_accessible_ids(
+            'repository', user, visible_only, local_site,
+            lambda: (self.accessible(user,
+                                     visible_only=visible_only,
+                                     local_site=local_site)
+                     .values_list('pk', flat=True)))
 
     def can_create(self, user, local_site=None):
         return user.has_perm('scmtools.add_repository', local_site)
@@ -17,12 +17,14 @@ from django.utils.functional import cached_property
 from django.utils.http import urlquote
 from django.utils.six.moves import range
 from django.utils.translation import ugettext_lazy as _
-from djblets.cache.backend import cache_memoize, make_cache_key
+from djblets.cache.backend import make_cache_key
 from djblets.db.fields import JSONField
-from djblets.log import log_timed
 
+from reviewboard.admin.cache_stats import cache_memoize, record_cache_lookup
+from reviewboard.admin.profiling import log_timed
 from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.hostingsvcs.service import get_hosting_service
+from reviewboard.scmtools.cache import cache_memoize_stale
 from reviewboard.scmtools.crypto_utils import (decrypt_password,
                                                encrypt_password)
 from reviewboard.scmtools.managers import RepositoryManager, ToolManager
@@ -183,6 +185,10 @@ class Repository(models.Model):
     COMMITS_CACHE_PERIOD_SHORT = 60 * 5  # 5 minutes
     COMMITS_CACHE_PERIOD_LONG = 60 * 60 * 24  # 1 day
 
+    # Branch and commit lists older than the periods above are still served
+    # while they're refreshed in the background, up until this period.
+    STALE_CACHE_PERIOD = 60 * 60 * 24  # 1 day
+
     def _set_password(self, value):
         """Sets the password for the repository.
 
@@ -284,6 +290,16 @@ class Repository(models.Model):
         else:
             return self.scmtool_class.supports_post_commit
 
+    @property
+    def supports_batched_file_fetch(self):
+        """Whether files can be fetched in batches by :py:meth:`prefetch_files`.
+
+        This requires a repository not backed by a hosting service, using an
+        SCMTool that supports batched fetches.
+        """
+        return (not self.hosting_service and
+                self.get_scmtool().supports_batched_file_fetch)
+
     @property
     def supports_pending_changesets(self):
         """Whether this repository supports server-aware pending changesets."""
@@ -416,7 +432,10 @@ class Repository(models.Model):
         """
         key = self._make_file_exists_cache_key(path, revision, base_commit_id)
 
-        if cache.get(make_cache_key(key)) == '1':
+        exists = cache.get(make_cache_key(key)) == '1'
+        record_cache_lookup(key, hit=exists)
+
+        if exists:
             return True
 
         exists = self._get_file_exists_uncached(path, revision,
@@ -427,18 +446,106 @@ class Repository(models.Model):
 
         return exists
 
+    def prefetch_files(self, files, base_commit_id=None, request=None):
+        """Fetches several files from the repository into the cache.
+
+        If the repository's SCMTool supports fetching files in batches (see
+        :py:attr:`SCMTool.supports_batched_file_fetch
+        <reviewboard.scmtools.core.SCMTool.supports_batched_file_fetch>`),
+        any of the given files that aren't already cached will be fetched
+        at once, and stored in the cache used by :py:meth:`get_file` and
+        :py:meth:`get_file_exists`. Otherwise, this does nothing, and the
+        files will be fetched individually as needed.
+
+        Files that can't be fetched are skipped. Errors will instead be
+        reported when they're requested through :py:meth:`get_file`.
+
+        As with :py:meth:`get_file`, the
+        :py:data:`~reviewboard.scmtools.signals.fetching_file` and
+        :py:data:`~reviewboard.scmtools.signals.fetched_file` signals are
+        sent for each file fetched.
+
+        ``files`` is a list of ``(path, revision)`` tuples.
+        """
+        if self.hosting_service or not files:
+            return
+
+        tool = self.get_scmtool()
+
+        if not tool.supports_batched_file_fetch:
+            return
+
+        missing_files = []
+
+        for path, revision in files:
+            if (path, revision) in missing_files:
+                continue
+
+            file_cache_key = make_cache_key(
+                self._make_file_cache_key(path, revision, base_commit_id))
+
+            if file_cache_key not in cache:
+                missing_files.append((path, revision))
+
+        if not missing_files:
+            return
+
+        for path, revision in missing_files:
+            fetching_file.send(sender=self,
+                               path=path,
+                               revision=revision,
+                               base_commit_id=base_commit_id,
+                               request=request)
+
+        log_timer = log_timed('Fetching %d files from %s'
+                              % (len(missing_files), self),
+                              request=request)
+
+        try:
+            results = tool.get_files(missing_files,
+                                     base_commit_id=base_commit_id)
+        except Exception as e:
+            logging.warning('Unable to fetch %d files from repository %s '
+                            'in a batch: %s',
+                            len(missing_files), self.pk, e)
+            results = {}
+
+        log_timer.done()
+
+        for (path, revision), data in six.iteritems(results):
+            fetched_file.send(sender=self,
+                              path=path,
+                              revision=revision,
+                              base_commit_id=base_commit_id,
+                              request=request,
+                              data=data)
+
+            cache_memoize(
+                self._make_file_cache_key(path, revision, base_commit_id),
+                lambda: [data],
+                large_data=True)
+            cache_memoize(
+                self._make_file_exists_cache_key(path, revision,
+                                                 base_commit_id),
+                lambda: '1')
+
     def get_branches(self):
-        """Returns a list of branches."""
+        """Returns a list of branches.
+
+        Once the cached list is older than ``BRANCHES_CACHE_PERIOD``, it
+        will still be returned while it's refreshed in the background.
+        """
         hosting_service = self.hosting_service
 
-        cache_key = make_cache_key('repository-branches:%s' % self.pk)
         if hosting_service:
             branches_callable = lambda: hosting_service.get_branches(self)
         else:
-            branches_callable = self.get_scmtool().get_branches
+            branches_callable = lambda: self.get_scmtool().get_branches()
 
-        return cache_memoize(cache_key, branches_callable,
-                             self.BRANCHES_CACHE_PERIOD)
+        return cache_memoize_stale('repository-branches-v2:%s' % self.pk,
+                                   branches_callable,
+                                   self.BRANCHES_CACHE_PERIOD,
+                                   self.STALE_CACHE_PERIOD)
 
     def get_commit_cache_key(self, commit):
         return 'repository-commit:%s:%s' % (self.pk, commit)
@@ -448,6 +555,9 @@ class Repository(models.Model):
 
         This is paginated via the 'start' parameter. Any exceptions are
         expected to be handled by the caller.
+
+        Once the cached list is older than its cache period, it will still
+        be returned while it's refreshed in the background.
         """
         hosting_service = self.hosting_service
 
@@ -456,33 +566,36 @@ class Repository(models.Model):
             'start': start,
         }
 
-        if hosting_service:
-            commits_callable = \
-                lambda: hosting_service.get_commits(self, **commits_kwargs)
-        else:
-            commits_callable = \
-                lambda: self.get_scmtool().get_commits(**commits_kwargs)
-
         # We cache both the entire list for 'start', as well as each individual
         # commit. This allows us to reduce API load when people are looking at
         # the "new review request" page more frequently than they're pushing
         # code, and will usually save 1 API request when they go to actually
         # create a new review request.
+        def commits_callable():
+            if hosting_service:
+                commits = hosting_service.get_commits(self, **commits_kwargs)
+            else:
+                commits = self.get_scmtool().get_commits(**commits_kwargs)
+
+            cache.set_many(
+                dict(
+                    (self.get_commit_cache_key(commit.id), commit)
+                    for commit in commits
+                ),
+                self.COMMITS_CACHE_PERIOD_LONG)
+
+            return commits
+
         if branch and start:
             cache_period = self.COMMITS_CACHE_PERIOD_LONG
         else:
             cache_period = self.COMMITS_CACHE_PERIOD_SHORT
 
-        cache_key = make_cache_key('repository-commits:%s:%s:%s'
-                                   % (self.pk, branch, start))
-        commits = cache_memoize(cache_key, commits_callable,
-                                cache_period)
-
-        for commit in commits:
-            cache.set(self.get_commit_cache_key(commit.id),
-                      commit, self.COMMITS_CACHE_PERIOD_LONG)
-
-        return commits
+        return cache_memoize_stale(
+            'repository-commits-v2:%s:%s:%s' % (self.pk, branch, start),
+            commits_callable,
+            cache_period,
+            max(cache_period, self.STALE_CACHE_PERIOD))
 
     def get_change(self, revision):
         """Get an individual change.
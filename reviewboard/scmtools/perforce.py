@@ -2,6 +2,8 @@
 
 from __future__ import unicode_literals
 
+import atexit
+import hashlib
 import logging
 import os
 import random
@@ -11,6 +13,7 @@ import signal
 import socket
 import subprocess
 import tempfile
+import threading
 import time
 from contextlib import contextmanager
 
@@ -209,6 +212,189 @@ class STunnelProxy(object):
                     pass
 
 
+class PerforceConnection(object):
+    """An open connection to a Perforce server.
+
+    This holds the P4 connection and the stunnel proxy (if any) used for it,
+    so they can be kept open in a :py:class:`PerforceConnectionPool`.
+    """
+
+    def __init__(self, p4, proxy=None):
+        """Initialize the connection.
+
+        Args:
+            p4 (P4.P4):
+                The P4 connection.
+
+            proxy (STunnelProxy, optional):
+                The stunnel proxy used for the connection.
+        """
+        self.p4 = p4
+        self.proxy = proxy
+        self.last_used = time.time()
+        self.ticket_checked_at = 0
+
+    def is_connected(self):
+        """Return whether the connection is still open.
+
+        Returns:
+            bool:
+            Whether the connection is still open.
+        """
+        try:
+            return bool(self.p4.connected())
+        except Exception:
+            return False
+
+    def close(self):
+        """Close the connection and shut down its proxy."""
+        try:
+            if self.p4.connected():
+                self.p4.disconnect()
+        except Exception as e:
+            logging.debug('Error disconnecting from Perforce: %s', e)
+
+        if self.proxy:
+            try:
+                self.proxy.shutdown()
+            except Exception:
+                pass
+
+            self.proxy = None
+
+
+class PerforceConnectionPool(object):
+    """A per-process pool of open Perforce connections.
+
+    Each connection is authenticated and (if needed) has its own stunnel
+    proxy running. Connections are kept open between operations, so that
+    fetching many files from Perforce doesn't require a new connection and
+    login for each file.
+
+    Idle connections are kept for up to :py:attr:`idle_timeout` seconds, and
+    up to :py:attr:`max_idle` connections are kept for each server and set
+    of credentials. Connections that are no longer open are discarded.
+    """
+
+    #: The maximum number of idle connections to keep for each key.
+    max_idle = 4
+
+    #: The number of seconds an idle connection is kept open.
+    idle_timeout = 5 * 60
+
+    def __init__(self):
+        """Initialize the pool."""
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self, key):
+        """Return an idle connection from the pool.
+
+        Args:
+            key (tuple):
+                The key for the connection settings and credentials.
+
+        Returns:
+            PerforceConnection:
+            The idle connection, or ``None`` if there isn't a usable one.
+        """
+        while True:
+            with self._lock:
+                self._check_pid()
+
+                try:
+                    connection = self._idle[key].pop()
+                except (KeyError, IndexError):
+                    return None
+
+            if (time.time() - connection.last_used < self.idle_timeout and
+                connection.is_connected()):
+                return connection
+
+            connection.close()
+
+    def release(self, key, connection):
+        """Return a connection to the pool.
+
+        If the connection was closed, or the pool is full, the connection
+        will be closed instead. Any connections that have been idle for too
+        long will also be closed.
+
+        Args:
+            key (tuple):
+                The key for the connection settings and credentials.
+
+            connection (PerforceConnection):
+                The connection to return.
+        """
+        to_close = []
+
+        if connection.is_connected():
+            connection.last_used = time.time()
+        else:
+            to_close.append(connection)
+
+        with self._lock:
+            self._check_pid()
+
+            if not to_close:
+                idle = self._idle.setdefault(key, [])
+
+                if len(idle) < self.max_idle:
+                    idle.append(connection)
+                else:
+                    to_close.append(connection)
+
+            expire_time = time.time() - self.idle_timeout
+
+            for idle_key, idle in list(self._idle.items()):
+                to_close += [
+                    idle_connection
+                    for idle_connection in idle
+                    if idle_connection.last_used < expire_time
+                ]
+                idle[:] = [
+                    idle_connection
+                    for idle_connection in idle
+                    if idle_connection.last_used >= expire_time
+                ]
+
+                if not idle:
+                    del self._idle[idle_key]
+
+        for connection in to_close:
+            connection.close()
+
+    def close_all(self):
+        """Close all idle connections in the pool."""
+        with self._lock:
+            self._check_pid()
+            idle = self._idle
+            self._idle = {}
+
+        for connections in six.itervalues(idle):
+            for connection in connections:
+                connection.close()
+
+    def _check_pid(self):
+        """Discard connections inherited from a parent process.
+
+        The connections belong to the parent process, so they're left for
+        it to close. This must be called with the lock held.
+        """
+        pid = os.getpid()
+
+        if pid != self._pid:
+            self._idle = {}
+            self._pid = pid
+
+
+#: The pool of Perforce connections for this process.
+connection_pool = PerforceConnectionPool()
+atexit.register(connection_pool.close_all)
+
+
 class PerforceClient(object):
     """Client for talking to a Perforce server.
 
@@ -224,6 +410,9 @@ class PerforceClient(object):
     #: We default this to 1 hour.
     TICKET_RENEWAL_SECS = 1 * 60 * 60
 
+    #: The number of seconds between ticket checks on pooled connections.
+    TICKET_CHECK_INTERVAL_SECS = 5 * 60
+
     def __init__(self, path, username, password, encoding='', host=None,
                  client_name=None, local_site_name=None,
                  use_ticket_auth=False):
@@ -274,6 +463,7 @@ class PerforceClient(object):
 
         import P4
         self.p4 = P4.P4()
+        self._connection = None
 
         if self.use_stunnel and not is_exe_in_path('stunnel'):
             raise AttributeError('stunnel proxy was requested, but stunnel '
@@ -342,14 +532,19 @@ class PerforceClient(object):
     def connect(self):
         """Connect to the Perforce server.
 
-        This is a context manager used to set up, open, and then close a
-        connection to the Perforce server. Generally, :py:meth:`run_worker`
-        should be used instead, as this will convert certain P4 exceptions to
-        Review Board exceptions.
+        This is a context manager used to check out a connection to the
+        Perforce server. Generally, :py:meth:`run_worker` should be used
+        instead, as this will convert certain P4 exceptions to Review Board
+        exceptions.
+
+        Connections are kept open in a per-process pool once the context
+        ends, and reused for later operations with the same server and
+        credentials (see :py:class:`PerforceConnectionPool`). While in the
+        context, :py:attr:`p4` is the connection being used.
 
         Context:
             The context for the connection. Once the context ends, the
-            connection will close.
+            connection will be returned to the pool.
 
             No variables are passed to the context.
 
@@ -359,6 +554,68 @@ class PerforceClient(object):
                 with client.connect():
                     ...
         """
+        if self._connection is not None:
+            # We're already within a connection context. Keep using it.
+            yield
+            return
+
+        pool_key = self._get_pool_key()
+        connection = connection_pool.acquire(pool_key)
+
+        if connection is None:
+            connection = self._open_connection()
+            self.p4 = connection.p4
+        else:
+            self.p4 = connection.p4
+
+            if (self.use_ticket_auth and
+                (time.time() - connection.ticket_checked_at >=
+                 self.TICKET_CHECK_INTERVAL_SECS)):
+                try:
+                    self.check_refresh_ticket()
+                except Exception:
+                    connection.close()
+                    raise
+
+                connection.ticket_checked_at = time.time()
+
+        self._connection = connection
+
+        try:
+            yield
+        finally:
+            self._connection = None
+            connection_pool.release(pool_key, connection)
+
+    def _get_pool_key(self):
+        """Return the key used for this client's pooled connections.
+
+        Connections are only shared between clients with identical
+        connection settings and credentials.
+
+        Returns:
+            tuple:
+            The key for the connection pool.
+        """
+        return (self.p4port, self.use_stunnel, self.username,
+                hashlib.sha256(self.password.encode('utf-8')).hexdigest(),
+                self.encoding, self.p4host, self.client_name,
+                self.local_site_name, self.use_ticket_auth)
+
+    def _open_connection(self):
+        """Open a new connection to the Perforce server.
+
+        This will set up the connection settings and credentials, start an
+        stunnel proxy if needed, connect, and check the login ticket if using
+        ticket-based authentication.
+
+        Returns:
+            PerforceConnection:
+            The new connection.
+        """
+        import P4
+
+        self.p4 = P4.P4()
         self.p4.user = self.username.encode('utf-8')
 
         if self.encoding:
@@ -414,21 +671,22 @@ class PerforceClient(object):
             # need to set the password that's provided.
             self.p4.password = self.password.encode('utf-8')
 
-        try:
-            with self.p4.connect():
-                if self.use_ticket_auth:
-                    # The ticket may not exist, may have expired, or may be
-                    # close to expiring. Check for those conditions and
-                    # possibly request/extend a ticket.
-                    self.check_refresh_ticket()
+        connection = PerforceConnection(self.p4, proxy)
 
-                yield
-        finally:
-            if proxy:
-                try:
-                    proxy.shutdown()
-                except:
-                    pass
+        try:
+            self.p4.connect()
+
+            if self.use_ticket_auth:
+                # The ticket may not exist, may have expired, or may be
+                # close to expiring. Check for those conditions and
+                # possibly request/extend a ticket.
+                self.check_refresh_ticket()
+                connection.ticket_checked_at = time.time()
+        except Exception:
+            connection.close()
+            raise
+
+        return connection
 
     @contextmanager
     def run_worker(self):
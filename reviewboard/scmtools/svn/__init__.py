@@ -73,6 +73,10 @@ class SVNTool(SCMTool):
                               credentials['username'], credentials['password'],
                               local_site_name)
 
+        # Only some backends can fetch files in batches.
+        self.supports_batched_file_fetch = \
+            self.client.supports_batched_file_fetch
+
         # If we assign a function to the pysvn Client that accesses anything
         # bound to SVNClient, it'll end up keeping a reference and a copy of
         # the function for every instance that gets created, and will never
@@ -157,6 +161,9 @@ class SVNTool(SCMTool):
     def get_file(self, path, revision=HEAD, **kwargs):
         return self.client.get_file(path, revision)
 
+    def get_files(self, files, base_commit_id=None):
+        return self.client.get_files(files)
+
     def get_keywords(self, path, revision=HEAD):
         return self.client.get_keywords(path, revision)
 
@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 import re
 
 from reviewboard.scmtools.core import HEAD
+from reviewboard.scmtools.errors import FileNotFoundError
 
 
 class Client(object):
@@ -19,6 +20,9 @@ class Client(object):
     LOG_DEFAULT_START = 'HEAD'
     LOG_DEFAULT_END = '1'
 
+    # Whether get_files fetches files more efficiently than get_file.
+    supports_batched_file_fetch = False
+
     # Mapping of keywords to known aliases
     keywords = {
         # Standard keywords
@@ -47,6 +51,27 @@ class Client(object):
         """Returns the contents of a given file at the given revision."""
         raise NotImplementedError
 
+    def get_files(self, files):
+        """Returns the contents of several files.
+
+        ``files`` is a list of ``(path, revision)`` tuples. The result is a
+        dictionary mapping each tuple to the file's contents, with any
+        keywords collapsed. Files that can't be found are left out.
+
+        By default, this fetches each file with :py:meth:`get_file`.
+        Backends that can fetch many files over a single connection should
+        override this and set ``supports_batched_file_fetch``.
+        """
+        results = {}
+
+        for path, revision in files:
+            try:
+                results[(path, revision)] = self.get_file(path, revision)
+            except FileNotFoundError:
+                pass
+
+        return results
+
     def get_keywords(self, path, revision=HEAD):
         """Returns a list of SVN keywords for a given path."""
         raise NotImplementedError
@@ -7,7 +7,9 @@ import nose
 
 from reviewboard.scmtools.core import PRE_CREATION, Revision
 from reviewboard.scmtools.errors import SCMError, FileNotFoundError
-from reviewboard.scmtools.hg import HgDiffParser, HgGitDiffParser
+from reviewboard.scmtools.hg import (HgDiffParser, HgGitDiffParser,
+                                     close_hg_command_servers,
+                                     get_hg_command_server)
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.scmtools.tests.testcases import SCMTestCase
 from reviewboard.testing import online_only
@@ -344,3 +346,67 @@ class MercurialTests(SCMTestCase):
 
         self.assertTrue(tool.file_exists('TODO.rst', rev))
         self.assertTrue(not tool.file_exists('TODO.rstNotFound', rev))
+
+
+class MercurialCommandServerTests(SCMTestCase):
+    """Unit tests for running Mercurial commands through a command server."""
+
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(MercurialCommandServerTests, self).setUp()
+
+        self.hg_repo_path = os.path.join(os.path.dirname(__file__),
+                                         '..', 'testdata', 'hg_repo')
+        self.repository = Repository(name='Test HG',
+                                     path=self.hg_repo_path,
+                                     tool=Tool.objects.get(name='Mercurial'))
+
+        try:
+            self.tool = self.repository.get_scmtool()
+        except ImportError:
+            raise nose.SkipTest('Hg is not installed')
+
+        self.tool.client.use_cmdserver = True
+
+    def tearDown(self):
+        super(MercurialCommandServerTests, self).tearDown()
+
+        close_hg_command_servers()
+
+    def test_get_branches(self):
+        """Testing HgClient.get_branches with a command server"""
+        value = self.tool.get_branches()
+        self.assertEqual(len(value), 1)
+        self.assertEqual(value[0].id, 'default')
+        self.assertEqual(value[0].commit,
+                         '661e5dd3c4938ecbe8f77e2fdfa905d70485f94c')
+
+    def test_get_file(self):
+        """Testing HgClient.cat_file with a command server"""
+        rev = Revision('661e5dd3c493')
+
+        self.assertEqual(self.tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+        self.assertRaises(FileNotFoundError,
+                          lambda: self.tool.get_file('foo/bar', rev))
+
+    def test_get_commits_with_error(self):
+        """Testing HgClient.get_commits with a command server and a failed
+        command
+        """
+        self.assertRaisesRegexp(SCMError, 'Cannot load commits: ',
+                                lambda: self.tool.get_commits(branch='x'))
+
+    def test_restart(self):
+        """Testing HgClient restarts the command server if it exits"""
+        rev = Revision('661e5dd3c493')
+        self.assertEqual(self.tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+
+        server = get_hg_command_server(self.hg_repo_path)
+        server._process.kill()
+        server._process.wait()
+
+        self.assertEqual(self.tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
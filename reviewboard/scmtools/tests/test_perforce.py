@@ -17,12 +17,90 @@ from reviewboard.scmtools.core import PRE_CREATION
 from reviewboard.scmtools.errors import (AuthenticationError,
                                          RepositoryNotFoundError, SCMError)
 from reviewboard.scmtools.models import Repository, Tool
-from reviewboard.scmtools.perforce import STunnelProxy
+from reviewboard.scmtools.perforce import (PerforceConnection,
+                                           PerforceConnectionPool,
+                                           STunnelProxy, connection_pool)
 from reviewboard.scmtools.tests.testcases import SCMTestCase
 from reviewboard.site.models import LocalSite
 from reviewboard.testing import online_only
 
 
+class FakeP4(object):
+    """A fake P4 connection for testing connection pooling."""
+
+    def __init__(self):
+        self._connected = True
+
+    def connected(self):
+        return self._connected
+
+    def disconnect(self):
+        self._connected = False
+
+
+class PerforceConnectionPoolTests(SCMTestCase):
+    """Unit tests for PerforceConnectionPool."""
+
+    def setUp(self):
+        super(PerforceConnectionPoolTests, self).setUp()
+
+        self.pool = PerforceConnectionPool()
+
+    def tearDown(self):
+        super(PerforceConnectionPoolTests, self).tearDown()
+
+        self.pool.close_all()
+
+    def test_acquire_empty(self):
+        """Testing PerforceConnectionPool.acquire with no idle connections"""
+        self.assertIsNone(self.pool.acquire('key'))
+
+    def test_release_and_acquire(self):
+        """Testing PerforceConnectionPool.release and acquire"""
+        connection = PerforceConnection(FakeP4())
+        self.pool.release('key', connection)
+
+        self.assertIsNone(self.pool.acquire('other-key'))
+        self.assertIs(self.pool.acquire('key'), connection)
+        self.assertIsNone(self.pool.acquire('key'))
+
+    def test_release_with_full_pool(self):
+        """Testing PerforceConnectionPool.release closes connections when
+        the pool is full
+        """
+        self.pool.max_idle = 1
+
+        connection1 = PerforceConnection(FakeP4())
+        connection2 = PerforceConnection(FakeP4())
+        self.pool.release('key', connection1)
+        self.pool.release('key', connection2)
+
+        self.assertTrue(connection1.is_connected())
+        self.assertFalse(connection2.is_connected())
+        self.assertIs(self.pool.acquire('key'), connection1)
+
+    def test_acquire_with_idle_timeout(self):
+        """Testing PerforceConnectionPool.acquire closes connections idle for
+        too long
+        """
+        connection = PerforceConnection(FakeP4())
+        self.pool.release('key', connection)
+        connection.last_used -= self.pool.idle_timeout
+
+        self.assertIsNone(self.pool.acquire('key'))
+        self.assertFalse(connection.is_connected())
+
+    def test_acquire_with_disconnected(self):
+        """Testing PerforceConnectionPool.acquire discards closed
+        connections
+        """
+        connection = PerforceConnection(FakeP4())
+        self.pool.release('key', connection)
+        connection.p4.disconnect()
+
+        self.assertIsNone(self.pool.acquire('key'))
+
+
 class PerforceTests(SpyAgency, SCMTestCase):
     """Unit tests for perforce.
 
@@ -50,6 +128,7 @@ class PerforceTests(SpyAgency, SCMTestCase):
     def tearDown(self):
         super(PerforceTests, self).tearDown()
 
+        connection_pool.close_all()
         shutil.rmtree(os.path.join(settings.SITE_DATA_DIR, 'p4'),
                       ignore_errors=True)
 
@@ -309,6 +388,67 @@ class PerforceTests(SpyAgency, SCMTestCase):
                                           'local-site-1', 'p4tickets'))
 
     @online_only
+    def test_connect_reuses_connection(self):
+        """Testing PerforceClient.connect reuses pooled connections"""
+        client = self.tool.client
+        p4 = FakeP4()
+
+        self.spy_on(client._open_connection,
+                    call_fake=lambda *args: PerforceConnection(p4))
+
+        with client.connect():
+            self.assertIs(client.p4, p4)
+
+        with client.connect():
+            self.assertIs(client.p4, p4)
+
+            # Nested contexts use the same connection.
+            with client.connect():
+                self.assertIs(client.p4, p4)
+
+        self.assertEqual(len(client._open_connection.spy.calls), 1)
+
+    def test_connect_with_disconnected_connection(self):
+        """Testing PerforceClient.connect doesn't reuse closed connections"""
+        client = self.tool.client
+
+        self.spy_on(client._open_connection,
+                    call_fake=lambda *args: PerforceConnection(FakeP4()))
+
+        with client.connect():
+            client.p4.disconnect()
+
+        with client.connect():
+            self.assertTrue(client.p4.connected())
+
+        self.assertEqual(len(client._open_connection.spy.calls), 2)
+
+    def test_connect_with_different_credentials(self):
+        """Testing PerforceClient.connect doesn't share connections between
+        credentials
+        """
+        client = self.tool.client
+        other_client = Repository(
+            name='Perforce.com',
+            path='public.perforce.com:1666',
+            username='other',
+            encoding='none',
+            tool=Tool.objects.get(name='Perforce')).get_scmtool().client
+
+        self.spy_on(client._open_connection,
+                    call_fake=lambda *args: PerforceConnection(FakeP4()))
+        self.spy_on(other_client._open_connection,
+                    call_fake=lambda *args: PerforceConnection(FakeP4()))
+
+        with client.connect():
+            pass
+
+        with other_client.connect():
+            pass
+
+        self.assertEqual(len(client._open_connection.spy.calls), 1)
+        self.assertEqual(len(other_client._open_connection.spy.calls), 1)
+
     def test_parse_diff_revision_with_revision_eq_0(self):
         """Testing Perforce.parse_diff_revision with revision == 0"""
         self.assertEqual(
@@ -545,6 +685,7 @@ class PerforceStunnelTests(SCMTestCase):
     def tearDown(self):
         super(PerforceStunnelTests, self).tearDown()
 
+        connection_pool.close_all()
         self.proxy.shutdown()
 
     def test_changeset(self):
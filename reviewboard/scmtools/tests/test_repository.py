@@ -3,7 +3,10 @@ from __future__ import unicode_literals
 import os
 
 from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+from kgb import SpyAgency
 
+from reviewboard.scmtools import cache as scmtools_cache
 from reviewboard.scmtools.core import HEAD
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.scmtools.signals import (checked_file_exists,
@@ -264,3 +267,193 @@ class RepositoryTests(TestCase):
 
         with self.assert_warns(message=warn_msg):
             self.repository.get_file_exists(path, revision, request=request)
+
+
+class RepositoryListingCacheTests(SpyAgency, TestCase):
+    """Unit tests for caching of Repository branch and commit lists."""
+
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(RepositoryListingCacheTests, self).setUp()
+
+        self.repository = Repository.objects.create(
+            name='Git test repo',
+            path=os.path.join(os.path.dirname(__file__), '..', 'testdata',
+                              'git_repo'),
+            tool=Tool.objects.get(name='Git'))
+        self.scmtool_cls = self.repository.get_scmtool().__class__
+
+        self.spy_on(self.scmtool_cls.get_branches,
+                    call_fake=lambda *args, **kwargs: ['new'])
+        self.spy_on(scmtools_cache._refresh_queue.run,
+                    call_fake=lambda queue, func, *args: func(*args))
+
+    def test_get_branches_cached(self):
+        """Testing Repository.get_branches caches results"""
+        self.assertEqual(self.repository.get_branches(), ['new'])
+        self.assertEqual(self.repository.get_branches(), ['new'])
+
+        self.assertEqual(len(self.scmtool_cls.get_branches.spy.calls), 1)
+        self.assertFalse(scmtools_cache._refresh_queue.run.spy.called)
+
+    def test_get_branches_stale(self):
+        """Testing Repository.get_branches returns stale results while
+        refreshing in the background
+        """
+        cache_key = make_cache_key('repository-branches-v2:%s'
+                                   % self.repository.pk)
+        cache.set(cache_key, (['old'], 0))
+
+        self.assertEqual(self.repository.get_branches(), ['old'])
+        self.assertEqual(len(scmtools_cache._refresh_queue.run.spy.calls), 1)
+        self.assertEqual(len(self.scmtool_cls.get_branches.spy.calls), 1)
+
+        self.assertEqual(self.repository.get_branches(), ['new'])
+        self.assertEqual(len(self.scmtool_cls.get_branches.spy.calls), 1)
+
+    def test_get_branches_stale_refresh_in_progress(self):
+        """Testing Repository.get_branches only starts one background
+        refresh at a time
+        """
+        cache_key = 'repository-branches-v2:%s' % self.repository.pk
+        cache.set(make_cache_key(cache_key), (['old'], 0))
+        cache.set(make_cache_key('%s:refresh-lock' % cache_key), True)
+
+        self.assertEqual(self.repository.get_branches(), ['old'])
+        self.assertFalse(scmtools_cache._refresh_queue.run.spy.called)
+        self.assertFalse(self.scmtool_cls.get_branches.spy.called)
+
+    def test_get_branches_with_unexpected_entry(self):
+        """Testing Repository.get_branches treats cache entries in another
+        format as a miss
+        """
+        cache.set(make_cache_key('repository-branches-v2:%s'
+                                 % self.repository.pk),
+                  ['old1', 'old2'])
+
+        self.assertEqual(self.repository.get_branches(), ['new'])
+        self.assertEqual(len(self.scmtool_cls.get_branches.spy.calls), 1)
+
+    def test_get_branches_stale_refresh_failed(self):
+        """Testing Repository.get_branches keeps the refresh lock when a
+        background refresh fails
+        """
+        def _get_branches(*args, **kwargs):
+            raise Exception('Oh no')
+
+        self.scmtool_cls.get_branches.unspy()
+        self.spy_on(self.scmtool_cls.get_branches, call_fake=_get_branches)
+
+        cache_key = 'repository-branches-v2:%s' % self.repository.pk
+        cache.set(make_cache_key(cache_key), (['old'], 0))
+
+        self.assertEqual(self.repository.get_branches(), ['old'])
+        self.assertEqual(self.repository.get_branches(), ['old'])
+
+        self.assertEqual(len(scmtools_cache._refresh_queue.run.spy.calls), 1)
+        self.assertIsNotNone(
+            cache.get(make_cache_key('%s:refresh-lock' % cache_key)))
+
+
+class RepositoryPrefetchFilesTests(SpyAgency, TestCase):
+    """Unit tests for Repository.prefetch_files."""
+
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(RepositoryPrefetchFilesTests, self).setUp()
+
+        self.repository = Repository.objects.create(
+            name='Git test repo',
+            path=os.path.join(os.path.dirname(__file__), '..', 'testdata',
+                              'git_repo'),
+            tool=Tool.objects.get(name='Git'))
+        self.scmtool_cls = self.repository.get_scmtool().__class__
+        self.scmtool_cls.supports_batched_file_fetch = True
+
+        def get_files(tool, files, base_commit_id=None):
+            return dict(
+                ((path, revision), b'data for %s' % path.encode('utf-8'))
+                for path, revision in files
+                if path != 'missing'
+            )
+
+        self.spy_on(self.scmtool_cls.get_files, call_fake=get_files)
+        self.spy_on(self.scmtool_cls.get_file,
+                    call_fake=lambda *args, **kwargs: b'fetched')
+
+    def tearDown(self):
+        super(RepositoryPrefetchFilesTests, self).tearDown()
+
+        del self.scmtool_cls.supports_batched_file_fetch
+        cache.clear()
+
+    def test_prefetch_files(self):
+        """Testing Repository.prefetch_files caches files for get_file"""
+        self.repository.prefetch_files([('a', 'r1'), ('b', 'r2')])
+
+        self.assertEqual(len(self.scmtool_cls.get_files.spy.calls), 1)
+        self.assertEqual(self.repository.get_file('a', 'r1'), b'data for a')
+        self.assertEqual(self.repository.get_file('b', 'r2'), b'data for b')
+        self.assertTrue(self.repository.get_file_exists('a', 'r1'))
+        self.assertFalse(self.scmtool_cls.get_file.spy.called)
+
+    def test_prefetch_files_sends_signals(self):
+        """Testing Repository.prefetch_files sends fetching_file and
+        fetched_file signals
+        """
+        fetching = []
+        fetched = []
+
+        def _on_fetching_file(sender, path, **kwargs):
+            fetching.append(path)
+
+        def _on_fetched_file(sender, path, data, **kwargs):
+            fetched.append((path, data))
+
+        fetching_file.connect(_on_fetching_file, sender=self.repository)
+        fetched_file.connect(_on_fetched_file, sender=self.repository)
+        self.addCleanup(fetching_file.disconnect, _on_fetching_file,
+                        sender=self.repository)
+        self.addCleanup(fetched_file.disconnect, _on_fetched_file,
+                        sender=self.repository)
+
+        self.repository.prefetch_files([('a', 'r1'), ('missing', 'r2')])
+
+        self.assertEqual(fetching, ['a', 'missing'])
+        self.assertEqual(fetched, [('a', b'data for a')])
+
+    def test_prefetch_files_skips_cached(self):
+        """Testing Repository.prefetch_files only fetches uncached files"""
+        self.repository.get_file('a', 'r1')
+        self.repository.prefetch_files([('a', 'r1'), ('b', 'r2')])
+
+        self.assertEqual(self.scmtool_cls.get_files.spy.calls[0].args[0],
+                         [('b', 'r2')])
+
+    def test_prefetch_files_with_missing_file(self):
+        """Testing Repository.prefetch_files with files that can't be
+        fetched
+        """
+        self.repository.prefetch_files([('missing', 'r1')])
+
+        self.assertEqual(self.repository.get_file('missing', 'r1'),
+                         b'fetched')
+        self.assertTrue(self.scmtool_cls.get_file.spy.called)
+
+    def test_prefetch_files_without_batch_support(self):
+        """Testing Repository.prefetch_files with SCMTools that don't support
+        batched fetches
+        """
+        self.scmtool_cls.supports_batched_file_fetch = False
+        self.repository.prefetch_files([('a', 'r1')])
+
+        self.assertFalse(self.scmtool_cls.get_files.spy.called)
+
+    def test_supports_batched_file_fetch(self):
+        """Testing Repository.supports_batched_file_fetch"""
+        self.assertTrue(self.repository.supports_batched_file_fetch)
+
+        self.scmtool_cls.supports_batched_file_fetch = False
+        self.assertFalse(self.repository.supports_batched_file_fetch)
@@ -108,6 +108,33 @@ class CommonSVNTestCase(SpyAgency, SCMTestCase):
         self.assertRaises(FileNotFoundError,
                           lambda: self.tool.get_file('hello', PRE_CREATION))
 
+    def test_supports_batched_file_fetch(self):
+        """Testing SVN (<backend>) supports_batched_file_fetch"""
+        self.assertEqual(self.tool.supports_batched_file_fetch,
+                         self.backend.endswith('.subvertpy'))
+
+    def test_get_files(self):
+        """Testing SVN (<backend>) get_files"""
+        files = [
+            ('trunk/doc/misc-docs/Makefile', Revision('2')),
+            ('trunk/doc/misc-docs/Makefile', Revision('4')),
+            ('trunk/doc/misc-docs/Makefile2', Revision('2')),
+            ('hello', PRE_CREATION),
+        ]
+
+        results = self.tool.get_files(files)
+
+        self.assertEqual(
+            set(results.keys()),
+            set([
+                ('trunk/doc/misc-docs/Makefile', files[0][1]),
+                ('trunk/doc/misc-docs/Makefile', files[1][1]),
+            ]))
+
+        for path, revision in results:
+            self.assertEqual(results[(path, revision)],
+                             self.tool.get_file(path, revision))
+
     def test_revision_parsing(self):
         """Testing SVN (<backend>) revision number parsing"""
         self.assertEqual(
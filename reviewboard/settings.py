@@ -91,6 +91,7 @@ MIDDLEWARE_CLASSES = [
     'reviewboard.admin.middleware.CheckUpdatesRequiredMiddleware',
     'reviewboard.admin.middleware.X509AuthMiddleware',
     'reviewboard.site.middleware.LocalSiteMiddleware',
+    'reviewboard.admin.middleware.RequestProfilingMiddleware',
 
     # Keep this second to last so that everything is initialized before
     # middleware from extensions are run.
@@ -158,6 +159,7 @@ RB_BUILTIN_APPS = [
     'reviewboard.attachments',
     'reviewboard.avatars',
     'reviewboard.changedescs',
+    'reviewboard.datagrids',
     'reviewboard.diffviewer',
     'reviewboard.extensions',
     'reviewboard.hostingsvcs',
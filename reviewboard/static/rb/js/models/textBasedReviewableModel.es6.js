@@ -5,6 +5,9 @@ RB.TextBasedReviewable = RB.FileAttachmentReviewable.extend({
     defaults: _.defaults({
         viewMode: 'source',
         hasRenderedView: false,
+        rangedRendering: false,
+        numLines: null,
+        linesPerBlock: null,
     }, RB.FileAttachmentReviewable.prototype.defaults),
 
     commentBlockModel: RB.TextCommentBlock,
@@ -25,6 +25,7 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
         this._$renderedTable = null;
         this._textSelector = null;
         this._renderedSelector = null;
+        this._blockLoads = {};
 
         this.on('commentBlockViewAdded', this._placeCommentBlockView, this);
 
@@ -64,6 +65,8 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
 
         this._textSelector.remove();
         this._renderedSelector.remove();
+
+        $(window).off('.textBlocks');
     },
 
     /**
@@ -81,6 +84,10 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
         });
         this._textSelector.render();
 
+        if (this.model.get('rangedRendering')) {
+            this._setUpPendingBlocks();
+        }
+
         if (this.model.get('hasRenderedView')) {
             // Set up the rendered table.
             this._$renderedTable = this.$('.text-review-ui-rendered-table');
@@ -166,7 +173,21 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
      *         The line number to scroll to.
      */
     _scrollToLine(lineNum) {
-        const $table = this._getTableForViewMode(this.model.get('viewMode'));
+        const viewMode = this.model.get('viewMode');
+        const $table = this._getTableForViewMode(viewMode);
+
+        if (this._isRangedViewMode(viewMode)) {
+            lineNum = RB.MathUtils.clip(lineNum, 1,
+                                        this.model.get('numLines'));
+
+            this._loadLines(lineNum, lineNum).done(() => {
+                const $row = this._getRowForLine($table, lineNum);
+                $(window).scrollTop($row.offset().top);
+            });
+
+            return;
+        }
+
         const rows = $table[0].tBodies[0].rows;
 
         /* Normalize this to a valid row index. */
@@ -176,6 +197,158 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
         $(window).scrollTop($row.offset().top);
     },
 
+    /**
+     * Return whether a view mode's table is rendered in blocks of lines.
+     *
+     * Args:
+     *     viewMode (string):
+     *         The view mode to check.
+     *
+     * Returns:
+     *     boolean:
+     *     Whether the table for the view mode is rendered in blocks.
+     */
+    _isRangedViewMode(viewMode) {
+        return (viewMode === 'source' &&
+                this.model.get('rangedRendering') &&
+                !this.model.get('diffRevision'));
+    },
+
+    /**
+     * Set up loading of blocks of lines that haven't been rendered yet.
+     *
+     * Each block that hasn't been loaded is represented by a placeholder
+     * row, sized to roughly match the lines it will contain. Blocks are
+     * loaded as they're scrolled into view.
+     */
+    _setUpPendingBlocks() {
+        const $firstRow = this._$textTable.find('tr[line]:first');
+        const lineHeight = $firstRow.height() || 16;
+
+        this._$textTable.find('.text-review-ui-pending-block').each(
+            (i, el) => {
+                const $row = $(el);
+
+                $row.height($row.data('num-lines') * lineHeight);
+            });
+
+        $(window).on('scroll.textBlocks resize.textBlocks',
+                     _.throttle(() => this._loadVisibleBlocks(), 100));
+        this._loadVisibleBlocks();
+    },
+
+    /**
+     * Load any blocks of lines that are scrolled into view.
+     *
+     * Blocks within a screen's height of the visible area are also loaded,
+     * so that they're ready before the user gets to them.
+     */
+    _loadVisibleBlocks() {
+        if (!this._$textTable.is(':visible')) {
+            return;
+        }
+
+        const $window = $(window);
+        const windowHeight = $window.height();
+        const top = $window.scrollTop() - windowHeight;
+        const bottom = $window.scrollTop() + 2 * windowHeight;
+
+        this._$textTable.find('.text-review-ui-pending-block').each(
+            (i, el) => {
+                const $row = $(el);
+                const rowTop = $row.offset().top;
+
+                if (rowTop < bottom && rowTop + $row.height() > top) {
+                    this._loadBlock($row.data('block-num'));
+                }
+            });
+    },
+
+    /**
+     * Load a block of lines, replacing its placeholder row.
+     *
+     * Args:
+     *     blockNum (number):
+     *         The 0-based index of the block to load.
+     *
+     * Returns:
+     *     jQuery.Promise:
+     *     A promise that resolves once the block has been loaded.
+     */
+    _loadBlock(blockNum) {
+        if (!this._blockLoads[blockNum]) {
+            const $row = this._$textTable.find(
+                `.text-review-ui-pending-block[data-block-num="${blockNum}"]`);
+
+            if ($row.length === 0) {
+                /* This block was rendered with the page. */
+                this._blockLoads[blockNum] = $.Deferred().resolve().promise();
+            } else {
+                this._blockLoads[blockNum] = $.ajax({
+                    type: 'GET',
+                    url: $row.data('url'),
+                    dataType: 'html',
+                })
+                .done(html => {
+                    $row.replaceWith(html);
+
+                    /* Cause all comments to recalculate their sizes. */
+                    $(window).triggerHandler('resize');
+                })
+                .fail(() => {
+                    delete this._blockLoads[blockNum];
+                });
+            }
+        }
+
+        return this._blockLoads[blockNum];
+    },
+
+    /**
+     * Load the blocks containing a range of lines.
+     *
+     * Args:
+     *     beginLineNum (number):
+     *         The first line number in the range.
+     *
+     *     endLineNum (number):
+     *         The last line number in the range.
+     *
+     * Returns:
+     *     jQuery.Promise:
+     *     A promise that resolves once all the blocks have been loaded.
+     */
+    _loadLines(beginLineNum, endLineNum) {
+        const linesPerBlock = this.model.get('linesPerBlock');
+        const firstBlock = Math.floor((beginLineNum - 1) / linesPerBlock);
+        const lastBlock = Math.floor((endLineNum - 1) / linesPerBlock);
+        const loads = [];
+
+        for (let blockNum = firstBlock; blockNum <= lastBlock; blockNum++) {
+            loads.push(this._loadBlock(blockNum));
+        }
+
+        return $.when.apply($, loads);
+    },
+
+    /**
+     * Return the row for a line in a table rendered in blocks.
+     *
+     * Args:
+     *     $table (jQuery):
+     *         The table containing the line.
+     *
+     *     lineNum (number):
+     *         The line number.
+     *
+     * Returns:
+     *     jQuery:
+     *     The row for the line.
+     */
+    _getRowForLine($table, lineNum) {
+        return $table.find(`tr[line="${lineNum}"]`);
+    },
+
     /**
      * Return the table element for the given view mode.
      *
@@ -242,6 +415,27 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
                 return;
             }
 
+            if (this._isRangedViewMode(viewMode)) {
+                /*
+                 * The lines may not have been loaded yet. Load them first,
+                 * and then place the comment on them.
+                 */
+                this._loadLines(beginLineNum, endLineNum).done(() => {
+                    const $beginRow = this._getRowForLine(this._$textTable,
+                                                          beginLineNum);
+                    const $endRow = this._getRowForLine(this._$textTable,
+                                                        endLineNum);
+
+                    if ($beginRow.length > 0 && $endRow.length > 0) {
+                        commentBlockView.setRows($beginRow, $endRow);
+                        commentBlockView.$el.appendTo(
+                            commentBlockView.$beginRow[0].cells[0]);
+                    }
+                });
+
+                return;
+            }
+
             let rowEls;
 
             if (this.model.get('diffRevision')) {
@@ -287,6 +481,10 @@ RB.TextBasedReviewableView = RB.FileAttachmentReviewableView.extend({
         this._$textTable.setVisible(viewMode === 'source');
         this._$renderedTable.setVisible(viewMode === 'rendered');
 
+        if (this._isRangedViewMode(viewMode)) {
+            this._loadVisibleBlocks();
+        }
+
         /* Cause all comments to recalculate their sizes. */
         $(window).triggerHandler('resize');
     },
@@ -0,0 +1,18 @@
+from __future__ import unicode_literals
+
+from django.dispatch import receiver
+
+from reviewboard.signals import initializing
+
+
+@receiver(initializing)
+def _on_initializing(*args, **kwargs):
+    """Handler for when Review Board is initializing.
+
+    This will begin listening for changes to API tokens, OAuth2 tokens and
+    the users, applications and Local Sites they belong to, removing any
+    affected tokens from the cache when they change.
+    """
+    from reviewboard.webapi.token_cache import connect_signals
+
+    connect_signals()
@@ -4,10 +4,36 @@ from django.contrib.auth.models import User
 from djblets.webapi.auth import (
     WebAPIBasicAuthBackend as DjbletsWebAPIBasicAuthBackend)
 from djblets.webapi.auth.backends.api_tokens import TokenAuthBackendMixin
-from djblets.webapi.auth.backends.oauth2_tokens import OAuth2TokenBackendMixin
+from djblets.webapi.auth.backends.oauth2_tokens import (
+    OAuth2TokenBackendMixin,
+    WebAPIOAuth2TokenAuthBackend as DjbletsWebAPIOAuth2TokenAuthBackend)
 
 from reviewboard.accounts.backends import AuthBackend
 from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.token_cache import get_access_token, get_webapi_token
+
+
+def parse_bearer_authorization(auth_header):
+    """Return the access token from an Authorization header.
+
+    This follows the same rules as oauthlib. The header must be in the form
+    of ``Bearer <token>``. The scheme is case-insensitive, and the parts may
+    be separated by any whitespace.
+
+    Args:
+        auth_header (unicode):
+            The value of the ``Authorization`` header.
+
+    Returns:
+        unicode:
+        The access token, or ``None`` if the header doesn't contain one.
+    """
+    parts = auth_header.split()
+
+    if len(parts) == 2 and parts[0].lower() == 'bearer':
+        return parts[1]
+
+    return None
 
 
 class TokenAuthBackend(TokenAuthBackendMixin, AuthBackend):
@@ -20,6 +46,43 @@ class TokenAuthBackend(TokenAuthBackendMixin, AuthBackend):
 
     api_token_model = WebAPIToken
 
+    def authenticate(self, token=None, **kwargs):
+        """Authenticate a user, given a token ID.
+
+        The token, its policy and its user are cached for a short time (see
+        :py:mod:`reviewboard.webapi.token_cache`), so that clients making
+        many API requests don't need to look them up each time.
+
+        Args:
+            token (unicode):
+                The API token ID to authenticate with.
+
+            **kwargs (dict):
+                Other credentials, which are ignored.
+
+        Returns:
+            django.contrib.auth.models.User:
+            The resulting user, if a token matched, or ``None`` otherwise.
+        """
+        if not token:
+            return None
+
+        webapi_token = get_webapi_token(token)
+
+        if webapi_token is None:
+            return None
+
+        user = webapi_token.user
+
+        if not user.is_active:
+            return None
+
+        # Store this temporarily. It will be used to store some session
+        # state.
+        user._webapi_token = webapi_token
+
+        return user
+
 
 class OAuth2TokenAuthBackend(OAuth2TokenBackendMixin, AuthBackend):
     """An OAuth2 token authentication backend that handles local sites.
@@ -29,8 +92,70 @@ class OAuth2TokenAuthBackend(OAuth2TokenBackendMixin, AuthBackend):
 
     * not limited to a local site; or
     * limited to the local site being requested.
+
+    Access tokens are cached for a short time (see
+    :py:mod:`reviewboard.webapi.token_cache`), so that clients making many
+    API requests don't need to look them up each time.
     """
 
+    def authenticate(self, **credentials):
+        """Attempt to authenticate a request.
+
+        Args:
+            **credentials (dict):
+                The credentials for authentication.
+
+        Returns:
+            django.contrib.auth.models.User:
+            If authentication succeeds, the user that authenticated, otherwise
+            ``None``.
+        """
+        request = credentials.get('request')
+
+        if request is None:
+            return None
+
+        token_str = self.get_bearer_token(request)
+
+        if not token_str:
+            return None
+
+        token = get_access_token(token_str)
+
+        if (token is None or
+            token.is_expired() or
+            not self.verify_request(request, token, token.user)):
+            return None
+
+        request._oauth2_token = token
+        request.session['oauth2_token_id'] = token.pk
+
+        return token.user
+
+    def get_bearer_token(self, request):
+        """Return the access token provided in a request.
+
+        This follows the same rules as oauthlib. If there's an
+        ``Authorization`` header, it's parsed by
+        :py:func:`parse_bearer_authorization`. Otherwise, the token is read
+        from the ``access_token`` argument in the query string or form body.
+
+        Args:
+            request (django.http.HttpRequest):
+                The current HTTP request.
+
+        Returns:
+            unicode:
+            The access token, or ``None`` if one wasn't provided.
+        """
+        auth_header = request.META.get('HTTP_AUTHORIZATION')
+
+        if auth_header is not None:
+            return parse_bearer_authorization(auth_header)
+
+        return (request.GET.get('access_token') or
+                request.POST.get('access_token'))
+
     def verify_request(self, request, token, user):
         """Ensure the given authentication request is valid.
 
@@ -102,3 +227,32 @@ class WebAPIBasicAuthBackend(DjbletsWebAPIBasicAuthBackend):
                     credentials['username'] = users[0]
 
         return credentials
+
+
+class WebAPIOAuth2TokenAuthBackend(DjbletsWebAPIOAuth2TokenAuthBackend):
+    """A WebAPI OAuth2 token auth backend following oauthlib's header rules.
+
+    Djblets' backend only accepts ``Bearer`` with exactly that casing and a
+    single space. This accepts the same headers as
+    :py:class:`OAuth2TokenAuthBackend`, so that the token is checked by it
+    rather than rejected first.
+    """
+
+    def get_credentials(self, request):
+        """Return the credentials supplied in the request.
+
+        Args:
+            request (django.http.HttpRequest):
+                The current HTTP request.
+
+        Returns:
+            dict:
+            An empty dictionary if there's a bearer token in the
+            ``Authorization`` header, or ``None`` otherwise.
+        """
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+
+        if parse_bearer_authorization(auth_header) is None:
+            return None
+
+        return {}
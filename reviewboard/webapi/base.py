@@ -26,6 +26,8 @@ from reviewboard.site.urlresolvers import local_site_reverse
 from reviewboard.webapi.decorators import (webapi_check_local_site,
                                            webapi_check_login_required)
 from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.token_cache import (get_access_token_by_id,
+                                            get_webapi_token_by_id)
 
 
 CUSTOM_MIMETYPE_BASE = 'application/vnd.reviewboard.org'
@@ -106,10 +108,90 @@ class RBResourceMixin(APIQueryUtilsMixin, ResourceAPITokenMixin,
     #: enabled, the resource will return a 403 Forbidden error.
     required_features = []
 
+    def call_method_view(self, request, method, view, *args, **kwargs):
+        """Check token access and call the API method handler.
+
+        If the client authenticated with an API token or OAuth2 token earlier
+        in its session, the token is loaded from the cache (see
+        :py:mod:`reviewboard.webapi.token_cache`) before the token's policy
+        or scopes are checked. Otherwise, the token would be looked up in
+        the database on every request.
+
+        Args:
+            request (django.http.HttpRequest):
+                The current HTTP request.
+
+            method (unicode):
+                The HTTP method.
+
+            view (callable):
+                The view.
+
+            *args (tuple):
+                Additional positional arguments.
+
+            **kwargs (dict):
+                Additional keyword arguments.
+
+        Returns:
+            WebAPIError or tuple:
+            The result of calling the method view.
+        """
+        session = getattr(request, 'session', None)
+
+        if session is not None and request.user.is_authenticated():
+            if getattr(request, '_webapi_token', None) is None:
+                token_id = session.get('webapi_token_id')
+
+                if token_id:
+                    webapi_token = get_webapi_token_by_id(token_id)
+
+                    if (webapi_token is not None and
+                        webapi_token.user_id == request.user.pk):
+                        request._webapi_token = webapi_token
+
+            if getattr(request, '_oauth2_token', None) is None:
+                token_id = session.get('oauth2_token_id')
+
+                if token_id:
+                    oauth2_token = get_access_token_by_id(token_id)
+
+                    # Expired tokens are left for the OAuth2 mixin to
+                    # handle, so that the user is logged out.
+                    if (oauth2_token is not None and
+                        oauth2_token.user_id == request.user.pk and
+                        not oauth2_token.is_expired()):
+                        request._oauth2_token = oauth2_token
+
+        return super(RBResourceMixin, self).call_method_view(
+            request, method, view, *args, **kwargs)
+
 
 class WebAPIResource(RBResourceMixin, DjbletsWebAPIResource):
     """A specialization of the Djblets WebAPIResource for Review Board."""
 
+    #: Relations to fetch using select_related() when listing objects.
+    #:
+    #: Foreign keys listed in :py:attr:`fields` without a custom serializer
+    #: are already fetched automatically. This should list any other
+    #: single-valued relations accessed while serializing each object, such
+    #: as those needed to build URLs.
+    list_select_related_fields = []
+
+    #: Relations to fetch using prefetch_related() when listing objects.
+    #:
+    #: Many-to-many relations listed in :py:attr:`fields` without a custom
+    #: serializer are already fetched automatically. This should list any
+    #: other multi-valued relations accessed while serializing each object.
+    list_prefetch_related_fields = []
+
+    #: Relations to prefetch when listing objects with expanded fields.
+    #:
+    #: This maps field names to the relations to fetch using
+    #: prefetch_related() when that field is listed in ``?expand=``. These
+    #: are the relations accessed when serializing the expanded objects.
+    list_expand_prefetch_related_fields = {}
+
     def __init__(self, *args, **kwargs):
         super(WebAPIResource, self).__init__(*args, **kwargs)
 
@@ -190,6 +272,57 @@ class WebAPIResource(RBResourceMixin, DjbletsWebAPIResource):
     def delete(self, *args, **kwargs):
         pass
 
+    def _get_queryset(self, request, is_list=False, *args, **kwargs):
+        """Return an optimized queryset.
+
+        This extends the optimizations made by Djblets for lists of objects,
+        fetching the relations declared in
+        :py:attr:`list_select_related_fields`,
+        :py:attr:`list_prefetch_related_fields`, and
+        :py:attr:`list_expand_prefetch_related_fields`, so that serializing
+        each object doesn't require additional queries.
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            is_list (bool, optional):
+                Whether the queryset is being used for a list of objects.
+
+            *args (tuple):
+                Positional arguments to pass to :py:meth:`get_queryset`.
+
+            **kwargs (dict):
+                Keyword arguments to pass to :py:meth:`get_queryset`.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The queryset.
+        """
+        queryset = super(WebAPIResource, self)._get_queryset(
+            request, is_list=is_list, *args, **kwargs)
+
+        if is_list:
+            if self.list_select_related_fields:
+                queryset = queryset.select_related(
+                    *self.list_select_related_fields)
+
+            prefetch_related_fields = list(self.list_prefetch_related_fields)
+
+            if self.list_expand_prefetch_related_fields and request:
+                expand = request.GET.get('expand',
+                                         request.POST.get('expand', ''))
+
+                for field in expand.split(','):
+                    prefetch_related_fields += \
+                        self.list_expand_prefetch_related_fields.get(field,
+                                                                     [])
+
+            if prefetch_related_fields:
+                queryset = queryset.prefetch_related(*prefetch_related_fields)
+
+        return queryset
+
     def _get_list_impl(self, request, *args, **kwargs):
         """Actual implementation to return the list of results.
 
@@ -2,11 +2,12 @@ from __future__ import unicode_literals
 
 import logging
 
-from django.http import HttpResponse
 from django.utils.six.moves.urllib.parse import quote as urllib_quote
-from djblets.util.http import set_last_modified
+from djblets.util.http import encode_etag
 from djblets.webapi.errors import DOES_NOT_EXIST, WebAPIError
 
+from reviewboard.diffviewer.downloads import (build_download_response,
+                                              get_not_modified_response)
 from reviewboard.diffviewer.models import FileDiff
 from reviewboard.diffviewer.diffutils import (get_original_file,
                                               get_patched_file)
@@ -51,6 +52,13 @@ class BasePatchedFileResource(WebAPIResource):
         if filediff.deleted:
             return DOES_NOT_EXIST
 
+        timestamp = filediff.diffset.timestamp
+        etag = encode_etag('patched-file:%s:%s' % (filediff.pk, timestamp))
+        resp = get_not_modified_response(request, etag, timestamp)
+
+        if resp is not None:
+            return resp
+
         try:
             orig_file = get_original_file(
                 filediff, request,
@@ -71,9 +79,15 @@ class BasePatchedFileResource(WebAPIResource):
                           request=request)
             return FILE_RETRIEVAL_ERROR
 
-        resp = HttpResponse(patched_file, content_type='text/plain')
+        resp = build_download_response(
+            request,
+            [patched_file],
+            content_type='text/plain',
+            etag=etag,
+            last_modified=timestamp,
+            get_length=lambda: len(patched_file),
+            streaming=False)
         filename = urllib_quote(filediff.dest_file)
         resp['Content-Disposition'] = 'inline; filename=%s' % filename
-        set_last_modified(resp, filediff.diffset.timestamp)
 
         return resp
@@ -97,6 +97,12 @@ class BaseReviewResource(MarkdownFieldsMixin, WebAPIResource):
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
 
+    # The review request is needed to build the URLs for each review.
+    list_select_related_fields = ['review_request__local_site']
+    list_expand_prefetch_related_fields = {
+        'user': ['user__profile_set'],
+    }
+
     CREATE_UPDATE_OPTIONAL_FIELDS = {
         'ship_it': {
             'type': bool,
@@ -3,9 +3,8 @@ from __future__ import unicode_literals
 import logging
 
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
-from django.http import HttpResponse
 from django.utils import six
-from djblets.util.http import get_http_requested_mimetype, set_last_modified
+from djblets.util.http import get_http_requested_mimetype
 from djblets.webapi.decorators import (webapi_login_required,
                                        webapi_response_errors,
                                        webapi_request_fields)
@@ -13,6 +12,9 @@ from djblets.webapi.errors import (DOES_NOT_EXIST, INVALID_ATTRIBUTE,
                                    INVALID_FORM_DATA, NOT_LOGGED_IN,
                                    PERMISSION_DENIED)
 
+from reviewboard.diffviewer.downloads import (build_download_response,
+                                              get_not_modified_response,
+                                              get_raw_diff_etag)
 from reviewboard.diffviewer.errors import DiffTooBigError, EmptyDiffError
 from reviewboard.diffviewer.models import DiffSet
 from reviewboard.reviews.forms import UploadDiffForm
@@ -171,10 +173,23 @@ class DiffResource(WebAPIResource):
         except ObjectDoesNotExist:
             return DOES_NOT_EXIST
 
+        etag = get_raw_diff_etag(diffset)
+        resp = get_not_modified_response(request, etag, diffset.timestamp)
+
+        if resp is not None:
+            return resp
+
         tool = review_request.repository.get_scmtool()
         data = tool.get_parser('').raw_diff(diffset)
 
-        resp = HttpResponse(data, content_type='text/x-patch')
+        resp = build_download_response(
+            request,
+            [data],
+            content_type='text/x-patch',
+            etag=etag,
+            last_modified=diffset.timestamp,
+            get_length=lambda: len(data),
+            streaming=False)
 
         if diffset.name == 'diff':
             filename = 'bug%s.patch' % \
@@ -183,7 +198,6 @@ class DiffResource(WebAPIResource):
             filename = diffset.name
 
         resp['Content-Disposition'] = 'inline; filename=%s' % filename
-        set_last_modified(resp, diffset.timestamp)
 
         return resp
 
@@ -98,6 +98,8 @@ class RepositoryResource(WebAPIResource):
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
 
+    list_select_related_fields = ['tool']
+
     @webapi_check_login_required
     def get_queryset(self, request, is_list=False, local_site_name=None,
                      show_invisible=False, *args, **kwargs):
@@ -91,6 +91,9 @@ class ReviewGroupResource(WebAPIResource):
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
 
+    # The Local Site is needed to build the URLs for each group.
+    list_select_related_fields = ['local_site']
+
     def has_delete_permissions(self, request, group, *args, **kwargs):
         return group.is_mutable_by(request.user)
 
@@ -103,6 +103,10 @@ class ReviewReplyResource(BaseReviewResource):
     uri_object_key = 'reply_id'
     model_parent_key = 'base_reply_to'
 
+    # The parent review is needed to build the URLs for each reply.
+    list_select_related_fields = ['base_reply_to',
+                                  'review_request__local_site']
+
     mimetype_list_resource_name = 'review-replies'
     mimetype_item_resource_name = 'review-reply'
 
@@ -66,6 +66,19 @@ from reviewboard.webapi.resources.review_request_draft import \
 from reviewboard.webapi.resources.user import UserResource
 
 
+#: Relations to fetch for review requests serialized within other review
+#: requests (through ``?expand=blocks`` or ``?expand=depends_on``).
+_NESTED_REVIEW_REQUEST_RELATIONS = [
+    'changedescs',
+    'diffset_history__diffsets',
+    'local_site',
+    'repository',
+    'submitter',
+    'target_groups',
+    'target_people',
+]
+
+
 class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
     """Provides information on review requests.
 
@@ -297,6 +310,39 @@ class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
 
     allowed_methods = ('GET', 'POST', 'PUT', 'DELETE')
 
+    # These are only fetched for list resources, since we want to reduce the
+    # number of queries. We don't want to do this when retrieving individual
+    # items, as they'd end up stuck with prefetched state, which could impact
+    # things when handling PUT/DELETE operations.
+    #
+    # Here's a real-world example (which is interesting enough to talk
+    # about): We had a bug before when the prefetching was done for item
+    # resources where a publish on the draft resource would fetch the review
+    # request from this resource (going through this function and therefore
+    # prefetching), and then the publish operation would associate the new
+    # diffset and then emit the review_request_published signal. Handlers
+    # listening to this that tried to fetch diffsets (Review Bot, in our
+    # case) would not see the new diffset.
+    #
+    # By having this only for lists, we get the performance benefits we
+    # wanted without triggering that sort of bug.
+    list_select_related_fields = ['diffset_history', 'local_site']
+    list_prefetch_related_fields = ['changedescs', 'diffset_history__diffsets']
+    list_expand_prefetch_related_fields = {
+        'blocks': [
+            'blocks__%s' % field_name
+            for field_name in _NESTED_REVIEW_REQUEST_RELATIONS
+        ],
+        'depends_on': [
+            'depends_on__%s' % field_name
+            for field_name in _NESTED_REVIEW_REQUEST_RELATIONS
+        ],
+        'repository': ['repository__tool'],
+        'submitter': ['submitter__profile_set'],
+        'target_groups': ['target_groups__local_site'],
+        'target_people': ['target_people__profile_set'],
+    }
+
     _close_type_map = {
         'submitted': ReviewRequest.SUBMITTED,
         'discarded': ReviewRequest.DISCARDED,
@@ -472,31 +518,6 @@ class ReviewRequestResource(MarkdownFieldsMixin, WebAPIResource):
                 local_site=local_site,
                 extra_query=q,
                 show_all_unpublished=show_all_unpublished)
-
-            # Only select/prefetch these for list resources, since we want to
-            # reduce the number of queries. We don't want to do this when
-            # retrieving individual items, as they'd end up stuck with
-            # prefetched state, which could impact things when handling
-            # PUT/DELETE operations.
-            #
-            # Here's a real-world example (which is interesting enough to
-            # talk about): We had a bug before when the prefetching was done
-            # for item resources where a publish on the draft resource would
-            # fetch the review request from this resource (going through this
-            # function and therefore prefetching), and then the publish
-            # operation would associate the new diffset and then emit the
-            # review_request_published signal. Handlers listening to this that
-            # tried to fetch diffsets (Review Bot, in our case) would not see
-            # the new diffset.
-            #
-            # By having this only in the list condition, we get the perforamnce
-            # benefits we wanted without triggering that sort of bug.
-            queryset = (
-                queryset
-                .select_related('diffset_history')
-                .prefetch_related('changedescs',
-                                  'diffset_history__diffsets')
-            )
         else:
             queryset = self.model.objects.filter(local_site=local_site)
 
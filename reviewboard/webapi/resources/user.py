@@ -63,6 +63,9 @@ class UserResource(WebAPIResource, DjbletsUserResource):
 
     allowed_methods = ('GET', 'POST')
 
+    # The profile is needed to look up each user's avatar settings.
+    list_prefetch_related_fields = ['profile_set']
+
     hidden_fields = ('email', 'first_name', 'last_name', 'fullname')
 
     def get_queryset(self, request, local_site_name=None, *args, **kwargs):
@@ -5,6 +5,8 @@ import os
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import six
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.webapi.testing.testcases import WebAPITestCaseMixin
@@ -75,6 +77,57 @@ class BaseWebAPITestCase(WebAPITestCaseMixin, TestCase, EmailTestHelper):
 
         self.assertHttpNotModified(response)
 
+    def assertListQueryCountConstant(self, url, expected_mimetype,
+                                     results_key, add_items, query=None):
+        """Assert that listing a resource doesn't query once per item.
+
+        This will list the resource twice, adding items with ``add_items``
+        before each, and check that both perform the same number of queries.
+
+        Args:
+            url (unicode):
+                The URL of the list resource.
+
+            expected_mimetype (unicode):
+                The expected mimetype of the response.
+
+            results_key (unicode):
+                The key in the payload containing the list of results.
+
+            add_items (callable):
+                A function that adds items to the list. This takes no
+                arguments.
+
+            query (dict, optional):
+                The query arguments for the request.
+        """
+        query = query or {}
+
+        add_items()
+
+        # Make an initial request to populate any caches.
+        self.api_get(url, query, expected_mimetype=expected_mimetype)
+
+        with CaptureQueriesContext(connection) as ctx:
+            rsp = self.api_get(url, query,
+                               expected_mimetype=expected_mimetype)
+
+        num_queries = len(ctx.captured_queries)
+        num_results = len(rsp[results_key])
+
+        add_items()
+
+        with CaptureQueriesContext(connection) as ctx:
+            rsp = self.api_get(url, query,
+                               expected_mimetype=expected_mimetype)
+
+        self.assertGreater(len(rsp[results_key]), num_results)
+        self.assertEqual(
+            len(ctx.captured_queries), num_queries,
+            'Expected %d queries, got %d:\n%s'
+            % (num_queries, len(ctx.captured_queries),
+               '\n'.join(info['sql'] for info in ctx.captured_queries)))
+
     #
     # Some utility functions shared across test suites.
     #
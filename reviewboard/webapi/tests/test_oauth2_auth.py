@@ -57,6 +57,38 @@ class OAuth2TokenAuthTests(WebAPITestCaseMixin, TestCase):
         self.assertIn('stat', rsp)
         self.assertEqual(rsp['stat'], 'ok')
 
+    def test_auth_lowercase_scheme(self):
+        """Testing OAuth2 authentication to the Web API with a lowercase
+        bearer scheme and extra whitespace
+        """
+        application = self.create_oauth_application(user=self.owner)
+        token = self.create_oauth_token(application, self.user, 'session:read')
+
+        with override_feature_check(oauth2_service_feature.feature_id, True):
+            load_site_config()
+            rsp = self.api_get(get_session_url(),
+                               HTTP_AUTHORIZATION='bearer  %s' % token.token,
+                               expected_mimetype=session_mimetype)
+
+        self.assertIn('stat', rsp)
+        self.assertEqual(rsp['stat'], 'ok')
+
+    def test_auth_query_access_token(self):
+        """Testing OAuth2 authentication to the Web API with the token in
+        the access_token query argument
+        """
+        application = self.create_oauth_application(user=self.owner)
+        token = self.create_oauth_token(application, self.user, 'session:read')
+
+        with override_feature_check(oauth2_service_feature.feature_id, True):
+            load_site_config()
+            rsp = self.api_get(get_session_url(),
+                               {'access_token': token.token},
+                               expected_mimetype=session_mimetype)
+
+        self.assertIn('stat', rsp)
+        self.assertEqual(rsp['stat'], 'ok')
+
     def test_auth_disabled_app(self):
         """Testing OAuth2 authentication to the Web API with a valid token
         against a disabled app
@@ -90,6 +90,23 @@ class ResourceListTests(ReviewListMixin, ReviewRequestChildListMixin,
         self.assertEqual(rsp['stat'], 'ok')
         self.assertEqual(rsp['count'], 2)
 
+    def test_get_num_queries(self):
+        """Testing the GET review-requests/<id>/reviews/ API for number of
+        queries
+        """
+        review_request = self.create_review_request(publish=True)
+
+        def _add_items():
+            for username in ('doc', 'dopey', 'grumpy'):
+                self.create_review(review_request, user=username,
+                                   publish=True)
+
+        self.assertListQueryCountConstant(get_review_list_url(review_request),
+                                          review_list_mimetype,
+                                          'reviews',
+                                          _add_items,
+                                          {'expand': 'user'})
+
     def test_get_with_invite_only_group_and_permission_denied_error(self):
         """Testing the GET review-requests/<id>/reviews/ API
         with invite-only group and Permission Denied error
@@ -827,6 +827,33 @@ class ResourceListTests(SpyAgency, ExtraDataListMixin, BaseWebAPITestCase):
         self.assertIn('total_results', rsp)
         self.assertEqual(rsp['total_results'], 3)
 
+    @add_fixtures(['test_scmtools'])
+    def test_get_num_queries_with_expand(self):
+        """Testing the GET <URL>?expand= API for number of queries with
+        expanded fields
+        """
+        repository = self.create_repository()
+        group = self.create_review_group()
+        users = list(User.objects.all())
+
+        def _add_items():
+            for i in range(3):
+                review_request = self.create_review_request(
+                    repository=repository,
+                    publish=True)
+                review_request.target_people.add(*users)
+                review_request.target_groups.add(group)
+                self.create_diffset(review_request)
+
+        self.assertListQueryCountConstant(
+            get_review_request_list_url(),
+            review_request_list_mimetype,
+            'review_requests',
+            _add_items,
+            {
+                'expand': 'submitter,repository,target_groups,target_people',
+            })
+
     #
     # HTTP POST tests
     #
@@ -0,0 +1,107 @@
+"""Unit tests for reviewboard.webapi.token_cache."""
+
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from reviewboard.testing import TestCase
+from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.token_cache import (get_access_token,
+                                            get_access_token_by_id,
+                                            get_webapi_token,
+                                            get_webapi_token_by_id)
+
+
+class TokenCacheTests(TestCase):
+    """Unit tests for reviewboard.webapi.token_cache."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(TokenCacheTests, self).setUp()
+
+        self.user = User.objects.get(username='doc')
+
+    def tearDown(self):
+        super(TokenCacheTests, self).tearDown()
+
+        cache.clear()
+
+    def test_get_webapi_token_cached(self):
+        """Testing get_webapi_token caches tokens"""
+        webapi_token = self.create_webapi_token(self.user)
+
+        self.assertEqual(get_webapi_token(webapi_token.token), webapi_token)
+
+        with self.assertNumQueries(0):
+            token = get_webapi_token(webapi_token.token)
+            self.assertEqual(token, webapi_token)
+            self.assertEqual(token.user, self.user)
+            self.assertEqual(token.policy, {'access': 'rw'})
+
+            self.assertEqual(get_webapi_token_by_id(webapi_token.pk),
+                             webapi_token)
+
+    def test_get_webapi_token_not_found(self):
+        """Testing get_webapi_token with a token that doesn't exist"""
+        self.assertIsNone(get_webapi_token('abc123'))
+
+    def test_get_webapi_token_after_delete(self):
+        """Testing get_webapi_token after the token is deleted"""
+        webapi_token = self.create_webapi_token(self.user)
+        get_webapi_token(webapi_token.token)
+
+        WebAPIToken.objects.get(pk=webapi_token.pk).delete()
+
+        self.assertIsNone(get_webapi_token(webapi_token.token))
+        self.assertIsNone(get_webapi_token_by_id(webapi_token.pk))
+
+    def test_get_webapi_token_after_policy_change(self):
+        """Testing get_webapi_token after the token's policy changes"""
+        webapi_token = self.create_webapi_token(self.user)
+        get_webapi_token(webapi_token.token)
+
+        webapi_token.policy = {'access': 'ro'}
+        webapi_token.save()
+
+        self.assertEqual(get_webapi_token(webapi_token.token).policy,
+                         {'access': 'ro'})
+
+    def test_get_webapi_token_after_user_deactivated(self):
+        """Testing get_webapi_token after the token's user is deactivated"""
+        webapi_token = self.create_webapi_token(self.user)
+        get_webapi_token(webapi_token.token)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertFalse(get_webapi_token(webapi_token.token).user.is_active)
+
+    def test_get_access_token_cached(self):
+        """Testing get_access_token caches tokens"""
+        application = self.create_oauth_application(user=self.user)
+        token = self.create_oauth_token(application, self.user,
+                                        'session:read')
+
+        self.assertEqual(get_access_token(token.token), token)
+
+        with self.assertNumQueries(0):
+            cached_token = get_access_token(token.token)
+            self.assertEqual(cached_token, token)
+            self.assertEqual(cached_token.application, application)
+            self.assertEqual(get_access_token_by_id(token.pk), token)
+
+    def test_get_access_token_after_application_disabled(self):
+        """Testing get_access_token after the token's application is
+        disabled
+        """
+        application = self.create_oauth_application(user=self.user)
+        token = self.create_oauth_token(application, self.user,
+                                        'session:read')
+        get_access_token(token.token)
+
+        application.enabled = False
+        application.save()
+
+        self.assertFalse(get_access_token(token.token).application.enabled)
@@ -106,6 +106,20 @@ class ResourceListTests(SpyAgency, BaseWebAPITestCase):
         self.assertEqual(set(User.objects.filter(pk__in=user_pks)),
                          set(User.objects.all()))
 
+    def test_get_num_queries(self):
+        """Testing the GET users/ API for number of queries"""
+        usernames = ('user%d' % i for i in range(6))
+
+        def _add_items():
+            for i in range(3):
+                user = User.objects.create(username=next(usernames))
+                Profile.objects.create(user=user)
+
+        self.assertListQueryCountConstant(get_user_list_url(),
+                                          user_list_mimetype,
+                                          'users',
+                                          _add_items)
+
     def test_get_with_q(self):
         """Testing the GET users/?q= API"""
         rsp = self.api_get(get_user_list_url(), {'q': 'gru'},
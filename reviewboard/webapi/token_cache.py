@@ -0,0 +1,356 @@
+"""Caching for the tokens used to authenticate with the Web API.
+
+Every request authenticated with an API token or OAuth2 access token has to
+look up the token (along with its user, policy, application and Local Site)
+from the database, and requests made within an authenticated session look up
+the token again to check its policy or scopes. Clients such as CI bots can
+make many thousands of these requests an hour.
+
+The functions here cache those tokens for a short time. Any change to a
+token, its user, its OAuth2 application or its Local Site removes the
+affected tokens from the cache right away, so revoking a token (or disabling
+an application or user) takes effect on the next request.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+
+
+#: The number of seconds tokens are cached for.
+TOKEN_CACHE_EXPIRATION = 5 * 60
+
+
+def _make_token_cache_key(token_type, token):
+    """Return the cache key for a token.
+
+    The token itself isn't stored in the key, so that it can't be read out
+    of the cache server's list of keys.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        token (unicode):
+            The token string.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('webapi-auth-token:%s:%s' % (
+        token_type, hashlib.sha256(token.encode('utf-8')).hexdigest()))
+
+
+def _make_token_id_cache_key(token_type, token_id):
+    """Return the cache key for a token's ID.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        token_id (int):
+            The ID of the token.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('webapi-auth-token-id:%s:%s' % (token_type,
+                                                          token_id))
+
+
+def _get_cached_token(token_type, cache_key, get_queryset, **lookup):
+    """Return a token from the cache, or look it up and cache it.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        cache_key (unicode):
+            The cache key to check first.
+
+        get_queryset (callable):
+            A function returning the queryset used to look up the token.
+
+        **lookup (dict):
+            The arguments used to look up the token in the queryset.
+
+    Returns:
+        django.db.models.Model:
+        The token, or ``None`` if it doesn't exist.
+    """
+    token = cache.get(cache_key)
+
+    if token is None:
+        queryset = get_queryset()
+
+        try:
+            token = queryset.get(**lookup)
+        except queryset.model.DoesNotExist:
+            return None
+
+        cache.set_many(
+            {
+                _make_token_cache_key(token_type, token.token): token,
+                _make_token_id_cache_key(token_type, token.pk): token,
+            },
+            TOKEN_CACHE_EXPIRATION)
+
+    return token
+
+
+def _get_webapi_token_queryset():
+    """Return the queryset used to look up API tokens.
+
+    Returns:
+        django.db.models.query.QuerySet:
+        The queryset.
+    """
+    from reviewboard.webapi.models import WebAPIToken
+
+    return WebAPIToken.objects.select_related('user', 'local_site')
+
+
+def _get_access_token_queryset():
+    """Return the queryset used to look up OAuth2 access tokens.
+
+    Returns:
+        django.db.models.query.QuerySet:
+        The queryset.
+    """
+    from oauth2_provider.models import AccessToken
+
+    return AccessToken.objects.select_related('application',
+                                              'application__local_site',
+                                              'user')
+
+
+def get_webapi_token(token):
+    """Return an API token, using the cache if possible.
+
+    Args:
+        token (unicode):
+            The token string provided by the client.
+
+    Returns:
+        reviewboard.webapi.models.WebAPIToken:
+        The API token, with its user and Local Site, or ``None`` if it
+        doesn't exist.
+    """
+    return _get_cached_token('api', _make_token_cache_key('api', token),
+                             _get_webapi_token_queryset,
+                             token=token)
+
+
+def get_webapi_token_by_id(token_id):
+    """Return an API token by its ID, using the cache if possible.
+
+    Args:
+        token_id (int):
+            The ID of the token.
+
+    Returns:
+        reviewboard.webapi.models.WebAPIToken:
+        The API token, with its user and Local Site, or ``None`` if it
+        doesn't exist.
+    """
+    return _get_cached_token('api', _make_token_id_cache_key('api', token_id),
+                             _get_webapi_token_queryset,
+                             pk=token_id)
+
+
+def get_access_token(token):
+    """Return an OAuth2 access token, using the cache if possible.
+
+    Args:
+        token (unicode):
+            The token string provided by the client.
+
+    Returns:
+        oauth2_provider.models.AccessToken:
+        The access token, with its user, application and Local Site, or
+        ``None`` if it doesn't exist.
+    """
+    return _get_cached_token('oauth2', _make_token_cache_key('oauth2', token),
+                             _get_access_token_queryset,
+                             token=token)
+
+
+def get_access_token_by_id(token_id):
+    """Return an OAuth2 access token by its ID, using the cache if possible.
+
+    Args:
+        token_id (int):
+            The ID of the token.
+
+    Returns:
+        oauth2_provider.models.AccessToken:
+        The access token, with its user, application and Local Site, or
+        ``None`` if it doesn't exist.
+    """
+    return _get_cached_token('oauth2',
+                             _make_token_id_cache_key('oauth2', token_id),
+                             _get_access_token_queryset,
+                             pk=token_id)
+
+
+def invalidate_tokens(token_type, tokens):
+    """Remove tokens from the cache.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        tokens (list of tuple):
+            A list of ``(token_id, token)`` tuples for the tokens to remove.
+    """
+    keys = []
+
+    for token_id, token in tokens:
+        keys += [
+            _make_token_cache_key(token_type, token),
+            _make_token_id_cache_key(token_type, token_id),
+        ]
+
+    if keys:
+        cache.delete_many(keys)
+
+
+def _on_webapi_token_changed(instance, **kwargs):
+    """Handle an API token being saved or deleted.
+
+    Args:
+        instance (reviewboard.webapi.models.WebAPIToken):
+            The token that changed.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    invalidate_tokens('api', [(instance.pk, instance.token)])
+
+
+def _on_access_token_changed(instance, **kwargs):
+    """Handle an OAuth2 access token being saved or deleted.
+
+    Args:
+        instance (oauth2_provider.models.AccessToken):
+            The token that changed.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    invalidate_tokens('oauth2', [(instance.pk, instance.token)])
+
+
+def _on_application_changed(instance, **kwargs):
+    """Handle an OAuth2 application being saved or deleted.
+
+    Args:
+        instance (reviewboard.oauth.models.Application):
+            The application that changed.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    _invalidate_matching_tokens(oauth2_filters={
+        'application': instance,
+    })
+
+
+def _on_user_changed(instance, update_fields=None, **kwargs):
+    """Handle a user being saved or deleted.
+
+    Updates to only the user's last login time (which happen on every
+    authenticated API request) are ignored.
+
+    Args:
+        instance (django.contrib.auth.models.User):
+            The user that changed.
+
+        update_fields (frozenset, optional):
+            The fields that were updated, if limited by the caller.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    if update_fields and set(update_fields) == set(['last_login']):
+        return
+
+    _invalidate_matching_tokens(
+        api_filters={
+            'user': instance,
+        },
+        oauth2_filters={
+            'user': instance,
+        })
+
+
+def _on_local_site_changed(instance, **kwargs):
+    """Handle a Local Site being saved or deleted.
+
+    Args:
+        instance (reviewboard.site.models.LocalSite):
+            The Local Site that changed.
+
+        **kwargs (dict):
+            Ignored arguments from the signal.
+    """
+    _invalidate_matching_tokens(
+        api_filters={
+            'local_site': instance,
+        },
+        oauth2_filters={
+            'application__local_site': instance,
+        })
+
+
+def _invalidate_matching_tokens(api_filters=None, oauth2_filters=None):
+    """Remove all tokens matching the given filters from the cache.
+
+    Args:
+        api_filters (dict, optional):
+            The filters used to find API tokens to remove.
+
+        oauth2_filters (dict, optional):
+            The filters used to find OAuth2 access tokens to remove.
+    """
+    if api_filters:
+        invalidate_tokens(
+            'api',
+            _get_webapi_token_queryset().model.objects
+            .filter(**api_filters)
+            .values_list('pk', 'token'))
+
+    if oauth2_filters:
+        invalidate_tokens(
+            'oauth2',
+            _get_access_token_queryset().model.objects
+            .filter(**oauth2_filters)
+            .values_list('pk', 'token'))
+
+
+def connect_signals():
+    """Connect the signal handlers that invalidate cached tokens."""
+    from django.contrib.auth.models import User
+    from django.db.models.signals import post_delete, post_save
+    from oauth2_provider.models import AccessToken
+
+    from reviewboard.oauth.models import Application
+    from reviewboard.site.models import LocalSite
+    from reviewboard.webapi.models import WebAPIToken
+
+    handlers = [
+        (WebAPIToken, _on_webapi_token_changed),
+        (AccessToken, _on_access_token_changed),
+        (Application, _on_application_changed),
+        (User, _on_user_changed),
+        (LocalSite, _on_local_site_changed),
+    ]
+
+    for sender, handler in handlers:
+        post_save.connect(handler, sender=sender)
+        post_delete.connect(handler, sender=sender)